@@ -6,7 +6,9 @@ to :mod:`utils.platform_startup`, which no-ops on every platform where a
 Windows-only feature does not apply.
 """
 import argparse
+import atexit
 import logging
+import multiprocessing
 import sys
 
 # Must be imported before PySide6 so the Windows Qt environment variables
@@ -22,6 +24,8 @@ from PySide6.QtWidgets import QApplication, QSystemTrayIcon
 from PySide6.QtGui import QIcon
 
 from ui.main_window import RoundedWindow
+from utils.gui_gc import GuiThreadCollector
+from utils.persistence import get_persistence
 from utils.platform_utils import get_app_dir
 from utils.startup_utils import (DECLINED_REASON, provision_backend,
                                  show_provisioning_failure)
@@ -91,6 +95,13 @@ def main(argv=None):
     app.setApplicationName("Socksicle")
     app.setDesktopFileName(desktop_file_name())
     _apply_platform_style(app)
+    # Cycles holding widgets must be freed on this thread, never on a worker.
+    GuiThreadCollector(app)
+    # Debounced saves still pending must reach disk however the app exits:
+    # on quit from the event loop, or from sys.exit() outside it.
+    persistence = get_persistence()
+    app.aboutToQuit.connect(persistence.close)
+    atexit.register(persistence.close)
 
     # Set icon
     icon_path = get_app_dir() / "icon.png"
@@ -132,4 +143,6 @@ def main(argv=None):
 
 
 if __name__ == "__main__":
+    # Frozen builds re-run this entry point in link-parsing worker processes.
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
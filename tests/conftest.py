@@ -16,6 +16,15 @@ def qapp():
     yield inst
 
 
+@pytest.fixture(scope="session", autouse=True)
+def _gui_thread_gc():
+    """Collect garbage on the main thread only, as main.py does."""
+    from utils.gui_gc import GuiThreadCollector
+    collector = GuiThreadCollector()
+    yield
+    collector.stop()
+
+
 @pytest.fixture(autouse=True)
 def _mock_init_app_fonts(monkeypatch):
     """Prevent font file access violations in parallel xdist workers."""
@@ -23,6 +32,28 @@ def _mock_init_app_fonts(monkeypatch):
     monkeypatch.setattr(utils.font_utils, "init_app_fonts", lambda: None)
 
 
+@pytest.fixture(autouse=True)
+def _isolate_engine_stats(tmp_path, monkeypatch):
+    """Keep per-server engine stats out of the real config dir."""
+    from utils.engines import selector
+    monkeypatch.setattr(selector, "_stats_path", lambda: tmp_path / "engine_stats.json")
+    monkeypatch.setattr(selector, "_SELECTOR", None)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_server_index(monkeypatch):
+    """Each test starts with an empty process-wide server index."""
+    from utils import server_index
+    monkeypatch.setattr(server_index, "_INDEX", None)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_link_cache(monkeypatch):
+    """Give each test an empty parsed-link cache so patched parsers are honoured."""
+    from utils import server_model
+    monkeypatch.setattr(server_model, "_LINK_CACHE", server_model.LinkCache())
+
+
 @pytest.fixture(scope="session", autouse=True)
 def _drain_qt_threadpool():
     """Let queued QRunnable work finish before the QApplication is destroyed."""
@@ -32,3 +63,10 @@ def _drain_qt_threadpool():
         QThreadPool.globalInstance().waitForDone(5000)
     except Exception:
         pass
+
+
+@pytest.fixture(autouse=True)
+def _immediate_persistence(monkeypatch):
+    """Write stores at once so tests can read files right after a save."""
+    from utils import persistence
+    monkeypatch.setattr(persistence, "_SERVICE", persistence.PersistenceService(debounce=0))
@@ -0,0 +1,169 @@
+"""Tests for the optional SQLite storage backend (utils/config_db.py)."""
+import base64
+import json
+import sqlite3
+
+import pytest
+
+import utils.twinsock as tw
+from utils import config_db, sub_manager
+from utils.server_model import Server
+
+
+@pytest.fixture(autouse=True)
+def db_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(tw, "get_config_dir", lambda: tmp_path)
+    monkeypatch.setattr(config_db, "get_config_dir", lambda: tmp_path)
+    monkeypatch.setattr(sub_manager, "get_config_dir", lambda: tmp_path)
+    monkeypatch.setattr(sub_manager, "_seal_cache", {})
+    tw._reset()
+    yield
+    config_db.set_backend(None)
+    tw._reset()
+
+
+def _server(host, password="password"):
+    userinfo = base64.urlsafe_b64encode(f"aes-256-gcm:{password}".encode()).decode().rstrip("=")
+    return Server.from_link(f"ss://{userinfo}@{host}:8388#{host}")
+
+
+def _subs(count=5):
+    return [{"name": "Sub", "url": "https://example.com/sub?token=secret",
+             "servers": [_server(f"n{i}.example", f"pw-{i}") for i in range(count)]}]
+
+
+def test_rows_round_trip_with_sealed_secrets(tmp_path):
+    store = config_db.set_backend(config_db.BACKEND_SQLITE)
+    store.save_servers(config_db.MANUAL_ROWS, "manual", [_server("one.example")])
+    store.save_subscriptions(_subs())
+    manual = store.load_servers(config_db.MANUAL_ROWS, "manual")
+    assert isinstance(manual[0]["password"], tw.Sealed)
+    assert tw.reveal(manual[0]["password"]) == "password"
+    [sub] = store.load_subscriptions()
+    assert sub["url"] == "https://example.com/sub?token=secret"
+    assert [tw.reveal(s["password"]) for s in sub["servers"]] == [f"pw-{i}" for i in range(5)]
+    raw = (tmp_path / config_db.DB_FILE).read_bytes()
+    assert b"pw-3" not in raw and b"token=secret" not in raw
+    with sqlite3.connect(tmp_path / config_db.DB_FILE) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_saves_write_only_changed_rows():
+    store = config_db.set_backend(config_db.BACKEND_SQLITE)
+    subs = _subs(20)
+    assert store.save_subscriptions(subs) == 21
+    assert store.save_subscriptions(subs) == 0
+    subs[0]["servers"][7] = _server("changed.example", "pw-new")
+    assert store.save_subscriptions(subs) == 1
+    del subs[0]["servers"][15:]
+    assert store.save_subscriptions(subs) == 5
+    assert store.save_subscriptions([]) == 16
+
+
+def test_reopened_store_keeps_unchanged_rows():
+    store = config_db.set_backend(config_db.BACKEND_SQLITE)
+    store.save_subscriptions(_subs(10))
+    config_db.set_backend(None)
+    store = config_db.set_backend(config_db.BACKEND_SQLITE)
+    loaded = store.load_subscriptions()
+    loaded[0]["servers"] = [Server.from_dict(s) for s in loaded[0]["servers"]]
+    assert store.save_subscriptions(loaded) == 0
+
+
+def test_record_format_switch_rewrites_rows(tmp_path):
+    store = config_db.set_backend(config_db.BACKEND_SQLITE)
+    servers = [_server(f"m{i}.example") for i in range(3)]
+    store.save_servers(config_db.MANUAL_ROWS, "manual", servers)
+    tw.set_record_format(tw.RECORD_FORMAT_RECORDS)
+    loaded = [Server.from_dict(s) for s in store.load_servers(config_db.MANUAL_ROWS, "manual")]
+    assert store.save_servers(config_db.MANUAL_ROWS, "manual", loaded) == 3
+    with sqlite3.connect(tmp_path / config_db.DB_FILE) as conn:
+        rows = [json.loads(d) for (d,) in conn.execute("SELECT data FROM servers")]
+    assert all(tw.RECORD_KEY in r and "password" not in r for r in rows)
+    assert store.save_servers(config_db.MANUAL_ROWS, "manual", loaded) == 0
+
+
+def test_queries_use_indexed_columns():
+    store = config_db.set_backend(config_db.BACKEND_SQLITE)
+    dup = _server("dup.example")
+    store.save_servers(config_db.MANUAL_ROWS, "manual", [_server("a.example"), dup])
+    store.save_subscriptions([{"name": "Sub", "url": "https://x", "servers": [dup]}])
+    assert store.find(dup.unique_key) == [(config_db.MANUAL_ROWS, 1), ("Sub", 0)]
+    assert store.find("missing") == []
+    assert store.protocol_counts() == {"shadowsocks": 3}
+    assert store.protocol_counts("Sub") == {"shadowsocks": 1}
+
+
+def test_chain_detects_rows_edited_outside(tmp_path, caplog):
+    tw.ensure_drawer()
+    store = config_db.set_backend(config_db.BACKEND_SQLITE)
+    store.save_servers(config_db.MANUAL_ROWS, "manual", [_server("one.example")])
+    config_db.set_backend(None)
+    with sqlite3.connect(tmp_path / config_db.DB_FILE) as conn:
+        conn.execute("UPDATE servers SET data = replace(data, 'one.example', 'evil.example')")
+    config_db.set_backend(config_db.BACKEND_SQLITE)
+    assert "config.db was modified outside Socksicle" in caplog.text
+
+
+def test_sub_manager_routes_through_store(tmp_path):
+    config_db.set_backend(config_db.BACKEND_SQLITE)
+    sub_manager.save_subscriptions(_subs(3))
+    assert not (tmp_path / "subscriptions.json").exists()
+    [sub] = sub_manager.load_subscriptions()
+    assert tw.reveal(sub["servers"][2]["password"]) == "pw-2"
+
+
+def test_server_manager_migrates_json_files_once(tmp_path, monkeypatch):
+    from utils import server_manager as sm
+    monkeypatch.setattr(sm, "get_config_dir", lambda: tmp_path)
+    mgr = sm.ServerManager()
+    mgr.add_from_link("ss://YWVzLTI1Ni1nY206cGFzc3dvcmQ@one.example:8388#One")
+    sub_manager.save_subscriptions(_subs(4))
+    mgr.settings["storage_backend"] = config_db.BACKEND_SQLITE
+    mgr.save_settings()
+
+    mgr2 = sm.ServerManager()
+    store = config_db.get_store()
+    assert store is not None and not store.needs_migration()
+    assert [s.host for s in mgr2.manual_servers] == ["one.example"]
+    assert mgr2.manual_servers[0].password == "password"
+    assert len(sub_manager.load_subscriptions()[0]["servers"]) == 4
+
+    mgr2.add_from_link("ss://YWVzLTI1Ni1nY206cGFzc3dvcmQ@two.example:8388#Two")
+    assert len(json.loads((tmp_path / "servers.json").read_text())) == 1
+    assert [s.host for s in sm.ServerManager().manual_servers] == ["one.example", "two.example"]
+
+
+def test_subscriptions_sharing_a_name_keep_their_own_rows(monkeypatch):
+    from utils.subscription_manager import SubscriptionManager
+    config_db.set_backend(config_db.BACKEND_SQLITE)
+    feeds = {"https://cdn.example.com/a": ["vless://uuid-a@a.example.com:443#A"],
+             "https://cdn.example.com/b": ["vless://uuid-b@b.example.com:443#B"]}
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: (list(feeds[url]), {}))
+    mgr = SubscriptionManager()
+    assert mgr.add("cdn.example.com", "https://cdn.example.com/a") == "cdn.example.com"
+    assert mgr.add("cdn.example.com", "https://cdn.example.com/b") == "cdn.example.com (2)"
+
+    loaded = {s["name"]: s for s in sub_manager.load_subscriptions()}
+    assert sorted(loaded) == ["cdn.example.com", "cdn.example.com (2)"]
+    assert loaded["cdn.example.com"]["url"] == "https://cdn.example.com/a"
+    assert [s["host"] for s in loaded["cdn.example.com (2)"]["servers"]] == ["b.example.com"]
+
+
+def test_json_subscriptions_sharing_a_name_are_renamed_on_load(tmp_path):
+    subs = [{"name": "Sub", "url": "https://one.example/sub", "servers": []},
+            {"name": "Sub", "url": "https://two.example/sub", "servers": []}]
+    (tmp_path / "subscriptions.json").write_text(json.dumps(subs))
+    loaded = sub_manager.load_subscriptions_json()
+    assert [s["name"] for s in loaded] == ["Sub", "Sub (2)"]
+    assert [s["url"] for s in loaded] == ["https://one.example/sub", "https://two.example/sub"]
+
+
+def test_seal_cache_holds_no_secrets_and_follows_the_vault_key():
+    store = config_db.set_backend(config_db.BACKEND_SQLITE)
+    store.save_subscriptions(_subs(2))
+    assert store._sealed
+    assert "pw-" not in repr([list(cache) for cache in store._sealed.values()])
+    tw._reset()
+    assert store._sealed == {}
@@ -0,0 +1,140 @@
+"""Tests for the offline loopback engine benchmark harness."""
+import base64
+import json
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from utils.engines import bench
+from utils.engines.base import EngineType
+from utils.engines.singbox_engine import SingBoxEngine
+from utils.server_model import ProxyProtocol
+
+
+@pytest.fixture(autouse=True)
+def _qapp_available(qapp):
+    return qapp
+
+
+class SinkMeasurementTest(unittest.TestCase):
+    """The measurement helpers work against the sink without any proxy."""
+
+    def setUp(self):
+        self.sink = bench.SinkServer().start()
+        self.addCleanup(self.sink.close)
+        self.target = (self.sink.host, self.sink.port)
+
+    def test_download(self):
+        self.assertGreater(bench.measure_download(self.target, size=2 * 1024 * 1024), 0)
+
+    def test_upload(self):
+        self.assertGreater(bench.measure_upload(self.target, size=2 * 1024 * 1024), 0)
+
+    def test_small_requests(self):
+        p50, p95 = bench.measure_small_requests(self.target, count=20)
+        self.assertGreater(p50, 0)
+        self.assertGreaterEqual(p95, p50)
+
+
+class BenchConfigTest(unittest.TestCase):
+
+    def test_ss2022_password_is_key_sized(self):
+        key = base64.b64decode(bench.cipher_password("2022-blake3-aes-128-gcm"))
+        self.assertEqual(len(key), 16)
+        key = base64.b64decode(bench.cipher_password("2022-blake3-aes-256-gcm"))
+        self.assertEqual(len(key), 32)
+
+    def test_bench_server(self):
+        ss = bench.bench_server(ProxyProtocol.SHADOWSOCKS, 4000, "aes-256-gcm")
+        self.assertEqual((ss.host, ss.port, ss.method), ("127.0.0.1", 4000, "aes-256-gcm"))
+        self.assertTrue(ss.password)
+        vless = bench.bench_server(ProxyProtocol.VLESS, 4001)
+        self.assertTrue(vless.uuid)
+
+    def test_singbox_server_inbounds(self):
+        ss = bench.bench_server(ProxyProtocol.SHADOWSOCKS, 4000, "aes-128-gcm")
+        inbound = bench.singbox_server_config(ss)["inbounds"][0]
+        self.assertEqual(inbound["type"], "shadowsocks")
+        self.assertEqual(inbound["password"], ss.password)
+        vmess = bench.bench_server(ProxyProtocol.VMESS, 4002)
+        inbound = bench.singbox_server_config(vmess)["inbounds"][0]
+        self.assertEqual(inbound["users"], [{"uuid": vmess.uuid, "alterId": 0}])
+
+    def test_xray_server_inbounds(self):
+        vless = bench.bench_server(ProxyProtocol.VLESS, 4001)
+        inbound = bench.xray_server_config(vless)["inbounds"][0]
+        self.assertEqual(inbound["protocol"], "vless")
+        self.assertEqual(inbound["settings"]["decryption"], "none")
+        self.assertEqual(inbound["port"], 4001)
+
+    def test_hysteria2_not_served(self):
+        server = bench.bench_server(ProxyProtocol.HYSTERIA2, 4003)
+        with self.assertRaises(ValueError):
+            bench.singbox_server_config(server)
+
+    def test_strip_loopback_bypass(self):
+        server = bench.bench_server(ProxyProtocol.SHADOWSOCKS, 4000, "aes-128-gcm")
+        config = bench.strip_loopback_bypass(SingBoxEngine().build_config(server))
+        for rule in config["route"]["rules"]:
+            self.assertNotIn("ip_is_private", rule)
+            self.assertNotIn("ip_cidr", rule)
+        self.assertEqual(config["route"]["final"], "proxy")
+
+    def test_start_client_uses_build_args(self):
+        engine = SingBoxEngine()
+        server = bench.bench_server(ProxyProtocol.VLESS, 4001)
+        with mock.patch.object(engine, "find_binary", return_value=Path("/opt/sing-box/sing-box")), \
+             mock.patch("utils.engines.bench._spawn") as spawn:
+            bench._start_client(engine, server, 5555)
+        args = spawn.call_args[0][0]
+        self.assertEqual(args[1:3], ["run", "-c"])
+        with open(args[3], encoding="utf-8") as f:
+            config = json.load(f)
+        engine._cleanup_config()
+        self.assertEqual(config["inbounds"][0]["listen_port"], 5555)
+        self.assertFalse(any("ip_is_private" in r for r in config["route"]["rules"]))
+        # The instance goes back to the class implementation afterwards.
+        self.assertNotIn("build_config", vars(engine))
+
+
+class BenchPlanTest(unittest.TestCase):
+
+    def test_sslocal_only_runs_shadowsocks(self):
+        cases = list(bench.plan_cases(
+            [EngineType.SSLOCAL, EngineType.XRAY],
+            [ProxyProtocol.SHADOWSOCKS, ProxyProtocol.VLESS],
+            ["aes-128-gcm", "aes-256-gcm"]))
+        self.assertEqual(cases, [
+            (EngineType.SSLOCAL, ProxyProtocol.SHADOWSOCKS, "aes-128-gcm"),
+            (EngineType.SSLOCAL, ProxyProtocol.SHADOWSOCKS, "aes-256-gcm"),
+            (EngineType.XRAY, ProxyProtocol.SHADOWSOCKS, "aes-128-gcm"),
+            (EngineType.XRAY, ProxyProtocol.SHADOWSOCKS, "aes-256-gcm"),
+            (EngineType.XRAY, ProxyProtocol.VLESS, ""),
+        ])
+
+    def test_no_server_engine_installed(self):
+        with mock.patch.object(SingBoxEngine, "find_binary", return_value=None), \
+             mock.patch("utils.engines.xray_engine.XrayEngine.find_binary", return_value=None), \
+             mock.patch("utils.engines.sslocal_engine.SslocalEngine.find_binary", return_value=None):
+            with self.assertRaises(RuntimeError):
+                bench.run_benchmarks()
+
+    def test_format_table(self):
+        results = [
+            bench.BenchResult("xray", "sing-box", "vless", "", 812.4, 790.1, 0.41, 0.9, 2.1, 1.8),
+            bench.BenchResult("sslocal", "sing-box", "shadowsocks", "aes-128-gcm",
+                              error="client engine did not start"),
+        ]
+        table = bench.format_table(results).splitlines()
+        self.assertEqual(len(table), 3)
+        self.assertIn("812.4", table[1])
+        self.assertIn("error: client engine did not start", table[2])
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "reads /proc")
+    def test_process_cpu_seconds(self):
+        self.assertIsNotNone(bench.process_cpu_seconds(os.getpid()))
+        self.assertIsNone(bench.process_cpu_seconds(-1))
@@ -0,0 +1,152 @@
+"""Tests for utils.engines.selector (per-server "auto" engine choice)."""
+import json
+import unittest
+from unittest import mock
+
+import pytest
+
+from utils.connection_manager import ConnectionManager
+from utils.engines import engine_manager as em
+from utils.engines.base import EngineType
+from utils.engines.selector import EngineSelector, engine_cost, server_id, supported_engines
+from utils.server_model import ProxyProtocol, Server
+
+
+@pytest.fixture(autouse=True)
+def _qapp_available(qapp):
+    return qapp
+
+
+@pytest.fixture(autouse=True)
+def _tmp(request, tmp_path):
+    if request.instance is not None:
+        request.instance.tmp_path = tmp_path
+
+
+def _ss(**kwargs):
+    return Server(host="1.2.3.4", port=8388, method="aes-256-gcm", password="pw", **kwargs)
+
+
+def _vless():
+    return Server(protocol=ProxyProtocol.VLESS, host="1.2.3.4", port=443, uuid="u-1")
+
+
+class SupportedEnginesTest(unittest.TestCase):
+
+    def test_protocol_support(self):
+        self.assertEqual(supported_engines(_ss())[0], EngineType.SSLOCAL)
+        self.assertNotIn(EngineType.SSLOCAL, supported_engines(_vless()))
+        hy2 = Server(protocol=ProxyProtocol.HYSTERIA2, host="h", password="p")
+        self.assertEqual(supported_engines(hy2), (EngineType.SINGBOX,))
+
+    def test_plugin_excludes_xray(self):
+        engines = supported_engines(_ss(plugin="obfs-local"))
+        self.assertNotIn(EngineType.XRAY, engines)
+
+    def test_tun_forces_singbox(self):
+        self.assertEqual(supported_engines(_ss(), tun_mode=True), (EngineType.SINGBOX,))
+
+
+class EngineSelectorTest(unittest.TestCase):
+
+    def _selector(self, installed=None):
+        installed = installed or {EngineType.SSLOCAL, EngineType.XRAY, EngineType.SINGBOX}
+        return EngineSelector(path=self.tmp_path / "engine_stats.json",
+                              installed=lambda et: et in installed)
+
+    def test_untried_engines_first(self):
+        sel = self._selector()
+        server = _vless()
+        self.assertEqual(sel.choose(server), EngineType.XRAY)
+        sel.record_connect(server, EngineType.XRAY, 300)
+        self.assertEqual(sel.choose(server), EngineType.SINGBOX)
+
+    def test_picks_lowest_cost_and_remembers(self):
+        sel = self._selector()
+        server = _vless()
+        sel.record_connect(server, EngineType.XRAY, 400)
+        sel.record_ping(server, EngineType.XRAY, 250)
+        sel.record_connect(server, EngineType.SINGBOX, 200)
+        sel.record_ping(server, EngineType.SINGBOX, 120)
+        self.assertEqual(sel.choose(server), EngineType.SINGBOX)
+        self.assertEqual(sel.winner(server), EngineType.SINGBOX)
+
+    def test_winner_kept_until_the_ranking_flips(self):
+        sel = self._selector()
+        server = _vless()
+        sel.record_connect(server, EngineType.XRAY, 400)
+        sel.record_connect(server, EngineType.SINGBOX, 200)
+        self.assertEqual(sel.choose(server), EngineType.SINGBOX)
+        sel.record_ping(server, EngineType.SINGBOX, 150)
+        sel.record_connect(server, EngineType.XRAY, 390)
+        self.assertEqual(sel.winner(server), EngineType.SINGBOX)
+        sel.record_failure(server, EngineType.SINGBOX)
+        self.assertEqual(sel.winner(server), EngineType.XRAY)
+
+    def test_throughput_counts_only_when_every_engine_has_a_sample(self):
+        sel = self._selector()
+        server = _ss()
+        sel.record_connect(server, EngineType.SSLOCAL, 200)
+        sel.record_connect(server, EngineType.SINGBOX, 220)
+        sel.record_connect(server, EngineType.XRAY, 240)
+        sel.record_throughput(server, EngineType.SINGBOX, 300)
+        self.assertEqual(sel.choose(server), EngineType.SSLOCAL)
+
+    def test_failures_penalised(self):
+        sel = self._selector()
+        server = _vless()
+        sel.record_connect(server, EngineType.XRAY, 400)
+        sel.record_connect(server, EngineType.SINGBOX, 200)
+        sel.record_failure(server, EngineType.SINGBOX)
+        self.assertEqual(sel.choose(server), EngineType.XRAY)
+
+    def test_only_installed_engines(self):
+        sel = self._selector(installed={EngineType.SINGBOX})
+        self.assertEqual(sel.choose(_ss()), EngineType.SINGBOX)
+
+    def test_throughput_lowers_cost(self):
+        base = {"ok": 1, "fail": 0, "connect_ms": 200.0, "ping_ms": 100.0}
+        self.assertLess(engine_cost({**base, "mbps": 300.0}), engine_cost(base))
+
+    def test_persisted_by_hashed_key(self):
+        path = self.tmp_path / "engine_stats.json"
+        sel = self._selector()
+        server = _ss()
+        sel.record_connect(server, EngineType.SSLOCAL, 150)
+        sel.save()
+        raw = path.read_text(encoding="utf-8")
+        self.assertNotIn("pw", raw)
+        self.assertIn(server_id(server), json.loads(raw)["stats"])
+
+        reloaded = EngineSelector(path=path, installed=lambda et: True)
+        self.assertEqual(reloaded.stats_for(server)["sslocal"]["ok"], 1)
+
+
+class AutoEngineManagerTest(unittest.TestCase):
+
+    def test_resolve_concrete(self):
+        self.assertEqual(em.resolve_engine_type("xray"), EngineType.XRAY)
+        self.assertEqual(em.resolve_engine_type("bogus"), EngineType.SSLOCAL)
+
+    def test_resolve_auto_prefers_installed(self):
+        def find(self):
+            return "/bin/xray" if self.engine_type == EngineType.XRAY else None
+
+        with mock.patch("utils.engines.singbox_engine.SingBoxEngine.find_binary", find), \
+             mock.patch("utils.engines.xray_engine.XrayEngine.find_binary", find), \
+             mock.patch("utils.engines.sslocal_engine.SslocalEngine.find_binary", find):
+            self.assertEqual(em.resolve_engine_type(em.AUTO_ENGINE), EngineType.XRAY)
+
+    def test_connection_manager_switches_per_server(self):
+        mgr = ConnectionManager({"engine": "xray"})
+        with mock.patch("utils.connection_manager.get_selector") as get_sel:
+            get_sel.return_value.choose.return_value = EngineType.SINGBOX
+            mgr._select_engine(_vless(), False)
+        self.assertEqual(mgr.engine.engine_type, EngineType.SINGBOX)
+
+    def test_failure_recorded_for_engine(self):
+        mgr = ConnectionManager({"engine": "xray"})
+        server = _vless()
+        mgr._record_failure(server)
+        from utils.engines.selector import get_selector
+        self.assertEqual(get_selector().stats_for(server)["xray"]["fail"], 1)
@@ -681,5 +681,35 @@ class PdeathsigAndProcessLifecycleTest(unittest.TestCase):
             engine.teardown()
 
 
+class EngineVersionProbeTest(unittest.TestCase):
+
+    def test_parse_version_formats(self):
+        self.assertEqual(common.parse_version("sing-box version 1.11.8"), (1, 11, 8))
+        self.assertEqual(common.parse_version("Xray 25.4.3 (Xray, Penetrates Everything.)"), (25, 4, 3))
+        self.assertEqual(common.parse_version("v1.9"), (1, 9, 0))
+        self.assertIsNone(common.parse_version(""))
+        self.assertIsNone(common.parse_version("no version here"))
+
+    def test_probe_version_runs_binary_once(self):
+        common.probe_version.cache_clear()
+        fake = SimpleNamespace(stdout="sing-box version 1.10.7\n", stderr="", returncode=0)
+        with mock.patch.object(common.subprocess, "run", return_value=fake) as run:
+            self.assertEqual(common.probe_version("/bin/sb", ("version",), 1.0), (1, 10, 7))
+            self.assertEqual(common.probe_version("/bin/sb", ("version",), 1.0), (1, 10, 7))
+        self.assertEqual(run.call_count, 1)
+        common.probe_version.cache_clear()
+
+    def test_probe_version_handles_oserror(self):
+        common.probe_version.cache_clear()
+        with mock.patch.object(common.subprocess, "run", side_effect=OSError("boom")):
+            self.assertIsNone(common.probe_version("/missing", ("version",), 0.0))
+        common.probe_version.cache_clear()
+
+    def test_detected_version_none_without_binary(self):
+        engine = XrayEngine()
+        with mock.patch.object(XrayEngine, "find_binary", return_value=None):
+            self.assertIsNone(engine.detected_version())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -33,6 +33,9 @@ def _run_main(backend, exit_behavior=SystemExit):
     with mock.patch.object(main, "QApplication", app_cls), \
          mock.patch.object(main, "RoundedWindow", window_cls), \
          mock.patch.object(main, "QIcon"), \
+         mock.patch.object(main, "GuiThreadCollector"), \
+         mock.patch.object(main, "get_persistence"), \
+         mock.patch.object(main, "atexit"), \
          mock.patch.object(main, "get_app_dir",
                            return_value=Path.cwd() / "icon.png"), \
          mock.patch.object(main, "provision_backend", return_value=backend), \
@@ -56,6 +59,9 @@ class ExitCodeTest(unittest.TestCase):
              mock.patch.object(main, "RoundedWindow",
                                return_value=mock.Mock()), \
              mock.patch.object(main, "QIcon"), \
+             mock.patch.object(main, "GuiThreadCollector"), \
+             mock.patch.object(main, "get_persistence") as persistence, \
+             mock.patch.object(main, "atexit") as atexit_mock, \
              mock.patch.object(main, "get_app_dir",
                                return_value=Path.cwd() / "icon.png"), \
              mock.patch.object(main, "provision_backend",
@@ -71,12 +77,18 @@ class ExitCodeTest(unittest.TestCase):
                 main.main()
         exit_mock.assert_called_once_with(42)
         app_inst.exec.assert_called_once_with()
+        close = persistence.return_value.close
+        app_inst.aboutToQuit.connect.assert_called_once_with(close)
+        atexit_mock.register.assert_called_once_with(close)
 
     def test_provisioning_failure_shows_dialog_and_exits_1(self):
         with mock.patch.object(main, "QApplication",
                                return_value=mock.Mock()), \
              mock.patch.object(main, "RoundedWindow") as window_cls, \
              mock.patch.object(main, "QIcon"), \
+             mock.patch.object(main, "GuiThreadCollector"), \
+             mock.patch.object(main, "get_persistence"), \
+             mock.patch.object(main, "atexit"), \
              mock.patch.object(main, "provision_backend",
                                return_value=SimpleNamespace(
                                    ok=False, reason="boom")), \
@@ -97,6 +109,9 @@ class ExitCodeTest(unittest.TestCase):
                                return_value=mock.Mock()), \
              mock.patch.object(main, "RoundedWindow") as window_cls, \
              mock.patch.object(main, "QIcon"), \
+             mock.patch.object(main, "GuiThreadCollector"), \
+             mock.patch.object(main, "get_persistence"), \
+             mock.patch.object(main, "atexit"), \
              mock.patch.object(main, "provision_backend",
                                return_value=None), \
              mock.patch.object(main, "show_provisioning_failure") as show, \
@@ -116,6 +131,9 @@ class ExitCodeTest(unittest.TestCase):
                                return_value=mock.Mock()), \
              mock.patch.object(main, "RoundedWindow") as window_cls, \
              mock.patch.object(main, "QIcon"), \
+             mock.patch.object(main, "GuiThreadCollector"), \
+             mock.patch.object(main, "get_persistence"), \
+             mock.patch.object(main, "atexit"), \
              mock.patch.object(main, "provision_backend",
                                return_value=SimpleNamespace(
                                    ok=False, reason=DECLINED_REASON)), \
@@ -147,6 +165,9 @@ class SharedFlowOrderTest(unittest.TestCase):
                                side_effect=lambda: calls.append("create")
                                or window_inst), \
              mock.patch.object(main, "QIcon"), \
+             mock.patch.object(main, "GuiThreadCollector"), \
+             mock.patch.object(main, "get_persistence"), \
+             mock.patch.object(main, "atexit"), \
              mock.patch.object(main, "get_app_dir",
                                return_value=Path.cwd() / "icon.png"), \
              mock.patch.object(main, "provision_backend",
@@ -182,7 +203,7 @@ class LinuxPathTest(unittest.TestCase):
         app_inst = mock.Mock(spec=[
             "setApplicationName", "setDesktopFileName", "setWindowIcon",
             "setHighDpiScaleFactorRoundingPolicy", "installNativeEventFilter",
-            "setStyle", "setPalette", "exec",
+            "setStyle", "setPalette", "exec", "aboutToQuit",
         ])
         app_inst.exec.return_value = 0
         with mock.patch.object(main, "QApplication",
@@ -190,6 +211,9 @@ class LinuxPathTest(unittest.TestCase):
              mock.patch.object(main, "RoundedWindow",
                                return_value=mock.Mock()), \
              mock.patch.object(main, "QIcon"), \
+             mock.patch.object(main, "GuiThreadCollector"), \
+             mock.patch.object(main, "get_persistence"), \
+             mock.patch.object(main, "atexit"), \
              mock.patch.object(main, "get_app_dir",
                                return_value=Path.cwd() / "icon.png"), \
              mock.patch.object(main, "provision_backend",
@@ -230,6 +254,9 @@ class WindowsPathTest(unittest.TestCase):
              mock.patch.object(main, "RoundedWindow",
                                return_value=window_inst), \
              mock.patch.object(main, "QIcon"), \
+             mock.patch.object(main, "GuiThreadCollector"), \
+             mock.patch.object(main, "get_persistence"), \
+             mock.patch.object(main, "atexit"), \
              mock.patch.object(main, "get_app_dir",
                                return_value=Path.cwd() / "icon.png"), \
              mock.patch.object(main, "provision_backend",
@@ -270,6 +297,9 @@ class CLIMinimizedTest(unittest.TestCase):
         with mock.patch.object(main, "QApplication", return_value=app_inst), \
              mock.patch.object(main, "RoundedWindow", return_value=window_inst), \
              mock.patch.object(main, "QIcon"), \
+             mock.patch.object(main, "GuiThreadCollector"), \
+             mock.patch.object(main, "get_persistence"), \
+             mock.patch.object(main, "atexit"), \
              mock.patch.object(main, "get_app_dir", return_value=Path.cwd() / "icon.png"), \
              mock.patch.object(main, "provision_backend", return_value=_backend_ok()), \
              mock.patch.object(main, "initialize"), \
@@ -292,6 +322,9 @@ class CLIMinimizedTest(unittest.TestCase):
         with mock.patch.object(main, "QApplication", return_value=app_inst), \
              mock.patch.object(main, "RoundedWindow", return_value=window_inst), \
              mock.patch.object(main, "QIcon"), \
+             mock.patch.object(main, "GuiThreadCollector"), \
+             mock.patch.object(main, "get_persistence"), \
+             mock.patch.object(main, "atexit"), \
              mock.patch.object(main, "get_app_dir", return_value=Path.cwd() / "icon.png"), \
              mock.patch.object(main, "provision_backend", return_value=_backend_ok()), \
              mock.patch.object(main, "initialize"), \
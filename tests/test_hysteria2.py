@@ -1,9 +1,12 @@
 """Tests for Hysteria 2 protocol link parsing and sing-box config generation."""
 import json
 import unittest
+from unittest import mock
 
 import pytest
 
+from utils import bandwidth
+from utils.connection_manager import ConnectionManager
 from utils.server_model import Server, ProxyProtocol
 from utils.link_parser import parse_link, parse_links_from_text, _parse_hysteria2
 from utils.engines.singbox_engine import (
@@ -192,3 +195,100 @@ class TestSingBoxHysteria2Config(unittest.TestCase):
         self.assertEqual(cfg["outbounds"][0]["server"], "1.2.3.4")
         self.assertEqual(cfg["outbounds"][0]["server_port"], 8443)
         self.assertEqual(cfg["route"]["final"], "proxy")
+
+
+class TestBandwidthCalibration(unittest.TestCase):
+
+    def _hy2(self, **kwargs):
+        return Server(protocol=ProxyProtocol.HYSTERIA2, host="1.2.3.4",
+                      port=443, password="auth", **kwargs)
+
+    def test_bw_network_round_trip(self):
+        server = self._hy2(up_mbps=40, down_mbps=180, bw_network="abc123")
+        restored = Server.from_dict(server.to_dict())
+        self.assertEqual(restored.bw_network, "abc123")
+        self.assertNotIn("bw_network", self._hy2().to_dict())
+
+    def test_to_mbps(self):
+        self.assertAlmostEqual(bandwidth.to_mbps(12_500_000, 1.0), 100.0)
+        self.assertEqual(bandwidth.to_mbps(1000, 0), 0.0)
+
+    def test_needs_recalibration_only_when_network_differs(self):
+        server = self._hy2(bw_network="net-a")
+        self.assertFalse(bandwidth.needs_recalibration(server, "net-a"))
+        self.assertTrue(bandwidth.needs_recalibration(server, "net-b"))
+        self.assertFalse(bandwidth.needs_recalibration(server, ""))
+        self.assertFalse(bandwidth.needs_recalibration(self._hy2(), "net-b"))
+        vless = Server(protocol=ProxyProtocol.VLESS, bw_network="net-a")
+        self.assertFalse(bandwidth.needs_recalibration(vless, "net-b"))
+
+    def test_network_fingerprint_ignores_host_part(self):
+        def fingerprint_for(addr):
+            sock = mock.MagicMock()
+            sock.__enter__.return_value.getsockname.return_value = (addr, 5353)
+            with mock.patch("utils.bandwidth.socket.socket", return_value=sock):
+                return bandwidth.network_fingerprint()
+
+        self.assertEqual(fingerprint_for("192.168.1.10"), fingerprint_for("192.168.1.77"))
+        self.assertNotEqual(fingerprint_for("192.168.1.10"), fingerprint_for("10.0.0.5"))
+        # The sing-box TUN address is never reported as a network.
+        self.assertEqual(fingerprint_for("172.19.0.1"), "")
+
+    def test_run_direction_aggregates_streams(self):
+        def worker(port, deadline, stop, timeout):
+            return 1_250_000, 10.0, 11.0
+
+        mbps = bandwidth._run_direction(worker, 1080, 0.1, 4, 1.0)
+        self.assertAlmostEqual(mbps, 40.0)
+
+    def test_run_direction_all_failed(self):
+        def worker(port, deadline, stop, timeout):
+            raise OSError("refused")
+
+        self.assertEqual(bandwidth._run_direction(worker, 1080, 0.1, 2, 1.0), 0.0)
+
+    def test_calibrate_rounds_up(self):
+        with mock.patch("utils.bandwidth.measure_download", return_value=187.2), \
+             mock.patch("utils.bandwidth.measure_upload", return_value=41.01):
+            self.assertEqual(bandwidth.calibrate(1080), (42, 188))
+
+    def test_calibrate_rejects_failed_measurement(self):
+        with mock.patch("utils.bandwidth.measure_download", return_value=0.0), \
+             mock.patch("utils.bandwidth.measure_upload", return_value=30.0):
+            self.assertIsNone(bandwidth.calibrate(1080))
+
+    def test_manager_stores_result(self):
+        mgr = ConnectionManager()
+        server = self._hy2()
+        mgr._network_fingerprint = "net-a"
+        mgr._calibration = (server, 0, 0)
+        results = []
+        mgr.bandwidthCalibrated.connect(lambda s, ok: results.append(ok))
+        mgr._on_calibration_done(mgr._generation, (50, 200))
+        self.assertEqual((server.up_mbps, server.down_mbps), (50, 200))
+        self.assertEqual(server.bw_network, "net-a")
+        self.assertEqual(results, [True])
+        self.assertFalse(mgr.is_calibrating)
+
+    def test_manager_restores_values_on_failure(self):
+        mgr = ConnectionManager()
+        server = self._hy2(up_mbps=0, down_mbps=0)
+        mgr._calibration = (server, 30, 90)
+        mgr._on_calibration_done(mgr._generation, None)
+        self.assertEqual((server.up_mbps, server.down_mbps), (30, 90))
+        self.assertFalse(mgr.is_calibrating)
+
+    def test_manager_suggests_recalibration_on_network_change(self):
+        mgr = ConnectionManager()
+        server = self._hy2(up_mbps=30, down_mbps=90, bw_network="net-a")
+        mgr._network_fingerprint = "net-b"
+        suggested = []
+        mgr.calibrationSuggested.connect(suggested.append)
+        with mock.patch.object(mgr._engine, "get_current_server", return_value=server):
+            mgr._check_calibration()
+        self.assertEqual(suggested, [server])
+
+    def test_calibrate_rejects_non_hysteria2(self):
+        mgr = ConnectionManager()
+        self.assertFalse(mgr.calibrate_bandwidth(Server(protocol=ProxyProtocol.VLESS)))
+        self.assertFalse(mgr.is_calibrating)
@@ -0,0 +1,37 @@
+"""Tests for the config JSON helpers (utils/jsonio.py)."""
+import json
+
+import pytest
+
+from utils import jsonio
+
+DATA = [{"name": "Ünïcode ✓", "port": 443, "flags": [True, None], "ratio": 0.5}]
+
+
+@pytest.fixture(params=["installed", "missing"])
+def backend(request, monkeypatch):
+    if request.param == "missing":
+        monkeypatch.setattr(jsonio, "orjson", None)
+    elif jsonio.orjson is None:
+        pytest.skip("orjson not installed")
+    return request.param
+
+
+def test_round_trip_matches_stdlib(backend):
+    data = jsonio.dumps(DATA)
+    assert isinstance(data, bytes)
+    assert json.loads(data) == DATA
+    assert jsonio.loads(json.dumps(DATA).encode("utf-8")) == DATA
+
+
+def test_loads_replaces_invalid_utf8(backend):
+    assert jsonio.loads(b'["a\xffb"]') == ["a�b"]
+
+
+def test_loads_rejects_malformed_json(backend):
+    with pytest.raises(json.JSONDecodeError):
+        jsonio.loads(b"[1,")
+
+
+def test_dumps_handles_big_ints(backend):
+    assert json.loads(jsonio.dumps([2 ** 70])) == [2 ** 70]
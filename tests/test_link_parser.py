@@ -291,6 +291,101 @@ class TestServerModelRoundTrip:
 
 # --- parse_links_from_text ---
 
+class TestCompactServer:
+    def test_server_is_slotted(self):
+        s = Server(host="h")
+        assert not hasattr(s, "__dict__")
+        with pytest.raises(AttributeError):
+            s.latency = 5
+
+    def test_option_strings_are_interned(self):
+        a = Server.from_dict(json.loads('{"method": "chacha20-ietf-poly1305", "transport": "ws"}'))
+        b = Server.from_dict(json.loads('{"method": "chacha20-ietf-poly1305", "transport": "ws"}'))
+        assert a.method is b.method
+        assert a.transport is b.transport
+
+    def test_lookup_keys_cached_and_refreshed_on_change(self):
+        from utils.server_model import lookup_key
+        s = Server(host="1.2.3.4", password="pw")
+        keys = s.lookup_keys
+        assert s.lookup_keys is keys
+        assert keys == ("", lookup_key("aes-256-gcm:pw@1.2.3.4:443"))
+        s.port = 8443
+        assert s.unique_key == "aes-256-gcm:pw@1.2.3.4:8443"
+        assert s.lookup_keys[1] == lookup_key(s.unique_key)
+        s.password = "other"
+        s.protocol = ProxyProtocol.HYSTERIA2
+        assert s.unique_key == "hysteria2:other@1.2.3.4:8443"
+        s.key = "hy2://other@1.2.3.4:8443"
+        assert s.lookup_keys == (lookup_key(s.key), lookup_key(s.unique_key))
+        keys = s.lookup_keys
+        s.name = "renamed"
+        assert s.lookup_keys is keys
+        # Only digests are kept, never the plaintext unique_key.
+        assert all(len(k) == 32 and "other" not in k for k in keys)
+
+    def test_copy_and_pickle_keep_sealed_secrets(self):
+        import copy
+        import pickle
+        from utils.twinsock import Sealed
+        s = Server(host="h")
+        handle = Sealed("manual", "tws3.token")
+        s.password = handle
+        for other in (copy.copy(s), pickle.loads(pickle.dumps(s))):
+            assert isinstance(other._secret("password", reveal=False), Sealed)
+            assert other.host == "h"
+        assert copy.copy(s)._secret("password", reveal=False) is handle
+
+
+class TestServerCodec:
+    def test_codec_covers_every_field(self):
+        import dataclasses
+        from utils.server_model import _FIELD_CODECS
+        assert [name for name, *_ in _FIELD_CODECS] == [
+            f.name for f in dataclasses.fields(Server) if f.init]
+
+    def test_round_trip_omits_defaults(self):
+        s = Server(name="n", host="h", port=8443, protocol=ProxyProtocol.VLESS, uuid="u",
+                   security="reality", fingerprint="chrome", expires_at=0, mux="smux")
+        d = s.to_dict()
+        assert d == {"key": "", "name": "n", "host": "h", "port": 8443,
+                     "method": "aes-256-gcm", "password": "", "protocol": "vless",
+                     "uuid": "u", "security": "reality", "expires_at": 0, "mux": "smux"}
+        assert Server.from_dict(d) == s
+
+    def test_bad_values_fall_back_to_defaults(self):
+        s = Server.from_dict({"port": "x", "alter_id": None, "protocol": ["vless"],
+                              "expires_at": "soon", "mux": None, "insecure": 1})
+        assert s.port == 443
+        assert s.alter_id == 0
+        assert s.protocol == ProxyProtocol.SHADOWSOCKS
+        assert s.expires_at is None
+        assert s.mux == ""
+        assert s.insecure is True
+        assert Server.from_dict({"port": "8443"}).port == 8443
+        assert Server.from_dict(None) == Server()
+
+    def test_batch_helpers_keep_sealed_secrets(self):
+        from utils.twinsock import Sealed, key_id
+        handle = Sealed("manual", "tws3.token")
+        servers = Server.from_dicts([{"host": "a", "password": handle}, {"host": "b"}])
+        assert [s.host for s in servers] == ["a", "b"]
+        dicts = Server.to_dicts(servers, reveal=False)
+        assert dicts[0]["password"] is handle
+        assert "lookup" not in dicts[0]  # would need the sealed password
+        assert dicts[1] == dict(servers[1].to_dict(),
+                                lookup=":".join((key_id(), *servers[1].lookup_keys)))
+        assert Server.from_dict(dicts[1]).has_lookup_keys
+
+    def test_lookup_keys_of_another_vault_key_are_ignored(self):
+        from utils.server_model import lookup_key
+        stored = Server(host="1.2.3.4", password="pw").to_dict(reveal=False)
+        stale = Server.from_dict(dict(stored, lookup="0123456789abcdef:aa:bb"))
+        assert not stale.has_lookup_keys
+        assert stale.lookup_keys == ("", lookup_key("aes-256-gcm:pw@1.2.3.4:443"))
+        assert Server.from_dict(stored).lookup_keys == stale.lookup_keys
+
+
 class TestParseLinksFromText:
     def test_extracts_links(self):
         text = (
@@ -341,3 +436,106 @@ class TestOptimizations:
         assert vless_pub is not None
         assert vless_pub.is_private is False
 
+    def test_from_link_cache_returns_copies(self):
+        from utils import server_model
+        server_model._LINK_CACHE.clear()
+        link = "vless://uuid@1.2.3.4:443?security=tls#Cached"
+        first = Server.from_link(link)
+        first.name = "Renamed"
+        second = Server.from_link(link)
+        assert second is not first
+        assert second.name == "Cached"
+        stats = server_model.link_cache_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_from_link_cache_skips_invalid_and_bounds_size(self):
+        from utils.server_model import LinkCache
+        cache = LinkCache(maxsize=2)
+        for i in range(3):
+            cache.put(i, Server(name=str(i)))
+        assert cache.get(0) is None
+        assert cache.get(2).name == "2"
+        assert cache.stats()["size"] == 2
+
+        assert Server.from_link("ss://not-a-link") is None
+        assert Server.from_link("ss://not-a-link") is None
+
+    def test_from_links_keeps_order_and_gaps(self):
+        links = [
+            "vless://a@1.2.3.4:443#A",
+            "bogus",
+            "",
+            "hy2://pw@5.6.7.8:443#B",
+            "vless://a@1.2.3.4:443#A",
+        ]
+        servers = Server.from_links(links, workers=1)
+        assert [s.name if s else None for s in servers] == ["A", None, None, "B", "A"]
+        assert servers[0] is not servers[4]
+
+    def test_from_links_process_pool_matches_serial(self):
+        from utils import server_model
+        links = [f"vless://u{i}@8.8.4.{i}:443?security=tls#N{i}" for i in range(40)]
+        serial = Server.from_links(links, workers=1)
+        server_model.clear_link_cache()
+        parallel = Server.from_links(links, workers=2, threshold=1)
+        assert parallel == serial
+
+    def test_from_links_falls_back_when_pool_fails(self, monkeypatch):
+        from utils import server_model
+
+        def broken(*args, **kwargs):
+            raise OSError("no processes")
+
+        monkeypatch.setattr(server_model, "ProcessPoolExecutor", broken)
+        servers = Server.from_links(["vless://u@1.2.3.4:443#X"], workers=4, threshold=1)
+        assert servers[0].name == "X"
+
+    @pytest.mark.parametrize("cpus, workers", [(1, 1), (3, 1), (4, 4), (32, 8)])
+    def test_parse_workers_needs_enough_cpus(self, monkeypatch, cpus, workers):
+        from utils import server_model
+        monkeypatch.setattr(server_model.os, "sched_getaffinity", lambda pid: set(range(cpus)), raising=False)
+        assert server_model.parse_workers() == workers
+
+
+
+class TestMuxHints:
+    def test_vless_mux_params(self):
+        s = parse_link("vless://u@1.2.3.4:443?security=tls&mux=smux&mux_concurrency=4&padding=1#N")
+        assert s.mux == "smux"
+        assert s.mux_concurrency == 4
+        assert s.mux_padding is True
+        assert s.mux_brutal is False
+
+    def test_vless_boolean_mux_selects_default_protocol(self):
+        s = parse_link("vless://u@1.2.3.4:443?mux=true#N")
+        assert s.mux == "h2mux"
+
+    def test_vless_mux_off_and_absent(self):
+        assert parse_link("vless://u@1.2.3.4:443?mux=0#N").mux == "off"
+        assert parse_link("vless://u@1.2.3.4:443#N").mux == ""
+
+    def test_vmess_mux_from_json(self):
+        link = "vmess://" + _b64_encode_json({
+            "add": "1.2.3.4", "port": "443", "id": "uuid", "mux": "yamux", "brutal": "1",
+        })
+        s = parse_link(link)
+        assert s.mux == "yamux"
+        assert s.mux_brutal is True
+
+    def test_ss_mux_query(self):
+        userinfo = _b64_encode("aes-256-gcm:pw")
+        s = Server.from_link(f"ss://{userinfo}@1.2.3.4:8388/?mux=h2mux&max_streams=6#N")
+        assert s.mux == "h2mux"
+        assert s.mux_concurrency == 6
+
+    def test_mux_fields_round_trip_dict(self):
+        s = parse_link("vless://u@1.2.3.4:443?mux=smux&padding=true#N")
+        d = s.to_dict()
+        assert d["mux"] == "smux"
+        assert d["mux_padding"] is True
+        back = Server.from_dict(d)
+        assert back.mux == "smux"
+        assert back.mux_padding is True
+        assert "mux" not in Server(host="h").to_dict()
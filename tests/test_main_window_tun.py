@@ -6,6 +6,7 @@ import pytest
 from PySide6.QtWidgets import QMessageBox
 
 from ui.main_window import RoundedWindow
+from utils.server_index import MANUAL_OWNER, get_server_index
 from utils.server_model import Server, ProxyProtocol
 import utils.twinsock as tw
 
@@ -31,6 +32,7 @@ def main_win(qapp, monkeypatch, tmp_path):
     )
     win.server_manager.manual_servers = [test_srv]
     win.manual_servers = [test_srv]
+    get_server_index().set_owner(MANUAL_OWNER, [test_srv])
     win._refresh_server_list()
     if win.server_panel._server_items:
         win.server_panel._server_items[0].radio.setChecked(True)
@@ -0,0 +1,165 @@
+"""Tests for the debounced persistence service (utils/persistence.py)."""
+import json
+import threading
+import time
+
+import pytest
+
+import utils.twinsock as tw
+from utils import persistence
+
+
+@pytest.fixture
+def vault_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(tw, "get_config_dir", lambda: tmp_path)
+    tw._reset()
+    yield
+    tw._reset()
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_burst_of_saves_is_written_once_on_writer_thread():
+    service = persistence.PersistenceService(debounce=0.05)
+    writes = []
+    for _ in range(20):
+        service.mark_dirty("store", lambda: writes.append(threading.current_thread()))
+    assert writes == [] and service.pending() == {"store"}
+    assert _wait_for(lambda: writes)
+    time.sleep(0.1)
+    assert len(writes) == 1 and writes[0] is not threading.current_thread()
+    assert service.pending() == set()
+    service.close()
+
+
+def test_continuous_saves_are_written_within_max_delay():
+    service = persistence.PersistenceService(debounce=0.05, max_delay=0.2)
+    writes = []
+    start = time.monotonic()
+    while not writes and time.monotonic() - start < 2.0:
+        service.mark_dirty("store", lambda: writes.append(time.monotonic()))
+        time.sleep(0.01)
+    assert writes and writes[0] - start < 1.0
+    service.close()
+
+
+def test_flush_writes_pending_stores_on_caller_thread():
+    service = persistence.PersistenceService(debounce=60)
+    writes = []
+    service.mark_dirty("a", lambda: writes.append(("a", threading.current_thread())))
+    service.mark_dirty("b", lambda: writes.append(("b", threading.current_thread())))
+    service.flush("a")
+    assert writes == [("a", threading.current_thread())]
+    assert service.pending() == {"b"}
+    service.flush()
+    assert [name for name, _ in writes] == ["a", "b"] and service.pending() == set()
+    service.close()
+
+
+def test_close_flushes_and_later_saves_write_at_once():
+    service = persistence.PersistenceService(debounce=60)
+    writes = []
+    service.mark_dirty("store", lambda: writes.append(1))
+    service.close()
+    assert writes == [1]
+    service.mark_dirty("store", lambda: writes.append(2))
+    assert writes == [1, 2] and service.pending() == set()
+
+
+def test_failed_write_is_logged_and_others_still_run(caplog):
+    service = persistence.PersistenceService(debounce=0)
+    writes = []
+
+    def broken():
+        raise OSError("disk full")
+
+    service.mark_dirty("broken", broken)
+    service.mark_dirty("store", lambda: writes.append(1))
+    assert writes == [1]
+    assert "Failed to save broken" in caplog.text
+
+
+def test_atomic_write_replaces_file_without_leftovers(tmp_path):
+    path = tmp_path / "store.json"
+    path.write_text("old")
+    persistence.atomic_write(path, b"new")
+    assert path.read_bytes() == b"new"
+    assert [p.name for p in tmp_path.iterdir()] == ["store.json"]
+
+
+def test_server_manager_saves_are_coalesced_until_flush(vault_env, monkeypatch, tmp_path):
+    from utils import server_manager as sm
+    monkeypatch.setattr(sm, "get_config_dir", lambda: tmp_path)
+    mgr = sm.ServerManager()
+    service = persistence.PersistenceService(debounce=60)
+    monkeypatch.setattr(persistence, "_SERVICE", service)
+    for host in ("one.example", "two.example", "three.example"):
+        assert mgr.add_from_link(f"ss://YWVzLTI1Ni1nY206cGFzc3dvcmQ@{host}:8388#{host}")
+    mgr.settings["local_port"] = 1090
+    mgr.save_settings()
+    assert not (tmp_path / "servers.json").exists()
+    assert service.pending() == {"servers.json", "settings.json"}
+    service.close()
+    assert json.loads((tmp_path / "settings.json").read_text())["local_port"] == 1090
+    assert [s.host for s in sm.ServerManager().manual_servers] == [
+        "one.example", "two.example", "three.example"]
+
+
+def test_batch_link_import_is_saved_once(vault_env, monkeypatch, tmp_path):
+    from utils import server_manager as sm
+    from utils.link_parser import parse_links_from_text
+    monkeypatch.setattr(sm, "get_config_dir", lambda: tmp_path)
+    mgr = sm.ServerManager()
+    saves = []
+    monkeypatch.setattr(mgr, "save_manual_servers", lambda: saves.append(1))
+    text = "\n".join(["notes", "ss://YWVzLTI1Ni1nY206cGFzc3dvcmQ@one.example:8388#One",
+                      "  vless://uuid@two.example:443#Two", "vless://"])
+    added = mgr.add_from_links(parse_links_from_text(text), lock_export=True, expires_at=42)
+    assert [s.host for s in added] == ["one.example", "two.example"]
+    assert all(s.lock_export and s.expires_at == 42 for s in added)
+    assert mgr.manual_servers == added and saves == [1]
+    assert mgr.add_from_links(["nonsense"]) == [] and saves == [1]
+
+
+def test_imported_profiles_are_saved_through_the_writer(vault_env, monkeypatch, tmp_path, qapp):
+    from utils import server_manager as sm
+    from utils import sub_manager as sbm
+    from utils.server_model import Server
+    from utils.subscription_manager import SubscriptionManager
+    monkeypatch.setattr(sm, "get_config_dir", lambda: tmp_path)
+    monkeypatch.setattr(sbm, "get_config_dir", lambda: tmp_path)
+    mgr = sm.ServerManager()
+    sub_mgr = SubscriptionManager()
+    service = persistence.PersistenceService(debounce=60)
+    monkeypatch.setattr(persistence, "_SERVICE", service)
+    sub = {"name": "Sub", "url": "https://example.com/s", "servers": [Server(host="s.example")]}
+    assert mgr.merge_imported([Server(host="m.example")], [sub], sub_mgr) == (1, 1)
+    assert not (tmp_path / "subscriptions.json").exists()
+    assert service.pending() == {"servers.json", "subscriptions.json"}
+    service.close()
+    assert [s["name"] for s in sbm.load_subscriptions()] == ["Sub"]
+
+
+def test_imported_subscriptions_are_added_under_the_manager_lock(vault_env, monkeypatch, tmp_path, qapp):
+    from utils import sub_manager as sbm
+    from utils.server_model import Server
+    from utils.subscription_manager import SubscriptionManager
+    monkeypatch.setattr(sbm, "get_config_dir", lambda: tmp_path)
+    sub_mgr = SubscriptionManager()
+    subs = [{"name": "Sub", "url": "https://one.example/s", "servers": [Server(host="a.example")]},
+            {"name": "Sub", "url": "https://two.example/s", "servers": [Server(host="b.example")]},
+            {"name": "Again", "url": "https://one.example/s", "servers": []}]
+    added = []
+    with sub_mgr._lock:
+        worker = threading.Thread(target=lambda: added.append(sub_mgr.add_imported(subs)))
+        worker.start()
+        worker.join(0.2)
+        assert worker.is_alive() and not sub_mgr.subscriptions
+    worker.join(5)
+    assert added == [2]
+    assert [s["name"] for s in sbm.load_subscriptions()] == ["Sub", "Sub (2)"]
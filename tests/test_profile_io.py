@@ -0,0 +1,126 @@
+"""Tests for streaming profile export/import (utils/profile_io.py)."""
+import json
+import threading
+
+import pytest
+
+import utils.twinsock as tw
+from utils import profile_io
+from utils.server_model import Server
+
+
+@pytest.fixture(autouse=True)
+def vault_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(tw, "get_config_dir", lambda: tmp_path)
+    tw._reset()
+    yield
+    tw._reset()
+
+
+def _profile(n=3):
+    manual = [Server(name=f"m{i}", host=f"m{i}.example", password=f"pw{i}") for i in range(n)]
+    manual.append(Server(name="locked", host="locked.example", lock_export=True))
+    subs = [
+        {"name": "Sub", "url": "https://example.com/s", "traffic": None,
+         "servers": [Server(name=f"s{i}", host=f"s{i}.example", uuid="u") for i in range(n)]},
+        {"name": "Empty", "url": "https://example.com/e", "servers": []},
+        {"name": "Locked", "url": "https://example.com/l", "lock_export": True,
+         "servers": [Server(host="x")]},
+    ]
+    return manual, subs
+
+
+@pytest.mark.parametrize("name", ["p.json", "p.json.gz", "p.ndjson", "p.ndjson.gz"])
+def test_roundtrip_matches_import_payload(tmp_path, name):
+    manual, subs = _profile()
+    path = tmp_path / name
+    assert profile_io.export_profiles(path, manual, subs) == 6
+    assert (path.read_bytes()[:2] == b"\x1f\x8b") == name.endswith(".gz")
+    assert profile_io.import_profiles(path) == tw.import_payload(tw.export_payload(manual, subs))
+
+
+def test_json_layout_is_the_classic_export_document(tmp_path):
+    manual, subs = _profile()
+    path = tmp_path / "p.json"
+    profile_io.export_profiles(path, manual, subs)
+    assert json.loads(path.read_text(encoding="utf-8")) == tw.export_payload(manual, subs)
+    profile_io.export_profiles(path, [], [])
+    assert json.loads(path.read_text(encoding="utf-8"))["subscriptions"] == []
+
+
+def test_reads_classic_export_and_detects_gzip_by_content(tmp_path):
+    manual, subs = _profile()
+    expected = tw.import_payload(tw.export_payload(manual, subs))
+    old = tmp_path / "old.json"
+    old.write_text(json.dumps(tw.export_payload(manual, subs), indent=4), encoding="utf-8")
+    assert profile_io.import_profiles(old) == expected
+    packed = tmp_path / "profile.bin"
+    profile_io.export_profiles(tmp_path / "p.ndjson.gz", manual, subs)
+    (tmp_path / "p.ndjson.gz").rename(packed)
+    assert profile_io.import_profiles(packed) == expected
+
+
+def test_ndjson_skips_malformed_lines(tmp_path):
+    path = tmp_path / "p.ndjson"
+    profile_io.export_profiles(path, [Server(host="a"), Server(host="b")], [])
+    lines = path.read_bytes().splitlines()
+    path.write_bytes(b"\n".join([lines[0], lines[1], b"{not json", b"", lines[2]]) + b"\n")
+    manuals, subs = profile_io.import_profiles(path)
+    assert [s.host for s in manuals] == ["a", "b"]
+    assert subs == []
+
+
+def test_progress_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(profile_io, "PROGRESS_EVERY", 2)
+    manual, subs = _profile(5)
+    path = tmp_path / "p.ndjson.gz"
+    calls = []
+    profile_io.export_profiles(path, manual, subs, lambda done, total: calls.append((done, total)))
+    assert calls[0] == (2, 10)
+    assert calls[-1] == (10, 10)
+    calls.clear()
+    profile_io.import_profiles(path, lambda done, total: calls.append((done, total)))
+    size = path.stat().st_size
+    assert len(calls) > 1
+    assert calls[-1] == (size, size)
+    assert all(done <= total for done, total in calls)
+
+
+def test_failed_export_leaves_existing_file(tmp_path):
+    path = tmp_path / "p.json"
+    path.write_text("previous", encoding="utf-8")
+
+    class Broken:
+        lock_export = False
+
+        def to_dict(self):
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        profile_io.export_profiles(path, [Broken()], [])
+    assert path.read_text(encoding="utf-8") == "previous"
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
+
+
+def test_profile_job_runs_off_the_calling_thread(qapp):
+    from PySide6.QtCore import QThreadPool
+    results = []
+    finished = threading.Event()
+
+    def work(progress):
+        progress(1, 1)
+        return threading.get_ident()
+
+    job = profile_io.ProfileJob(work, lambda done, total: None,
+                                lambda result, error: (results.append((result, error)), finished.set()))
+    QThreadPool.globalInstance().start(job)
+    assert finished.wait(5)
+    assert results[0][1] is None
+    assert results[0][0] != threading.get_ident()
+
+    finished.clear()
+    failing = profile_io.ProfileJob(lambda progress: 1 / 0, None,
+                                    lambda result, error: (results.append((result, error)), finished.set()))
+    QThreadPool.globalInstance().start(failing)
+    assert finished.wait(5)
+    assert isinstance(results[1][1], ZeroDivisionError)
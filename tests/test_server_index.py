@@ -0,0 +1,136 @@
+"""Tests for the cross-subscription server index."""
+from utils.server_index import MANUAL_OWNER, ServerIndex, get_server_index
+from utils.server_model import ProxyProtocol, Server
+from utils.subscription_manager import SubscriptionManager
+
+
+def _server(uuid, host="1.2.3.4", name="N"):
+    return Server.from_link(f"vless://{uuid}@{host}:443#{name}")
+
+
+def test_lookup_by_key_and_unique_key():
+    index = ServerIndex()
+    a, b = _server("a"), _server("b")
+    index.set_owner("Sub", [a, b])
+    assert index.get(a.key) is a
+    assert index.get(" " + b.key + "\n") is b
+    assert index.get_unique(b.unique_key) is b
+    assert index.owner_of(a) == "Sub"
+    assert a in index and len(index) == 2
+    assert index.get("vless://missing@h:1") is None
+
+
+def test_set_owner_replaces_previous_servers():
+    index = ServerIndex()
+    a, b = _server("a"), _server("b")
+    index.set_owner("Sub", [a])
+    index.set_owner("Sub", [b])
+    assert index.get(a.key) is None
+    assert index.owner_of(a) is None
+    assert index.get(b.key) is b
+
+    index.remove_owner("Sub")
+    assert len(index) == 0
+
+
+def test_servers_of_follows_list_order():
+    index = ServerIndex()
+    a, b, c = _server("a"), _server("b"), _server("c")
+    index.set_owner(MANUAL_OWNER, [a, b])
+    index.add(MANUAL_OWNER, c)
+    index.discard(a)
+    assert index.servers_of(MANUAL_OWNER) == [b, c]
+    assert index.servers_of("Missing") == []
+
+
+def test_shared_nodes_map_back_to_every_owner():
+    index = ServerIndex()
+    first, second = _server("a", name="One"), _server("a", name="Two")
+    index.add(MANUAL_OWNER, _server("solo"))
+    index.set_owner("Sub A", [first])
+    index.set_owner("Sub B", [second])
+    assert index.owners(first.unique_key) == ["Sub A", "Sub B"]
+    assert index.shared() == {first.lookup_keys[1]: ["Sub A", "Sub B"]}
+
+    index.discard(first)
+    assert index.owners(first.unique_key) == ["Sub B"]
+    assert index.shared() == {}
+
+
+def test_keys_captured_at_indexing_time():
+    index = ServerIndex()
+    s = _server("a")
+    old_key = s.key
+    index.add("Sub", s)
+    s.key = "vless://changed@1.2.3.4:443#N"
+    index.discard(s)
+    assert index.get(old_key) is None
+    assert len(index) == 0
+
+
+def test_subscription_manager_keeps_index_in_step(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.sub_manager.get_config_dir", lambda: tmp_path)
+    links = ["vless://uuid-1@h1.example.com:443#N1", "vless://uuid-2@h2.example.com:443#N2"]
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: (list(links), {}))
+    sub_mgr = SubscriptionManager()
+    assert sub_mgr.add("Sub", "https://example.com/sub")
+    index = get_server_index()
+    assert index.owner_of(index.get(links[0])) == "Sub"
+
+    links[1] = "vless://uuid-3@h3.example.com:443#N3"
+    sub_mgr._update_worker(sub_mgr.get("Sub"), emit_signal=False)
+    assert index.get("vless://uuid-2@h2.example.com:443#N2") is None
+    assert index.get(links[1]) is sub_mgr.get("Sub")["servers"][1]
+
+    sub_mgr.delete("Sub")
+    assert len(index) == 0
+
+
+def test_keys_are_read_on_first_keyed_lookup():
+    reads = []
+
+    class Tracked(Server):
+        @property
+        def unique_key(self):
+            reads.append(self.name)
+            return super().unique_key
+
+    index = ServerIndex()
+    a = Tracked(name="A", host="1.2.3.4", uuid="a", protocol=ProxyProtocol.VLESS)
+    b = Tracked(name="B", host="1.2.3.4", uuid="b", protocol=ProxyProtocol.VLESS)
+    index.set_owner("Sub", [a, b])
+    index.discard(b)
+    assert index.owner_of(a) == "Sub" and len(index) == 1
+    assert reads == []
+    assert index.get_unique("vless:a@1.2.3.4:443") is a
+    assert index.get_unique("vless:a@1.2.3.4:443") is a
+    assert reads == ["A"]
+
+
+def test_stored_lookup_keys_index_without_revealing():
+    from utils.twinsock import Sealed
+    a = _server("a")
+    stored = dict(a.to_dict(reveal=False), uuid=Sealed("subscriptions", "tws3.unused"),
+                  key=Sealed("subscriptions", "tws3.unused"))
+    loaded = Server.from_dict(stored)
+    index = ServerIndex()
+    index.set_owner("Sub", [loaded])
+    assert index.get(a.key) is loaded
+    assert index.get_unique(a.unique_key) is loaded
+
+
+def test_index_digests_again_after_a_vault_rekey(tmp_path, monkeypatch):
+    import utils.twinsock as tw
+    a = _server("a")
+    index = ServerIndex()
+    index.set_owner("Sub", [a])
+    assert index.get(a.key) is a
+    monkeypatch.setattr(tw, "get_config_dir", lambda: tmp_path)
+    tw._reset()  # a fresh vault in tmp_path: every digest changes
+    try:
+        assert index.get(a.key) is a
+        assert index.get_unique(a.unique_key) is a
+    finally:
+        monkeypatch.undo()
+        tw._reset()
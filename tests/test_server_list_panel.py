@@ -56,3 +56,69 @@ def test_server_list_panel_refresh_updates_enabled():
     panel.refresh([srv])
     assert panel.scroll_content.updatesEnabled() is True
     assert len(panel._server_items) == 1
+
+
+def test_server_list_panel_refresh_reuses_rows():
+    theme = M3Theme()
+    panel = ServerListPanel(theme)
+    a = Server(name="A", host="1.1.1.1", port=443, protocol=ProxyProtocol.VLESS)
+    b = Server(name="B", host="2.2.2.2", port=443, protocol=ProxyProtocol.VLESS)
+    c = Server(name="C", host="3.3.3.3", port=443, protocol=ProxyProtocol.VLESS)
+    panel.refresh([a, b])
+    row_a = panel._server_items[0]
+
+    panel.refresh([c, a], reuse=True)
+    assert panel._server_items[1] is row_a
+    assert [item.server for item in panel._server_items] == [c, a]
+
+    deleted = []
+    panel.serverDeleted.connect(deleted.append)
+    row_a.delete_button.click()
+    assert deleted == [1]
+
+    panel.refresh([c, a])
+    assert panel._server_items[1] is not row_a
+
+
+def test_server_list_panel_checks_connected_and_selects_by_server():
+    panel = ServerListPanel(M3Theme())
+    a = Server(name="A", host="1.1.1.1", port=443, protocol=ProxyProtocol.VLESS)
+    b = Server(name="B", host="2.2.2.2", port=443, protocol=ProxyProtocol.VLESS)
+    panel.refresh([a, b], [b])
+    assert [item.radio.isChecked() for item in panel._server_items] == [False, True]
+    assert panel.select_server(a)
+    assert panel._server_items[0].radio.isChecked()
+    assert not panel.select_server(Server(name="C", host="3.3.3.3", port=443))
+
+
+def test_qr_payloads_keep_links_scannable_and_shares_intact():
+    import secrets
+    from utils import twinsock
+    theme = M3Theme()
+    short = Server.from_link("vless://uuid@1.2.3.4:443?type=ws&path=%2Fws#Short")
+    assert ServerItem("Short", short, theme)._qr_payloads() == [short.key]
+
+    path = secrets.token_hex(750)  # random, so compression cannot shrink it into one part
+    long = Server.from_link(f"vless://uuid@1.2.3.4:443?type=ws&path=%2F{path}#Long")
+    long.expires_at = 4102444800
+    item = ServerItem("Long", long, theme)
+    assert len(long.key) > twinsock.SHARE_PART_CHARS
+    assert item._qr_payloads() == [long.key]
+
+    huge = Server.from_link(f"vless://uuid@1.2.3.4:443?type=ws&path=%2F{path * 2}#Huge")
+    huge.expires_at = 4102444800
+    item = ServerItem("Huge", huge, theme)
+    assert item._qr_payloads() == []
+    parts = item._qr_payloads(wrap_long=True)
+    assert len(parts) > 1
+    assembler = twinsock.ShareAssembler()
+    for part in parts:
+        assembler.feed(part)
+    link, meta = twinsock.decrypt_share_payload("", assembler.token())
+    assert link == huge.key and meta["expires_at"] == 4102444800
+
+    share = twinsock.encrypt_share("", huge.key)
+    item.server = Server.from_link(short.key)
+    item.server.key = share
+    split = item._qr_payloads()
+    assert len(split) > 1 and all(twinsock.is_share_part(p) for p in split)
@@ -570,5 +570,125 @@ class SingBoxTunConfigTest(unittest.TestCase):
                             os.remove(temp_name)
 
 
+class SingBoxMultiplexTest(unittest.TestCase):
+
+    def _server(self, **kw):
+        base = dict(protocol=ProxyProtocol.VLESS, host="1.2.3.4", port=443,
+                    uuid="u", flow="", security="tls", transport="tcp",
+                    server_name="", fingerprint="", mux="", mux_concurrency=0,
+                    mux_padding=False, mux_brutal=False, up_mbps=0, down_mbps=0)
+        base.update(kw)
+        return _FakeServer(**base)
+
+    def test_no_multiplex_by_default(self):
+        cfg = _generate_config(self._server(), 1080)
+        self.assertNotIn("multiplex", cfg["outbounds"][0])
+
+    def test_global_default_applies(self):
+        cfg = _generate_config(self._server(), 1080,
+                               mux_defaults={"mux": "smux", "mux_concurrency": 4})
+        mp = cfg["outbounds"][0]["multiplex"]
+        self.assertEqual(mp, {"enabled": True, "protocol": "smux", "max_streams": 4})
+
+    def test_server_overrides_global(self):
+        srv = self._server(mux="off")
+        cfg = _generate_config(srv, 1080, mux_defaults={"mux": "h2mux"})
+        self.assertNotIn("multiplex", cfg["outbounds"][0])
+        srv = self._server(mux="yamux", mux_padding=True)
+        cfg = _generate_config(srv, 1080, mux_defaults={"mux": "off"})
+        mp = cfg["outbounds"][0]["multiplex"]
+        self.assertEqual(mp["protocol"], "yamux")
+        self.assertTrue(mp["padding"])
+
+    def test_brutal_needs_bandwidth(self):
+        srv = self._server(mux="h2mux", mux_brutal=True)
+        self.assertNotIn("brutal", _generate_config(srv, 1080)["outbounds"][0]["multiplex"])
+        srv = self._server(mux="h2mux", mux_brutal=True, up_mbps=50, down_mbps=200)
+        brutal = _generate_config(srv, 1080)["outbounds"][0]["multiplex"]["brutal"]
+        self.assertEqual(brutal, {"enabled": True, "up_mbps": 50, "down_mbps": 200})
+
+    def test_vision_flow_skips_multiplex(self):
+        srv = self._server(mux="h2mux", flow="xtls-rprx-vision")
+        self.assertNotIn("multiplex", _generate_config(srv, 1080)["outbounds"][0])
+
+    def test_shadowsocks_multiplex(self):
+        srv = self._server(protocol=ProxyProtocol.SHADOWSOCKS, method="aes-256-gcm",
+                           password="p", mux="smux")
+        self.assertTrue(_generate_config(srv, 1080)["outbounds"][0]["multiplex"]["enabled"])
+
+    def test_engine_passes_mux_defaults(self):
+        engine = SingBoxEngine()
+        engine.mux_defaults = {"mux": "smux"}
+        cfg = engine.build_config(self._server())
+        self.assertEqual(cfg["outbounds"][0]["multiplex"]["protocol"], "smux")
+
+
+class SingBoxPerformanceTest(unittest.TestCase):
+
+    def _server(self, **kw):
+        base = dict(protocol=ProxyProtocol.VLESS, host="1.2.3.4", port=443,
+                    uuid="u", flow="", security="none", transport="tcp",
+                    server_name="", fingerprint="")
+        base.update(kw)
+        return _FakeServer(**base)
+
+    def test_dial_fields_on_proxy_outbound(self):
+        perf = {"tcp_fast_open": True, "tcp_multi_path": True, "udp_fragment": True}
+        ob = _generate_config(self._server(), 1080, perf=perf)["outbounds"][0]
+        self.assertTrue(ob["tcp_fast_open"])
+        self.assertTrue(ob["tcp_multi_path"])
+        self.assertTrue(ob["udp_fragment"])
+
+    def test_defaults_add_no_dial_fields(self):
+        ob = _generate_config(self._server(), 1080)["outbounds"][0]
+        for key in ("tcp_fast_open", "tcp_multi_path", "udp_fragment"):
+            self.assertNotIn(key, ob)
+
+    def test_hysteria2_skips_tcp_options(self):
+        srv = self._server(protocol=ProxyProtocol.HYSTERIA2, password="p")
+        perf = {"tcp_fast_open": True, "udp_fragment": True}
+        ob = _generate_config(srv, 1080, perf=perf)["outbounds"][0]
+        self.assertNotIn("tcp_fast_open", ob)
+        self.assertTrue(ob["udp_fragment"])
+
+    def test_tun_stack_mtu_gso(self):
+        perf = {"tun_stack": "system", "tun_mtu": 1500, "tun_gso": True}
+        tun_in = _generate_config(self._server(), 1080, tun_mode=True, perf=perf)["inbounds"][0]
+        self.assertEqual(tun_in["stack"], "system")
+        self.assertEqual(tun_in["mtu"], 1500)
+        self.assertTrue(tun_in["gso"])
+
+    def test_engine_drops_gso_on_singbox_1_11(self):
+        from unittest import mock
+        engine = SingBoxEngine()
+        engine.tun_mode = True
+        engine.perf_options = {"tun_gso": True, "tcp_fast_open": True}
+        with mock.patch.object(SingBoxEngine, "detected_version", return_value=(1, 11, 8)), \
+                mock.patch("utils.engines.tuning.sys.platform", "linux"):
+            cfg = engine.build_config(self._server())
+        self.assertNotIn("gso", cfg["inbounds"][0])
+        self.assertTrue(cfg["outbounds"][0]["tcp_fast_open"])
+
+    def test_engine_keeps_gso_on_singbox_1_10(self):
+        from unittest import mock
+        engine = SingBoxEngine()
+        engine.tun_mode = True
+        engine.perf_options = {"tun_gso": True}
+        with mock.patch.object(SingBoxEngine, "detected_version", return_value=(1, 10, 7)), \
+                mock.patch("utils.engines.tuning.sys.platform", "linux"):
+            cfg = engine.build_config(self._server())
+        self.assertTrue(cfg["inbounds"][0]["gso"])
+
+    def test_gso_setting_offered_only_where_honoured(self):
+        from unittest import mock
+        from utils.engines.tuning import tun_gso_available
+        with mock.patch("utils.engines.tuning.sys.platform", "linux"):
+            self.assertTrue(tun_gso_available((1, 10, 7)))
+            self.assertFalse(tun_gso_available((1, 11, 8)))
+            self.assertFalse(tun_gso_available((1, 7, 0)))
+        with mock.patch("utils.engines.tuning.sys.platform", "win32"):
+            self.assertFalse(tun_gso_available((1, 10, 7)))
+
+
 if __name__ == "__main__":
     unittest.main()
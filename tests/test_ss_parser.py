@@ -278,7 +278,8 @@ class TestSIP008JSON:
         }
         ss_links, meta = _try_parse_sip008_json(json.dumps(data))
         assert len(ss_links) == 1
-        assert "example.com" in ss_links[0]
+        assert ss_links[0].host == "example.com"
+        assert "example.com" in ss_links[0].key
         assert meta['traffic']['used'] == 1073741824
         assert meta['traffic']['total'] == 1073741824 + 5368709120
 
@@ -301,7 +302,26 @@ class TestSIP008JSON:
         ss_links, meta = _try_parse_sip008_json(json.dumps(data))
         assert len(ss_links) == 1
         # The link should contain plugin info
-        assert "plugin=" in ss_links[0]
+        assert "plugin=" in ss_links[0].key
+        assert ss_links[0].plugin == "obfs-local"
+        assert ss_links[0].plugin_opts == "obfs=http;obfs-host=cdn.com"
+
+    def test_sip008_matches_link_parsing(self):
+        """Direct construction gives the same Server as parsing its key link."""
+        from utils.server_model import Server
+        from utils.sub_manager import _try_parse_sip008_json
+        data = {"version": 1, "servers": [
+            {"remarks": "Tokyo #1", "server": "jp.example.com", "server_port": 8388,
+             "password": "p@ss:w/rd", "method": "2022-blake3-aes-128-gcm",
+             "plugin": "v2ray-plugin", "plugin_opts": "tls;host=cdn.example.com"},
+            {"server": "10.0.0.1", "server_port": "8388", "password": "pw", "method": "aes-256-gcm"},
+            {"server": "bad.example.com", "server_port": "x", "password": "pw", "method": "aes-256-gcm"},
+        ]}
+        servers, _ = _try_parse_sip008_json(json.dumps(data))
+        assert len(servers) == 2
+        for direct in servers:
+            assert direct == Server.from_link(direct.key)
+        assert servers[1].is_private
 
     def test_invalid_json(self):
         from utils.sub_manager import _try_parse_sip008_json
@@ -444,7 +464,7 @@ class TestParseSubscriptionMetadata:
         import urllib.request
         from utils import sub_manager
         resp = MagicMock()
-        resp.read.return_value = body.encode()
+        resp.read.side_effect = [body.encode(), b""]
         resp.headers = headers
         resp.__enter__.return_value = resp
         return patch.object(sub_manager.urllib.request, 'urlopen', return_value=resp)
@@ -0,0 +1,168 @@
+"""Tests for the pooled subscription refresh scheduler."""
+import base64
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+from utils import sub_manager, sub_scheduler
+from utils.sub_scheduler import RefreshQueue, backoff_delay
+from utils.subscription_manager import SubscriptionManager
+
+
+@pytest.fixture(autouse=True)
+def _qapp_available(qapp):
+    return qapp
+
+
+@pytest.fixture(autouse=True)
+def _isolate(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.sub_manager.get_config_dir", lambda: tmp_path)
+    monkeypatch.setattr(sub_scheduler, "START_JITTER_S", 0)
+    monkeypatch.setattr("utils.subscription_manager.START_JITTER_S", 0)
+
+
+class RefreshQueueTest(unittest.TestCase):
+
+    def test_due_order_and_interval(self):
+        q = RefreshQueue()
+        q.sync([
+            {"name": "b", "profile_update_interval": 1, "last_updated": 1000},
+            {"name": "a", "profile_update_interval": 1, "last_updated": 0},
+            {"name": "manual", "profile_update_interval": 0, "last_updated": 0},
+        ])
+        self.assertEqual(q.pop_due(now=5000), ["a", "b"])
+        # In flight: a resync does not queue them again.
+        q.sync([{"name": "a", "profile_update_interval": 1, "last_updated": 0}])
+        self.assertEqual(q.pop_due(now=5000), [])
+        q.record("a", True, 1, now=5000)
+        self.assertEqual(q.next_due("a"), 5000 + 3600)
+
+    def test_failure_backoff_grows_and_resets(self):
+        q = RefreshQueue()
+        q.record("a", False, 1, now=0)
+        self.assertEqual(q.next_due("a"), backoff_delay(1))
+        q.record("a", False, 1, now=0)
+        self.assertEqual(q.next_due("a"), 2 * backoff_delay(1))
+        self.assertEqual(q.failures("a"), 2)
+        q.record("a", True, 1, now=0)
+        self.assertEqual(q.failures("a"), 0)
+        self.assertEqual(q.next_due("a"), 3600)
+
+    def test_failure_without_interval_is_not_retried(self):
+        q = RefreshQueue()
+        q.record("a", False, 0, now=0)
+        self.assertEqual(q.failures("a"), 1)
+        self.assertIsNone(q.next_due("a"))
+        self.assertEqual(q.pop_due(now=10 ** 9), [])
+
+    def test_backoff_capped(self):
+        self.assertEqual(backoff_delay(50), sub_scheduler.MAX_BACKOFF_S)
+
+    def test_removed_subscription_dropped(self):
+        q = RefreshQueue()
+        q.sync([{"name": "a", "profile_update_interval": 1, "last_updated": 0}])
+        q.sync([])
+        self.assertEqual(q.pop_due(now=10 ** 9), [])
+
+
+class RefreshRoundTest(unittest.TestCase):
+
+    LINK = "vless://uuid-1@h1.example.com:443#N1"
+
+    def _manager(self, names):
+        with mock.patch("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: ([self.LINK], {})):
+            mgr = SubscriptionManager()
+            for name in names:
+                self.assertTrue(mgr.add(name, f"https://{name}.example.com/sub"))
+        return mgr
+
+    def test_round_saves_once(self):
+        mgr = self._manager(["a", "b", "c"])
+        pools = []
+
+        def fetch(url, settings, http_cache=None, pool=None):
+            pools.append(pool)
+            if url.startswith("https://b."):
+                return [], {}
+            return [self.LINK, "vless://uuid-2@h2.example.com:443#N2"], {}
+
+        with mock.patch("utils.subscription_manager.parse_subscription", fetch), \
+             mock.patch("utils.subscription_manager.save_subscriptions") as save:
+            mgr._refresh_round(list(mgr.subscriptions))
+        save.assert_called_once()
+        self.assertEqual(len(pools), 3)
+        self.assertIs(pools[0], pools[1])
+        self.assertEqual(len(mgr.get_servers("a")), 2)
+        self.assertEqual(len(mgr.get_servers("b")), 1)
+        self.assertEqual(mgr._queue.failures("b"), 1)
+        self.assertEqual(mgr._queue.failures("a"), 0)
+
+    def test_not_modified_round_skips_save(self):
+        mgr = self._manager(["a"])
+        with mock.patch("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: ([], {"not_modified": True})), \
+             mock.patch("utils.subscription_manager.save_subscriptions") as save:
+            mgr._refresh_round(list(mgr.subscriptions))
+        save.assert_not_called()
+
+    def test_auto_update_only_runs_due(self):
+        mgr = self._manager(["a", "b"])
+        mgr.get("a")["profile_update_interval"] = 1
+        mgr.get("a")["last_updated"] = 0
+        mgr.get("b")["profile_update_interval"] = 24
+        with mock.patch.object(mgr, "_start_round") as start:
+            mgr._check_auto_update()
+        self.assertEqual([s["name"] for s in start.call_args[0][0]], ["a"])
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = base64.b64encode(b"vless://u1@h1:443#N1\n")
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        if self.path == "/old":
+            self.send_response(302)
+            self.send_header("Location", "/sub")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class KeepAlivePoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        self.server.connections = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+    def test_connection_reused_and_redirect_followed(self):
+        pool = sub_manager.KeepAlivePool()
+        self.addCleanup(pool.close)
+        for path in ("/sub", "/old", "/sub"):
+            with pool.urlopen(self.base + path, {"User-Agent": "t"}) as resp:
+                self.assertEqual(resp.read(), _KeepAliveHandler.body)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_parse_subscription_uses_pool(self):
+        pool = sub_manager.KeepAlivePool()
+        self.addCleanup(pool.close)
+        # The loopback guard applies to the host, so point a name at it.
+        url = f"http://localhost:{self.server.server_port}/sub"
+        with mock.patch("urllib.request.getproxies", return_value={}):
+            links, _ = sub_manager.parse_subscription(url, pool=pool)
+        self.assertEqual(links, ["vless://u1@h1:443#N1"])
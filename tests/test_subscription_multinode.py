@@ -19,11 +19,11 @@ def test_multinode_same_host_preserved(tmp_path, monkeypatch):
 
     # Mock parse_subscription to return our links
     monkeypatch.setattr("utils.subscription_manager.parse_subscription",
-                        lambda url, settings: ([de_link, nl_link, us_link], {"profile_title": "Google VPN"}))
+                        lambda url, settings, **kwargs: ([de_link, nl_link, us_link], {"profile_title": "Google VPN"}))
 
     sub_mgr = SubscriptionManager()
-    ok = sub_mgr.add("Google Sub", "https://example.com/sub")
-    assert ok is True
+    stored = sub_mgr.add("Google Sub", "https://example.com/sub")
+    assert stored == "Google Sub"
 
     servers = sub_mgr.get_servers("Google Sub")
     assert len(servers) == 3
@@ -42,7 +42,12 @@ def test_base64_multiline_with_whitespace_decoding(tmp_path, monkeypatch):
 
     class DummyResp:
         headers = {}
-        def read(self):
+        sent = False
+
+        def read(self, size=-1):
+            if self.sent:
+                return b""
+            self.sent = True
             return b64_with_spaces.encode("utf-8")
         def __enter__(self):
             return self
@@ -55,3 +60,492 @@ def test_base64_multiline_with_whitespace_decoding(tmp_path, monkeypatch):
     assert len(links) == 2
     assert links[0] == "vless://u1@h1:443#N1"
     assert links[1] == "vless://u2@h2:443#N2"
+
+
+def test_refresh_keeps_calibrated_bandwidth(tmp_path, monkeypatch):
+    """Measured Hysteria 2 bandwidth survives a subscription refresh."""
+    monkeypatch.setattr("utils.sub_manager.get_config_dir", lambda: tmp_path)
+    hy2_link = "hysteria2://auth@hy.example.com:443?sni=hy.example.com#HY"
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: ([hy2_link], {}))
+
+    sub_mgr = SubscriptionManager()
+    assert sub_mgr.add("HY Sub", "https://example.com/sub")
+    server = sub_mgr.get_servers("HY Sub")[0]
+    server.up_mbps, server.down_mbps, server.bw_network = 40, 160, "net-a"
+
+    # The provider renames the node, so the link is re-parsed.
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: ([hy2_link + "-2"], {}))
+    sub_mgr._update_worker(sub_mgr.get("HY Sub"), emit_signal=False)
+
+    refreshed = sub_mgr.get_servers("HY Sub")[0]
+    assert refreshed is not server
+    assert (refreshed.up_mbps, refreshed.down_mbps) == (40, 160)
+    assert refreshed.bw_network == "net-a"
+    assert refreshed.name == "HY-2"
+
+
+def test_refresh_diff_reuses_unchanged_servers(tmp_path, monkeypatch):
+    """Unchanged links keep their Server objects; only real changes are saved."""
+    monkeypatch.setattr("utils.sub_manager.get_config_dir", lambda: tmp_path)
+    a = "vless://uuid-a@a.example.com:443#A"
+    b = "vless://uuid-b@b.example.com:443#B"
+    c = "vless://uuid-c@c.example.com:443#C"
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: ([a, b], {}))
+    sub_mgr = SubscriptionManager()
+    assert sub_mgr.add("Sub", "https://example.com/sub")
+    old_a, old_b = sub_mgr.get_servers("Sub")
+
+    saves = []
+    monkeypatch.setattr("utils.subscription_manager.save_subscriptions", saves.append)
+    pushed, results = [], []
+    sub_mgr.serversChanged.connect(pushed.append)
+    sub_mgr.updated.connect(lambda ok, count: results.append((ok, count)))
+
+    sub_mgr._update_worker(sub_mgr.get("Sub"))
+    assert saves == [] and pushed == []
+    assert sub_mgr.get_servers("Sub")[0] is old_a
+
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: ([a, b + "2", c], {}))
+    sub_mgr._update_worker(sub_mgr.get("Sub"))
+    new_a, new_b, new_c = sub_mgr.get_servers("Sub")
+    assert new_a is old_a
+    assert new_b is not old_b and new_b.name == "B2"
+    assert len(saves) == 1 and pushed == ["Sub"]
+    assert results[-1] == (True, 1)
+
+
+def test_diff_servers_sets():
+    from utils.subscription_manager import diff_servers
+    a = "vless://uuid-a@a.example.com:443#A"
+    b = "vless://uuid-b@b.example.com:443#B"
+    old, _ = diff_servers([], [a, b])
+    servers, diff = diff_servers(old, [b, a + "x", "vless://uuid-c@c.example.com:443#C"])
+    assert servers[0] is old[1]
+    assert diff.unchanged == 1
+    assert [s.name for s in diff.changed] == ["Ax"]
+    assert [s.name for s in diff.added] == ["C"]
+    assert diff.removed == []
+    _, diff = diff_servers(old, [b, a])
+    assert diff.reordered and not diff.added
+    _, diff = diff_servers(old, [a])
+    assert diff.removed == [old[1]]
+
+
+class _StreamResp:
+    """urlopen() result that serves *body* in chunks like a real socket."""
+
+    def __init__(self, body, headers):
+        import io
+        self._buf = io.BytesIO(body)
+        self.headers = headers
+
+    def read(self, size=-1):
+        return self._buf.read(size)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+def _capture_urlopen(monkeypatch, respond):
+    sent = []
+
+    def fake_urlopen(req, timeout):
+        sent.append(dict(req.header_items()))
+        return respond(req)
+
+    monkeypatch.setattr("urllib.request.urlopen", fake_urlopen)
+    return sent
+
+
+def test_gzip_body_streamed_and_validators_returned(monkeypatch):
+    """Compressed bodies are inflated and ETag/Last-Modified come back in meta."""
+    import gzip
+    body = base64.b64encode(b"vless://u1@h1:443#N1\n" * 5000)
+    headers = {"Content-Encoding": "gzip", "ETag": '"v1"',
+               "Last-Modified": "Mon, 19 Oct 2026 10:00:00 GMT"}
+    sent = _capture_urlopen(monkeypatch, lambda req: _StreamResp(gzip.compress(body), headers))
+
+    links, meta = sm.parse_subscription("https://valid-sub.example.com/sub")
+
+    assert len(links) == 5000
+    assert "gzip" in sent[0]["Accept-encoding"]
+    assert "If-none-match" not in sent[0]
+    assert meta["http_cache"]["etag"] == '"v1"'
+    assert meta["http_cache"]["last_modified"] == "Mon, 19 Oct 2026 10:00:00 GMT"
+
+
+def test_raw_deflate_body(monkeypatch):
+    import zlib
+    raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    payload = raw.compress(base64.b64encode(b"vless://u1@h1:443#N1\n")) + raw.flush()
+    _capture_urlopen(monkeypatch, lambda req: _StreamResp(payload, {"Content-Encoding": "deflate"}))
+
+    links, _ = sm.parse_subscription("https://valid-sub.example.com/sub")
+    assert links == ["vless://u1@h1:443#N1"]
+
+
+def test_oversized_compressed_body_rejected(monkeypatch):
+    import gzip
+    monkeypatch.setattr(sm, "MAX_BODY_BYTES", 1024)
+    bomb = gzip.compress(b"A" * 100_000)
+    _capture_urlopen(monkeypatch, lambda req: _StreamResp(bomb, {"Content-Encoding": "gzip"}))
+
+    assert sm.parse_subscription("https://valid-sub.example.com/sub") == ([], {})
+
+
+def test_conditional_get_not_modified(monkeypatch):
+    import urllib.error
+    headers = {"Subscription-Userinfo": "upload=1; download=2; total=10; expire=0"}
+
+    def respond(req):
+        raise urllib.error.HTTPError(req.full_url, 304, "Not Modified", headers, None)
+
+    sent = _capture_urlopen(monkeypatch, respond)
+    variant = sm._request_variant({"User-Agent": sm.USER_AGENT_PRESETS["socksicle"]})
+    cache = {"etag": '"v1"', "last_modified": "Mon, 19 Oct 2026 10:00:00 GMT", "variant": variant}
+
+    links, meta = sm.parse_subscription("https://valid-sub.example.com/sub", http_cache=cache)
+
+    assert links == []
+    assert meta["not_modified"] is True
+    assert meta["traffic"]["used"] == 3
+    assert sent[0]["If-none-match"] == '"v1"'
+    assert sent[0]["If-modified-since"] == cache["last_modified"]
+
+
+def test_validators_ignored_when_user_agent_changes(monkeypatch):
+    sent = _capture_urlopen(monkeypatch, lambda req: _StreamResp(b"vless://u1@h1:443#N1", {}))
+    cache = {"etag": '"v1"', "variant": sm._request_variant({"User-Agent": "other"})}
+
+    sm.parse_subscription("https://valid-sub.example.com/sub", http_cache=cache)
+    assert "If-none-match" not in sent[0]
+
+
+def test_not_modified_refresh_skips_parse_and_save(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.sub_manager.get_config_dir", lambda: tmp_path)
+    link = "vless://uuid-1@h1.example.com:443#N1"
+    cache = {"etag": '"v1"', "variant": "x"}
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: ([link], {"http_cache": cache}))
+    sub_mgr = SubscriptionManager()
+    assert sub_mgr.add("Sub", "https://example.com/sub")
+    sub = sub_mgr.get("Sub")
+    assert sub["http_cache"] == cache
+    servers = sub["servers"]
+    sub["last_updated"] = 0
+
+    seen = []
+
+    def not_modified(url, settings, http_cache=None, **kwargs):
+        seen.append(http_cache)
+        return [], {"not_modified": True}
+
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription", not_modified)
+    saves = []
+    monkeypatch.setattr("utils.subscription_manager.save_subscriptions", saves.append)
+    results = []
+    sub_mgr.updated.connect(lambda ok, count: results.append((ok, count)))
+
+    sub_mgr._update_worker(sub)
+
+    assert seen == [cache]
+    assert saves == []
+    assert sub["servers"] is servers
+    assert sub["last_updated"] > 0
+    assert results == [(True, 0)]
+
+
+def test_not_modified_refresh_saves_new_traffic(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.sub_manager.get_config_dir", lambda: tmp_path)
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: (["vless://uuid-1@h1.example.com:443#N1"], {}))
+    sub_mgr = SubscriptionManager()
+    assert sub_mgr.add("Sub", "https://example.com/sub")
+    sub = sub_mgr.get("Sub")
+    traffic = {"used": 5, "total": 10, "expire": 0}
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: ([], {"not_modified": True, "traffic": traffic}))
+    saves = []
+    monkeypatch.setattr("utils.subscription_manager.save_subscriptions", saves.append)
+
+    sub_mgr._update_worker(sub)
+    assert sub["traffic"] == traffic
+    assert len(saves) == 1
+    assert saves[0][0]["traffic"] == traffic
+
+    sub_mgr._update_worker(sub)
+    assert len(saves) == 1
+
+
+def test_unchanged_servers_not_resealed(tmp_path, monkeypatch):
+    """Saving the same servers again reuses their sealed form."""
+    from unittest import mock
+    monkeypatch.setattr("utils.sub_manager.get_config_dir", lambda: tmp_path)
+    subs = [{"name": "Sub", "url": "https://example.com/sub",
+             "servers": [Server.from_link("vless://uuid-a@a.example.com:443#A")]}]
+    sm.save_subscriptions(subs)
+    with mock.patch("utils.twinsock.seal_dicts", wraps=sm.twinsock.seal_dicts) as seal:
+        sm.save_subscriptions(subs)
+        seal.assert_not_called()
+        subs[0]["servers"].append(Server.from_link("vless://uuid-b@b.example.com:443#B"))
+        sm.save_subscriptions(subs)
+        assert seal.call_count == 1
+        assert [d["name"] for d in seal.call_args.args[1]] == ["B"]
+    loaded = sm.load_subscriptions()
+    assert [Server.from_dict(s).uuid for s in loaded[0]["servers"]] == ["uuid-a", "uuid-b"]
+
+
+def test_seal_cache_holds_no_secrets_and_follows_the_vault_key(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.sub_manager.get_config_dir", lambda: tmp_path)
+    monkeypatch.setattr("utils.twinsock.get_config_dir", lambda: tmp_path)
+    monkeypatch.setattr(sm, "SEAL_CACHE_SIZE", 2)
+    sm.twinsock._reset()
+    subs = [{"name": "Sub", "url": "https://example.com/sub?token=hidden",
+             "servers": [Server.from_link(f"vless://uuid-{i}@h{i}.example.com:443#N{i}")
+                         for i in range(3)]}]
+    sm.save_subscriptions(subs)
+    assert len(sm._seal_cache) == 2
+    assert "uuid-" not in repr(sm._seal_cache.keys())
+    sm.twinsock._reset()
+    assert sm._seal_cache == {}
+
+
+def test_streamed_base64_across_small_chunks(monkeypatch):
+    """Base64 split at arbitrary points (urlsafe, unpadded, wrapped) decodes the same."""
+    links = [f"vless://uuid-{i}@h{i}.example.com:443#N{i}" for i in range(300)]
+    text = ("Welcome aboard\n" + "\n".join(links)).encode("utf-8")
+    b64 = base64.urlsafe_b64encode(text).rstrip(b"=")
+    wrapped = b"\r\n".join(b64[i:i + 76] for i in range(0, len(b64), 76))
+    monkeypatch.setattr(sm, "READ_CHUNK", 7)
+    _capture_urlopen(monkeypatch, lambda req: _StreamResp(wrapped, {}))
+
+    got, meta = sm.parse_subscription("https://valid-sub.example.com/sub")
+    assert got == links
+    assert meta["description"] == "Welcome aboard"
+
+
+def test_plain_text_subscription(monkeypatch):
+    body = b"vless://u1@h1:443#N1\r\nss://YWVzLTI1Ni1nY206cHc@1.2.3.4:8388#S\r\n"
+    _capture_urlopen(monkeypatch, lambda req: _StreamResp(body, {}))
+    got, _ = sm.parse_subscription("https://valid-sub.example.com/sub")
+    assert got == ["vless://u1@h1:443#N1", "ss://YWVzLTI1Ni1nY206cHc@1.2.3.4:8388#S"]
+
+
+
+def test_plain_text_subscription_with_preamble(monkeypatch):
+    """Links after a comment, or after more lines than are sniffed, are still plain text."""
+    links = b"vless://u1@h1:443#N1\nvless://u2@h2:443#N2\n"
+    monkeypatch.setattr(sm, "READ_CHUNK", 5)
+    for preamble in (b"# Managed by Example Panel\n#\n",
+                     b"Welcome!\n" + b"Notice line\n" * (sm.SNIFF_LINES + 2)):
+        _capture_urlopen(monkeypatch, lambda req: _StreamResp(preamble + links, {}))
+        got, _ = sm.parse_subscription("https://valid-sub.example.com/sub")
+        assert got == ["vless://u1@h1:443#N1", "vless://u2@h2:443#N2"]
+
+def test_node_cap_truncates(monkeypatch):
+    links = "\n".join(f"vless://u{i}@h{i}:443#N{i}" for i in range(50))
+    body = base64.b64encode(links.encode("utf-8"))
+    _capture_urlopen(monkeypatch, lambda req: _StreamResp(body, {}))
+    got, meta = sm.parse_subscription("https://valid-sub.example.com/sub", {"max_nodes": 10})
+    assert len(got) == 10
+    assert meta["truncated"] is True
+
+
+def test_byte_cap_applies_to_plain_bodies(monkeypatch):
+    body = base64.b64encode(b"vless://u1@h1:443#N1\n" * 1000)
+    _capture_urlopen(monkeypatch, lambda req: _StreamResp(body, {}))
+    assert sm.parse_subscription("https://valid-sub.example.com/sub",
+                                 {"max_body_bytes": 1024}) == ([], {})
+
+
+def test_sip008_servers_flow_through_refresh(tmp_path, monkeypatch):
+    """Structured subscriptions hand over Server objects, deduped and diffed by key."""
+    monkeypatch.setattr("utils.sub_manager.get_config_dir", lambda: tmp_path)
+    data = {"version": 1, "servers": [
+        {"remarks": "A", "server": "a.example.com", "server_port": 8388,
+         "password": "pw", "method": "aes-256-gcm"},
+        {"remarks": "A", "server": "a.example.com", "server_port": 8388,
+         "password": "pw", "method": "aes-256-gcm"},
+    ]}
+    body = json.dumps(data).encode("utf-8")
+    _capture_urlopen(monkeypatch, lambda req: _StreamResp(body, {"Content-Type": "application/json"}))
+
+    sub_mgr = SubscriptionManager()
+    assert sub_mgr.add("SIP", "https://valid-sub.example.com/sub")
+    (server,) = sub_mgr.get_servers("SIP")
+    assert server.host == "a.example.com" and server.key.startswith("ss://")
+
+    sub_mgr._update_worker(sub_mgr.get("SIP"), emit_signal=False)
+    assert sub_mgr.get_servers("SIP")[0] is server
+
+
+_USERINFO = {"Subscription-Userinfo": "upload=10; download=20; total=100; expire=1700000000"}
+
+
+def test_quota_fetch_uses_head_only(monkeypatch):
+    methods = []
+
+    def respond(req):
+        methods.append(req.get_method())
+        return _StreamResp(b"", _USERINFO)
+
+    _capture_urlopen(monkeypatch, respond)
+    meta = sm.fetch_subscription_quota("https://valid-sub.example.com/sub")
+    assert methods == ["HEAD"]
+    assert meta["traffic"] == {"used": 30, "total": 100, "expire": 1700000000}
+
+
+def test_quota_fetch_falls_back_to_ranged_get(monkeypatch):
+    import urllib.error
+    methods = []
+
+    def respond(req):
+        methods.append((req.get_method(), req.get_header("Range")))
+        if req.get_method() == "HEAD":
+            raise urllib.error.HTTPError(req.full_url, 405, "Method Not Allowed", {}, None)
+        return _StreamResp(b"vless://u1@h1:443#N1\n" * 1000, _USERINFO)
+
+    _capture_urlopen(monkeypatch, respond)
+    meta = sm.fetch_subscription_quota("https://valid-sub.example.com/sub")
+    assert methods == [("HEAD", None), ("GET", "bytes=0-0")]
+    assert meta["traffic"]["used"] == 30
+
+
+def test_quota_round_updates_traffic_only(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.sub_manager.get_config_dir", lambda: tmp_path)
+    link = "vless://uuid-1@h1.example.com:443#N1"
+    old = {"used": 1, "total": 100, "expire": 0}
+    monkeypatch.setattr("utils.subscription_manager.parse_subscription",
+                        lambda url, settings, **kwargs: ([link], {"traffic": old}))
+    sub_mgr = SubscriptionManager()
+    assert sub_mgr.add("Sub", "https://example.com/sub")
+    sub = sub_mgr.get("Sub")
+    servers = sub["servers"]
+
+    new = {"used": 50, "total": 100, "expire": 0}
+    monkeypatch.setattr("utils.subscription_manager.fetch_subscription_quota",
+                        lambda url, settings, pool: {"traffic": new})
+    saves = []
+    monkeypatch.setattr("utils.subscription_manager.save_subscriptions", saves.append)
+    changed = []
+    sub_mgr.quotaChanged.connect(changed.append)
+
+    sub_mgr._quota_round([sub])
+    assert sub["traffic"] == new
+    assert sub["servers"] is servers
+    assert changed == ["Sub"]
+    assert len(saves) == 1
+
+    sub_mgr._quota_round([sub])
+    assert changed == ["Sub"]
+    assert len(saves) == 1
+
+
+def _fake_routes(monkeypatch, direct, proxied):
+    """Replace the direct/tunnel openers with *direct*/*proxied* callables."""
+    calls = []
+
+    def open_direct(req, pool):
+        calls.append("direct")
+        return direct(req)
+
+    def open_proxied(req, port):
+        calls.append("proxy")
+        return proxied(req)
+
+    monkeypatch.setattr(sm, "_open", open_direct)
+    monkeypatch.setattr(sm, "_open_proxied", open_proxied)
+    monkeypatch.setattr(sm, "_preferred_routes", {})
+    return calls
+
+
+def _blocked(req):
+    import time
+    import urllib.error
+    time.sleep(0.05)
+    raise urllib.error.URLError("timed out")
+
+
+def test_race_takes_tunnel_when_direct_is_blocked(monkeypatch):
+    calls = _fake_routes(monkeypatch, _blocked,
+                         lambda req: _StreamResp(b"vless://u1@h1:443#N1", {}))
+    settings = {"fetch_strategy": sm.FETCH_RACE, "proxy_port": 1080}
+    links, _ = sm.parse_subscription("https://valid-sub.example.com/sub", settings)
+    assert links == ["vless://u1@h1:443#N1"]
+    assert sm._preferred_routes == {"valid-sub.example.com": sm.FETCH_PROXY}
+
+    calls.clear()
+    links, _ = sm.parse_subscription("https://valid-sub.example.com/sub", settings)
+    assert links == ["vless://u1@h1:443#N1"]
+    assert calls == ["proxy"]
+
+
+def test_race_route_survives_a_restart_through_the_http_cache(monkeypatch):
+    calls = _fake_routes(monkeypatch, _blocked,
+                         lambda req: _StreamResp(b"vless://u1@h1:443#N1", {}))
+    settings = {"fetch_strategy": sm.FETCH_RACE, "proxy_port": 1080}
+    _, meta = sm.parse_subscription("https://valid-sub.example.com/sub", settings)
+    assert meta["http_cache"] == {"route": sm.FETCH_PROXY}
+
+    sm._preferred_routes.clear()
+    calls.clear()
+    links, _ = sm.parse_subscription("https://valid-sub.example.com/sub", settings,
+                                     http_cache=meta["http_cache"])
+    assert links == ["vless://u1@h1:443#N1"]
+    assert calls == ["proxy"]
+
+
+def test_race_attempts_get_their_own_request(monkeypatch):
+    seen = []
+
+    def record(req):
+        seen.append(req)
+        return _StreamResp(b"vless://u1@h1:443#N1", {})
+
+    _fake_routes(monkeypatch, record, record)
+    req = sm.urllib.request.Request("https://valid-sub.example.com/sub", headers={"X-A": "1"})
+    route, response = sm._race(req, None, 1080)
+    import time
+    deadline = time.monotonic() + 2
+    while len(seen) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(seen) == 2 and seen[0] is not seen[1] and req not in seen
+    assert seen[0].headers is not seen[1].headers
+    assert all(r.full_url == req.full_url and r.headers == req.headers for r in seen)
+
+
+def test_race_reraces_when_remembered_route_fails(monkeypatch):
+    calls = _fake_routes(monkeypatch, lambda req: _StreamResp(b"vless://u1@h1:443#N1", {}),
+                         _blocked)
+    sm._preferred_routes["valid-sub.example.com"] = sm.FETCH_PROXY
+    settings = {"fetch_strategy": sm.FETCH_RACE, "proxy_port": 1080}
+    links, _ = sm.parse_subscription("https://valid-sub.example.com/sub", settings)
+    assert links == ["vless://u1@h1:443#N1"]
+    assert calls[0] == "proxy"
+    assert sm._preferred_routes == {"valid-sub.example.com": sm.FETCH_DIRECT}
+
+
+def test_race_both_routes_fail(monkeypatch):
+    _fake_routes(monkeypatch, _blocked, _blocked)
+    settings = {"fetch_strategy": sm.FETCH_RACE, "proxy_port": 1080}
+    assert sm.parse_subscription("https://valid-sub.example.com/sub", settings) == ([], {})
+    assert sm._preferred_routes == {}
+
+
+def test_tunnel_strategies_fetch_directly_without_tunnel(monkeypatch):
+    calls = _fake_routes(monkeypatch, lambda req: _StreamResp(b"vless://u1@h1:443#N1", {}),
+                         _blocked)
+    for strategy in (sm.FETCH_PROXY, sm.FETCH_RACE):
+        sm.parse_subscription("https://valid-sub.example.com/sub",
+                              {"fetch_strategy": strategy, "proxy_port": None})
+    assert calls == ["direct", "direct"]
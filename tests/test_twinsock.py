@@ -169,6 +169,37 @@ def test_same_plaintext_yields_different_tokens(vault_env, monkeypatch):
     assert tw.decrypt_field("manual", t2) == "same-value"
 
 
+def test_field_cipher_cached_per_purpose(vault_env, monkeypatch):
+    _patch_machine(monkeypatch)
+    tw.unlock()
+    manual = tw._field_cipher("manual")
+    assert tw._field_cipher("manual") is manual
+    assert tw._field_cipher("subscriptions") is not manual
+    tw._reset()
+    tw.unlock()
+    assert tw._field_cipher("manual") is not manual
+
+
+def test_seal_unseal_dicts_roundtrip(vault_env, monkeypatch):
+    _patch_machine(monkeypatch)
+    tw.unlock()
+    plain = [{"name": f"s{i}", "password": f"pw{i}", "uuid": ""} for i in range(5)]
+    sealed = tw.seal_dicts("manual", plain, tw.SECRET_FIELDS)
+    assert all(d["password"].startswith("tws3.") and d["uuid"] == "" for d in sealed)
+    assert plain[0]["password"] == "pw0"  # inputs are not modified
+    assert tw.unseal_dicts("manual", sealed, tw.SECRET_FIELDS) == plain
+    assert tw.migration_occurred() is False
+
+
+def test_unseal_dicts_marks_legacy_values_for_migration(vault_env, monkeypatch):
+    _patch_machine(monkeypatch)
+    tw.unlock()
+    dicts = [{"password": tw._legacy_obfuscate("old")}, {"password": "plain"}]
+    out = tw.unseal_dicts("manual", dicts, tw.SECRET_FIELDS)
+    assert [d["password"] for d in out] == ["old", "plain"]
+    assert tw.migration_occurred() is True
+
+
 def test_legacy_obfuscation_migrates(vault_env, monkeypatch):
     _patch_machine(monkeypatch)
     tw.unlock()
@@ -225,10 +256,11 @@ def test_subscription_seal_unseal(vault_env, monkeypatch, tmp_path):
     assert raw[0]["servers"][0]["host"] == "h1"
     loaded = sbm.load_subscriptions()
     assert loaded[0]["url"] == "https://example.com/sub1"
-    assert loaded[0]["servers"][0]["password"] == "pw-1"
-    assert loaded[0]["servers"][0]["uuid"] == "u1"
-    assert loaded[0]["servers"][0]["public_key"] == "pk1"
-    assert loaded[0]["servers"][0]["key"] == "ss://raw1"
+    first = {k: tw.reveal(v) for k, v in loaded[0]["servers"][0].items()}
+    assert first["password"] == "pw-1"
+    assert first["uuid"] == "u1"
+    assert first["public_key"] == "pk1"
+    assert first["key"] == "ss://raw1"
     assert loaded[0]["name"] == "Sub A"
 
 
@@ -246,6 +278,197 @@ def test_subscriptions_foreign_loads_empty(vault_env, monkeypatch, tmp_path):
     assert sbm.load_subscriptions() == []
 
 
+def test_v4_server_record_roundtrip_and_binding(vault_env, monkeypatch):
+    _patch_machine(monkeypatch)
+    tw.set_record_format("tws4")
+    plain = {"name": "s", "host": "h", "password": "pw", "uuid": "u", "key": ""}
+    sealed = tw.seal_dict("manual", plain, tw.SECRET_FIELDS)
+    assert sealed[tw.RECORD_KEY].startswith("tws4.")
+    assert "password" not in sealed and "uuid" not in sealed and sealed["key"] == ""
+    assert tw.unseal_dict("manual", sealed, tw.SECRET_FIELDS) == plain
+    assert tw.migration_occurred() is False
+    # Bound to the purpose: the same blob does not open as a subscription record.
+    moved = tw.unseal_dict("subscriptions", sealed, tw.SECRET_FIELDS)
+    assert "password" not in moved and tw.RECORD_KEY not in moved
+
+
+def test_v4_group_roundtrip_and_count_binding(vault_env, monkeypatch):
+    _patch_machine(monkeypatch)
+    tw.set_record_format("tws4")
+    sub = {"name": "Sub", "url": "https://example.com/s", "servers": [
+        {"name": "a", "password": "pa"}, {"name": "b", "password": ""}]}
+    sealed = tw.seal_group("subscriptions", sub, "servers", tw.SECRET_FIELDS, ("url",))
+    assert "url" not in sealed and sealed[tw.RECORD_KEY].startswith("tws4.")
+    assert sealed["servers"] == [{"name": "a"}, {"name": "b", "password": ""}]
+    assert tw.unseal_group("subscriptions", sealed, "servers", tw.SECRET_FIELDS, ("url",)) == sub
+    dropped = dict(sealed, servers=sealed["servers"][1:])
+    out = tw.unseal_group("subscriptions", dropped, "servers", tw.SECRET_FIELDS, ("url",))
+    assert "url" not in out and out["servers"] == [{"name": "b", "password": ""}]
+
+
+def test_record_format_switch_marks_migration(vault_env, monkeypatch):
+    _patch_machine(monkeypatch)
+    v3 = tw.seal_dict("manual", {"password": "pw"}, tw.SECRET_FIELDS)
+    tw.set_record_format("tws4")
+    assert tw.unseal_dict("manual", v3, tw.SECRET_FIELDS) == {"password": "pw"}
+    assert tw.migration_occurred() is True
+    v4 = tw.seal_dict("manual", {"password": "pw"}, tw.SECRET_FIELDS)
+    tw.set_record_format("tws3")
+    assert tw.unseal_dict("manual", v4, tw.SECRET_FIELDS) == {"password": "pw"}
+    assert tw.migration_occurred() is True
+    tw.set_record_format("bogus")
+    assert tw.record_format() == "tws3"
+
+
+def test_subscriptions_migrate_to_v4_records(vault_env, monkeypatch, tmp_path):
+    _patch_machine(monkeypatch)
+    from utils import sub_manager as sbm
+    monkeypatch.setattr(sbm, "get_config_dir", lambda: tmp_path)
+    servers = [{"key": f"ss://raw{i}", "password": f"pw-{i}", "name": f"s{i}",
+                "host": f"h{i}", "port": 8388} for i in range(50)]
+    subs = [{"name": "Sub A", "url": "https://example.com/sub1", "servers": servers}]
+    sbm.save_subscriptions(subs)
+    v3_size = (tmp_path / "subscriptions.json").stat().st_size
+    tw.set_record_format("tws4")
+    loaded = sbm.load_subscriptions()  # rewritten as v4 on load
+    raw = json.loads((tmp_path / "subscriptions.json").read_text(encoding="utf-8"))
+    assert raw[0][tw.RECORD_KEY].startswith("tws4.") and "url" not in raw[0]
+    assert raw[0]["servers"][0] == {"name": "s0", "host": "h0", "port": 8388}
+    assert (tmp_path / "subscriptions.json").stat().st_size < v3_size
+    reloaded = sbm.load_subscriptions()
+    assert reloaded[0]["url"] == loaded[0]["url"] == "https://example.com/sub1"
+    assert [{k: tw.reveal(v) for k, v in d.items()} for d in reloaded[0]["servers"]] == servers
+    assert tw.reveal(loaded[0]["servers"][7]["password"]) == "pw-7"
+
+
+def test_lazy_group_record_keeps_item_secrets_sealed(vault_env, monkeypatch):
+    _patch_machine(monkeypatch)
+    items = [{"name": f"s{i}", "password": f"pw-{i}", "uuid": ""} for i in range(20)]
+    tw.set_record_format("tws4")
+    stored = tw.seal_group("subscriptions", {"url": "https://example.com/s", "servers": items},
+                           "servers", tw.SECRET_FIELDS, ("url",))
+    loaded = tw.unseal_group("subscriptions", stored, "servers", tw.SECRET_FIELDS, ("url",),
+                             lazy=True)
+    assert loaded["url"] == "https://example.com/s"
+    assert all(isinstance(d["password"], tw.Sealed) for d in loaded["servers"])
+    assert "pw-" not in repr(loaded) and not tw._REVEALED
+    assert [tw.reveal(d["password"]) for d in loaded["servers"]] == [d["password"] for d in items]
+    assert len(tw._REVEALED) == 1  # one opening of the group record serves every item
+    resealed = tw.seal_group("subscriptions", loaded, "servers", tw.SECRET_FIELDS, ("url",))
+    again = tw.unseal_group("subscriptions", resealed, "servers", tw.SECRET_FIELDS, ("url",))
+    assert again["servers"] == items
+
+
+def test_server_manager_reads_record_format_setting(vault_env, monkeypatch, tmp_path):
+    _patch_machine(monkeypatch)
+    from utils import server_manager as sm
+    monkeypatch.setattr(sm, "get_config_dir", lambda: tmp_path)
+    mgr = sm.ServerManager()
+    mgr.add_from_link(_ss_link("one.example"))
+    assert json.loads((tmp_path / "servers.json").read_text())[0]["key"].startswith("tws3.")
+    mgr.settings["vault_record_format"] = "tws4"
+    mgr.save_settings()
+    tw._reset()
+    mgr2 = sm.ServerManager()
+    raw = json.loads((tmp_path / "servers.json").read_text())
+    assert "key" not in raw[0] and raw[0][tw.RECORD_KEY].startswith("tws4.")
+    assert mgr2.manual_servers[0].password == "password"
+
+
+def test_lazy_unseal_returns_handles_revealed_on_demand(vault_env, monkeypatch):
+    _patch_machine(monkeypatch)
+    sealed = tw.seal_dicts("manual", [{"password": f"pw{i}", "uuid": ""} for i in range(3)],
+                           tw.SECRET_FIELDS)
+    opened = []
+    real_open = tw._open_v3
+    monkeypatch.setattr(tw, "_open_v3", lambda *a: opened.append(1) or real_open(*a))
+    lazy = tw.unseal_dicts("manual", sealed, tw.SECRET_FIELDS, lazy=True)
+    assert all(isinstance(d["password"], tw.Sealed) for d in lazy)
+    assert lazy[0]["uuid"] == "" and opened == []
+    assert tw.reveal(lazy[1]["password"]) == "pw1"
+    assert tw.reveal(lazy[1]["password"]) == "pw1"
+    assert len(opened) == 1  # second reveal served from the cache
+    # Untouched handles are written back as their original tokens.
+    assert tw.seal_dicts("manual", lazy, tw.SECRET_FIELDS) == sealed
+    assert len(opened) == 1
+
+
+def test_reveal_cache_is_bounded_and_dropped_on_reset(vault_env, monkeypatch):
+    _patch_machine(monkeypatch)
+    monkeypatch.setattr(tw, "REVEAL_CACHE_SIZE", 2)
+    sealed = tw.seal_dicts("manual", [{"password": f"pw{i}"} for i in range(4)], tw.SECRET_FIELDS)
+    lazy = tw.unseal_dicts("manual", sealed, tw.SECRET_FIELDS, lazy=True)
+    assert [tw.reveal(d["password"]) for d in lazy] == ["pw0", "pw1", "pw2", "pw3"]
+    assert len(tw._REVEALED) == 2
+    tw._reset()
+    assert len(tw._REVEALED) == 0
+
+
+def test_lazy_v4_record_fields(vault_env, monkeypatch):
+    _patch_machine(monkeypatch)
+    tw.set_record_format("tws4")
+    sealed = tw.seal_dicts("manual", [{"password": "pw", "uuid": "u"}], tw.SECRET_FIELDS)
+    lazy = tw.unseal_dicts("manual", sealed, tw.SECRET_FIELDS, lazy=True)[0]
+    assert isinstance(lazy["uuid"], tw.Sealed)
+    assert (tw.reveal(lazy["password"]), tw.reveal(lazy["uuid"]), tw.reveal(lazy["key"])) == \
+        ("pw", "u", "")
+    assert tw.migration_occurred() is False
+
+
+def test_server_manager_keeps_secrets_sealed_until_used(vault_env, monkeypatch, tmp_path):
+    _patch_machine(monkeypatch)
+    from utils import server_manager as sm
+    monkeypatch.setattr(sm, "get_config_dir", lambda: tmp_path)
+    mgr = sm.ServerManager()
+    mgr.add_from_link(_ss_link("one.example"))
+    mgr.add_from_link(_ss_link("two.example"))
+    stored = (tmp_path / "servers.json").read_text()
+    tw._reset()
+    mgr2 = sm.ServerManager()
+    first, second = mgr2.manual_servers
+    assert isinstance(first._secret("password", reveal=False), tw.Sealed)
+    assert second.password == "password"
+    assert second.to_dict()["key"].startswith("ss://")
+    assert isinstance(second._secret("password", reveal=False), tw.Sealed)  # plaintext not kept
+    mgr2.save_manual_servers()
+    assert (tmp_path / "servers.json").read_text() == stored
+    first.password = "changed"
+    mgr2.save_manual_servers()
+    tw._reset()
+    assert sm.ServerManager().manual_servers[0].password == "changed"
+
+
+
+def test_subscription_refresh_keeps_unchanged_secrets_sealed(vault_env, monkeypatch, tmp_path, qapp):
+    _patch_machine(monkeypatch)
+    from utils import sub_manager as sbm
+    from utils import subscription_manager as smod
+    from utils.server_index import get_server_index
+    from utils.server_model import Server
+    monkeypatch.setattr(sbm, "get_config_dir", lambda: tmp_path)
+    links = [_ss_link(f"h{i}.example") for i in range(20)]
+    sbm.save_subscriptions([{"name": "Sub", "url": "https://example.com/s",
+                             "servers": [Server.from_link(link) for link in links]}])
+    tw._reset()
+    opened = []
+    real_decrypt = tw._FieldCrypto.decrypt
+    monkeypatch.setattr(tw._FieldCrypto, "decrypt",
+                        lambda self, token: opened.append(1) or real_decrypt(self, token))
+    mgr = smod.SubscriptionManager()
+    sub = mgr.get("Sub")
+    old = list(sub["servers"])
+    links[3] = links[3].replace("#ServerOne", "#Renamed")
+    monkeypatch.setattr(smod, "parse_subscription", lambda url, settings, **kwargs: (list(links), {}))
+    opened.clear()
+    mgr._update_worker(sub, emit_signal=False)
+    assert opened == []
+    assert [s.name for s in sub["servers"]][3] == "Renamed"
+    assert sub["servers"][4] is old[4]
+    assert isinstance(old[4]._secret("password", reveal=False), tw.Sealed)
+    assert get_server_index().get(links[4]) is old[4]
+    assert opened == []
+
+
 def test_export_import_roundtrip(vault_env, monkeypatch, tmp_path):
     _patch_machine(monkeypatch)
     from utils import server_manager as sm
@@ -307,6 +530,35 @@ def test_chain_detects_modification(vault_env, monkeypatch, tmp_path):
     assert tw.file_intact("drawer.json") is True
 
 
+def test_chain_uses_in_memory_bytes_and_skips_unchanged(vault_env, monkeypatch, tmp_path):
+    _patch_machine(monkeypatch)
+    tw.unlock()
+    (tmp_path / "servers.json").write_bytes(b"[]")
+    writes = []
+    real_write = tw._write_drawer
+    monkeypatch.setattr(tw, "_write_drawer", lambda d: writes.append(1) or real_write(d))
+    monkeypatch.setattr(Path, "read_bytes", lambda self: pytest.fail(f"re-read {self.name}"))
+    tw.file_saved("servers.json", b"[]")
+    tw.file_saved("servers.json", b"[]")
+    assert len(writes) == 1
+    assert tw.file_intact("servers.json", b"[]") is True
+    assert tw.file_intact("servers.json", b"[1]") is False
+
+
+def test_chain_batch_writes_drawer_once(vault_env, monkeypatch, tmp_path):
+    _patch_machine(monkeypatch)
+    tw.unlock()
+    writes = []
+    real_write = tw._write_drawer
+    monkeypatch.setattr(tw, "_write_drawer", lambda d: writes.append(1) or real_write(d))
+    with tw.chain_batch():
+        tw.file_saved("servers.json", b"[1]")
+        tw.file_saved("subscriptions.json", b"[2]")
+        assert writes == []
+    assert len(writes) == 1
+    assert tw.file_intact("servers.json", b"[1]") and tw.file_intact("subscriptions.json", b"[2]")
+
+
 def test_server_manager_foreign_lifecycle(vault_env, monkeypatch, tmp_path):
     _patch_machine(monkeypatch, host="hostA", machine_guid="guid-A")
     from utils import server_manager as sm
@@ -486,6 +738,82 @@ def test_share_metadata_and_payload_roundtrip(vault_env):
     assert meta_plain["expires_at"] is None
 
 
+def _share_links(n):
+    return [_ss_link(f"node{i}.example") for i in range(n)]
+
+
+def test_compressed_share_roundtrip_and_size(vault_env):
+    links = _share_links(500)
+    plain = tw.encrypt_share("k", links, lock_export=True)
+    tok = tw.encrypt_share("k", links, lock_export=True, compress="zlib")
+    raw = tw._b64url_decode(tok[len("tws3://"):])
+    assert raw[:2] == bytes([tw.SHARE_VERSION_COMPRESSED, tw.SHARE_CODECS["zlib"]])
+    assert len(tok) * 5 < len(plain)
+    target, meta = tw.decrypt_share_payload("k", tok)
+    assert target == links
+    assert meta["lock_export"] is True
+    # The codec byte is authenticated.
+    forged = bytearray(raw)
+    forged[1] = tw.SHARE_CODECS["zstd"]
+    with pytest.raises(tw.VaultError):
+        tw.decrypt_share("k", "tws3://" + tw._b64url(bytes(forged)))
+    with pytest.raises(ValueError):
+        tw.encrypt_share("k", links, compress="lzma")
+
+
+def test_compressed_share_rejects_oversized_payload(vault_env, monkeypatch):
+    tok = tw.encrypt_share("k", "ss://" + "A" * 5000, compress="zlib")
+    monkeypatch.setattr(tw, "SHARE_MAX_PLAIN", 1000)
+    with pytest.raises(tw.VaultError, match="too large"):
+        tw.decrypt_share("k", tok)
+
+
+def test_zstd_share_roundtrip(vault_env):
+    pytest.importorskip("zstandard")
+    links = _share_links(50)
+    tok = tw.encrypt_share("k", links, compress="zstd")
+    assert tw.decrypt_share("k", tok) == links
+
+
+def test_split_share_reassembles_in_any_order(vault_env):
+    links = _share_links(2000)
+    parts = tw.encrypt_share_parts("k", links)
+    assert len(parts) > 1
+    assert all(len(p) <= tw.SHARE_PART_CHARS and tw.is_share_part(p) for p in parts)
+
+    assembler = tw.ShareAssembler()
+    shuffled = parts[::-1]
+    for part in shuffled[:-1]:
+        assert assembler.feed(part) is False
+    assert assembler.received == len(parts) - 1
+    assert assembler.missing() == [0]
+    with pytest.raises(tw.VaultError, match="incomplete"):
+        assembler.token()
+    assert assembler.feed(shuffled[-1]) is True
+    assert tw.decrypt_share("k", assembler.token()) == links
+
+    # Pasted together, separated by any whitespace.
+    assert tw.decrypt_share("k", "\n".join(shuffled) + "\n") == links
+    with pytest.raises(tw.VaultError, match="incomplete"):
+        tw.decrypt_share("k", " ".join(parts[1:]))
+
+
+def test_split_share_rejects_parts_of_another_share(vault_env):
+    a = tw.encrypt_share_parts("k", _share_links(2000))
+    b = tw.encrypt_share_parts("k", _share_links(2000))
+    assembler = tw.ShareAssembler()
+    assembler.feed(a[0])
+    with pytest.raises(tw.VaultError, match="another share"):
+        assembler.feed(b[1])
+
+
+def test_short_share_is_not_split(vault_env):
+    link = _ss_link("one.example")
+    parts = tw.encrypt_share_parts("k", link)
+    assert len(parts) == 1 and not tw.is_share_part(parts[0])
+    assert tw.decrypt_share("k", parts[0]) == link
+
+
 def test_server_model_lock_export_and_expiration():
     import time
     from utils.server_model import Server
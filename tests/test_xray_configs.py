@@ -515,5 +515,68 @@ class XrayEngineClassTest(unittest.TestCase):
         self.assertEqual(engine.process_name(), "xray")
 
 
+class XrayMuxTest(unittest.TestCase):
+
+    def _server(self, **kw):
+        base = dict(protocol=ProxyProtocol.VLESS, host="1.2.3.4", port=443,
+                    uuid="u", flow="", security="tls", transport="tcp",
+                    server_name="", fingerprint="", mux="", mux_concurrency=0)
+        base.update(kw)
+        return _FakeServer(**base)
+
+    def test_no_mux_by_default(self):
+        self.assertNotIn("mux", _generate_config(self._server(), 1080)["outbounds"][0])
+
+    def test_mux_enabled_from_server(self):
+        mux = _generate_config(self._server(mux="smux", mux_concurrency=4), 1080)["outbounds"][0]["mux"]
+        self.assertTrue(mux["enabled"])
+        self.assertEqual(mux["concurrency"], 4)
+        self.assertEqual(mux["xudpConcurrency"], 16)
+
+    def test_vision_flow_uses_xudp_only(self):
+        srv = self._server(flow="xtls-rprx-vision")
+        mux = _generate_config(srv, 1080, mux_defaults={"mux": "h2mux"})["outbounds"][0]["mux"]
+        self.assertEqual(mux["concurrency"], -1)
+
+    def test_engine_passes_mux_defaults(self):
+        engine = XrayEngine()
+        engine.mux_defaults = {"mux": "h2mux", "mux_concurrency": 2}
+        cfg = engine.build_config(self._server())
+        self.assertEqual(cfg["outbounds"][0]["mux"]["concurrency"], 2)
+
+
+class XraySockoptTest(unittest.TestCase):
+
+    def _server(self, **kw):
+        base = dict(protocol=ProxyProtocol.VLESS, host="1.2.3.4", port=443,
+                    uuid="u", flow="", security="none", transport="tcp",
+                    server_name="", fingerprint="")
+        base.update(kw)
+        return _FakeServer(**base)
+
+    def test_sockopt_fields(self):
+        perf = {"tcp_fast_open": True, "tcp_multi_path": True, "tcp_congestion": "bbr"}
+        ob = _generate_config(self._server(), 1080, perf=perf)["outbounds"][0]
+        self.assertEqual(ob["streamSettings"]["sockopt"],
+                         {"tcpFastOpen": True, "tcpMptcp": True, "tcpcongestion": "bbr"})
+
+    def test_no_sockopt_by_default(self):
+        ob = _generate_config(self._server(), 1080)["outbounds"][0]
+        self.assertNotIn("sockopt", ob["streamSettings"])
+
+    def test_shadowsocks_gets_sockopt(self):
+        srv = self._server(protocol=ProxyProtocol.SHADOWSOCKS, method="aes-256-gcm", password="p")
+        ob = _generate_config(srv, 1080, perf={"tcp_fast_open": True})["outbounds"][0]
+        self.assertTrue(ob["streamSettings"]["sockopt"]["tcpFastOpen"])
+
+    def test_engine_drops_mptcp_on_old_xray(self):
+        from unittest import mock
+        engine = XrayEngine()
+        engine.perf_options = {"tcp_multi_path": True, "tcp_fast_open": True, "udp_fragment": True}
+        with mock.patch.object(XrayEngine, "detected_version", return_value=(1, 8, 4)):
+            ob = engine.build_config(self._server())["outbounds"][0]
+        self.assertEqual(ob["streamSettings"]["sockopt"], {"tcpFastOpen": True})
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,7 @@
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QHBoxLayout, QFrame
 from PySide6.QtCore import Qt
 
+from utils import twinsock
 from utils.server_model import ProxyProtocol
 from utils.window_utils import configure_window
 
@@ -18,6 +19,22 @@ _PROTOCOL_HINTS = {
 }
 
 
+def _share_parts_hint(text):
+    """(label, incomplete) for the pasted parts of a split tws3:// share, or None."""
+    pieces = text.split()
+    if not any(twinsock.is_share_part(p) for p in pieces):
+        return None
+    assembler = twinsock.ShareAssembler()
+    try:
+        for piece in pieces:
+            assembler.feed(piece)
+    except twinsock.VaultError as e:
+        return f"TwinSock Share ({e})", True
+    if assembler.complete:
+        return f"TwinSock Share ({assembler.total} parts)", False
+    return f"TwinSock Share ({assembler.received} of {assembler.total} parts, paste the rest)", True
+
+
 class AddServerDialog(QDialog):
 
     def __init__(self, parent=None, theme=None, has_legacy_tws2: bool = False):
@@ -94,10 +111,13 @@ class AddServerDialog(QDialog):
         layout.addLayout(button_layout)
 
     def _on_text_changed(self, text):
+        parts_hint = _share_parts_hint(text)
         text = text.strip().lower()
         detected = None
         is_warn = False
-        if text.startswith("tws2://") or text.startswith("tws2."):
+        if parts_hint:
+            detected, is_warn = parts_hint
+        elif text.startswith("tws2://") or text.startswith("tws2."):
             if self.has_legacy_tws2:
                 detected = "TwinSock Share (Legacy)"
             else:
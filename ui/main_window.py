@@ -5,9 +5,9 @@ import time
 
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QFrame, QMessageBox, QDialog, QFileDialog,
-    QApplication,
+    QApplication, QProgressDialog,
 )
-from PySide6.QtCore import Qt, QTimer, Slot
+from PySide6.QtCore import Qt, QTimer, Slot, Signal, QThreadPool
 from urllib.parse import urlparse
 
 from .header_bar import HeaderBar
@@ -21,23 +21,37 @@ from .add_server_dialog import AddServerDialog
 from .connection_log_dialog import ConnectionLogDialog
 from .settings_dialog import SettingsDialog
 from .about_dialog import AboutDialog
-from utils import twinsock
+from utils import profile_io, twinsock
+from utils.link_parser import parse_links_from_text
 from utils.connection_manager import ConnectionManager
+from utils.persistence import get_persistence
+from utils.server_index import MANUAL_OWNER, get_server_index
 from utils.server_manager import ServerManager
 from utils.subscription_manager import SubscriptionManager
 from utils.ping import DEFAULT_PING_METHOD
 from utils.theme import M3Theme
 from utils.platform_utils import get_app_dir
 from utils.platform_startup import set_autostart
-from utils.engines.engine_manager import get_engine, ensure_engine, EngineType
+from utils.engines.engine_manager import get_engine, ensure_engine, resolve_engine_type, EngineType
 from utils.startup_utils import (
     DECLINED_REASON, provision_backend, show_provisioning_failure
 )
 
 log = logging.getLogger("main_window")
 
+# Export file dialog filter -> extension added when the name has none.
+_EXPORT_FILTERS = {
+    "JSON Files (*.json)": ".json",
+    "Compressed NDJSON (*.ndjson.gz)": ".ndjson.gz",
+    "NDJSON (*.ndjson)": ".ndjson",
+}
+_IMPORT_FILTER = "Profiles (*.json *.ndjson *.gz);;All Files (*)"
+
 
 class RoundedWindow(QWidget):
+    _profileProgress = Signal(int)                  # per mille done
+    # (on_done, result, error) for the callback to run on the GUI thread.
+    _profileJobDone = Signal(object)
 
     def __init__(self):
         super().__init__()
@@ -72,7 +86,14 @@ class RoundedWindow(QWidget):
         self.connection_manager.geoInfoReady.connect(self.update_geo_ui)
         self.connection_manager.geoError.connect(self.on_geo_error)
         self.connection_manager.pingResultReady.connect(self.update_ping_ui)
+        self.connection_manager.bandwidthCalibrated.connect(self._on_bandwidth_calibrated)
+        self.connection_manager.calibrationSuggested.connect(self._on_calibration_suggested)
+        self._profileProgress.connect(self._on_profile_progress)
+        self._profileJobDone.connect(self._on_profile_job_done)
+        self._profile_dialog = None
         self.subscription_manager.updated.connect(self._on_sub_updated)
+        self.subscription_manager.serversChanged.connect(self._on_sub_servers_changed)
+        self.subscription_manager.quotaChanged.connect(self._on_sub_quota_changed)
 
         self.log_dialog = ConnectionLogDialog(self, self.theme)
         self._ping_all_generation = 0
@@ -120,6 +141,7 @@ class RoundedWindow(QWidget):
         self.server_panel.pingAllRequested.connect(self._ping_all_servers)
         self.server_panel.serverSelected.connect(self._on_server_selected)
         self.server_panel.serverDeleted.connect(self._on_server_deleted)
+        self.server_panel.serverCalibrateRequested.connect(self._on_calibrate_requested)
         self.inner_layout.addWidget(self.server_panel)
 
         self.bottom_nav = BottomNav(self.theme)
@@ -129,6 +151,7 @@ class RoundedWindow(QWidget):
         self.inner_layout.addWidget(self.bottom_nav)
 
         self._pending_tray_action = None
+        self._calibration_declined = set()
         self._dragging = False
         self._connect_generation = 0
 
@@ -236,6 +259,8 @@ class RoundedWindow(QWidget):
             self.status_card.reset_to_disconnected()
 
     def on_connection_state_changed(self, conn):
+        self.subscription_manager.set_proxy_port(
+            self.connection_manager.local_port if conn else None)
         if conn:
             self.status_card.set_switch_state(True)
         elif not self.connection_manager.is_connecting and not self.connection_manager.is_reconnecting:
@@ -337,9 +362,7 @@ class RoundedWindow(QWidget):
             threading.Thread(target=lambda: self.connection_manager.toggle(None, False), daemon=True).start()
 
     def _current_servers(self):
-        if self.current_tab == "Manual":
-            return self.manual_servers
-        return self.subscription_manager.get_servers(self.current_tab)
+        return get_server_index().servers_of(self.current_tab)
 
     def switch_tab(self, name, force=False):
         if self.current_tab == name and not force:
@@ -364,11 +387,10 @@ class RoundedWindow(QWidget):
     def _execute_pending_tray_action(self):
         if self._pending_tray_action is None:
             return
-        tab_name, server_index = self._pending_tray_action
+        server = self._pending_tray_action
         self._pending_tray_action = None
-        if server_index < len(self.server_panel._server_items):
-            self.server_panel._server_items[server_index].radio.setChecked(True)
-        QTimer.singleShot(100, lambda: self.toggle_connection(True))
+        if self.server_panel.select_server(server):
+            QTimer.singleShot(100, lambda: self.toggle_connection(True))
 
     def reconnect_after_resume(self):
         log.info("System resumed or network restored, reconnecting proxy...")
@@ -378,22 +400,28 @@ class RoundedWindow(QWidget):
         self.status_card.set_switch_state(False)
         QTimer.singleShot(1500, lambda: self.toggle_connection(True))
 
-    def _refresh_server_list(self):
+    def _refresh_server_list(self, reuse=False):
         servers = self._current_servers()
-        connected_key = None
+        connected = ()
         curr = self.connection_manager.current_server
         if self.connection_manager.is_connected and curr:
-            connected_key = curr.key
-        self.server_panel.refresh(servers, connected_key)
+            connected = get_server_index().servers_with_key(curr.key)
+        self.server_panel.refresh(servers, connected, reuse=reuse)
         self.tray_manager.rebuild_menu(self.manual_servers, self.subscription_manager.subscriptions)
 
     def _ping_all_servers(self):
         method = self.settings.get("ping_method", DEFAULT_PING_METHOD)
         self.server_panel.ping_all(method, self.connection_manager.local_port)
 
-    def _on_connect_from_tray(self, tab_name, server_index):
-        self._pending_tray_action = (tab_name, server_index)
-        self.switch_tab(tab_name)
+    def _on_connect_from_tray(self, server):
+        if server is None:
+            self.toggle_connection(False)
+            return
+        owner = get_server_index().owner_of(server)
+        if owner is None:  # removed since the menu was built
+            return
+        self._pending_tray_action = server
+        self.switch_tab(owner)
 
     def show_log_dialog(self):
         if hasattr(self, 'log_dialog') and self.log_dialog:
@@ -423,7 +451,10 @@ class RoundedWindow(QWidget):
     def _on_sub_updated(self, success, new_count):
         self.server_panel.set_update_button_state("🔄 Update", True)
         if success:
-            self.switch_tab(self.current_tab, force=True)
+            # The server rows were already patched via serversChanged.
+            info = self.subscription_manager.traffic_info(self.current_tab)
+            meta = self.subscription_manager.get_metadata(self.current_tab)
+            self.traffic_card.update_from_subscription(info, meta)
             if new_count > 0:
                 self.tray_manager.notify(
                     "Subscription Updated", f"Added {new_count} new nodes.")
@@ -437,6 +468,19 @@ class RoundedWindow(QWidget):
                 f"Failed to update subscription.\n\nURL: {url}\n\n"
                 "Check your network connection and verify the URL is correct.")
 
+    def _on_sub_servers_changed(self, name):
+        if name == self.current_tab:
+            self._refresh_server_list(reuse=True)
+        else:
+            self.tray_manager.rebuild_menu(self.manual_servers, self.subscription_manager.subscriptions)
+
+    @Slot(str)
+    def _on_sub_quota_changed(self, name):
+        if name == self.current_tab:
+            info = self.subscription_manager.traffic_info(name)
+            meta = self.subscription_manager.get_metadata(name)
+            self.traffic_card.update_from_subscription(info, meta)
+
     def delete_current_subscription(self):
         if self.current_tab == "Manual":
             return
@@ -457,6 +501,50 @@ class RoundedWindow(QWidget):
             QMessageBox.information(
                 self, "Info", "Delete the entire subscription instead.")
 
+    def _on_calibrate_requested(self, idx):
+        servers = self._current_servers()
+        if not 0 <= idx < len(servers):
+            return
+        server = servers[idx]
+        if getattr(server, "is_expired", False):
+            return
+        if self.connection_manager.calibrate_bandwidth(server):
+            self.status_card.set_switch_state(True)
+            self.status_card.set_status("📶 Calibrating bandwidth...", self.theme.on_secondary_container)
+            self.tray_manager.notify("Calibrating", f"Measuring bandwidth for {server.name}...")
+
+    @Slot(object)
+    def _on_calibration_suggested(self, server):
+        if server.unique_key in self._calibration_declined:
+            return
+        reply = QMessageBox.question(
+            self, "Network Changed",
+            f"'{server.name}' was calibrated on a different network, so its "
+            "Hysteria 2 bandwidth settings may be wrong.\n\n"
+            "Recalibrate now? This runs a short speed test through the tunnel.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if reply == QMessageBox.Yes:
+            if self.connection_manager.calibrate_bandwidth(server):
+                self.status_card.set_status("📶 Calibrating bandwidth...", self.theme.on_secondary_container)
+        else:
+            self._calibration_declined.add(server.unique_key)
+
+    @Slot(object, bool)
+    def _on_bandwidth_calibrated(self, server, ok):
+        if not ok:
+            self.tray_manager.notify(
+                "Calibration Failed", f"Could not measure bandwidth for {server.name}.")
+            return
+        if get_server_index().owner_of(server) == MANUAL_OWNER:
+            self.server_manager.save_manual_servers()
+        else:
+            self.subscription_manager.save()
+        self._calibration_declined.discard(server.unique_key)
+        self.tray_manager.notify(
+            "Bandwidth Calibrated",
+            f"{server.name}: ↑ {server.up_mbps} / ↓ {server.down_mbps} Mbps")
+        self._refresh_server_list()
+
     def show_settings_dialog(self):
         current_engine = self.settings.get("engine", "sslocal")
         d = SettingsDialog(self, self.theme, self.connection_manager.local_port,
@@ -475,6 +563,8 @@ class RoundedWindow(QWidget):
             new_tun_mode = bool(s.get("tun_mode", False))
             old_theme_preset = self.settings.get("theme_preset", "dynamic")
             new_theme_preset = s.get("theme_preset", "dynamic")
+            old_record_format = self.settings.get("vault_record_format", "tws3")
+            old_backend = self.settings.get("storage_backend", "json")
 
             has_changes = any(self.settings.get(k) != v for k, v in s.items()) or (new_port != old_port)
             if not has_changes:
@@ -494,6 +584,16 @@ class RoundedWindow(QWidget):
                 self.theme.apply_theme(new_theme_preset)
                 self.apply_theme_styles()
 
+            if s.get("vault_record_format", "tws3") != old_record_format:
+                with twinsock.chain_batch():
+                    self.server_manager.apply_record_format()
+                    self.subscription_manager.save()
+
+            if s.get("storage_backend", "json") != old_backend:
+                with twinsock.chain_batch():
+                    self.server_manager.apply_storage_backend()
+                    self.subscription_manager.save()
+
             engine_changed = (new_engine != old_engine)
             tun_changed = (new_tun_mode != old_tun_mode)
 
@@ -501,7 +601,7 @@ class RoundedWindow(QWidget):
                 if new_tun_mode:
                     engine = get_engine(EngineType.SINGBOX)
                 else:
-                    engine = get_engine(EngineType(new_engine))
+                    engine = get_engine(resolve_engine_type(new_engine))
                 self.connection_manager.switch_engine(engine)
 
             self.connection_manager.apply_settings(s)
@@ -519,23 +619,75 @@ class RoundedWindow(QWidget):
             self.theme.apply_theme(orig_theme)
             self.apply_theme_styles()
 
+    def _run_profile_job(self, label, work, on_done):
+        """Run work(progress) on the thread pool behind a progress dialog;
+        on_done(result, error) is then called on the GUI thread."""
+        dlg = QProgressDialog(label, None, 0, 1000, self)
+        dlg.setWindowModality(Qt.WindowModal)
+        dlg.setMinimumDuration(300)
+        dlg.setAutoClose(False)
+        dlg.setValue(0)
+        self._profile_dialog = dlg
+
+        def progress(done, total):
+            self._profileProgress.emit(int(1000 * done / total) if total else 1000)
+
+        QThreadPool.globalInstance().start(profile_io.ProfileJob(
+            work, progress,
+            lambda result, error: self._profileJobDone.emit((on_done, result, error))))
+
+    @Slot(int)
+    def _on_profile_progress(self, permille):
+        if self._profile_dialog is not None:
+            self._profile_dialog.setValue(min(permille, 999))
+
+    @Slot(object)
+    def _on_profile_job_done(self, outcome):
+        on_done, result, error = outcome
+        if self._profile_dialog is not None:
+            self._profile_dialog.close()
+            self._profile_dialog.deleteLater()
+            self._profile_dialog = None
+        on_done(result, error)
+
     def export_profiles(self):
-        path, _ = QFileDialog.getSaveFileName(self, "Export Profiles", "", "JSON Files (*.json)")
-        if path:
-            try:
-                self.server_manager.export_profiles(path, self.subscription_manager.subscriptions)
-                self.tray_manager.notify("Export Successful", f"Profiles saved to {os.path.basename(path)}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to export: {e}")
+        if self._profile_dialog is not None:
+            return
+        path, selected = QFileDialog.getSaveFileName(
+            self, "Export Profiles", "", ";;".join(_EXPORT_FILTERS))
+        if not path:
+            return
+        if not path.lower().endswith((".json", ".ndjson", ".gz")):
+            path += _EXPORT_FILTERS.get(selected, ".json")
+        # The job works on a snapshot, so refreshes and edits can go on meanwhile.
+        manual = list(self.server_manager.manual_servers)
+        subs = [{**sub, "servers": list(sub.get("servers", []))}
+                for sub in self.subscription_manager.subscriptions]
+
+        def done(_, error):
+            if error is not None:
+                QMessageBox.critical(self, "Error", f"Failed to export: {error}")
+                return
+            self.tray_manager.notify("Export Successful", f"Profiles saved to {os.path.basename(path)}")
+
+        self._run_profile_job(
+            "Exporting profiles…",
+            lambda progress: profile_io.export_profiles(path, manual, subs, progress), done)
 
     def import_profiles(self):
-        path, _ = QFileDialog.getOpenFileName(self, "Import Profiles", "", "JSON Files (*.json)")
-        if path:
-            try:
-                added_m, added_s = self.server_manager.import_profiles(path, self.subscription_manager.subscriptions)
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to import: {e}")
+        if self._profile_dialog is not None:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Import Profiles", "", _IMPORT_FILTER)
+        if not path:
+            return
+
+        def done(result, error):
+            if error is not None:
+                QMessageBox.critical(self, "Error", f"Failed to import: {error}")
                 return
+            manuals, subs = result
+            added_m, added_s = self.server_manager.merge_imported(
+                manuals, subs, self.subscription_manager)
             if added_m or added_s:
                 tabs = ["Manual"] + [s['name'] for s in self.subscription_manager.subscriptions]
                 self.tab_bar.set_tabs(tabs, self.current_tab)
@@ -544,6 +696,10 @@ class RoundedWindow(QWidget):
             else:
                 QMessageBox.information(self, "Import", "No new profiles found in file.")
 
+        self._run_profile_job(
+            "Importing profiles…",
+            lambda progress: profile_io.import_profiles(path, progress), done)
+
     def show_add_dialog(self):
         has_legacy = self.server_manager.has_legacy_tws2_key()
         d = AddServerDialog(self, self.theme, has_legacy_tws2=has_legacy)
@@ -611,20 +767,20 @@ class RoundedWindow(QWidget):
         imported_subs_count = 0
         last_sub_name = None
 
+        sub_urls, other_lines = [], []
         for single_link in links_to_import:
-            if single_link.startswith("http://") or single_link.startswith("https://"):
-                name = urlparse(single_link).hostname or urlparse(single_link).netloc or "Subscription"
-                if self.subscription_manager.add(name, single_link, lock_export=lock_export, expires_at=expires_at):
-                    imported_subs_count += 1
-                    last_sub_name = name
-            else:
-                srv = self.server_manager.add_from_link(
-                    single_link,
-                    lock_export=lock_export,
-                    expires_at=expires_at
-                )
-                if srv:
-                    imported_servers_count += 1
+            (sub_urls if single_link.startswith(("http://", "https://")) else other_lines).append(single_link)
+        for single_link in sub_urls:
+            name = urlparse(single_link).hostname or urlparse(single_link).netloc or "Subscription"
+            name = self.subscription_manager.add(name, single_link, lock_export=lock_export, expires_at=expires_at)
+            if name:
+                imported_subs_count += 1
+                last_sub_name = name
+        # Proxy links are parsed as one batch, so long pasted lists use the parsing pool.
+        server_links = parse_links_from_text("\n".join(other_lines))
+        if server_links:
+            imported_servers_count = len(self.server_manager.add_from_links(
+                server_links, lock_export=lock_export, expires_at=expires_at))
 
         if imported_subs_count > 0:
             tabs = ["Manual"] + [s['name'] for s in self.subscription_manager.subscriptions]
@@ -672,6 +828,7 @@ class RoundedWindow(QWidget):
         except Exception:
             pass
         self.tray_manager.hide()
+        get_persistence().close()
         QApplication.quit()
 
     def closeEvent(self, event):
@@ -1,12 +1,17 @@
 from PySide6.QtWidgets import (
     QWidget, QHBoxLayout, QPushButton, QLabel, QRadioButton,
-    QFrame, QSizePolicy, QDialog, QVBoxLayout
+    QFrame, QSizePolicy, QDialog, QVBoxLayout, QMenu, QMessageBox
 )
-from PySide6.QtCore import Qt, QPropertyAnimation, QEasingCurve, Property
+from PySide6.QtCore import Qt, QPropertyAnimation, QEasingCurve, Property, Signal
 from PySide6.QtGui import QColor, QPainter, QBrush, QFont, QPixmap, QPen
 
+from utils import twinsock
 from utils.window_utils import configure_window
 
+# Longest text one QR code holds at qrcode's default error correction (M),
+# version 40, byte mode.
+QR_MAX_BYTES = 2331
+
 
 class AnimatedRadioButton(QRadioButton):
     """Material 3 Card Radio Button with tonal hover and selection indicator."""
@@ -82,6 +87,8 @@ class AnimatedRadioButton(QRadioButton):
 
 
 class ServerItem(QFrame):
+    calibrateRequested = Signal()
+
     def __init__(self, text, server=None, theme=None, parent=None):
         super().__init__(parent)
         self.server = server
@@ -138,6 +145,12 @@ class ServerItem(QFrame):
                         parts.append("Hop")
                     if getattr(server, "obfs", ""):
                         parts.append("Obfs")
+                    up = getattr(server, "up_mbps", 0)
+                    down = getattr(server, "down_mbps", 0)
+                    if up and down:
+                        self.protocol_badge.setToolTip(f"Brutal: ↑ {up} / ↓ {down} Mbps")
+                    self.radio.setContextMenuPolicy(Qt.CustomContextMenu)
+                    self.radio.customContextMenuRequested.connect(self._show_context_menu)
                 badge_text = " · ".join(parts)
                 self.protocol_badge.setText(badge_text)
             elif getattr(server, "plugin", ""):
@@ -241,10 +254,40 @@ class ServerItem(QFrame):
         self._recompute_actions_width()
         self.setFixedHeight(56)
 
+    def _show_context_menu(self, pos):
+        menu = QMenu(self)
+        menu.addAction("📶 Calibrate bandwidth", self.calibrateRequested.emit)
+        menu.exec(self.radio.mapToGlobal(pos))
+
+    def _qr_payloads(self, wrap_long=False):
+        """Texts to show as QR codes for the server's link.
+
+        A tws3:// share is split into its parts as it is.  Any other link is
+        shown whole while it fits one code, so every app can scan it; a
+        longer one becomes a compressed multi-part tws3:// share only with
+        *wrap_long*, and is [] otherwise.
+        """
+        link = self.server.key
+        if link.startswith(twinsock.SHARE_SCHEME_CURRENT):
+            return twinsock.split_share(link)
+        if len(link.encode("utf-8")) <= QR_MAX_BYTES:
+            return [link]
+        if not wrap_long:
+            return []
+        return twinsock.encrypt_share_parts(
+            "", link, lock_export=self.server.lock_export, expires_at=self.server.expires_at)
+
     def show_qr_code(self):
         import qrcode
-        qr_img = qrcode.make(self.server.key)
-        img = qr_img.toqimage()
+        payloads = self._qr_payloads()
+        if not payloads:
+            reply = QMessageBox.question(
+                self, "Link Too Long",
+                "This link is too long for a QR code other apps can scan.\n\n"
+                "Show it as a multi-part TwinSock share instead? Only Socksicle can import it.")
+            if reply != QMessageBox.Yes:
+                return
+            payloads = self._qr_payloads(wrap_long=True)
         d = QDialog(self)
         d.setWindowFlags(Qt.Dialog)
         configure_window(d)
@@ -267,10 +310,35 @@ class ServerItem(QFrame):
         lay.addWidget(title)
 
         lbl = QLabel()
-        lbl.setPixmap(QPixmap.fromImage(img).scaled(260, 260, Qt.KeepAspectRatio, Qt.SmoothTransformation))
         lbl.setAlignment(Qt.AlignCenter)
         lay.addWidget(lbl)
 
+        part_lbl = QLabel()
+        part_lbl.setStyleSheet(f"color: {self.theme.on_surface_variant}; font-size: 12px; border: none;")
+        part_lbl.setAlignment(Qt.AlignCenter)
+        lay.addWidget(part_lbl)
+        part_lbl.setVisible(len(payloads) > 1)
+
+        index = 0
+
+        def show_part(step=0):
+            nonlocal index
+            index = (index + step) % len(payloads)
+            img = qrcode.make(payloads[index]).toqimage()
+            lbl.setPixmap(QPixmap.fromImage(img).scaled(260, 260, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            part_lbl.setText(f"Part {index + 1} of {len(payloads)} — scan all parts")
+
+        if len(payloads) > 1:
+            nav = QHBoxLayout()
+            for text, step in (("◀", -1), ("▶", 1)):
+                btn = QPushButton(text)
+                btn.setFocusPolicy(Qt.NoFocus)
+                btn.setStyleSheet(self.theme.get_button_style("tonal"))
+                btn.clicked.connect(lambda _=False, step=step: show_part(step))
+                nav.addWidget(btn)
+            lay.addLayout(nav)
+        show_part()
+
         close_btn = QPushButton("Close")
         close_btn.setFocusPolicy(Qt.NoFocus)
         close_btn.setStyleSheet(self.theme.get_button_style("tonal"))
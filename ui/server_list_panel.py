@@ -16,11 +16,13 @@ class ServerListPanel(QWidget):
     pingAllRequested = Signal()
     serverSelected = Signal(int)
     serverDeleted = Signal(int)
+    serverCalibrateRequested = Signal(int)
 
     def __init__(self, theme, parent=None):
         super().__init__(parent)
         self.theme = theme
         self._server_items = []
+        self._row_of = {}  # id(server) -> row in _server_items
         self._fade_out_cb = None
         self._setup_ui()
 
@@ -130,25 +132,41 @@ class ServerListPanel(QWidget):
             if idx >= 0:
                 self.serverSelected.emit(idx)
 
-    def refresh(self, servers, connected_server_key=None):
+    def refresh(self, servers, connected_servers=(), reuse=False):
+        """Rebuild the list for *servers*, checking the row of any of *connected_servers*.
+
+        With *reuse*, rows whose Server object is still in the list keep
+        their widget (and last ping) and only added/removed rows change.
+        """
+        connected = {id(s) for s in connected_servers}
         self.scroll_content.setUpdatesEnabled(False)
         self._button_group.blockSignals(True)
         try:
+            wanted = {id(s) for s in servers}
+            kept = {id(item.server): item for item in self._server_items
+                    if reuse and id(item.server) in wanted}
             for b in self._button_group.buttons():
                 self._button_group.removeButton(b)
             while self.server_layout.count():
                 item = self.server_layout.takeAt(0)
-                if item.widget():
-                    item.widget().deleteLater()
+                widget = item.widget()
+                if widget and kept.get(id(widget.server)) is not widget:
+                    widget.deleteLater()
             self._server_items = []
+            self._row_of = {}
             for i, s in enumerate(servers):
-                item = ServerItem(s.name, s, self.theme)
-                item.delete_button.clicked.connect(
-                    lambda checked=False, idx=i: self.serverDeleted.emit(idx))
+                item = kept.pop(id(s), None)
+                if item is None:
+                    item = ServerItem(s.name, s, self.theme)
+                    item.delete_button.clicked.connect(
+                        lambda checked=False, it=item: self.serverDeleted.emit(self._server_items.index(it)))
+                    item.calibrateRequested.connect(
+                        lambda it=item: self.serverCalibrateRequested.emit(self._server_items.index(it)))
                 self._button_group.addButton(item.radio, i)
                 self.server_layout.addWidget(item)
                 self._server_items.append(item)
-                if connected_server_key and s.key == connected_server_key:
+                self._row_of[id(s)] = i
+                if id(s) in connected:
                     item.radio.setChecked(True)
             self.server_layout.addStretch()
             self._filter_servers(self.search_bar.text())
@@ -156,6 +174,14 @@ class ServerListPanel(QWidget):
             self._button_group.blockSignals(False)
             self.scroll_content.setUpdatesEnabled(True)
 
+    def select_server(self, server) -> bool:
+        """Check the row of *server*; False when it is not listed."""
+        row = self._row_of.get(id(server))
+        if row is None:
+            return False
+        self._server_items[row].radio.setChecked(True)
+        return True
+
     def _filter_servers(self, text):
         text = text.lower()
         for item in self._server_items:
@@ -10,9 +10,11 @@ from PySide6.QtCore import Qt
 
 from utils.platform_startup import is_autostart_enabled
 from utils.platform_utils import is_admin, is_windows
-from utils.sub_manager import USER_AGENT_PRESETS
+from utils.sub_manager import FETCH_DIRECT, FETCH_STRATEGY_LABELS, USER_AGENT_PRESETS
 from utils.window_utils import configure_window
-from utils.engines.base import DEFAULT_LOCAL_PORT
+from utils.engines.base import DEFAULT_LOCAL_PORT, EngineType
+from utils.engines.engine_manager import get_engine
+from utils.engines.tuning import tun_gso_available
 from utils.ping import DEFAULT_PING_METHOD
 from utils.theme import THEME_PRESETS
 
@@ -21,6 +23,7 @@ ENGINE_LABELS = {
     "sslocal": "Shadowsocks (sslocal)",
     "xray": "Xray-core",
     "sing-box": "sing-box",
+    "auto": "Automatic (per server)",
 }
 
 PING_METHOD_LABELS = {
@@ -29,6 +32,26 @@ PING_METHOD_LABELS = {
     "tcp_connect": "TCP connect",
 }
 
+MUX_LABELS = {
+    "off": "Off",
+    "h2mux": "h2mux",
+    "smux": "smux",
+    "yamux": "yamux",
+}
+
+TUN_STACK_LABELS = {
+    "mixed": "Mixed (system TCP + gVisor UDP)",
+    "system": "System",
+    "gvisor": "gVisor",
+}
+
+TCP_CONGESTION_LABELS = {
+    "": "System default",
+    "bbr": "BBR",
+    "cubic": "CUBIC",
+    "reno": "Reno",
+}
+
 DNS_PRESETS = {
     "default": ("System / Core Default (Auto)", ""),
     "cloudflare": ("Cloudflare DoH (1.1.1.1)", "https://1.1.1.1/dns-query"),
@@ -288,6 +311,15 @@ class SettingsDialog(QDialog):
         self.ua_combo.setCurrentIndex(idx)
         form_layout.addRow("UA preset:", self.ua_combo)
 
+        self.fetch_strategy_combo = QComboBox()
+        for key, label in FETCH_STRATEGY_LABELS.items():
+            self.fetch_strategy_combo.addItem(label, key)
+        strategy_keys = list(FETCH_STRATEGY_LABELS.keys())
+        saved_strategy = parent.settings.get("sub_fetch_strategy", FETCH_DIRECT) if parent else FETCH_DIRECT
+        self.fetch_strategy_combo.setCurrentIndex(
+            strategy_keys.index(saved_strategy) if saved_strategy in strategy_keys else 0)
+        form_layout.addRow("Fetch via:", self.fetch_strategy_combo)
+
         # --- Custom Secure DNS ---
         dns_label = QLabel("Secure DNS (DoH / DoT):")
         dns_label.setStyleSheet(f"color: {theme.on_surface}; font-weight: bold; font-size: 13px; margin-top: 6px;")
@@ -319,6 +351,84 @@ class SettingsDialog(QDialog):
         self.ping_method_combo.setCurrentIndex(ping_idx)
         form_layout.addRow("Ping method:", self.ping_method_combo)
 
+        # --- Connection multiplexing ---
+        mux_label = QLabel("Connection Multiplexing:")
+        mux_label.setStyleSheet(f"color: {theme.on_surface}; font-weight: bold; font-size: 13px; margin-top: 6px;")
+        form_layout.addRow(mux_label)
+
+        self.mux_combo = QComboBox()
+        for key, label in MUX_LABELS.items():
+            self.mux_combo.addItem(label, key)
+        mux_keys = list(MUX_LABELS.keys())
+        saved_mux = parent.settings.get("mux", "off") if parent else "off"
+        self.mux_combo.setCurrentIndex(mux_keys.index(saved_mux) if saved_mux in mux_keys else 0)
+        self.mux_combo.setToolTip(
+            "Default for servers whose link does not specify mux. "
+            "xray uses Mux.cool/XUDP for any non-off choice.")
+        form_layout.addRow("Mux protocol:", self.mux_combo)
+
+        self.mux_concurrency_input = QSpinBox()
+        self.mux_concurrency_input.setRange(1, 128)
+        self.mux_concurrency_input.setValue(
+            int(parent.settings.get("mux_concurrency", 8) or 8) if parent else 8)
+        form_layout.addRow("Mux streams:", self.mux_concurrency_input)
+
+        self.mux_padding_check = QCheckBox("Pad multiplexed streams (sing-box)")
+        self.mux_padding_check.setChecked(parent.settings.get("mux_padding", False) if parent else False)
+        form_layout.addRow("", self.mux_padding_check)
+
+        # --- Performance ---
+        perf_label = QLabel("Performance:")
+        perf_label.setStyleSheet(f"color: {theme.on_surface}; font-weight: bold; font-size: 13px; margin-top: 6px;")
+        form_layout.addRow(perf_label)
+
+        self.tfo_check = QCheckBox("TCP Fast Open")
+        self.tfo_check.setChecked(parent.settings.get("tcp_fast_open", False) if parent else False)
+        form_layout.addRow("", self.tfo_check)
+
+        self.mptcp_check = QCheckBox("Multipath TCP (MPTCP)")
+        self.mptcp_check.setChecked(parent.settings.get("tcp_multi_path", False) if parent else False)
+        form_layout.addRow("", self.mptcp_check)
+
+        self.udp_fragment_check = QCheckBox("Allow UDP fragmentation (sing-box)")
+        self.udp_fragment_check.setChecked(parent.settings.get("udp_fragment", False) if parent else False)
+        form_layout.addRow("", self.udp_fragment_check)
+
+        self.congestion_combo = QComboBox()
+        for key, label in TCP_CONGESTION_LABELS.items():
+            self.congestion_combo.addItem(label, key)
+        congestion_keys = list(TCP_CONGESTION_LABELS.keys())
+        saved_congestion = parent.settings.get("tcp_congestion", "") if parent else ""
+        self.congestion_combo.setCurrentIndex(
+            congestion_keys.index(saved_congestion) if saved_congestion in congestion_keys else 0)
+        form_layout.addRow("TCP congestion (xray):", self.congestion_combo)
+
+        self.tun_stack_combo = QComboBox()
+        for key, label in TUN_STACK_LABELS.items():
+            self.tun_stack_combo.addItem(label, key)
+        stack_keys = list(TUN_STACK_LABELS.keys())
+        saved_stack = parent.settings.get("tun_stack", "mixed") if parent else "mixed"
+        self.tun_stack_combo.setCurrentIndex(stack_keys.index(saved_stack) if saved_stack in stack_keys else 0)
+        form_layout.addRow("TUN stack:", self.tun_stack_combo)
+
+        self.tun_mtu_input = QSpinBox()
+        self.tun_mtu_input.setRange(1280, 65535)
+        self.tun_mtu_input.setValue(int(parent.settings.get("tun_mtu", 9000) or 9000) if parent else 9000)
+        form_layout.addRow("TUN MTU:", self.tun_mtu_input)
+
+        self.tun_gso_check = QCheckBox("Generic Segmentation Offload (Linux TUN)")
+        self.tun_gso_check.setChecked(parent.settings.get("tun_gso", False) if parent else False)
+        form_layout.addRow("", self.tun_gso_check)
+        # sing-box dropped GSO in 1.11; only offer it where the engine honours it.
+        self.tun_gso_check.setVisible(tun_gso_available(get_engine(EngineType.SINGBOX).version_or_pinned()))
+
+        self.perf_hint = QLabel(
+            "Options unsupported by the installed engine version are ignored "
+            "and noted in the log.")
+        self.perf_hint.setWordWrap(True)
+        self.perf_hint.setStyleSheet(f"color: {theme.on_surface_variant}; font-size: 11px; margin-top: 2px;")
+        form_layout.addRow("", self.perf_hint)
+
         # --- Fake HWID ---
         self.hwid_check = QCheckBox("Send fake X-hwid header")
         self.hwid_check.setChecked(parent.settings.get("fake_hwid", False) if parent else False)
@@ -374,6 +484,22 @@ class SettingsDialog(QDialog):
         self.key_hint.setStyleSheet(f"color: {theme.on_surface_variant}; font-size: 12px;")
         form_layout.addRow("", self.key_hint)
 
+        self.compact_vault_check = QCheckBox("Compact vault records (TwinSock v4)")
+        saved_format = parent.settings.get("vault_record_format", "tws3") if parent else "tws3"
+        self.compact_vault_check.setChecked(saved_format == "tws4")
+        self.compact_vault_check.setToolTip(
+            "Seal each server's secrets, or a subscription's whole server list, as one record. "
+            "Smaller and faster config files; older Socksicle versions cannot read them.")
+        form_layout.addRow("", self.compact_vault_check)
+
+        self.sqlite_store_check = QCheckBox("Indexed server storage (SQLite)")
+        saved_backend = parent.settings.get("storage_backend", "json") if parent else "json"
+        self.sqlite_store_check.setChecked(saved_backend == "sqlite")
+        self.sqlite_store_check.setToolTip(
+            "Keep servers and subscriptions in config.db, one sealed row per server. "
+            "Saves only rewrite what changed; the JSON files are kept as a backup.")
+        form_layout.addRow("", self.sqlite_store_check)
+
         # --- Beta Features ---
         beta_label = QLabel("Beta Features")
         beta_label.setStyleSheet(f"color: {theme.primary}; font-weight: bold; font-size: 14px; margin-top: 10px;")
@@ -514,12 +640,23 @@ class SettingsDialog(QDialog):
         res = {
             "engine": engine_val,
             "ping_method": self.ping_method_combo.currentData(),
+            "mux": self.mux_combo.currentData(),
+            "mux_concurrency": self.mux_concurrency_input.value(),
+            "mux_padding": self.mux_padding_check.isChecked(),
+            "tcp_fast_open": self.tfo_check.isChecked(),
+            "tcp_multi_path": self.mptcp_check.isChecked(),
+            "udp_fragment": self.udp_fragment_check.isChecked(),
+            "tcp_congestion": self.congestion_combo.currentData(),
+            "tun_stack": self.tun_stack_combo.currentData(),
+            "tun_mtu": self.tun_mtu_input.value(),
+            "tun_gso": self.tun_gso_check.isChecked(),
             "local_port": self.port_input.value(),
             "auto_connect": self.auto_connect_check.isChecked(),
             "autostart": self.autostart_check.isChecked(),
             "minimize_to_tray": self.minimize_to_tray_check.isChecked(),
             "auto_update_subs": self.auto_update_check.isChecked(),
             "user_agent_key": self.ua_combo.currentText(),
+            "sub_fetch_strategy": self.fetch_strategy_combo.currentData(),
             "fake_hwid": self.hwid_check.isChecked(),
             "hwid_value": self.hwid_input.text().strip(),
             "tun_mode": self.tun_mode_check.isChecked(),
@@ -528,6 +665,8 @@ class SettingsDialog(QDialog):
             "custom_dns_manual": self.custom_dns_input.text().strip(),
             "custom_dns": custom_dns_val,
             "theme_preset": self.theme_combo.currentData(),
+            "vault_record_format": "tws4" if self.compact_vault_check.isChecked() else "tws3",
+            "storage_backend": "sqlite" if self.sqlite_store_check.isChecked() else "json",
         }
         if self.is_legacy_tws2:
             res["tws2_share_key"] = self.tws_key_input.text().strip()
@@ -4,7 +4,7 @@ from PySide6.QtWidgets import QSystemTrayIcon, QMenu
 
 
 class TrayManager(QObject):
-    connectRequested = Signal(str, int)
+    connectRequested = Signal(object)  # Server to connect, None to disconnect
     showHideRequested = Signal()
     quitRequested = Signal()
 
@@ -28,7 +28,7 @@ class TrayManager(QObject):
 
         self.disconnect_action = self.tray_menu.addAction("Disconnect")
         self.disconnect_action.triggered.connect(
-            lambda: self.connectRequested.emit("", -1))
+            lambda: self.connectRequested.emit(None))
         self.disconnect_action.setEnabled(False)
 
         self.quit_action = self.tray_menu.addAction("Quit")
@@ -45,16 +45,16 @@ class TrayManager(QObject):
     def rebuild_menu(self, manual_servers, subscriptions):
         self.servers_menu.clear()
         manual_menu = self.servers_menu.addMenu("Manual")
-        for i, server in enumerate(manual_servers):
+        for server in manual_servers:
             action = manual_menu.addAction(server.name)
             action.triggered.connect(
-                lambda checked=False, i=i: self.connectRequested.emit("Manual", i))
+                lambda checked=False, s=server: self.connectRequested.emit(s))
         for sub in subscriptions:
             sub_menu = self.servers_menu.addMenu(sub['name'])
-            for i, server in enumerate(sub['servers']):
+            for server in sub['servers']:
                 action = sub_menu.addAction(server.name)
                 action.triggered.connect(
-                    lambda checked=False, n=sub['name'], i=i: self.connectRequested.emit(n, i))
+                    lambda checked=False, s=server: self.connectRequested.emit(s))
 
     def set_disconnect_enabled(self, enabled):
         self.disconnect_action.setEnabled(enabled)
@@ -0,0 +1,227 @@
+"""Hysteria 2 bandwidth calibration through the local SOCKS5 proxy.
+
+Brutal congestion control sends at exactly the configured ``up_mbps`` /
+``down_mbps``: values that are too low waste the link, values that are too
+high flood it with retransmissions.  Calibration runs a short download and
+upload test against a public speed-test endpoint *through the tunnel* while
+the server is connected with BBR (no bandwidth hints), then stores the
+measured rates on the server so the next connect uses Brutal with them.
+
+Each calibration also records a coarse fingerprint of the local network
+(the prefix of the source address used for the default route).  When the
+fingerprint changes, the stored values are likely wrong and the UI offers
+to recalibrate.
+"""
+import hashlib
+import ipaddress
+import logging
+import math
+import socket
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import socks
+from PySide6.QtCore import QRunnable
+
+from .ping import HTTP_USER_AGENT, _configure_tcp_socket
+from .server_model import ProxyProtocol
+
+log = logging.getLogger(__name__)
+
+SPEEDTEST_HOST = "speed.cloudflare.com"
+SPEEDTEST_PORT = 443
+SPEEDTEST_DOWN_PATH = "/__down?bytes={size}"
+SPEEDTEST_UP_PATH = "/__up"
+
+CALIBRATION_DURATION_S = 6.0     # per direction
+CALIBRATION_STREAMS = 4          # parallel connections per direction
+CALIBRATION_MAX_BYTES = 200 * 1024 * 1024   # per stream cap
+CALIBRATION_TIMEOUT_S = 10.0
+UPLOAD_CHUNK = 64 * 1024
+READ_CHUNK = 256 * 1024
+
+# Anything under this is treated as a failed measurement rather than a slow link.
+MIN_CALIBRATED_MBPS = 1
+
+# sing-box TUN inbound address; never a real network.
+_TUN_NETWORKS = (ipaddress.ip_network("172.19.0.0/30"),
+                 ipaddress.ip_network("fdfe:dcba:9876::/126"))
+_ROUTE_PROBES = (("1.1.1.1", socket.AF_INET), ("2606:4700:4700::1111", socket.AF_INET6))
+
+
+def network_fingerprint() -> str:
+    """Short hash identifying the current local network, or "" if offline.
+
+    Uses the source address the OS would pick for a public destination
+    (no packets are sent), truncated to its /24 or /64 so DHCP renewals
+    on the same network keep the same fingerprint.
+    """
+    for probe, family in _ROUTE_PROBES:
+        try:
+            with socket.socket(family, socket.SOCK_DGRAM) as s:
+                s.connect((probe, 53))
+                addr = ipaddress.ip_address(s.getsockname()[0].split("%", 1)[0])
+        except (OSError, ValueError):
+            continue
+        if addr.is_loopback or any(addr in net for net in _TUN_NETWORKS):
+            continue
+        prefix = 24 if addr.version == 4 else 64
+        net = ipaddress.ip_network(f"{addr}/{prefix}", strict=False)
+        return hashlib.sha256(str(net).encode()).hexdigest()[:12]
+    return ""
+
+
+def supports_calibration(server) -> bool:
+    return getattr(server, "protocol", None) == ProxyProtocol.HYSTERIA2
+
+
+def needs_recalibration(server, fingerprint: str) -> bool:
+    """True when *server* was calibrated on a different network."""
+    calibrated_on = getattr(server, "bw_network", "")
+    return (supports_calibration(server) and bool(calibrated_on)
+            and bool(fingerprint) and calibrated_on != fingerprint)
+
+
+def to_mbps(nbytes: int, seconds: float) -> float:
+    if seconds <= 0:
+        return 0.0
+    return nbytes * 8 / 1_000_000 / seconds
+
+
+def _open_tls(socks5_port: int, timeout: float):
+    s = socks.socksocket()
+    _configure_tcp_socket(s)
+    s.set_proxy(socks.SOCKS5, "127.0.0.1", socks5_port, rdns=True)
+    s.settimeout(timeout)
+    try:
+        s.connect((SPEEDTEST_HOST, SPEEDTEST_PORT))
+        ctx = ssl.create_default_context()
+        return ctx.wrap_socket(s, server_hostname=SPEEDTEST_HOST)
+    except BaseException:
+        s.close()
+        raise
+
+
+def _request_head(method: str, path: str, extra: str = "") -> bytes:
+    return (
+        f"{method} {path} HTTP/1.1\r\n"
+        f"Host: {SPEEDTEST_HOST}\r\n"
+        f"User-Agent: {HTTP_USER_AGENT}\r\n"
+        "Accept: */*\r\n"
+        f"{extra}"
+        "Connection: close\r\n\r\n"
+    ).encode("ascii")
+
+
+def _download_stream(socks5_port, deadline, stop, timeout):
+    """Read one download stream until *deadline*; returns (bytes, first, last)."""
+    total = 0
+    first = last = None
+    with _open_tls(socks5_port, timeout) as s:
+        s.sendall(_request_head(
+            "GET", SPEEDTEST_DOWN_PATH.format(size=CALIBRATION_MAX_BYTES)))
+        header = b""
+        while b"\r\n\r\n" not in header:
+            chunk = s.recv(4096)
+            if not chunk:
+                return 0, None, None
+            header += chunk
+        status = header.split(b"\r\n", 1)[0].split(b" ")
+        if len(status) < 2 or not status[1].startswith(b"2"):
+            log.debug("Download test got status %r", header.split(b"\r\n", 1)[0])
+            return 0, None, None
+        # Timing starts with the first body byte so TLS setup is excluded.
+        first = last = time.monotonic()
+        total = len(header.split(b"\r\n\r\n", 1)[1])
+        while not stop.is_set() and time.monotonic() < deadline:
+            chunk = s.recv(READ_CHUNK)
+            if not chunk:
+                break
+            total += len(chunk)
+            last = time.monotonic()
+    return total, first, last
+
+
+def _upload_stream(socks5_port, deadline, stop, timeout):
+    """Push one upload stream until *deadline*; returns (bytes, first, last)."""
+    total = 0
+    payload = b"\0" * UPLOAD_CHUNK
+    with _open_tls(socks5_port, timeout) as s:
+        s.sendall(_request_head(
+            "POST", SPEEDTEST_UP_PATH,
+            f"Content-Type: application/octet-stream\r\n"
+            f"Content-Length: {CALIBRATION_MAX_BYTES}\r\n"))
+        first = last = time.monotonic()
+        while (not stop.is_set() and time.monotonic() < deadline
+               and total < CALIBRATION_MAX_BYTES):
+            s.sendall(payload)
+            total += len(payload)
+            last = time.monotonic()
+    return total, first, last
+
+
+def _run_direction(worker, socks5_port, duration, streams, timeout) -> float:
+    """Run *streams* parallel workers and return the aggregate rate in Mbps."""
+    stop = threading.Event()
+    deadline = time.monotonic() + duration
+    results = []
+    with ThreadPoolExecutor(max_workers=streams) as pool:
+        futures = [pool.submit(worker, socks5_port, deadline, stop, timeout)
+                   for _ in range(streams)]
+        for fut in futures:
+            try:
+                results.append(fut.result())
+            except (OSError, ssl.SSLError, socks.ProxyError) as e:
+                log.debug("Calibration stream failed: %s", e)
+            except Exception as e:
+                log.debug("Calibration stream unexpected failure: %s", e)
+        stop.set()
+    results = [r for r in results if r[0] and r[1] is not None]
+    if not results:
+        return 0.0
+    total = sum(r[0] for r in results)
+    start = min(r[1] for r in results)
+    end = max(r[2] for r in results)
+    return to_mbps(total, end - start)
+
+
+def measure_download(socks5_port, duration=CALIBRATION_DURATION_S,
+                     streams=CALIBRATION_STREAMS, timeout=CALIBRATION_TIMEOUT_S) -> float:
+    return _run_direction(_download_stream, socks5_port, duration, streams, timeout)
+
+
+def measure_upload(socks5_port, duration=CALIBRATION_DURATION_S,
+                   streams=CALIBRATION_STREAMS, timeout=CALIBRATION_TIMEOUT_S) -> float:
+    return _run_direction(_upload_stream, socks5_port, duration, streams, timeout)
+
+
+def calibrate(socks5_port, duration=CALIBRATION_DURATION_S,
+              streams=CALIBRATION_STREAMS) -> tuple[int, int] | None:
+    """Measure (up_mbps, down_mbps) through the proxy, or None on failure."""
+    down = measure_download(socks5_port, duration, streams)
+    up = measure_upload(socks5_port, duration, streams)
+    log.info("Bandwidth calibration on port %s: up %.1f Mbps, down %.1f Mbps",
+             socks5_port, up, down)
+    if up < MIN_CALIBRATED_MBPS or down < MIN_CALIBRATED_MBPS:
+        return None
+    return math.ceil(up), math.ceil(down)
+
+
+class CalibrationJob(QRunnable):
+    """Run a bandwidth calibration off the GUI thread via the global thread pool."""
+
+    def __init__(self, socks5_port, callback, duration=CALIBRATION_DURATION_S):
+        super().__init__()
+        self.socks5_port = socks5_port
+        self.callback = callback
+        self.duration = duration
+
+    def run(self):
+        try:
+            result = calibrate(self.socks5_port, self.duration)
+        except Exception as e:
+            log.debug("Bandwidth calibration raised: %s", e)
+            result = None
+        self.callback(result)
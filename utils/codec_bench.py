@@ -0,0 +1,85 @@
+"""Benchmark for saving and loading large server lists.
+
+Builds the servers of a synthetic subscription (``parse_bench.make_links``)
+and times, per size, the two halves of a save and of a load:
+
+- ``to_dicts_s`` / ``from_dicts_s``: the Server codec;
+- ``dumps_s`` / ``loads_s``: JSON encode/decode via ``jsonio`` (orjson when
+  installed, see the ``json`` column);
+- ``save_s`` / ``load_s``: the totals.
+
+Each figure is the best of ``--repeat`` runs.  Run with::
+
+    python -m utils.codec_bench [--sizes 1000,10000,50000] [--repeat 5] [--json]
+"""
+import argparse
+import json
+import sys
+import time
+
+from . import jsonio
+from .parse_bench import make_links
+from .server_model import Server
+
+DEFAULT_SIZES = (1_000, 10_000, 50_000)
+DEFAULT_REPEAT = 5
+
+
+def _best(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def measure(size, repeat=DEFAULT_REPEAT):
+    """Return the result dict for *size* servers."""
+    servers = Server.from_links(make_links(size), workers=1)
+    to_dicts, dicts = _best(lambda: Server.to_dicts(servers), repeat)
+    dumps, data = _best(lambda: jsonio.dumps(dicts), repeat)
+    loads, loaded = _best(lambda: jsonio.loads(data), repeat)
+    from_dicts, _ = _best(lambda: Server.from_dicts(loaded), repeat)
+    return {"servers": size, "json": "orjson" if jsonio.orjson is not None else "json",
+            "to_dicts_s": round(to_dicts, 4), "dumps_s": round(dumps, 4),
+            "save_s": round(to_dicts + dumps, 4),
+            "loads_s": round(loads, 4), "from_dicts_s": round(from_dicts, 4),
+            "load_s": round(loads + from_dicts, 4)}
+
+
+def run(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT):
+    """Return one result dict per size."""
+    return [measure(size, repeat) for size in sizes]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time saving and loading server lists.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated server counts")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="runs per figure (best is kept)")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+    try:
+        sizes = [int(v) for v in args.sizes.split(",") if v.strip()]
+    except ValueError as e:
+        parser.error(f"bad size: {e}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    results = run(sizes, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    headers = ("servers", "json", "to_dicts_s", "dumps_s", "save_s",
+               "loads_s", "from_dicts_s", "load_s")
+    rows = [headers] + [tuple(r[h] for h in headers) for r in results]
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(headers))]
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)).rstrip())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
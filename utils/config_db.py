@@ -0,0 +1,413 @@
+"""Optional SQLite storage for manual servers and subscriptions (config.db).
+
+With the ``storage_backend`` setting at ``"sqlite"``, servers.json and
+subscriptions.json are replaced by one database:
+
+- ``servers``: one row per server, keyed by (owner, position) where owner is
+  the subscription name or ``MANUAL_ROWS`` for manual servers, and indexed
+  by a keyed digest of the server's unique_key and by protocol.  Secrets are
+  sealed per row with TwinSock (a v3 token per field, or a v4 record).
+- ``subscriptions``: one row per subscription, without its servers.
+
+A save compares every row with the stored one and writes only rows that
+changed, in one transaction.  The database runs in WAL mode so queries on
+other threads do not wait for the writer.  The TwinSock chain digest of
+config.db covers all row digests, so edits outside Socksicle are detected
+like they are for the JSON files.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .platform_utils import get_config_dir
+from .server_model import Server, lookup_key
+from . import twinsock
+
+log = logging.getLogger(__name__)
+
+DB_FILE = "config.db"
+BACKEND_JSON = "json"
+BACKEND_SQLITE = "sqlite"
+BACKENDS = (BACKEND_JSON, BACKEND_SQLITE)
+# Owner of manual server rows; subscription names are never empty.
+MANUAL_ROWS = ""
+_SUB_FIELDS = ("url",)
+_SEAL_CACHE_PURPOSE = "seal-cache"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subscriptions (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS servers (
+    owner TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    unique_key TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (owner, position)
+);
+CREATE INDEX IF NOT EXISTS servers_unique_key ON servers (unique_key);
+CREATE INDEX IF NOT EXISTS servers_protocol ON servers (protocol);
+"""
+
+
+def _plain_dict(server) -> dict:
+    return server.to_dict(reveal=False) if hasattr(server, "to_dict") else dict(server)
+
+
+def _row_key(d: dict) -> str:
+    # A keyed digest, so the seal cache holds no plaintext secrets.  Secrets
+    # still sealed since load are identified by their token.
+    def sealed_token(value):
+        if isinstance(value, twinsock.Sealed):
+            return value.ident
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+    return twinsock.lookup_digest(
+        _SEAL_CACHE_PURPOSE, json.dumps(d, sort_keys=True, default=sealed_token))
+
+
+def _row_digest(owner: str, data: str) -> bytes:
+    return hashlib.sha256(owner.encode("utf-8") + b"\0" + data.encode("utf-8")).digest()
+
+
+def _as_stored(purpose: str, plain: dict, fields) -> dict | None:
+    """*plain* as seal_dicts stored it, when its secrets are Sealed handles from a load.
+
+    None when a secret is plaintext (or handles of different records, or of
+    a subscriptions.json group record), which needs sealing anyway.
+    """
+    d = dict(plain)
+    record = None
+    for field in fields:
+        value = d.get(field)
+        if not value:
+            continue
+        if not isinstance(value, twinsock.Sealed) or value.purpose != purpose \
+                or value.item is not None:
+            return None
+        if value.field is None:
+            d[field] = value.token
+        elif record in (None, value.token):
+            record = value.token
+        else:
+            return None
+    if record is not None:
+        if any(d.get(field) for field in fields if not isinstance(d.get(field), twinsock.Sealed)):
+            return None
+        for field in fields:
+            d.pop(field, None)
+        d[twinsock.RECORD_KEY] = record
+    return d
+
+
+def _server_unchanged(purpose: str, plain: dict, stored: dict) -> bool:
+    return _as_stored(purpose, plain, twinsock.SECRET_FIELDS) == stored
+
+
+def _sub_unchanged(plain: dict, stored: dict) -> bool:
+    return twinsock.unseal_dicts("subscriptions", [stored], _SUB_FIELDS)[0] == plain
+
+
+def _in_current_format(stored: dict, fields) -> bool:
+    # A row sealed in the other record format is rewritten in the current one.
+    if twinsock.record_format() == twinsock.RECORD_FORMAT_RECORDS:
+        return not any(stored.get(f) for f in fields)
+    return twinsock.RECORD_KEY not in stored
+
+
+class ConfigStore:
+    """config.db with an in-memory copy of its rows for diffing and chaining.
+
+    All writes go through one connection under ``_lock``; queries use a
+    connection per thread.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conn = self._connect()
+        self._rows: dict[str, list[tuple[str, bytes]]] = {}  # owner -> [(data, digest)]
+        self._subs: dict[str, tuple[int, str, bytes]] = {}  # name -> (position, data, digest)
+        # Row data sealed by this process: cache owner -> {(key id, format, _row_key): data}.
+        # A save replaces the entries of every owner it touched.
+        self._sealed: dict[object, dict[tuple, str]] = {}
+        self._read_rows()
+        twinsock.file_intact(DB_FILE, self._chain_data())
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"{self.path.as_uri()}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _read_rows(self):
+        self._rows = {}
+        self._subs = {}
+        for owner, data in self._conn.execute(
+                "SELECT owner, data FROM servers ORDER BY owner, position"):
+            self._rows.setdefault(owner, []).append((data, _row_digest(owner, data)))
+        for name, position, data in self._conn.execute(
+                "SELECT name, position, data FROM subscriptions"):
+            self._subs[name] = (position, data, _row_digest(name, data))
+
+    def _chain_data(self) -> bytes:
+        parts = [digest for _, _, digest in sorted(self._subs.values())]
+        for owner in sorted(self._rows):
+            parts.extend(digest for _, digest in self._rows[owner])
+        return b"".join(parts)
+
+    # --- migration bookkeeping ---
+
+    def needs_migration(self) -> bool:
+        """True until mark_migrated(): the JSON files were never copied in."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone()
+        return row is None
+
+    def mark_migrated(self):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', ?)",
+                               (str(int(time.time())),))
+
+    # --- loading ---
+
+    def load_servers(self, owner: str, purpose: str) -> list[dict]:
+        """Server dicts of *owner* in order, secrets as Sealed handles."""
+        with self._lock:
+            rows = [json.loads(data) for data, _ in self._rows.get(owner, [])]
+        return twinsock.unseal_dicts(purpose, rows, twinsock.SECRET_FIELDS, lazy=True)
+
+    def load_subscriptions(self) -> list[dict]:
+        """Subscription dicts in order, each with its server dicts under "servers"."""
+        with self._lock:
+            subs = [(name, data) for name, (_, data, _) in
+                    sorted(self._subs.items(), key=lambda item: item[1][0])]
+        out = []
+        for name, data in subs:
+            sub = twinsock.unseal_dicts("subscriptions", [json.loads(data)], _SUB_FIELDS)[0]
+            sub["servers"] = self.load_servers(name, "subscriptions")
+            out.append(sub)
+        return out
+
+    # --- saving ---
+
+    def save_servers(self, owner: str, purpose: str, servers):
+        """Make the rows of *owner* match *servers*; returns the rows written."""
+        servers = list(servers)
+        return self._write(lambda fresh: self._put_servers_locked(owner, purpose, servers, fresh))
+
+    def save_subscriptions(self, subs):
+        """Make the stored subscriptions and their servers match *subs*."""
+        entries = []
+        for sub in subs:
+            meta = dict(sub)
+            entries.append((meta, list(meta.pop("servers", []))))
+        return self._write(lambda fresh: self._put_subscriptions_locked(entries, fresh))
+
+    def _write(self, put):
+        with self._lock:
+            for attempt in (0, 1):
+                fresh = {}
+                try:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        written = put(fresh)
+                    except BaseException:
+                        self._conn.execute("ROLLBACK")
+                        self._read_rows()
+                        raise
+                    self._conn.execute("COMMIT")
+                except twinsock.VaultError as e:
+                    if str(e) != "foreign" or attempt:
+                        raise
+                    log.warning("vault: foreign config, retiring %s and starting fresh", DB_FILE)
+                    self._retire_foreign_locked()
+                    twinsock.drop_foreign()
+                    continue
+                self._sealed.update(fresh)
+                for owner in [o for o, cache in self._sealed.items() if not cache]:
+                    del self._sealed[owner]
+                break
+            if written:
+                twinsock.file_saved(DB_FILE, self._chain_data())
+            return written
+
+    def _retire_foreign_locked(self):
+        self._conn.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        for suffix in ("", "-wal", "-shm"):
+            src = f"{self.path}{suffix}"
+            if os.path.exists(src):
+                try:
+                    os.replace(src, f"{self.path}.foreign-{stamp}{suffix}")
+                except OSError as e:
+                    log.error("Failed to retire foreign config %s: %s", src, e)
+        self._conn = self._connect()
+        self._sealed.clear()
+        self._read_rows()
+
+    def _seal_rows(self, cache_owner, purpose, fields, plains, old, unchanged, fresh):
+        """Row data for *plains*: reuse rows whose content did not change, seal the rest."""
+        cache_base = (twinsock.key_id(), twinsock.record_format())
+        cache = self._sealed.get(cache_owner, {})
+        fresh = fresh.setdefault(cache_owner, {})
+        out = [None] * len(plains)
+        missing = []
+        for pos, plain in enumerate(plains):
+            row_key = _row_key(plain)
+            cache_key = cache_base + (row_key,)
+            data = cache.get(cache_key)
+            if data is None and pos < len(old):
+                try:
+                    stored = json.loads(old[pos])
+                    if _in_current_format(stored, fields) and unchanged(plain, stored):
+                        data = old[pos]
+                except (twinsock.VaultError, ValueError):
+                    pass
+            if data is None:
+                missing.append((pos, cache_key, plain))
+            else:
+                fresh[cache_key] = data
+                out[pos] = data
+        if missing:
+            sealed = twinsock.seal_dicts(purpose, [plain for _, _, plain in missing], fields)
+            for (pos, cache_key, _), d in zip(missing, sealed):
+                out[pos] = fresh[cache_key] = json.dumps(d, sort_keys=True)
+        return out
+
+    def _put_servers_locked(self, owner, purpose, servers, fresh):
+        plains = [_plain_dict(s) for s in servers]
+        old = self._rows.get(owner, [])
+        datas = self._seal_rows(owner, purpose, twinsock.SECRET_FIELDS, plains,
+                                [data for data, _ in old],
+                                lambda plain, stored: _server_unchanged(purpose, plain, stored), fresh)
+        rows = []
+        changed = []
+        for pos, (server, plain, data) in enumerate(zip(servers, plains, datas)):
+            if pos < len(old) and old[pos][0] == data:
+                rows.append(old[pos])
+                continue
+            if not isinstance(server, Server):
+                server = Server.from_dict(plain)
+            changed.append((owner, pos, server.lookup_keys[1],
+                            server.protocol.value, data))
+            rows.append((data, _row_digest(owner, data)))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO servers (owner, position, unique_key, protocol, data) "
+            "VALUES (?, ?, ?, ?, ?)", changed)
+        written = len(changed)
+        if len(old) > len(plains):
+            self._conn.execute("DELETE FROM servers WHERE owner = ? AND position >= ?",
+                               (owner, len(plains)))
+            written += len(old) - len(plains)
+        if rows:
+            self._rows[owner] = rows
+        else:
+            self._rows.pop(owner, None)
+        return written
+
+    def _put_subscriptions_locked(self, entries, fresh):
+        metas = [meta for meta, _ in entries]
+        names = [meta.get("name", "") for meta in metas]
+        written = 0
+        for name in set(self._subs) - set(names):
+            self._conn.execute("DELETE FROM subscriptions WHERE name = ?", (name,))
+            self._subs.pop(name)
+            fresh[("subscription", name)] = {}
+            written += 1 + self._put_servers_locked(name, "subscriptions", [], fresh)
+        for pos, (name, meta) in enumerate(zip(names, metas)):
+            old = self._subs.get(name)
+            data = self._seal_rows(("subscription", name), "subscriptions", _SUB_FIELDS, [meta],
+                                   [old[1]] if old else [], _sub_unchanged, fresh)[0]
+            if old is None or old[:2] != (pos, data):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO subscriptions (name, position, data) VALUES (?, ?, ?)",
+                    (name, pos, data))
+                self._subs[name] = (pos, data, _row_digest(name, data))
+                written += 1
+        for name, (_, servers) in zip(names, entries):
+            written += self._put_servers_locked(name, "subscriptions", servers, fresh)
+        return written
+
+    # --- queries ---
+
+    def find(self, unique_key: str) -> list[tuple[str, int]]:
+        """(owner, position) of every stored server with *unique_key*."""
+        digest = lookup_key(unique_key)
+        return self._reader().execute(
+            "SELECT owner, position FROM servers WHERE unique_key = ? ORDER BY owner, position",
+            (digest,)).fetchall()
+
+    def protocol_counts(self, owner: str | None = None) -> dict[str, int]:
+        """Number of stored servers per protocol, for one owner or all."""
+        query = "SELECT protocol, COUNT(*) FROM servers"
+        args = ()
+        if owner is not None:
+            query += " WHERE owner = ?"
+            args = (owner,)
+        return dict(self._reader().execute(query + " GROUP BY protocol", args).fetchall())
+
+
+_STORE: ConfigStore | None = None
+_store_lock = threading.Lock()
+
+
+def set_backend(name: str | None) -> ConfigStore | None:
+    """Open config.db for ``"sqlite"``, close it for any other backend."""
+    global _STORE
+    with _store_lock:
+        if name == BACKEND_SQLITE:
+            path = get_config_dir() / DB_FILE
+            if _STORE is not None and _STORE.path != path:
+                _STORE.close()
+                _STORE = None
+            if _STORE is None:
+                _STORE = ConfigStore(path)
+        elif _STORE is not None:
+            _STORE.close()
+            _STORE = None
+        return _STORE
+
+
+def get_store() -> ConfigStore | None:
+    """The open config.db, or None while the JSON backend is selected."""
+    return _STORE
+
+
+def _forget_sealed():
+    # Runs under the vault lock: rebind rather than take the store's lock.
+    store = _STORE
+    if store is not None:
+        store._sealed = {}
+
+
+twinsock.on_key_change(_forget_sealed)
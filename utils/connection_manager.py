@@ -16,11 +16,14 @@ import time
 
 from PySide6.QtCore import QObject, QTimer, Signal, Slot, QThreadPool, QMetaObject, Qt, QRunnable, Q_ARG
 
+from .bandwidth import CalibrationJob, network_fingerprint, needs_recalibration, supports_calibration
 from .geo_utils import fetch_ip_info_via_proxy
 from .ping import (http_ping_via_socks5_once, socks5_proxy_ready, ProxyPingJob,
                    PING_PROBE_HOST)
-from .engines.engine_manager import get_current_engine
+from .engines.engine_manager import get_current_engine, is_auto
+from .engines.selector import get_selector
 from .engines.base import DEFAULT_LOCAL_PORT
+from .engines.tuning import mux_defaults_from_settings, perf_options_from_settings
 
 log = logging.getLogger("connection_manager")
 
@@ -69,6 +72,9 @@ class ConnectionManager(QObject):
     geoInfoReady = Signal(dict)            # {ip, flag} after connect
     geoError = Signal(str)                 # reason when geo lookup failed
     pingResultReady = Signal(object)       # active ping in ms (None on error)
+    bandwidthCalibrated = Signal(object, bool)  # server, success
+    calibrationSuggested = Signal(object)  # server whose bandwidth values look stale
+    _calibrationDone = Signal(int, object)  # generation, (up, down) or None
 
     def __init__(self, settings=None):
         super().__init__()
@@ -87,6 +93,10 @@ class ConnectionManager(QObject):
         self._last_connected_server = None
         self._auto_reconnect_attempts = 0
         self.MAX_AUTO_RECONNECTS = 3
+        self._network_fingerprint = ""
+        self._calibration = None          # (server, old_up, old_down) while calibrating
+        self._connect_started = 0.0
+        self._calibrationDone.connect(self._on_calibration_done)
 
         self._probe_deadline = 0.0
         self.probe_timer = QTimer(self)
@@ -126,9 +136,7 @@ class ConnectionManager(QObject):
             self._settings.update(settings)
         self.local_port = self._settings.get("local_port", DEFAULT_LOCAL_PORT)
         tun_mode = self._settings.get("tun_mode", False)
-        custom_dns = self._settings.get("custom_dns", None)
-        if hasattr(self._engine, "custom_dns"):
-            self._engine.custom_dns = custom_dns
+        self._apply_engine_options()
         self.kill_switch_enabled = bool(self._settings.get("kill_switch", False))
         if tun_mode:
             from .engines.base import EngineType
@@ -140,6 +148,15 @@ class ConnectionManager(QObject):
         elif hasattr(self._engine, "tun_mode"):
             self._engine.tun_mode = False
 
+    def _apply_engine_options(self):
+        """Push per-engine config options (DNS, multiplex, performance) from settings."""
+        if hasattr(self._engine, "custom_dns"):
+            self._engine.custom_dns = self._settings.get("custom_dns", None)
+        if hasattr(self._engine, "mux_defaults"):
+            self._engine.mux_defaults = mux_defaults_from_settings(self._settings)
+        if hasattr(self._engine, "perf_options"):
+            self._engine.perf_options = perf_options_from_settings(self._settings)
+
     @property
     def current_server(self):
         return self._engine.get_current_server()
@@ -167,6 +184,7 @@ class ConnectionManager(QObject):
         engine.connectionStateChanged.connect(self._on_connection_state_changed)
         engine.logUpdated.connect(self.logUpdated)
         engine.local_port = old_port
+        self._apply_engine_options()
 
     def toggle(self, server, connect=None):
         """Start or stop the proxy. Returns True when a connect was initiated."""
@@ -187,7 +205,12 @@ class ConnectionManager(QObject):
                 self.disconnect()
                 self._last_connected_server = server
 
+            # Sampled before the engine starts so a TUN route cannot mask it.
+            self._network_fingerprint = network_fingerprint()
+
             tun_mode = self._settings.get("tun_mode", False)
+            if is_auto(self._settings):
+                self._select_engine(server, bool(tun_mode))
             proto_val = getattr(getattr(server, "protocol", None), "value", getattr(server, "protocol", ""))
             if tun_mode or proto_val == "hysteria2":
                 from .engines.base import EngineType
@@ -203,6 +226,7 @@ class ConnectionManager(QObject):
             self.current_geo = None
             self._generation += 1
             curr_gen = self._generation
+            self._connect_started = time.monotonic()
 
             if self._engine.start(server):
                 # Verify that no disconnect/new connect happened while start() was executing
@@ -217,9 +241,11 @@ class ConnectionManager(QObject):
                     return False
             self.state = DISCONNECTED
             self.is_connecting = False
+            self._record_failure(server)
         else:
             self._last_connected_server = None
             self._auto_reconnect_attempts = 0
+            self._abort_calibration()
             self.disconnect()
         return False
 
@@ -283,6 +309,7 @@ class ConnectionManager(QObject):
         self.state = CONNECTED
         self.is_connecting = False
         self._engine.confirm_connected()
+        self._record_connect()
         self.statusChanged.emit("Started", False)
         if getattr(self, "kill_switch_enabled", False) and self.current_server:
             try:
@@ -299,6 +326,7 @@ class ConnectionManager(QObject):
         self._geo_last_attempt = time.monotonic()
         self._update_ping()
         threading.Thread(target=self._fetch_geo, daemon=True).start()
+        self._check_calibration()
 
     def _fail(self, msg):
         self._probing_in_flight = False
@@ -312,6 +340,8 @@ class ConnectionManager(QObject):
         self.state = DISCONNECTED
         self.is_connecting = False
         self._engine.teardown()
+        self._abort_calibration()
+        self._record_failure(self._last_connected_server)
         self.statusChanged.emit(msg, True)
 
     def _handle_process_stopped(self):
@@ -321,6 +351,8 @@ class ConnectionManager(QObject):
             self._engine.teardown()
             self.state = DISCONNECTED
             self.is_connecting = False
+            self._abort_calibration()
+            self._record_failure(self._last_connected_server)
             code = self._engine.last_exit_code
             if code is not None:
                 msg_fn = getattr(self._engine, 'exit_message', None)
@@ -347,6 +379,7 @@ class ConnectionManager(QObject):
                 self.is_connecting = False
                 self._last_connected_server = None
                 self._auto_reconnect_attempts = 0
+                self._abort_calibration()
                 self.statusChanged.emit("Connection lost", True)
 
     def _on_connection_state_changed(self, conn):
@@ -389,6 +422,104 @@ class ConnectionManager(QObject):
             except (RuntimeError, ReferenceError):
                 return
 
+    # --- Per-server engine stats ("auto" engine) ---
+
+    def _select_engine(self, server, tun_mode):
+        from .engines.engine_manager import get_engine
+        chosen = get_selector().choose(server, tun_mode)
+        if getattr(self._engine, "engine_type", None) != chosen:
+            log.info("Auto engine: using %s for %s", chosen.value, getattr(server, "name", "server"))
+            self.switch_engine(get_engine(chosen))
+
+    def _record_connect(self):
+        server = self._last_connected_server
+        if server is None or not self._connect_started:
+            return
+        ms = (time.monotonic() - self._connect_started) * 1000
+        selector = get_selector()
+        selector.record_connect(server, self._engine.engine_type, ms)
+        selector.save()
+
+    def _record_failure(self, server):
+        if server is None or not hasattr(server, "unique_key"):
+            return
+        selector = get_selector()
+        selector.record_failure(server, self._engine.engine_type)
+        selector.save()
+
+    # --- Hysteria 2 bandwidth calibration ---
+
+    @property
+    def is_calibrating(self):
+        return self._calibration is not None
+
+    def calibrate_bandwidth(self, server=None):
+        """Measure up/down bandwidth for a Hysteria 2 server through the tunnel.
+
+        The measurement must run with BBR, so a server that already has
+        Brutal values is reconnected without them first.  On success the
+        values are stored on the server and it is reconnected to apply them.
+        Returns True when a calibration was started.
+        """
+        server = server or self.current_server
+        if not supports_calibration(server) or self.is_calibrating:
+            return False
+        self._calibration = (server, server.up_mbps, server.down_mbps)
+        if self.is_connected and self.current_server is server \
+                and not server.up_mbps and not server.down_mbps:
+            self._start_calibration()
+        else:
+            server.up_mbps = server.down_mbps = 0
+            threading.Thread(target=self.toggle, args=(server, True), daemon=True).start()
+        return True
+
+    def _check_calibration(self):
+        server = self.current_server
+        if self._calibration is not None:
+            if self._calibration[0] is server:
+                self._start_calibration()
+            else:
+                self._abort_calibration()
+            return
+        if needs_recalibration(server, self._network_fingerprint):
+            log.info("Network changed since %s was calibrated", server.name)
+            self.calibrationSuggested.emit(server)
+
+    def _abort_calibration(self):
+        """Restore the pre-calibration values when the tunnel went away."""
+        if self._calibration is None:
+            return
+        server, old_up, old_down = self._calibration
+        self._calibration = None
+        server.up_mbps, server.down_mbps = old_up, old_down
+        self.bandwidthCalibrated.emit(server, False)
+
+    def _start_calibration(self):
+        gen = self._generation
+        QThreadPool.globalInstance().start(CalibrationJob(
+            int(self.local_port),
+            lambda result, gen=gen: self._calibrationDone.emit(gen, result)))
+
+    @Slot(int, object)
+    def _on_calibration_done(self, gen, result):
+        if self._calibration is None:
+            return
+        server, old_up, old_down = self._calibration
+        self._calibration = None
+        if gen != self._generation or not result:
+            server.up_mbps, server.down_mbps = old_up, old_down
+            self.bandwidthCalibrated.emit(server, False)
+            if self.is_connected and self.current_server is server and (old_up or old_down):
+                threading.Thread(target=self.toggle, args=(server, True), daemon=True).start()
+            return
+        server.up_mbps, server.down_mbps = result
+        server.bw_network = self._network_fingerprint
+        get_selector().record_throughput(server, self._engine.engine_type, result[1])
+        log.info("Calibrated %s: up %d Mbps, down %d Mbps", server.name, *result)
+        self.bandwidthCalibrated.emit(server, True)
+        if self.is_connected and self.current_server is server:
+            threading.Thread(target=self.toggle, args=(server, True), daemon=True).start()
+
     def _update_ping(self):
         if not self.is_connected:
             return
@@ -402,6 +533,9 @@ class ConnectionManager(QObject):
         """Forward a ping result, dropping results from older connections."""
         if gen != self._generation or not self.is_connected:
             return
+        server = self._last_connected_server
+        if ms is not None and server is not None:
+            get_selector().record_ping(server, self._engine.engine_type, ms)
         try:
             self.pingResultReady.emit(ms)
         except RuntimeError:
@@ -139,6 +139,18 @@ class ProxyEngine(QObject):
         """Human-readable process name for log messages."""
         raise NotImplementedError
 
+    def detected_version(self) -> tuple[int, int, int] | None:
+        """Version of the installed binary, or None when it cannot be probed."""
+        binary = self.find_binary()
+        if binary is None:
+            return None
+        from .common import probe_version
+        try:
+            mtime = binary.stat().st_mtime
+        except OSError:
+            return None
+        return probe_version(str(binary), tuple(self.version_args()), mtime)
+
     def exit_message(self, code):
         if sys.platform == "win32" and code is not None:
             c = code & 0xFFFFFFFF
@@ -0,0 +1,569 @@
+"""Offline loopback throughput benchmark for the proxy engines.
+
+Every measurement runs entirely on 127.0.0.1::
+
+    bench client --SOCKS5--> engine (client, via build_args)
+                 --ss/vless/vmess--> engine (server) --direct--> sink
+
+The sink is a small in-process TCP server that streams or swallows bulk
+data and answers tiny request/response exchanges.  sing-box or xray plays
+the proxy server; each installed engine is then run as our client with the
+exact config ``build_args`` produces, so the numbers reflect what the app
+would really run.
+
+Reported per engine / protocol / cipher: download and upload MB/s, median
+and p95 connection setup latency for small requests, and CPU time spent by
+the client and server engine processes (Linux only; ``None`` elsewhere).
+
+Run with::
+
+    python -m utils.engines.bench [--engines sslocal,xray,sing-box]
+        [--protocols ss,vless,vmess] [--ciphers aes-128-gcm,...]
+        [--size-mb 64] [--requests 200] [--json]
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid as uuid_mod
+from typing import NamedTuple
+
+import socks
+
+from ..server_model import ProxyProtocol, Server
+from .base import EngineType
+
+log = logging.getLogger("engine.bench")
+
+BENCH_HOST = "127.0.0.1"
+DEFAULT_BULK_MB = 64
+DEFAULT_SMALL_REQUESTS = 200
+SMALL_RESPONSE_BYTES = 1024
+IO_CHUNK = 256 * 1024
+STARTUP_TIMEOUT_S = 10.0
+IO_TIMEOUT_S = 30.0
+
+DEFAULT_CIPHERS = (
+    "aes-128-gcm",
+    "aes-256-gcm",
+    "chacha20-ietf-poly1305",
+    "2022-blake3-aes-128-gcm",
+    "2022-blake3-aes-256-gcm",
+)
+# Shadowsocks 2022 keys must be base64 of exactly this many bytes.
+_SS2022_KEY_BYTES = {
+    "2022-blake3-aes-128-gcm": 16,
+    "2022-blake3-aes-256-gcm": 32,
+    "2022-blake3-chacha20-poly1305": 32,
+}
+PROTOCOL_NAMES = {
+    "ss": ProxyProtocol.SHADOWSOCKS,
+    "vless": ProxyProtocol.VLESS,
+    "vmess": ProxyProtocol.VMESS,
+}
+# Engines that can act as the proxy server, in order of preference.
+SERVER_ENGINES = (EngineType.SINGBOX, EngineType.XRAY)
+CLIENT_PROTOCOLS = {
+    EngineType.SSLOCAL: (ProxyProtocol.SHADOWSOCKS,),
+    EngineType.XRAY: tuple(PROTOCOL_NAMES.values()),
+    EngineType.SINGBOX: tuple(PROTOCOL_NAMES.values()),
+}
+
+
+class BenchResult(NamedTuple):
+    client: str
+    server: str
+    protocol: str
+    cipher: str
+    download_mbs: float | None = None
+    upload_mbs: float | None = None
+    connect_ms_p50: float | None = None
+    connect_ms_p95: float | None = None
+    client_cpu_s: float | None = None
+    server_cpu_s: float | None = None
+    error: str = ""
+
+
+# --- Sink server ---
+
+class SinkServer:
+    """Loopback TCP target speaking a one-line command protocol.
+
+    ``GET <n>\\n`` streams n bytes back; ``PUT <n>\\n`` reads n bytes and
+    replies ``OK\\n``.  One command per connection.
+    """
+
+    def __init__(self, host=BENCH_HOST):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, 0))
+        self._sock.listen(128)
+        self.host, self.port = self._sock.getsockname()[:2]
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closed.set()
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _serve(self):
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _handle(conn):
+        with conn:
+            try:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                conn.settimeout(IO_TIMEOUT_S)
+                line = _read_line(conn)
+                cmd, _, size = line.partition(b" ")
+                size = int(size or 0)
+                if cmd == b"GET":
+                    _send_zeros(conn, size)
+                elif cmd == b"PUT":
+                    _recv_exact(conn, size)
+                    conn.sendall(b"OK\n")
+            except (OSError, ValueError) as e:
+                log.debug("Sink connection failed: %s", e)
+
+
+def _read_line(sock, limit=64) -> bytes:
+    buf = b""
+    while not buf.endswith(b"\n"):
+        chunk = sock.recv(1)
+        if not chunk or len(buf) > limit:
+            raise ValueError("bad command line")
+        buf += chunk
+    return buf.strip()
+
+
+def _send_zeros(sock, size):
+    block = bytes(IO_CHUNK)
+    view = memoryview(block)
+    while size > 0:
+        n = min(size, IO_CHUNK)
+        sock.sendall(view[:n])
+        size -= n
+
+
+def _recv_exact(sock, size) -> int:
+    buf = bytearray(IO_CHUNK)
+    got = 0
+    while got < size:
+        n = sock.recv_into(buf, min(IO_CHUNK, size - got))
+        if not n:
+            break
+        got += n
+    return got
+
+
+# --- Measurements ---
+
+def _open(target, socks_port=None, timeout=IO_TIMEOUT_S):
+    """Connect to *target*, through the SOCKS5 port when given."""
+    if socks_port is None:
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    else:
+        s = socks.socksocket()
+        s.set_proxy(socks.SOCKS5, BENCH_HOST, int(socks_port))
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    s.settimeout(timeout)
+    try:
+        s.connect(target)
+    except BaseException:
+        s.close()
+        raise
+    return s
+
+
+def _mbs(nbytes, seconds) -> float:
+    return nbytes / (1024 * 1024) / seconds if seconds > 0 else 0.0
+
+
+def measure_download(target, socks_port=None, size=DEFAULT_BULK_MB * 1024 * 1024) -> float:
+    """MB/s for streaming *size* bytes from the sink."""
+    with _open(target, socks_port) as s:
+        start = time.perf_counter()
+        s.sendall(f"GET {size}\n".encode())
+        got = _recv_exact(s, size)
+        elapsed = time.perf_counter() - start
+    if got < size:
+        raise OSError(f"download truncated at {got} of {size} bytes")
+    return _mbs(got, elapsed)
+
+
+def measure_upload(target, socks_port=None, size=DEFAULT_BULK_MB * 1024 * 1024) -> float:
+    """MB/s for pushing *size* bytes into the sink (timed until its ack)."""
+    with _open(target, socks_port) as s:
+        start = time.perf_counter()
+        s.sendall(f"PUT {size}\n".encode())
+        _send_zeros(s, size)
+        if _read_line(s) != b"OK":
+            raise OSError("upload not acknowledged")
+        elapsed = time.perf_counter() - start
+    return _mbs(size, elapsed)
+
+
+def measure_small_requests(target, socks_port=None, count=DEFAULT_SMALL_REQUESTS,
+                           size=SMALL_RESPONSE_BYTES) -> tuple[float, float]:
+    """(median, p95) ms from connect start to a complete small response.
+
+    Each request uses a fresh connection, so this is dominated by the
+    SOCKS5 handshake and the engine's outbound dial.
+    """
+    samples = []
+    for _ in range(max(1, count)):
+        start = time.perf_counter()
+        with _open(target, socks_port) as s:
+            s.sendall(f"GET {size}\n".encode())
+            if _recv_exact(s, size) < size:
+                raise OSError("small response truncated")
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return statistics.median(samples), p95
+
+
+def process_cpu_seconds(pid) -> float | None:
+    """User+system CPU seconds of a live process (Linux /proc only)."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            fields = f.read().rsplit(b")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        return (int(fields[11]) + int(fields[12])) / ticks
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+# --- Engine configs ---
+
+def cipher_password(method: str) -> str:
+    """A password valid for *method* (fixed-length base64 key for SS 2022)."""
+    key_len = _SS2022_KEY_BYTES.get(method)
+    if key_len:
+        return base64.b64encode(os.urandom(key_len)).decode()
+    return base64.urlsafe_b64encode(os.urandom(18)).decode()
+
+
+def bench_server(protocol, port, cipher="aes-128-gcm") -> Server:
+    """The Server our client engines dial for a benchmark run."""
+    server = Server(name="bench", host=BENCH_HOST, port=int(port), protocol=protocol)
+    if protocol == ProxyProtocol.SHADOWSOCKS:
+        server.method = cipher
+        server.password = cipher_password(cipher)
+    else:
+        server.uuid = str(uuid_mod.uuid4())
+    return server
+
+
+def singbox_server_config(server) -> dict:
+    inbound = {"tag": "bench-in", "listen": BENCH_HOST, "listen_port": server.port}
+    if server.protocol == ProxyProtocol.SHADOWSOCKS:
+        inbound.update(type="shadowsocks", method=server.method, password=server.password)
+    elif server.protocol == ProxyProtocol.VLESS:
+        inbound.update(type="vless", users=[{"uuid": server.uuid}])
+    elif server.protocol == ProxyProtocol.VMESS:
+        inbound.update(type="vmess", users=[{"uuid": server.uuid, "alterId": 0}])
+    else:
+        raise ValueError(f"sing-box bench server does not serve {server.protocol.value}")
+    return {
+        "log": {"level": "warn"},
+        "inbounds": [inbound],
+        "outbounds": [{"type": "direct", "tag": "direct"}],
+    }
+
+
+def xray_server_config(server) -> dict:
+    if server.protocol == ProxyProtocol.SHADOWSOCKS:
+        protocol, settings = "shadowsocks", {
+            "method": server.method, "password": server.password, "network": "tcp"}
+    elif server.protocol == ProxyProtocol.VLESS:
+        protocol, settings = "vless", {
+            "clients": [{"id": server.uuid}], "decryption": "none"}
+    elif server.protocol == ProxyProtocol.VMESS:
+        protocol, settings = "vmess", {"clients": [{"id": server.uuid}]}
+    else:
+        raise ValueError(f"xray bench server does not serve {server.protocol.value}")
+    return {
+        "log": {"loglevel": "warning"},
+        "inbounds": [{
+            "tag": "bench-in", "listen": BENCH_HOST, "port": server.port,
+            "protocol": protocol, "settings": settings,
+            "streamSettings": {"network": "tcp"},
+        }],
+        "outbounds": [{"protocol": "freedom", "tag": "direct"}],
+    }
+
+
+_SERVER_CONFIGS = {
+    EngineType.SINGBOX: (singbox_server_config, ["run", "-c"]),
+    EngineType.XRAY: (xray_server_config, ["run", "-c"]),
+}
+
+
+def strip_loopback_bypass(config: dict) -> dict:
+    """Drop client route rules that would send loopback targets direct.
+
+    The app's configs route private addresses and the server address
+    outside the tunnel; here both the server and the sink live on
+    127.0.0.1, so those rules would bypass the engine under test.
+    """
+    route = config.get("route")
+    if isinstance(route, dict) and isinstance(route.get("rules"), list):
+        route["rules"] = [r for r in route["rules"]
+                          if not ({"ip_is_private", "ip_cidr", "domain"} & set(r))]
+    return config
+
+
+# --- Process management ---
+
+def free_port(host=BENCH_HOST) -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def wait_listening(port, timeout=STARTUP_TIMEOUT_S, proc=None) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            return False
+        try:
+            with socket.create_connection((BENCH_HOST, port), timeout=0.2):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def _spawn(args, cwd=None):
+    # Output is discarded: engines log per connection and nothing drains it.
+    return subprocess.Popen(args, cwd=cwd, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            close_fds=(sys.platform != "win32"))
+
+
+def _stop(proc):
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=3)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait(timeout=3)
+
+
+def _start_server(engine, server):
+    """Launch *engine* serving *server*; returns (process, config_path)."""
+    builder, prefix = _SERVER_CONFIGS[engine.engine_type]
+    binary = engine.find_binary()
+    fd, path = tempfile.mkstemp(prefix="bench-server-", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(builder(server), f)
+    proc = _spawn([str(binary), *prefix, path], cwd=str(binary.parent))
+    return proc, path
+
+
+def _start_client(engine, server, socks_port):
+    """Launch *engine* as our client using its own build_args."""
+    engine.local_port = socks_port
+    original = engine.build_config
+    engine.build_config = lambda srv: strip_loopback_bypass(original(srv))
+    try:
+        args = engine.build_args(server)
+    finally:
+        del engine.build_config
+    binary = engine.find_binary()
+    return _spawn([str(binary), *args], cwd=str(binary.parent))
+
+
+def _cpu_delta(proc, before):
+    after = process_cpu_seconds(proc.pid)
+    if before is None or after is None:
+        return None
+    return round(after - before, 3)
+
+
+def run_case(client_engine, server_engine, protocol, cipher="",
+             size=DEFAULT_BULK_MB * 1024 * 1024, requests=DEFAULT_SMALL_REQUESTS) -> BenchResult:
+    """Benchmark one client engine against one server engine and protocol."""
+    base = dict(client=client_engine.engine_type.value, server=server_engine.engine_type.value,
+                protocol=protocol.value,
+                cipher=cipher if protocol == ProxyProtocol.SHADOWSOCKS else "")
+    server = bench_server(protocol, free_port(), cipher or DEFAULT_CIPHERS[0])
+    socks_port = free_port()
+    server_proc = client_proc = None
+    server_cfg = None
+    try:
+        with SinkServer() as sink:
+            server_proc, server_cfg = _start_server(server_engine, server)
+            if not wait_listening(server.port, proc=server_proc):
+                return BenchResult(**base, error="server engine did not start")
+            client_proc = _start_client(client_engine, server, socks_port)
+            if not wait_listening(socks_port, proc=client_proc):
+                return BenchResult(**base, error="client engine did not start")
+
+            target = (sink.host, sink.port)
+            # Warm up both engines (connection pools, JIT-less caches, mux).
+            measure_small_requests(target, socks_port, count=5)
+            client_cpu = process_cpu_seconds(client_proc.pid)
+            server_cpu = process_cpu_seconds(server_proc.pid)
+            down = measure_download(target, socks_port, size)
+            up = measure_upload(target, socks_port, size)
+            p50, p95 = measure_small_requests(target, socks_port, count=requests)
+            return BenchResult(
+                **base,
+                download_mbs=round(down, 1), upload_mbs=round(up, 1),
+                connect_ms_p50=round(p50, 2), connect_ms_p95=round(p95, 2),
+                client_cpu_s=_cpu_delta(client_proc, client_cpu),
+                server_cpu_s=_cpu_delta(server_proc, server_cpu),
+            )
+    except (OSError, socks.ProxyError, ValueError) as e:
+        return BenchResult(**base, error=str(e) or type(e).__name__)
+    finally:
+        _stop(client_proc)
+        _stop(server_proc)
+        client_engine._cleanup_config()
+        if server_cfg:
+            try:
+                os.unlink(server_cfg)
+            except OSError:
+                pass
+
+
+def plan_cases(client_types, protocols, ciphers):
+    """Yield (client_type, protocol, cipher) combinations each client supports."""
+    for client_type in client_types:
+        for protocol in protocols:
+            if protocol not in CLIENT_PROTOCOLS.get(client_type, ()):
+                continue
+            if protocol == ProxyProtocol.SHADOWSOCKS:
+                for cipher in ciphers:
+                    yield client_type, protocol, cipher
+            else:
+                yield client_type, protocol, ""
+
+
+def run_benchmarks(client_types=None, protocols=None, ciphers=DEFAULT_CIPHERS,
+                   server_type=None, size=DEFAULT_BULK_MB * 1024 * 1024,
+                   requests=DEFAULT_SMALL_REQUESTS, progress=None) -> list[BenchResult]:
+    """Run the benchmark matrix over every installed engine."""
+    from .engine_manager import get_engine_classes
+    engines = {t: cls() for t, cls in get_engine_classes().items()}
+    installed = {t: e for t, e in engines.items() if e.find_binary()}
+
+    if server_type is None:
+        server_type = next((t for t in SERVER_ENGINES if t in installed), None)
+    if server_type not in installed or server_type not in _SERVER_CONFIGS:
+        raise RuntimeError("No installed engine can act as the benchmark server "
+                           "(sing-box or xray is required)")
+    server_engine = installed[server_type]
+
+    client_types = [t for t in (client_types or installed) if t in installed]
+    protocols = protocols or tuple(PROTOCOL_NAMES.values())
+    results = []
+    for client_type, protocol, cipher in plan_cases(client_types, protocols, ciphers):
+        result = run_case(installed[client_type], server_engine, protocol, cipher,
+                          size=size, requests=requests)
+        results.append(result)
+        if progress:
+            progress(result)
+    return results
+
+
+def format_table(results) -> str:
+    def cell(v):
+        return "-" if v is None else str(v)
+
+    headers = ("client", "server", "protocol", "cipher", "down MB/s", "up MB/s",
+               "conn p50 ms", "conn p95 ms", "client cpu s", "server cpu s")
+    rows = [headers]
+    for r in results:
+        if r.error:
+            rows.append((r.client, r.server, r.protocol, r.cipher or "-",
+                         f"error: {r.error}", "", "", "", "", ""))
+            continue
+        rows.append((r.client, r.server, r.protocol, r.cipher or "-",
+                     *map(cell, (r.download_mbs, r.upload_mbs, r.connect_ms_p50,
+                                 r.connect_ms_p95, r.client_cpu_s, r.server_cpu_s))))
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(headers))]
+    return "\n".join("  ".join(str(v).ljust(w) for v, w in zip(row, widths)).rstrip()
+                     for row in rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark Socksicle proxy engines over loopback (offline).")
+    parser.add_argument("--engines", default="",
+                        help="comma-separated client engines (default: all installed)")
+    parser.add_argument("--server", default="",
+                        help="server engine: sing-box or xray (default: first installed)")
+    parser.add_argument("--protocols", default=",".join(PROTOCOL_NAMES),
+                        help="comma-separated protocols: ss, vless, vmess")
+    parser.add_argument("--ciphers", default=",".join(DEFAULT_CIPHERS),
+                        help="comma-separated Shadowsocks ciphers")
+    parser.add_argument("--size-mb", type=int, default=DEFAULT_BULK_MB,
+                        help="bulk transfer size per direction")
+    parser.add_argument("--requests", type=int, default=DEFAULT_SMALL_REQUESTS,
+                        help="number of small request/response exchanges")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    def split(value):
+        return [v.strip() for v in value.split(",") if v.strip()]
+
+    try:
+        clients = [EngineType(v) for v in split(args.engines)] or None
+        server = EngineType(args.server) if args.server else None
+        protocols = [PROTOCOL_NAMES[v] for v in split(args.protocols)]
+    except (ValueError, KeyError) as e:
+        parser.error(f"unknown engine or protocol: {e}")
+
+    def progress(result):
+        if not args.json:
+            print(f"  {result.client} / {result.protocol} {result.cipher}".rstrip(),
+                  "failed" if result.error else "done", file=sys.stderr)
+
+    try:
+        results = run_benchmarks(clients, protocols, split(args.ciphers), server,
+                                 size=max(1, args.size_mb) * 1024 * 1024,
+                                 requests=max(1, args.requests), progress=progress)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps([r._asdict() for r in results], indent=2))
+    else:
+        print(format_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
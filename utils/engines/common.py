@@ -11,10 +11,12 @@ Range-based download, install location and platform specifics (``chmod``
 only off Windows, ``CREATE_NO_WINDOW`` on Windows).  Shared byte-copy and
 download helpers live here once instead of being duplicated per engine.
 """
+import functools
 import lzma
 import logging
 import os
 import platform
+import re
 import shutil
 import socket
 import subprocess
@@ -140,6 +142,44 @@ def _check_usable(path, display_name, version_arg=("version",),
         return CheckResult(False, f"Could not run {p.name}: {e}")
 
 
+_VERSION_RE = re.compile(r"v?(\d+)\.(\d+)(?:\.(\d+))?")
+
+
+def parse_version(text: str) -> tuple[int, int, int] | None:
+    """Extract the first dotted version number from text ('v1.11.8' -> (1, 11, 8))."""
+    if not text:
+        return None
+    m = _VERSION_RE.search(text)
+    if not m:
+        return None
+    return int(m.group(1)), int(m.group(2)), int(m.group(3) or 0)
+
+
+@functools.lru_cache(maxsize=16)
+def probe_version(path: str, version_arg: tuple = ("version",),
+                  mtime: float = 0.0) -> tuple[int, int, int] | None:
+    """Run the binary's version command and parse its version.
+
+    Cached per (path, args, mtime) so replacing the binary re-probes it.
+    """
+    try:
+        flags = CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        proc = subprocess.run(
+            [path, *version_arg],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=VERSION_ARG_TIMEOUT_S,
+            creationflags=flags,
+            text=True,
+            errors="replace",
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        log.debug("Version probe of %s failed: %s", path, e)
+        return None
+    return parse_version(proc.stdout or proc.stderr or "")
+
+
 def copy_stream(src, out, chunk_size: int = CHUNK_SIZE) -> int:
     """Copy src to out in bounded chunks; returns the number of bytes."""
     copied = 0
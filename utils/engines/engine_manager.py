@@ -16,6 +16,12 @@ log = logging.getLogger("engine.manager")
 _ENGINES: dict[EngineType, type[ProxyEngine]] = {}
 _INSTANCES: dict[EngineType, ProxyEngine] = {}
 
+# Settings value that lets the selector pick an engine per server.
+AUTO_ENGINE = "auto"
+# Engine used in auto mode before a server is chosen: the first installed
+# one able to serve every protocol.
+_AUTO_DEFAULTS = (EngineType.SINGBOX, EngineType.XRAY, EngineType.SSLOCAL)
+
 
 def register_engine(cls: type[ProxyEngine]):
     """Register an engine class. Call at import time."""
@@ -46,14 +52,27 @@ def get_engine(cls_or_type) -> ProxyEngine:
     return _INSTANCES[et]
 
 
-def get_current_engine(settings: dict) -> ProxyEngine:
-    """Get the engine instance for the currently selected engine type."""
-    engine_key = settings.get("engine", "sslocal")
+def is_auto(settings: dict) -> bool:
+    """True when the user lets Socksicle pick the engine per server."""
+    return settings.get("engine") == AUTO_ENGINE
+
+
+def resolve_engine_type(engine_key: str) -> EngineType:
+    """Map a settings engine value (including "auto") to a concrete type."""
+    if engine_key == AUTO_ENGINE:
+        for et in _AUTO_DEFAULTS:
+            if et in _ENGINES and get_engine(et).find_binary() is not None:
+                return et
+        return EngineType.SINGBOX
     try:
-        et = EngineType(engine_key)
+        return EngineType(engine_key)
     except ValueError:
-        et = EngineType.SSLOCAL
-    return get_engine(et)
+        return EngineType.SSLOCAL
+
+
+def get_current_engine(settings: dict) -> ProxyEngine:
+    """Get the engine instance for the currently selected engine type."""
+    return get_engine(resolve_engine_type(settings.get("engine", "sslocal")))
 
 
 def check_engine(engine_type: EngineType) -> CheckResult:
@@ -0,0 +1,247 @@
+"""Per-server engine selection for the "auto" engine setting.
+
+ConnectionManager records how each engine performed for each server:
+connect time (start to local proxy ready), active ping, measured
+throughput, and connect failures.  In auto mode the selector picks the
+engine for a server from the installed engines that support its protocol:
+
+1. engines never tried on this server are tried first, lightest first;
+2. afterwards the engine with the lowest cost wins, where
+   cost = ping + CONNECT_WEIGHT * connect time
+          + FAILURE_PENALTY_MS * failure rate
+          - THROUGHPUT_WEIGHT * throughput.
+
+Throughput samples only come from Hysteria 2 bandwidth calibration, which
+only sing-box runs, so the throughput term counts only when every engine
+being compared has a sample; one measured engine is not favoured over
+unmeasured ones.
+
+The winner is remembered per server and kept until new stats rank another
+engine below it.  Stats are keyed by a hash of ``Server.unique_key`` (which embeds
+the password) and kept in ``engine_stats.json`` in the config dir.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from ..platform_utils import get_config_dir
+from ..server_model import ProxyProtocol
+from .base import EngineType
+
+log = logging.getLogger("engine.selector")
+
+EWMA_ALPHA = 0.3
+CONNECT_WEIGHT = 0.5
+FAILURE_PENALTY_MS = 2000.0
+THROUGHPUT_WEIGHT = 0.5        # ms of cost removed per Mbps
+MAX_THROUGHPUT_CREDIT_MBPS = 500
+UNKNOWN_LATENCY_MS = 1000.0
+
+# Supported protocols per engine, listed lightest engine first.
+PROTOCOL_ENGINES = {
+    ProxyProtocol.SHADOWSOCKS: (EngineType.SSLOCAL, EngineType.SINGBOX, EngineType.XRAY),
+    ProxyProtocol.VLESS: (EngineType.XRAY, EngineType.SINGBOX),
+    ProxyProtocol.VMESS: (EngineType.XRAY, EngineType.SINGBOX),
+    ProxyProtocol.HYSTERIA2: (EngineType.SINGBOX,),
+}
+# xray's shadowsocks outbound has no SIP003 plugin support.
+_PLUGIN_ENGINES = (EngineType.SSLOCAL, EngineType.SINGBOX)
+
+
+def _stats_path():
+    return get_config_dir() / "engine_stats.json"
+
+
+def server_id(server) -> str:
+    return hashlib.sha256(server.unique_key.encode("utf-8")).hexdigest()[:16]
+
+
+def _ewma(old, value):
+    if old is None:
+        return float(value)
+    return (1 - EWMA_ALPHA) * old + EWMA_ALPHA * float(value)
+
+
+def supported_engines(server, tun_mode=False) -> tuple[EngineType, ...]:
+    """Engines able to connect *server*, in preference order."""
+    if tun_mode:
+        return (EngineType.SINGBOX,)
+    protocol = getattr(server, "protocol", ProxyProtocol.SHADOWSOCKS)
+    engines = PROTOCOL_ENGINES.get(protocol, (EngineType.SINGBOX,))
+    if protocol == ProxyProtocol.SHADOWSOCKS and getattr(server, "plugin", ""):
+        engines = tuple(e for e in engines if e in _PLUGIN_ENGINES)
+    return engines
+
+
+def engine_cost(stats: dict, throughput: bool = True) -> float:
+    connect = stats.get("connect_ms")
+    ping = stats.get("ping_ms")
+    latency = ping if ping is not None else connect if connect is not None else UNKNOWN_LATENCY_MS
+    cost = latency + CONNECT_WEIGHT * (connect if connect is not None else UNKNOWN_LATENCY_MS)
+    attempts = stats.get("ok", 0) + stats.get("fail", 0)
+    if attempts:
+        cost += FAILURE_PENALTY_MS * stats.get("fail", 0) / attempts
+    mbps = stats.get("mbps")
+    if mbps and throughput:
+        cost -= THROUGHPUT_WEIGHT * min(mbps, MAX_THROUGHPUT_CREDIT_MBPS)
+    return cost
+
+
+def _cheapest(stats: dict, engines) -> str:
+    """The engine in *engines* (values) with the lowest cost in *stats*."""
+    measured = all(stats[e].get("mbps") for e in engines)
+    return min(engines, key=lambda e: engine_cost(stats[e], throughput=measured))
+
+
+class EngineSelector:
+    """Records per-server engine stats and picks the best engine."""
+
+    def __init__(self, path=None, installed=None):
+        self._path = path
+        self._installed = installed      # callable(EngineType) -> bool, for tests
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, dict]] = {}
+        self._winners: dict[str, str] = {}
+        self._loaded = False
+        self._dirty = False
+
+    # --- persistence ---
+
+    def _file(self):
+        return self._path or _stats_path()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self._file(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable engine stats: %s", e)
+            return
+        if isinstance(data, dict):
+            self._stats = {k: v for k, v in data.get("stats", {}).items() if isinstance(v, dict)}
+            self._winners = {k: v for k, v in data.get("winners", {}).items() if isinstance(v, str)}
+
+    def save(self):
+        """Write the stats file if anything changed since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {"stats": self._stats, "winners": self._winners}
+            self._dirty = False
+        path = self._file()
+        try:
+            with tempfile.NamedTemporaryFile(
+                    mode="w", dir=str(path.parent), delete=False,
+                    encoding="utf-8", suffix=".tmp") as f:
+                json.dump(payload, f)
+                tmp_name = f.name
+            os.replace(tmp_name, str(path))
+        except OSError as e:
+            log.warning("Failed to save engine stats: %s", e)
+
+    # --- recording ---
+
+    def _entry(self, sid, engine_type) -> dict:
+        self._ensure_loaded()
+        self._dirty = True
+        per_server = self._stats.setdefault(sid, {})
+        return per_server.setdefault(EngineType(engine_type).value, {"ok": 0, "fail": 0})
+
+    def _rerank(self, sid):
+        """Replace the remembered winner only if new stats rank another engine lower."""
+        winner = self._winners.get(sid)
+        stats = self._stats.get(sid, {})
+        if winner is None or winner not in stats:
+            return
+        best = _cheapest(stats, list(stats))
+        if best != winner:
+            self._winners[sid] = best
+
+    def record_connect(self, server, engine_type, ms):
+        sid = server_id(server)
+        with self._lock:
+            entry = self._entry(sid, engine_type)
+            entry["ok"] += 1
+            entry["connect_ms"] = _ewma(entry.get("connect_ms"), ms)
+            self._rerank(sid)
+
+    def record_failure(self, server, engine_type):
+        sid = server_id(server)
+        with self._lock:
+            self._entry(sid, engine_type)["fail"] += 1
+            self._rerank(sid)
+
+    def record_ping(self, server, engine_type, ms):
+        sid = server_id(server)
+        with self._lock:
+            entry = self._entry(sid, engine_type)
+            entry["ping_ms"] = _ewma(entry.get("ping_ms"), ms)
+            self._rerank(sid)
+
+    def record_throughput(self, server, engine_type, mbps):
+        sid = server_id(server)
+        with self._lock:
+            entry = self._entry(sid, engine_type)
+            entry["mbps"] = _ewma(entry.get("mbps"), mbps)
+            self._rerank(sid)
+
+    def stats_for(self, server) -> dict:
+        with self._lock:
+            self._ensure_loaded()
+            return {k: dict(v) for k, v in self._stats.get(server_id(server), {}).items()}
+
+    # --- selection ---
+
+    def _is_installed(self, engine_type) -> bool:
+        if self._installed is not None:
+            return self._installed(engine_type)
+        from .engine_manager import get_engine
+        return get_engine(engine_type).find_binary() is not None
+
+    def winner(self, server) -> EngineType | None:
+        with self._lock:
+            self._ensure_loaded()
+            value = self._winners.get(server_id(server))
+        return EngineType(value) if value else None
+
+    def choose(self, server, tun_mode=False) -> EngineType:
+        """Pick the engine to connect *server* with."""
+        supported = supported_engines(server, tun_mode)
+        candidates = [e for e in supported if self._is_installed(e)] or list(supported)
+        if len(candidates) == 1:
+            return candidates[0]
+        sid = server_id(server)
+        with self._lock:
+            self._ensure_loaded()
+            remembered = self._winners.get(sid)
+            if remembered in (c.value for c in candidates):
+                return EngineType(remembered)
+            stats = self._stats.get(sid, {})
+            untried = [c for c in candidates
+                       if not stats.get(c.value, {}).get("ok") and not stats.get(c.value, {}).get("fail")]
+            if untried:
+                return untried[0]
+            best = EngineType(_cheapest(stats, [c.value for c in candidates]))
+            self._winners[sid] = best.value
+            self._dirty = True
+        log.info("Auto engine for %s: %s", getattr(server, "name", "server"), best.value)
+        return best
+
+
+_SELECTOR: EngineSelector | None = None
+
+
+def get_selector() -> EngineSelector:
+    """Process-wide selector instance."""
+    global _SELECTOR
+    if _SELECTOR is None:
+        _SELECTOR = EngineSelector()
+    return _SELECTOR
@@ -12,7 +12,7 @@ from pathlib import Path
 
 from ..server_model import ProxyProtocol
 from .base import ProxyEngine, EngineType
-from . import common
+from . import common, tuning
 
 log = logging.getLogger("engine.singbox")
 
@@ -305,7 +305,8 @@ def _build_singbox_dns_server(dns_target: str, tag="remote-dns", detour="proxy")
         }
 
 
-def _generate_config(server, local_port, tun_mode=False, custom_dns=None) -> dict:
+def _generate_config(server, local_port, tun_mode=False, custom_dns=None,
+                     mux_defaults=None, perf=None) -> dict:
     """Generate sing-box JSON config for a single server."""
     protocol = getattr(server, "protocol", ProxyProtocol.SHADOWSOCKS)
 
@@ -313,6 +314,10 @@ def _generate_config(server, local_port, tun_mode=False, custom_dns=None) -> dic
     if builder is None:
         raise ValueError(f"sing-box engine does not support protocol: {protocol}")
     outbound = builder(server)
+    multiplex = tuning.singbox_multiplex(server, tuning.resolve_mux(server, mux_defaults))
+    if multiplex:
+        outbound["multiplex"] = multiplex
+    outbound.update(tuning.singbox_dial_fields(perf, protocol))
 
     server_host = getattr(server, "host", "") or ""
     server_rule = None
@@ -355,7 +360,7 @@ def _generate_config(server, local_port, tun_mode=False, custom_dns=None) -> dic
                 "::/1",
                 "8000::/1",
             ],
-            "stack": "mixed",
+            **tuning.singbox_tun_fields(perf),
             "endpoint_independent_nat": True,
         }
         if server_ip_cidr:
@@ -477,6 +482,8 @@ class SingBoxEngine(ProxyEngine):
         super().__init__()
         self.tun_mode = False
         self.custom_dns = None
+        self.mux_defaults = None
+        self.perf_options = None
 
     def _clean_stale_tun_adapter(self):
         """Clean any stale Wintun/socksicle network adapter on Windows."""
@@ -530,11 +537,22 @@ class SingBoxEngine(ProxyEngine):
         return _install(progress_cb=progress_cb)
 
     def build_config(self, server):
-        return _generate_config(server, self.local_port, tun_mode=self.tun_mode, custom_dns=self.custom_dns)
+        version = None
+        # Probing runs the binary, so only do it when something needs checking.
+        if tuning.perf_customized(self.perf_options):
+            version = self.version_or_pinned()
+        perf = tuning.validate_perf_options(self.engine_type.value, version, self.perf_options)
+        return _generate_config(server, self.local_port, tun_mode=self.tun_mode,
+                                custom_dns=self.custom_dns, mux_defaults=self.mux_defaults,
+                                perf=perf)
 
     def build_args(self, server):
         return super().build_args(server, ["run", "-c"], "singbox-")
 
+    def version_or_pinned(self):
+        """Installed sing-box version, or the pinned one when it cannot be probed."""
+        return self.detected_version() or common.parse_version(SINGBOX_VERSION)
+
     def version_args(self):
         return ["version"]
 
@@ -0,0 +1,260 @@
+"""Transport tuning shared by the xray and sing-box config generators.
+
+Connection multiplexing is configured at two levels: global defaults from
+the settings dict, and per-server values stored on :class:`Server` (usually
+parsed from the share link).  An empty per-server value means "inherit the
+global default"; ``"off"`` disables multiplexing for that server even when
+it is enabled globally.
+
+sing-box supports the smux / yamux / h2mux protocols with optional padding
+and TCP Brutal congestion control.  xray only has its own Mux.cool (plus
+XUDP for UDP), so any enabled protocol maps to a plain ``mux`` block there.
+
+Dial-level performance options (TCP Fast Open, Multipath TCP, UDP
+fragmentation, TCP congestion control) and TUN inbound options (stack, MTU,
+GSO) come from the "performance" settings and are validated against the
+detected engine version before they are written into a config.
+"""
+import logging
+import sys
+from typing import NamedTuple
+
+from ..server_model import ProxyProtocol
+from ..link_parser import MUX_OFF, normalize_mux_protocol
+
+log = logging.getLogger("engine.tuning")
+
+DEFAULT_MUX_CONCURRENCY = 8
+DEFAULT_XUDP_CONCURRENCY = 16
+
+# Hysteria 2 runs over QUIC, which already multiplexes streams.
+MUX_CAPABLE_PROTOCOLS = (
+    ProxyProtocol.SHADOWSOCKS,
+    ProxyProtocol.VLESS,
+    ProxyProtocol.VMESS,
+)
+
+
+class MuxOptions(NamedTuple):
+    protocol: str = ""          # "" when multiplexing is disabled
+    concurrency: int = DEFAULT_MUX_CONCURRENCY
+    padding: bool = False
+    brutal: bool = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.protocol)
+
+
+def _as_int(value, default=0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def mux_defaults_from_settings(settings: dict | None) -> dict:
+    """Extract the global multiplex defaults from the app settings dict."""
+    settings = settings or {}
+    return {
+        "mux": normalize_mux_protocol(settings.get("mux", MUX_OFF)) or MUX_OFF,
+        "mux_concurrency": _as_int(settings.get("mux_concurrency", 0)),
+        "mux_padding": bool(settings.get("mux_padding", False)),
+    }
+
+
+def resolve_mux(server, defaults: dict | None = None) -> MuxOptions:
+    """Combine per-server mux fields with the global defaults."""
+    defaults = defaults or {}
+    protocol = getattr(server, "protocol", ProxyProtocol.SHADOWSOCKS)
+    if protocol not in MUX_CAPABLE_PROTOCOLS:
+        return MuxOptions()
+
+    chosen = normalize_mux_protocol(getattr(server, "mux", ""))
+    if not chosen:
+        chosen = normalize_mux_protocol(defaults.get("mux", MUX_OFF))
+    if not chosen or chosen == MUX_OFF:
+        return MuxOptions()
+
+    concurrency = _as_int(getattr(server, "mux_concurrency", 0)) \
+        or _as_int(defaults.get("mux_concurrency", 0)) \
+        or DEFAULT_MUX_CONCURRENCY
+    padding = bool(getattr(server, "mux_padding", False)
+                   or defaults.get("mux_padding", False))
+    return MuxOptions(
+        protocol=chosen,
+        concurrency=max(1, concurrency),
+        padding=padding,
+        brutal=bool(getattr(server, "mux_brutal", False)),
+    )
+
+
+def singbox_multiplex(server, opts: MuxOptions) -> dict | None:
+    """Build a sing-box outbound ``multiplex`` block, or None when disabled."""
+    if not opts.enabled:
+        return None
+    # XTLS Vision splices the raw TLS stream and cannot run inside a mux.
+    if getattr(server, "flow", ""):
+        return None
+    multiplex: dict = {
+        "enabled": True,
+        "protocol": opts.protocol,
+        "max_streams": opts.concurrency,
+    }
+    if opts.padding:
+        multiplex["padding"] = True
+    up = _as_int(getattr(server, "up_mbps", 0))
+    down = _as_int(getattr(server, "down_mbps", 0))
+    if opts.brutal and up > 0 and down > 0:
+        multiplex["brutal"] = {"enabled": True, "up_mbps": up, "down_mbps": down}
+    return multiplex
+
+
+def xray_mux(server, opts: MuxOptions) -> dict | None:
+    """Build an xray outbound ``mux`` block, or None when disabled."""
+    if not opts.enabled:
+        return None
+    mux = {
+        "enabled": True,
+        "concurrency": opts.concurrency,
+        "xudpConcurrency": DEFAULT_XUDP_CONCURRENCY,
+        "xudpProxyUDP443": "reject",
+    }
+    # Vision flows must not be muxed; -1 keeps TCP direct and XUDP only.
+    if getattr(server, "flow", ""):
+        mux["concurrency"] = -1
+    return mux
+
+
+# --- Dial-level performance options ---
+
+TUN_STACKS = ("mixed", "system", "gvisor")
+TCP_CONGESTION_CHOICES = ("", "bbr", "cubic", "reno")
+DEFAULT_TUN_MTU = 9000
+MIN_TUN_MTU = 1280       # IPv6 minimum; the TUN inbound carries an IPv6 address
+MAX_TUN_MTU = 65535
+
+PERF_DEFAULTS = {
+    "tcp_fast_open": False,
+    "tcp_multi_path": False,
+    "udp_fragment": False,
+    "tcp_congestion": "",
+    "tun_stack": "mixed",
+    "tun_mtu": DEFAULT_TUN_MTU,
+    "tun_gso": False,
+}
+
+# option -> (first version that supports it, first version that dropped it)
+_SINGBOX_SUPPORT = {
+    "tcp_multi_path": ((1, 5, 0), None),
+    "tun_gso": ((1, 8, 0), (1, 11, 0)),
+}
+_XRAY_SUPPORT = {
+    "tcp_multi_path": ((1, 8, 6), None),
+    "tcp_congestion": ((1, 8, 0), None),
+}
+# Options that only one engine understands are dropped silently for the other.
+_SINGBOX_ONLY = ("udp_fragment", "tun_stack", "tun_mtu", "tun_gso")
+_XRAY_ONLY = ("tcp_congestion",)
+
+
+def perf_options_from_settings(settings: dict | None) -> dict:
+    """Extract and sanitize the performance section of the settings dict."""
+    settings = settings or {}
+    opts = dict(PERF_DEFAULTS)
+    for key in ("tcp_fast_open", "tcp_multi_path", "udp_fragment", "tun_gso"):
+        opts[key] = bool(settings.get(key, PERF_DEFAULTS[key]))
+    congestion = str(settings.get("tcp_congestion", "") or "").strip().lower()
+    opts["tcp_congestion"] = congestion if congestion in TCP_CONGESTION_CHOICES else ""
+    stack = str(settings.get("tun_stack", "mixed") or "mixed").strip().lower()
+    opts["tun_stack"] = stack if stack in TUN_STACKS else "mixed"
+    mtu = _as_int(settings.get("tun_mtu", DEFAULT_TUN_MTU), DEFAULT_TUN_MTU)
+    opts["tun_mtu"] = min(MAX_TUN_MTU, max(MIN_TUN_MTU, mtu))
+    return opts
+
+
+def perf_customized(opts: dict | None) -> bool:
+    """True when any performance option differs from its default."""
+    return any((opts or {}).get(k, v) != v for k, v in PERF_DEFAULTS.items())
+
+
+def _supported(table, key, version) -> bool:
+    if key not in table or version is None:
+        return True
+    since, until = table[key]
+    if version < since:
+        return False
+    return until is None or version < until
+
+
+def tun_gso_available(version) -> bool:
+    """True when sing-box *version* (a parsed tuple) can use TUN GSO on this platform."""
+    return sys.platform.startswith("linux") and _supported(_SINGBOX_SUPPORT, "tun_gso", version)
+
+
+def validate_perf_options(engine_type, version, opts: dict | None) -> dict:
+    """Reset options the given engine/version cannot honour to their defaults.
+
+    *engine_type* is the engine name ('sing-box' / 'xray'); *version* is a
+    parsed version tuple, or None to skip version checks.
+    """
+    out = dict(PERF_DEFAULTS)
+    out.update(opts or {})
+    if engine_type == "sing-box":
+        table, foreign = _SINGBOX_SUPPORT, _XRAY_ONLY
+    elif engine_type == "xray":
+        table, foreign = _XRAY_SUPPORT, _SINGBOX_ONLY
+    else:
+        return dict(PERF_DEFAULTS)
+    for key in foreign:
+        out[key] = PERF_DEFAULTS[key]
+    for key in PERF_DEFAULTS:
+        if out[key] == PERF_DEFAULTS[key]:
+            continue
+        if not _supported(table, key, version):
+            log.warning("%s %s does not support %s; option ignored",
+                        engine_type, ".".join(map(str, version)), key)
+            out[key] = PERF_DEFAULTS[key]
+    if out["tun_gso"] and not sys.platform.startswith("linux"):
+        log.info("TUN GSO is only available on Linux; option ignored")
+        out["tun_gso"] = False
+    return out
+
+
+def singbox_dial_fields(opts: dict | None, protocol=None) -> dict:
+    """Dial fields for a sing-box outbound (TCP options skipped for QUIC)."""
+    opts = opts or PERF_DEFAULTS
+    fields = {}
+    if protocol != ProxyProtocol.HYSTERIA2:
+        if opts.get("tcp_fast_open"):
+            fields["tcp_fast_open"] = True
+        if opts.get("tcp_multi_path"):
+            fields["tcp_multi_path"] = True
+    if opts.get("udp_fragment"):
+        fields["udp_fragment"] = True
+    return fields
+
+
+def singbox_tun_fields(opts: dict | None) -> dict:
+    """stack / mtu / gso fields for the sing-box TUN inbound."""
+    opts = opts or PERF_DEFAULTS
+    fields = {
+        "stack": opts.get("tun_stack") or "mixed",
+        "mtu": int(opts.get("tun_mtu") or DEFAULT_TUN_MTU),
+    }
+    if opts.get("tun_gso"):
+        fields["gso"] = True
+    return fields
+
+
+def xray_sockopt(opts: dict | None) -> dict:
+    """streamSettings.sockopt for an xray outbound."""
+    opts = opts or PERF_DEFAULTS
+    sockopt = {}
+    if opts.get("tcp_fast_open"):
+        sockopt["tcpFastOpen"] = True
+    if opts.get("tcp_multi_path"):
+        sockopt["tcpMptcp"] = True
+    if opts.get("tcp_congestion"):
+        sockopt["tcpcongestion"] = opts["tcp_congestion"]
+    return sockopt
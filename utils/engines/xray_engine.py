@@ -7,7 +7,7 @@ from pathlib import Path
 
 from ..server_model import ProxyProtocol
 from .base import ProxyEngine, EngineType
-from . import common
+from . import common, tuning
 
 log = logging.getLogger("engine.xray")
 
@@ -194,13 +194,20 @@ _XRAY_OUTBOUND_BUILDERS = {
 }
 
 
-def _generate_config(server, local_port, custom_dns=None) -> dict:
+def _generate_config(server, local_port, custom_dns=None, mux_defaults=None,
+                     perf=None) -> dict:
     """Generate xray JSON config for a single proxy server."""
     protocol = getattr(server, 'protocol', ProxyProtocol.SHADOWSOCKS)
     builder = _XRAY_OUTBOUND_BUILDERS.get(protocol)
     if builder is None:
         raise ValueError(f"Xray engine does not support protocol: {protocol}")
     outbound = builder(server)
+    mux = tuning.xray_mux(server, tuning.resolve_mux(server, mux_defaults))
+    if mux:
+        outbound["mux"] = mux
+    sockopt = tuning.xray_sockopt(perf)
+    if sockopt:
+        outbound.setdefault("streamSettings", {"network": "tcp"})["sockopt"] = sockopt
 
     cfg = {
         "log": {"loglevel": "warning"},
@@ -248,6 +255,8 @@ class XrayEngine(ProxyEngine):
     def __init__(self):
         super().__init__()
         self.custom_dns = None
+        self.mux_defaults = None
+        self.perf_options = None
 
     def find_binary(self):
         return _find_binary()
@@ -259,7 +268,13 @@ class XrayEngine(ProxyEngine):
         return _install(progress_cb=progress_cb)
 
     def build_config(self, server):
-        return _generate_config(server, self.local_port, custom_dns=self.custom_dns)
+        version = None
+        # Probing runs the binary, so only do it when something needs checking.
+        if tuning.perf_customized(self.perf_options):
+            version = self.detected_version() or common.parse_version(XRAY_VERSION)
+        perf = tuning.validate_perf_options(self.engine_type.value, version, self.perf_options)
+        return _generate_config(server, self.local_port, custom_dns=self.custom_dns,
+                                mux_defaults=self.mux_defaults, perf=perf)
 
     def build_args(self, server):
         return super().build_args(server, ["run", "-c"], "xray-")
@@ -0,0 +1,43 @@
+"""Run Python's cyclic garbage collector on the GUI thread only.
+
+Automatic collection runs on whichever thread happens to allocate when a
+generation overflows.  When that is a QThreadPool worker, a subscription
+refresh thread or a persistence writer, widgets left in reference cycles are
+deleted there, and Qt crashes.  ``GuiThreadCollector`` turns automatic
+collection off and instead checks the generation counts from a QTimer on the
+GUI thread, collecting the same generations the interpreter would have.
+"""
+import gc
+
+from PySide6.QtCore import QObject, QTimer
+
+COLLECT_INTERVAL_MS = 1000
+
+
+class GuiThreadCollector(QObject):
+    """Replaces automatic garbage collection while it is running."""
+
+    def __init__(self, parent=None, interval_ms: int = COLLECT_INTERVAL_MS):
+        super().__init__(parent)
+        self._thresholds = gc.get_threshold()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.check)
+        gc.disable()
+        self._timer.start(interval_ms)
+
+    def check(self):
+        """Collect each generation whose count is over its threshold."""
+        counts = gc.get_count()
+        generation = -1
+        for gen, (count, threshold) in enumerate(zip(counts, self._thresholds)):
+            if count <= threshold:
+                break
+            generation = gen
+        if generation >= 0:
+            gc.collect(generation)
+
+    def stop(self):
+        """Collect what is pending on this thread, then hand collection back."""
+        self._timer.stop()
+        gc.collect()
+        gc.enable()
@@ -0,0 +1,36 @@
+"""JSON encode/decode for the config files, using orjson when installed.
+
+Both helpers work on UTF-8 bytes and produce the same data as the stdlib
+``json`` module; orjson (``pip install socksicle[orjson]``) only makes them
+faster.  Anything orjson refuses (ints beyond 64 bits, invalid UTF-8) is
+handed to ``json`` instead, so the output never depends on it being present.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    """Serialize *obj* to UTF-8 JSON bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+    return json.dumps(obj).encode("utf-8")
+
+
+def loads(data: bytes):
+    """Parse UTF-8 JSON bytes; undecodable bytes are replaced, as on read.
+
+    Raises json.JSONDecodeError (a ValueError) on malformed JSON.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data.decode("utf-8", errors="replace"))
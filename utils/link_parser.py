@@ -43,6 +43,70 @@ def parse_links_from_text(text):
     return links
 
 
+MUX_OFF = "off"
+MUX_PROTOCOLS = ("smux", "yamux", "h2mux")
+DEFAULT_MUX_PROTOCOL = "h2mux"
+_MUX_TRUE = ("1", "true", "yes", "on")
+_MUX_FALSE = ("0", "false", "no", MUX_OFF, "none", "disabled")
+
+
+def normalize_mux_protocol(value) -> str:
+    """Map a link/settings mux value to '', 'off' or a multiplex protocol.
+
+    '' means "not specified" (inherit the global default), 'off' explicitly
+    disables, and boolean-ish truthy values select the default protocol.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return DEFAULT_MUX_PROTOCOL if value else MUX_OFF
+    v = str(value).strip().lower()
+    if v in MUX_PROTOCOLS:
+        return v
+    if v in _MUX_TRUE:
+        return DEFAULT_MUX_PROTOCOL
+    if v in _MUX_FALSE:
+        return MUX_OFF
+    return ""
+
+
+def _flag(value) -> bool:
+    return str(value).strip().lower() in _MUX_TRUE
+
+
+def _mux_fields(get) -> dict:
+    """Extract multiplex hints from link parameters into Server field values.
+
+    *get* maps a parameter name to its string value ('' when absent).
+    Accepts the common spellings used by v2rayN / NekoBox / sing-box links.
+    """
+    fields = {}
+    mux = normalize_mux_protocol(get('mux') or get('multiplex'))
+    if mux:
+        fields['mux'] = mux
+    concurrency = (get('mux_concurrency') or get('muxConcurrency')
+                   or get('max_streams') or get('concurrency'))
+    try:
+        if concurrency:
+            fields['mux_concurrency'] = int(concurrency)
+    except (TypeError, ValueError):
+        pass
+    if _flag(get('mux_padding') or get('padding')):
+        fields['mux_padding'] = True
+    if _flag(get('brutal')):
+        fields['mux_brutal'] = True
+    return fields
+
+
+def mux_fields_from_link(raw_link) -> dict:
+    """Extract multiplex hints from the query string of a URL-style link."""
+    payload = raw_link.split('#', 1)[0]
+    if '?' not in payload:
+        return {}
+    params = parse_qs(payload.split('?', 1)[1], keep_blank_values=True)
+    return _mux_fields(lambda key: params.get(key, [''])[0])
+
+
 _MBPS_RE = re.compile(r'(?i)(mbps|mb/s|m|kbps|k).*')
 
 
@@ -223,6 +287,7 @@ def _parse_vless(raw_link, default_name="Server"):
             path=path,
             host_header=host_header,
             is_private=is_priv,
+            **_mux_fields(_param),
         )
     except (ValueError, IndexError) as e:
         log.debug("VLESS link parse failed: %s", e)
@@ -272,6 +337,7 @@ def _parse_vmess(raw_link, default_name="Server"):
             path=path,
             host_header=host_header,
             is_private=is_priv,
+            **_mux_fields(lambda key: str(data.get(key, '') or '')),
         )
     except (json.JSONDecodeError, ValueError, KeyError) as e:
         log.debug("VMess link parse failed: %s", e)
@@ -0,0 +1,76 @@
+"""Memory benchmark for Server objects, measured with tracemalloc.
+
+Builds the servers of a synthetic subscription (``parse_bench.make_links``)
+the way they are held after a restart: stored dicts read back from JSON and
+turned into Servers with ``Server.from_dict``.  Per size it reports:
+
+- ``kb``: memory still allocated once the stored dicts are dropped;
+- ``bytes_per_server``: the same, per server;
+- ``load_s``: time spent in from_dict.
+
+Run with::
+
+    python -m utils.memory_bench [--sizes 1000,10000,50000] [--json]
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from .parse_bench import make_links
+from .server_model import Server
+
+DEFAULT_SIZES = (1_000, 10_000, 50_000)
+
+
+def measure(size):
+    """Return the result dict for *size* servers."""
+    stored = json.dumps([s.to_dict() for s in Server.from_links(make_links(size), workers=1)])
+    gc.collect()
+    tracemalloc.start()
+    try:
+        dicts = json.loads(stored)
+        start = time.perf_counter()
+        servers = [Server.from_dict(d) for d in dicts]
+        load = time.perf_counter() - start
+        del dicts
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del servers
+    return {"servers": size, "kb": round(used / 1024, 1),
+            "bytes_per_server": round(used / size), "load_s": round(load, 3)}
+
+
+def run(sizes=DEFAULT_SIZES):
+    """Return one result dict per size."""
+    return [measure(size) for size in sizes]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure memory held by loaded Server objects.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated server counts")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+    try:
+        sizes = [int(v) for v in args.sizes.split(",") if v.strip()]
+    except ValueError as e:
+        parser.error(f"bad size: {e}")
+    results = run(sizes)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    headers = ("servers", "kb", "bytes_per_server", "load_s")
+    rows = [headers] + [tuple(r[h] for h in headers) for r in results]
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(headers))]
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)).rstrip())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Benchmark for bulk link parsing (Server.from_links).
+
+Generates a synthetic subscription that mixes ss://, vless://, vmess:// and
+hysteria2:// links and times, per size:
+
+- ``serial``: cold cache, parsed in-thread;
+- ``parallel``: cold cache, parsed on the process pool;
+- ``cached``: the same list again with a warm link cache;
+
+and which of the two ``Server.from_links`` picks by default on this machine
+(``default``: see ``parse_workers`` and ``PARALLEL_PARSE_THRESHOLD``).  The
+pool is timed even where it would not be used, so its start-up cost shows.
+
+Run with::
+
+    python -m utils.parse_bench [--sizes 1000,10000,100000] [--workers N] [--json]
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+from .server_model import (MAX_PARSE_WORKERS, PARALLEL_PARSE_THRESHOLD, Server,
+                           clear_link_cache, parse_workers)
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def make_links(count):
+    """Return *count* distinct links, an even mix of the supported schemes."""
+    links = []
+    for i in range(count):
+        host = f"10{i % 9}.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"
+        kind = i % 4
+        if kind == 0:
+            userinfo = _b64(f"chacha20-ietf-poly1305:pass{i}".encode())
+            links.append(f"ss://{userinfo}@{host}:8388#SS%20{i}")
+        elif kind == 1:
+            links.append(f"vless://uuid-{i}@{host}:443?security=reality&type=tcp"
+                         f"&sni=example.com&fp=chrome&pbk=KEY{i}&sid=ab"
+                         f"&flow=xtls-rprx-vision#VLESS%20{i}")
+        elif kind == 2:
+            obj = {"v": "2", "ps": f"VMess {i}", "add": host, "port": "443",
+                   "id": f"uuid-{i}", "aid": "0", "scy": "auto", "net": "ws",
+                   "path": "/ws", "host": "example.com", "tls": "tls"}
+            links.append("vmess://" + _b64(json.dumps(obj).encode()))
+        else:
+            links.append(f"hysteria2://pw{i}@{host}:443?sni=example.com"
+                         f"&obfs=salamander&obfs-password=o{i}#HY2%20{i}")
+    return links
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(sizes=DEFAULT_SIZES, workers=None):
+    """Return one result dict per size with serial/parallel/cached seconds."""
+    if workers is None:
+        workers = max(2, min(os.cpu_count() or 1, MAX_PARSE_WORKERS))
+    pool_default = parse_workers() > 1
+    results = []
+    for size in sizes:
+        links = make_links(size)
+        clear_link_cache()
+        serial = _timed(lambda: Server.from_links(links, workers=1))
+        clear_link_cache()
+        parallel = _timed(lambda: Server.from_links(links, workers=workers, threshold=0))
+        cached = _timed(lambda: Server.from_links(links))
+        default = "parallel" if pool_default and size >= PARALLEL_PARSE_THRESHOLD else "serial"
+        results.append({"links": size, "workers": workers, "serial_s": round(serial, 3),
+                        "parallel_s": round(parallel, 3), "cached_s": round(cached, 3),
+                        "default": default})
+    clear_link_cache()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark bulk subscription link parsing.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated link counts")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="process pool size (default: CPU count, capped, at least 2)")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+    try:
+        sizes = [int(v) for v in args.sizes.split(",") if v.strip()]
+    except ValueError as e:
+        parser.error(f"bad size: {e}")
+    results = run(sizes, args.workers)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    headers = ("links", "workers", "serial_s", "parallel_s", "cached_s", "default")
+    rows = [headers] + [tuple(r[h] for h in headers) for r in results]
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(headers))]
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)).rstrip())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
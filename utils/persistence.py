@@ -0,0 +1,146 @@
+"""Debounced background persistence for the config stores.
+
+Managers call ``get_persistence().mark_dirty(name, write)`` instead of writing
+right away.  The write runs on a single writer thread once the store has been
+quiet for ``SAVE_DEBOUNCE_S`` (and never later than ``SAVE_MAX_DELAY_S`` after
+the first request), so a burst of saves costs one serialize + seal + write.
+``write`` should snapshot the store itself, so it always writes current state.
+"""
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from . import twinsock
+
+log = logging.getLogger(__name__)
+
+SAVE_DEBOUNCE_S = 0.5
+SAVE_MAX_DELAY_S = 3.0
+
+
+@contextlib.contextmanager
+def atomic_open(path):
+    """Binary file that replaces *path* when the block exits without error.
+
+    It is a temp file in the same directory until then, so readers never
+    see a partly written *path*.
+    """
+    path = str(path)
+    tmp_name = None
+    try:
+        with tempfile.NamedTemporaryFile(
+                mode='wb', dir=os.path.dirname(path) or '.', delete=False, suffix='.tmp') as f:
+            tmp_name = f.name
+            yield f
+        os.replace(tmp_name, path)
+    except BaseException:
+        if tmp_name:
+            try:
+                os.remove(tmp_name)
+            except OSError:
+                pass
+        raise
+
+
+def atomic_write(path, data: bytes):
+    """Replace *path* with *data* via a temp file in the same directory."""
+    with atomic_open(path) as f:
+        f.write(data)
+
+
+class PersistenceService:
+    """Coalesces store writes and runs them on one daemon thread.
+
+    With *debounce* <= 0, or after close(), mark_dirty writes at once on the
+    caller's thread.
+    """
+
+    def __init__(self, debounce: float = SAVE_DEBOUNCE_S, max_delay: float = SAVE_MAX_DELAY_S):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._dirty = {}  # name -> (write, first_request, due)
+        # Held while writing, so flush() also waits for a write in progress.
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def mark_dirty(self, name: str, write):
+        """Schedule write() for store *name*, replacing any pending write of it."""
+        now = time.monotonic()
+        with self._cond:
+            if not (self._closed or self.debounce <= 0):
+                entry = self._dirty.get(name)
+                first = entry[1] if entry else now
+                self._dirty[name] = (write, first, min(now + self.debounce, first + self.max_delay))
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._loop, name="persistence", daemon=True)
+                    self._thread.start()
+                self._cond.notify()
+                return
+            self._dirty.pop(name, None)
+        self._run({name: write})
+
+    def pending(self) -> set[str]:
+        """Names of the stores waiting to be written."""
+        with self._cond:
+            return set(self._dirty)
+
+    def flush(self, name: str | None = None):
+        """Write pending stores (all, or only *name*) now on the caller's thread."""
+        with self._cond:
+            names = list(self._dirty) if name is None else [n for n in (name,) if n in self._dirty]
+            jobs = {n: self._dirty.pop(n)[0] for n in names}
+        self._run(jobs)
+
+    def close(self, timeout: float = 5.0):
+        """Flush everything and stop the writer thread; later saves write at once."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        self.flush()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _next_jobs(self):
+        """Block until some stores are due; None once closed."""
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                due = [n for n, (_, _, at) in self._dirty.items() if at <= now]
+                if due:
+                    return {n: self._dirty.pop(n)[0] for n in due}
+                wait = min((at for _, _, at in self._dirty.values()), default=None)
+                self._cond.wait(None if wait is None else wait - now)
+        return None
+
+    def _loop(self):
+        while True:
+            jobs = self._next_jobs()
+            if jobs is None:
+                return
+            self._run(jobs)
+
+    def _run(self, jobs: dict):
+        with self._write_lock, twinsock.chain_batch():
+            for name, write in jobs.items():
+                try:
+                    write()
+                except Exception:
+                    log.exception("Failed to save %s", name)
+
+
+_SERVICE: PersistenceService | None = None
+
+
+def get_persistence() -> PersistenceService:
+    """Process-wide persistence service."""
+    global _SERVICE
+    if _SERVICE is None:
+        _SERVICE = PersistenceService()
+    return _SERVICE
@@ -0,0 +1,198 @@
+"""Streaming profile export and import files.
+
+Profiles are written and read one server at a time, so a large profile never
+sits in memory as a whole document next to the servers built from it.  The
+layout is picked from the file name on export:
+
+- ``*.ndjson``: a header line ``{"schema": "socksicle-export", "format":
+  "ndjson", "note": ...}``, then one ``{"type": ..., "data": {...}}`` line per
+  record of ``twinsock.iter_export``;
+- anything else (``*.json``): the classic export document, written in chunks;
+  older Socksicle versions can read it.
+
+A ``.gz`` suffix adds a gzip layer to either.  On import gzip is recognized by
+its magic bytes and NDJSON by its header line.  Classic documents still have
+to be parsed whole, but their dicts are freed as the servers are built.
+
+``progress(done, total)`` is called every PROGRESS_EVERY records and once at
+the end: servers written of servers on export, bytes read of the file size
+on import.
+"""
+import gzip
+import logging
+import os
+
+from PySide6.QtCore import QRunnable
+
+from . import jsonio, twinsock
+from .persistence import atomic_open
+
+log = logging.getLogger(__name__)
+
+FORMAT_JSON = "json"
+FORMAT_NDJSON = "ndjson"
+PROGRESS_EVERY = 256
+# Output is handed to the file (or gzip) in blocks of about this size.
+WRITE_CHUNK = 64 * 1024
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def export_format(path) -> tuple[str, bool]:
+    """(layout, gzipped) for an export file named *path*."""
+    name = str(path).lower()
+    gz = name.endswith(".gz")
+    if gz:
+        name = name[:-3]
+    return (FORMAT_NDJSON if name.endswith(".ndjson") else FORMAT_JSON), gz
+
+
+def _ndjson_chunks(records):
+    yield jsonio.dumps({"schema": twinsock.EXPORT_SCHEMA, "format": FORMAT_NDJSON,
+                        "note": twinsock.EXPORT_NOTE}) + b"\n"
+    for kind, d in records:
+        yield jsonio.dumps({"type": kind, "data": d}) + b"\n"
+
+
+def _json_chunks(records):
+    yield (b'{"schema": ' + jsonio.dumps(twinsock.EXPORT_SCHEMA)
+           + b', "note": ' + jsonio.dumps(twinsock.EXPORT_NOTE)
+           + b',\n "manual_servers": [')
+    in_subs = False
+    sep = b"\n  "
+    for kind, d in records:
+        if kind == "subscription":
+            if in_subs:
+                yield b"\n  ]},"
+            else:
+                yield b'\n ],\n "subscriptions": ['
+                in_subs = True
+            head = jsonio.dumps(d)[:-1]  # the sub dict, still open
+            yield b"\n  " + head + (b', ' if len(head) > 1 else b'') + b'"servers": ['
+            sep = b"\n   "
+        else:
+            yield sep + jsonio.dumps(d)
+            sep = b",\n   " if in_subs else b",\n  "
+    yield b"\n  ]}\n ]\n}\n" if in_subs else b'\n ],\n "subscriptions": []\n}\n'
+
+
+def export_profiles(path, manual_servers, subscriptions, progress=None) -> int:
+    """Write an export of the given servers and subscriptions to *path*.
+
+    lock_export items are left out (see twinsock.iter_export).  Returns the
+    number of servers written.
+    """
+    layout, gz = export_format(path)
+    total = twinsock.count_export(manual_servers, subscriptions)
+    written = 0
+
+    def counted():
+        nonlocal written
+        for kind, d in twinsock.iter_export(manual_servers, subscriptions):
+            if kind != "subscription":
+                written += 1
+                if progress and written % PROGRESS_EVERY == 0:
+                    progress(written, total)
+            yield kind, d
+
+    chunks = (_ndjson_chunks if layout == FORMAT_NDJSON else _json_chunks)(counted())
+    with atomic_open(path) as raw:
+        out = gzip.GzipFile(fileobj=raw, mode="wb") if gz else raw
+        try:
+            pending, size = [], 0
+            for chunk in chunks:
+                pending.append(chunk)
+                size += len(chunk)
+                if size >= WRITE_CHUNK:
+                    out.write(b"".join(pending))
+                    pending, size = [], 0
+            out.write(b"".join(pending))
+        finally:
+            if gz:
+                out.close()
+    if progress:
+        progress(total, total)
+    return written
+
+
+def _ndjson_header(line: bytes) -> dict | None:
+    if not line.lstrip().startswith(b"{"):
+        return None
+    try:
+        header = jsonio.loads(line)
+    except ValueError:
+        return None
+    if (isinstance(header, dict) and header.get("format") == FORMAT_NDJSON
+            and header.get("schema") == twinsock.EXPORT_SCHEMA):
+        return header
+    return None
+
+
+def _ndjson_records(stream):
+    for number, line in enumerate(stream, 2):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = jsonio.loads(line)
+        except ValueError:
+            log.warning("import: skipping malformed line %d", number)
+            continue
+        if isinstance(record, dict):
+            yield record.get("type"), record.get("data")
+
+
+def import_profiles(path, progress=None):
+    """Read an export file written by export_profiles (or an older version).
+
+    Returns (manual Servers, subscriptions) like twinsock.import_payload.
+    """
+    size = os.path.getsize(path)
+    manuals, subs = [], []
+    with open(path, "rb") as raw:
+        gz = raw.read(2) == _GZIP_MAGIC
+        raw.seek(0)
+        stream = gzip.GzipFile(fileobj=raw, mode="rb") if gz else raw
+        try:
+            first = stream.readline()
+            if _ndjson_header(first) is not None:
+                records = _ndjson_records(stream)
+            else:
+                data = jsonio.loads(first + stream.read())
+                if not isinstance(data, dict):
+                    return [], []
+                if "schema" not in data:
+                    log.warning("import: legacy export format (no schema), treating as transport form")
+                records = twinsock.payload_records(data, consume=True)
+                del data
+            for count, (kind, item) in enumerate(twinsock.import_records(records), 1):
+                (manuals if kind == "manual" else subs).append(item)
+                if progress and count % PROGRESS_EVERY == 0:
+                    progress(raw.tell(), size)
+        finally:
+            if gz:
+                stream.close()
+    if progress:
+        progress(size, size)
+    return manuals, subs
+
+
+class ProfileJob(QRunnable):
+    """Run a profile export or import off the GUI thread via the global thread pool.
+
+    work(progress) runs on the pool thread, then done(result, error) is called
+    there with its return value, or with the exception it raised.
+    """
+
+    def __init__(self, work, progress, done):
+        super().__init__()
+        self.work = work
+        self.progress = progress
+        self.done = done
+
+    def run(self):
+        try:
+            result, error = self.work(self.progress), None
+        except Exception as e:
+            log.warning("Profile job failed: %s", e)
+            result, error = None, e
+        self.done(result, error)
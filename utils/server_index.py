@@ -0,0 +1,194 @@
+"""Process-wide index of every known server across manual and subscription lists.
+
+Servers stay owned by their lists (``ServerManager.manual_servers`` and each
+subscription's ``servers``); the index only maps into them.  Owners are the
+tab names used by the UI: ``MANUAL_OWNER`` for manual servers, the
+subscription name otherwise.  It answers in O(1):
+
+- which server has a given ``key`` (raw link) or ``unique_key`` (node
+  identity), and
+- which owners list a given node, so identical nodes in different
+  subscriptions can be recognised.
+
+ServerManager and SubscriptionManager keep it in step with their lists on
+load, add, refresh and delete.  Keys embed secrets that stay sealed until
+used, so servers are indexed by their lookup digests (``Server.lookup_keys``,
+stored with loaded servers) and queries are digested the same way; digests
+a server does not have yet are computed on the first keyed lookup, and all
+of them again after the vault key changed.  An owner whose servers are
+edited in place re-registers them with ``set_owner``.
+"""
+import threading
+
+from .server_model import lookup_key
+from .twinsock import key_id
+
+MANUAL_OWNER = "Manual"
+
+
+class ServerIndex:
+    """Maps server keys and unique keys to the servers (and owners) holding them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}    # id(server) -> (owner, server, key digest, unique_key digest)
+        self._owned = {}      # owner -> {id(server): None}, in list order
+        self._by_key = {}     # key digest -> {id(server): None}
+        self._by_unique = {}  # unique_key digest -> {id(server): None}
+        self._pending = {}    # id(server) -> None, digests not read yet
+        self._kid = ""        # vault key id the key tables were digested with
+
+    @staticmethod
+    def _bucket_add(table, name, sid):
+        table.setdefault(name, {})[sid] = None
+
+    @staticmethod
+    def _bucket_discard(table, name, sid):
+        bucket = table.get(name)
+        if bucket is not None:
+            bucket.pop(sid, None)
+            if not bucket:
+                del table[name]
+
+    def _add_unlocked(self, owner, server):
+        sid = id(server)
+        if sid in self._entries:
+            self._discard_unlocked(sid)
+        self._entries[sid] = (owner, server, None, None)
+        self._bucket_add(self._owned, owner, sid)
+        self._pending[sid] = None
+
+    def _discard_unlocked(self, sid):
+        entry = self._entries.pop(sid, None)
+        if entry is None:
+            return
+        owner, _, key, unique = entry
+        self._bucket_discard(self._owned, owner, sid)
+        if sid in self._pending:  # never made it into the key tables
+            del self._pending[sid]
+            return
+        if key:
+            self._bucket_discard(self._by_key, key, sid)
+        self._bucket_discard(self._by_unique, unique, sid)
+
+    def _settle_unlocked(self):
+        """Read the lookup digests of servers indexed since the last keyed lookup.
+
+        After a vault re-key every server is digested again.
+        """
+        kid = key_id()
+        if kid != self._kid:
+            self._kid = kid
+            self._by_key.clear()
+            self._by_unique.clear()
+            self._pending = dict.fromkeys(self._entries)
+        if not self._pending:
+            return
+        for sid in self._pending:
+            owner, server, _, _ = self._entries[sid]
+            key, unique = server.lookup_keys
+            self._entries[sid] = (owner, server, key, unique)
+            if key:
+                self._bucket_add(self._by_key, key, sid)
+            self._bucket_add(self._by_unique, unique, sid)
+        self._pending.clear()
+
+    def _first(self, table, name):
+        self._settle_unlocked()
+        bucket = table.get(name)
+        if not bucket:
+            return None
+        return self._entries[next(iter(bucket))][1]
+
+    # --- Maintenance ---
+
+    def set_owner(self, owner, servers):
+        """Make *servers* the complete list indexed for *owner*."""
+        with self._lock:
+            for sid in list(self._owned.get(owner, ())):
+                self._discard_unlocked(sid)
+            for server in servers:
+                self._add_unlocked(owner, server)
+
+    def remove_owner(self, owner):
+        """Forget every server of *owner* (a deleted subscription)."""
+        self.set_owner(owner, ())
+
+    def add(self, owner, server):
+        with self._lock:
+            self._add_unlocked(owner, server)
+
+    def discard(self, server):
+        with self._lock:
+            self._discard_unlocked(id(server))
+
+    # --- Lookups ---
+
+    def get(self, key):
+        """The first indexed server whose link is *key*, or None."""
+        digest = lookup_key(key)
+        with self._lock:
+            return self._first(self._by_key, digest)
+
+    def get_unique(self, unique_key):
+        """The first indexed server for node *unique_key*, or None."""
+        digest = lookup_key(unique_key)
+        with self._lock:
+            return self._first(self._by_unique, digest)
+
+    def servers_with_key(self, key):
+        """Every indexed server whose link is *key*."""
+        digest = lookup_key(key)
+        with self._lock:
+            self._settle_unlocked()
+            return [self._entries[sid][1] for sid in self._by_key.get(digest, ())]
+
+    def owner_of(self, server):
+        """Owner of this exact server object, or None when it is not indexed."""
+        with self._lock:
+            entry = self._entries.get(id(server))
+            return entry[0] if entry is not None else None
+
+    def servers_of(self, owner):
+        """Servers indexed for *owner*, in list order."""
+        with self._lock:
+            return [self._entries[sid][1] for sid in self._owned.get(owner, ())]
+
+    def owners(self, unique_key):
+        """Owners listing node *unique_key*, without repeats, in first-seen order."""
+        digest = lookup_key(unique_key)
+        with self._lock:
+            self._settle_unlocked()
+            return list(dict.fromkeys(
+                self._entries[sid][0] for sid in self._by_unique.get(digest, ())))
+
+    def shared(self):
+        """unique_key digest (lookup_keys[1]) -> owners, for nodes listed by more than one owner."""
+        with self._lock:
+            self._settle_unlocked()
+            result = {}
+            for unique, bucket in self._by_unique.items():
+                if len(bucket) < 2:
+                    continue
+                owners = list(dict.fromkeys(self._entries[sid][0] for sid in bucket))
+                if len(owners) > 1:
+                    result[unique] = owners
+            return result
+
+    def __contains__(self, server):
+        return self.owner_of(server) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_INDEX: ServerIndex | None = None
+
+
+def get_server_index() -> ServerIndex:
+    """Process-wide server index."""
+    global _INDEX
+    if _INDEX is None:
+        _INDEX = ServerIndex()
+    return _INDEX
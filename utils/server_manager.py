@@ -6,9 +6,12 @@ import os
 import secrets
 import time
 
+from . import config_db, jsonio, profile_io
+from .persistence import atomic_write, get_persistence
 from .platform_utils import get_config_dir
+from .server_index import MANUAL_OWNER, get_server_index
 from .server_model import Server
-from .sub_manager import save_subscriptions
+from .sub_manager import load_subscriptions_json
 from .engines.base import DEFAULT_LOCAL_PORT
 from .ping import DEFAULT_PING_METHOD
 from . import twinsock
@@ -23,55 +26,102 @@ class ServerManager:
         os.makedirs(self.config_dir, exist_ok=True)
         self.config_file = os.path.join(self.config_dir, "servers.json")
         self.settings_file = os.path.join(self.config_dir, "settings.json")
+        self.settings = self.load_settings()
+        twinsock.set_record_format(self.settings.get("vault_record_format"))
+        store = config_db.set_backend(self.settings.get("storage_backend"))
+        if store is not None and store.needs_migration():
+            self._migrate_to_store(store)
         self.manual_servers = self.load_manual_servers()
+        get_server_index().set_owner(MANUAL_OWNER, self.manual_servers)
         if twinsock.migration_occurred():
             self.save_manual_servers()
-        self.settings = self.load_settings()
         self._ensure_tws3_share_key()
 
     def load_manual_servers(self):
+        store = config_db.get_store()
+        if store is None:
+            return self._load_manual_servers_json()
+        try:
+            servers = store.load_servers(config_db.MANUAL_ROWS, "manual")
+        except twinsock.VaultError as e:
+            log.warning("vault: manual servers unusable on this machine: %s", e)
+            return []
+        return Server.from_dicts(servers)
+
+    def _load_manual_servers_json(self):
         if os.path.exists(self.config_file):
-            twinsock.file_intact("servers.json")
             try:
-                with open(self.config_file, 'r', encoding="utf-8", errors="replace") as f:
-                    data = json.load(f)
+                with open(self.config_file, 'rb') as f:
+                    raw = f.read()
+                twinsock.file_intact("servers.json", raw)
+                data = jsonio.loads(raw)
                 if isinstance(data, list):
-                    servers = []
-                    for s in data:
-                        if isinstance(s, dict):
-                            try:
-                                servers.append(
-                                    twinsock.unseal_dict("manual", s, twinsock.SECRET_FIELDS))
-                            except twinsock.VaultError as e:
-                                log.warning("vault: manual servers unusable on this machine: %s", e)
-                                return []
-                    return [Server.from_dict(s) for s in servers]
+                    try:
+                        servers = twinsock.unseal_dicts(
+                            "manual", [s for s in data if isinstance(s, dict)],
+                            twinsock.SECRET_FIELDS, lazy=True)
+                    except twinsock.VaultError as e:
+                        log.warning("vault: manual servers unusable on this machine: %s", e)
+                        return []
+                    return Server.from_dicts(servers)
             except (json.JSONDecodeError, OSError, ValueError) as e:
                 log.error("Failed to load manual servers: %s", e)
         return []
 
     def save_manual_servers(self):
-        payload = []
+        """Schedule a background write of servers.json."""
+        get_persistence().mark_dirty("servers.json", self._write_manual_servers)
+
+    def _write_manual_servers(self):
+        servers = list(self.manual_servers)
+        store = config_db.get_store()
+        if store is not None:
+            store.save_servers(config_db.MANUAL_ROWS, "manual", servers)
+            return
+        plain = Server.to_dicts(servers, reveal=False)
         try:
-            for s in self.manual_servers:
-                payload.append(twinsock.seal_dict("manual", s.to_dict(), twinsock.SECRET_FIELDS))
+            payload = twinsock.seal_dicts("manual", plain, twinsock.SECRET_FIELDS)
         except twinsock.VaultError as e:
             if str(e) != "foreign":
                 raise
             log.warning("vault: foreign config, retiring servers.json and starting fresh")
             self._retire_foreign(self.config_file)
             twinsock.drop_foreign()
-            payload = [
-                twinsock.seal_dict("manual", s.to_dict(), twinsock.SECRET_FIELDS)
-                for s in self.manual_servers
-            ]
+            payload = twinsock.seal_dicts("manual", plain, twinsock.SECRET_FIELDS)
+        data = jsonio.dumps(payload)
         try:
-            with open(self.config_file, 'w', encoding="utf-8") as f:
-                json.dump(payload, f)
+            atomic_write(self.config_file, data)
         except (OSError, IOError) as e:
             log.error("Failed to save manual servers: %s", e)
             return
-        twinsock.file_saved("servers.json")
+        twinsock.file_saved("servers.json", data)
+
+    def _migrate_to_store(self, store):
+        """Copy servers.json and subscriptions.json into config.db (left in place as a backup)."""
+        servers = self._load_manual_servers_json()
+        subs = load_subscriptions_json()
+        with twinsock.chain_batch():
+            store.save_servers(config_db.MANUAL_ROWS, "manual", servers)
+            store.save_subscriptions(subs)
+        store.mark_migrated()
+        log.info("storage: copied %d manual servers and %d subscriptions into %s",
+                 len(servers), len(subs), config_db.DB_FILE)
+
+    def apply_storage_backend(self):
+        """Switch to the storage backend in the settings and rewrite servers into it.
+
+        The caller saves subscriptions too, so the new backend holds the current state.
+        """
+        get_persistence().flush()
+        store = config_db.set_backend(self.settings.get("storage_backend"))
+        if store is not None:
+            store.mark_migrated()
+        self.save_manual_servers()
+
+    def apply_record_format(self):
+        """Switch the vault record format to the current setting and rewrite servers.json."""
+        twinsock.set_record_format(self.settings.get("vault_record_format"))
+        self.save_manual_servers()
 
     def _retire_foreign(self, path):
         if not os.path.exists(path):
@@ -128,8 +178,14 @@ class ServerManager:
                 self.settings["tws3_share_key"] = base64.urlsafe_b64encode(
                     secrets.token_bytes(32)).rstrip(b"=").decode()
                 log.info("generated TwinSock v3 share key")
-        with open(self.settings_file, 'w', encoding="utf-8") as f:
-            json.dump(self.settings, f)
+        get_persistence().mark_dirty("settings.json", self._write_settings)
+
+    def _write_settings(self):
+        data = json.dumps(dict(self.settings)).encode("utf-8")
+        try:
+            atomic_write(self.settings_file, data)
+        except (OSError, IOError) as e:
+            log.error("Failed to save settings: %s", e)
 
     def _stored_tws_share_key(self):
         if not os.path.exists(self.settings_file):
@@ -147,50 +203,62 @@ class ServerManager:
 
     def add_from_link(self, raw_link, default_name="New Server", lock_export: bool = False, expires_at: int | None = None):
         """Parse an ss://, vless://, vmess://, hysteria2://, or hy2:// link and append it to the manual server list."""
-        server = Server.from_link(raw_link, default_name=default_name)
-        if not server:
-            return None
-        if lock_export:
-            server.lock_export = True
-        if expires_at is not None:
-            server.expires_at = expires_at
-        self.manual_servers.append(server)
+        servers = self.add_from_links([raw_link], default_name, lock_export, expires_at)
+        return servers[0] if servers else None
+
+    def add_from_links(self, raw_links, default_name="New Server", lock_export: bool = False,
+                       expires_at: int | None = None):
+        """Parse *raw_links* as one batch (Server.from_links) and append the valid ones.
+
+        Returns the added servers; the list is saved once.
+        """
+        servers = [s for s in Server.from_links(raw_links, default_name=default_name) if s]
+        if not servers:
+            return []
+        index = get_server_index()
+        for server in servers:
+            if lock_export:
+                server.lock_export = True
+            if expires_at is not None:
+                server.expires_at = expires_at
+            self.manual_servers.append(server)
+            index.add(MANUAL_OWNER, server)
         self.save_manual_servers()
-        return server
+        return servers
 
     def delete_manual(self, index):
         if index < 0 or index >= len(self.manual_servers):
             return
-        del self.manual_servers[index]
+        get_server_index().discard(self.manual_servers.pop(index))
         self.save_manual_servers()
 
-    def export_profiles(self, path, subscriptions):
-        data = twinsock.export_payload(self.manual_servers, subscriptions)
-        with open(path, 'w', encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
-
-    def import_profiles(self, path, subscriptions):
-        """Merge profiles from a JSON file. Returns (added_servers, added_subs)."""
-        with open(path, 'r', encoding="utf-8", errors="replace") as f:
-            data = json.load(f)
-        if not isinstance(data, dict):
-            return 0, 0
-        manuals, subs = twinsock.import_payload(data)
+    def export_profiles(self, path, subscriptions, progress=None):
+        """Write an export file (layout by file name, see profile_io)."""
+        return profile_io.export_profiles(path, self.manual_servers, subscriptions, progress)
+
+    def import_profiles(self, path, subscription_manager, progress=None):
+        """Merge profiles from an export file. Returns (added_servers, added_subs)."""
+        manuals, subs = profile_io.import_profiles(path, progress)
+        return self.merge_imported(manuals, subs, subscription_manager)
+
+    def merge_imported(self, manuals, subs, subscription_manager):
+        """Add imported servers and subscriptions that are not there yet.
+
+        Subscriptions go through SubscriptionManager.add_imported; both stores
+        are saved through the persistence service.  Returns
+        (added_servers, added_subs).
+        """
+        index = get_server_index()
         added_m = 0
         for srv in manuals:
-            if srv not in self.manual_servers:
+            candidates = index.servers_with_key(srv.key) if srv.key.strip() else self.manual_servers
+            if not any(s == srv and index.owner_of(s) == MANUAL_OWNER for s in candidates):
                 self.manual_servers.append(srv)
+                index.add(MANUAL_OWNER, srv)
                 added_m += 1
         if added_m:
             self.save_manual_servers()
-        added_s = 0
-        for raw_sub in subs:
-            if not any(x['url'] == raw_sub['url'] for x in subscriptions):
-                subscriptions.append(raw_sub)
-                added_s += 1
-        if added_s:
-            save_subscriptions(subscriptions)
-        return added_m, added_s
+        return added_m, subscription_manager.add_imported(subs)
 
     def is_sslocal_declined(self):
         return bool(self.settings.get("sslocal_declined", False))
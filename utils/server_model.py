@@ -1,12 +1,20 @@
 """Server model shared across the app."""
+import copy
 import functools
 import ipaddress
 import logging
+import multiprocessing
+import os
+import sys
+import threading
 import time
-from dataclasses import dataclass
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields
 from enum import Enum
 
 from .ss_parser import decode_ss_link
+from .twinsock import SECRET_FIELDS, Sealed, VaultError, key_id, lookup_digest
 
 log = logging.getLogger(__name__)
 
@@ -28,8 +36,163 @@ class ProxyProtocol(str, Enum):
     HYSTERIA2 = "hysteria2"
 
 
-@dataclass
+LINK_CACHE_SIZE = 20_000
+
+# Server.from_links only starts a process pool when at least this many
+# distinct uncached links are left and MIN_PARSE_WORKERS CPUs are usable.
+# parse_bench measures pool start-up at ~0.26 s and a link at ~70 us to parse
+# and ~5 us to ship back, so with 4 workers the pool breaks even around
+# 5,400 links; the threshold leaves a margin for slower start-ups.
+PARALLEL_PARSE_THRESHOLD = 10_000
+MIN_PARSE_WORKERS = 4
+MAX_PARSE_WORKERS = 8
+
+
+class LinkCache:
+    """Bounded LRU of raw link -> parsed Server that hands out copies.
+
+    Subscription refreshes and imports see the same links over and over;
+    a hit costs one shallow copy instead of a full parse.  Server fields
+    are all immutable values, so a shallow copy is independent.
+    """
+
+    def __init__(self, maxsize=LINK_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            server = self._entries.get(key)
+            if server is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.copy(server)
+
+    def put(self, key, server):
+        with self._lock:
+            self._entries[key] = copy.copy(server)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_LINK_CACHE = LinkCache()
+
+
+def link_cache_stats() -> dict:
+    """Hit/miss counters of the parsed-link cache used by Server.from_link."""
+    return _LINK_CACHE.stats()
+
+
+def clear_link_cache():
+    """Drop every cached parsed link and reset the counters."""
+    _LINK_CACHE.clear()
+
+
+# Fields unique_key is built from; assigning one (or the key) drops the
+# cached lookup keys.
+KEY_FIELDS = ("protocol", "method", "host", "port", "password", "uuid")
+# Purpose of the keyed digests in Server.lookup_keys; config.db indexes its
+# rows by the same digests.
+LOOKUP_PURPOSE = "index"
+# Option strings drawn from a small vocabulary ("aes-256-gcm", "tcp", "none",
+# "chrome", ...); interned so every server shares one copy of each.
+INTERNED_FIELDS = ("method", "plugin", "security", "transport", "flow", "encryption",
+                   "fingerprint", "vmess_security", "obfs", "mux")
+
+
+def lookup_key(value) -> str:
+    """Keyed digest of a link or unique_key ("" for an empty one).
+
+    Cut to 128 bits: plenty to tell servers apart, and half the size on disk.
+    """
+    value = value.strip() if value else ""
+    return lookup_digest(LOOKUP_PURPOSE, value)[:32] if value else ""
+
+
+class _KeyField:
+    """Wraps the slot of a field the lookup keys depend on."""
+
+    __slots__ = ("slot", "get", "put", "forget")
+
+    def __init__(self, slot, lookup_slot):
+        self.slot = slot
+        self.get = slot.__get__
+        self.put = slot.__set__
+        self.forget = lookup_slot.__set__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return self.get(obj)
+
+    def __set__(self, obj, value):
+        self.put(obj, value)
+        self.forget(obj, None)
+
+    def raw(self, obj):
+        return self.get(obj)
+
+
+class _SecretField(_KeyField):
+    """Server field that may hold a twinsock.Sealed handle.
+
+    Loaded servers keep their secrets sealed; reading the attribute reveals
+    the plaintext (through twinsock's small reveal cache) without storing it
+    on the server.  Assigning a plain string replaces the handle.
+    """
+
+    __slots__ = ()
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = self.get(obj)
+        return value.reveal() if isinstance(value, Sealed) else value
+
+
+def _wrap_slots(cls):
+    """Route secret and unique_key fields of the slotted *cls* through descriptors."""
+    slots = {name: cls.__dict__[name] for name in cls.__slots__}
+    for name, slot in slots.items():
+        if name in SECRET_FIELDS:
+            setattr(cls, name, _SecretField(slot, slots["_lookup"]))
+        elif name in KEY_FIELDS:
+            setattr(cls, name, _KeyField(slot, slots["_lookup"]))
+    # (get, set) of every raw slot, for copies and pickles.
+    cls._raw_slots = tuple((slot.__get__, slot.__set__) for slot in slots.values())
+    return cls
+
+
+@_wrap_slots
+@dataclass(slots=True)
 class Server:
+    """One proxy node.
+
+    Slotted: 10k-node subscriptions are common, and a per-instance __dict__
+    is the largest part of a Server.
+    """
+
     key: str = ""
     name: str = "Server"
     host: str = ""
@@ -61,6 +224,39 @@ class Server:
     down_mbps: int = 0
     lock_export: bool = False
     expires_at: int | None = None
+    mux: str = ""
+    mux_concurrency: int = 0
+    mux_padding: bool = False
+    mux_brutal: bool = False
+    bw_network: str = ""     # network fingerprint up/down_mbps were calibrated on
+    # (vault key id, lookup_keys), or the "kid:key:unique" string they were stored as.
+    _lookup: tuple | str | None = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        for name in INTERNED_FIELDS:
+            value = getattr(self, name)
+            if type(value) is str:
+                setattr(self, name, sys.intern(value))
+
+    # Copies and pickles move the raw slots, so sealed secrets stay sealed.
+    def __getstate__(self):
+        return tuple(get(self) for get, _ in self._raw_slots), getattr(self, "__dict__", None)
+
+    def __setstate__(self, state):
+        values, extra = state
+        for (_, put), value in zip(self._raw_slots, values):
+            put(self, value)
+        if extra:
+            self.__dict__.update(extra)
+
+    def __copy__(self):
+        new = object.__new__(type(self))
+        for get, put in self._raw_slots:
+            put(new, get(self))
+        extra = getattr(self, "__dict__", None)
+        if extra:
+            new.__dict__.update(extra)
+        return new
 
     @property
     def is_expired(self) -> bool:
@@ -71,15 +267,69 @@ class Server:
 
     @classmethod
     def from_link(cls, raw_link, default_name="Server"):
-        """Parse an ss://, vless://, vmess://, hysteria2://, or hy2:// link into a Server, or None."""
+        """Parse an ss://, vless://, vmess://, hysteria2://, or hy2:// link into a Server, or None.
+
+        Results are memoised in a bounded LRU keyed by the raw link; each
+        call returns its own copy, so callers may modify it freely.
+        """
         if not raw_link:
             return None
+        cache_key = (raw_link, default_name)
+        server = _LINK_CACHE.get(cache_key)
+        if server is None:
+            server = cls._parse_link(raw_link, default_name)
+            if server is not None:
+                _LINK_CACHE.put(cache_key, server)
+        return server
+
+    @classmethod
+    def from_links(cls, raw_links, default_name="Server", workers=None,
+                   threshold=PARALLEL_PARSE_THRESHOLD):
+        """Parse many links at once; returns a list aligned with *raw_links*.
+
+        Unparseable entries come back as None and every entry is its own
+        copy, as with from_link.  Cached links are served from the link
+        cache and each distinct link is parsed only once.  When at least
+        *threshold* distinct links are left they are split across a process
+        pool of *workers* (default: parse_workers()); smaller batches, too
+        few CPUs or a pool that cannot start fall back to in-thread parsing.
+        """
+        raw_links = list(raw_links)
+        results = [_LINK_CACHE.get((link, default_name)) if link else None
+                   for link in raw_links]
+        pending = list(dict.fromkeys(
+            link for link, server in zip(raw_links, results) if link and server is None))
+        if not pending:
+            return results
+        if workers is None:
+            workers = parse_workers()
+        parsed = None
+        if workers > 1 and len(pending) >= threshold:
+            try:
+                parsed = _parse_links_in_pool(pending, default_name, workers)
+            except (OSError, RuntimeError) as e:
+                log.warning("Parallel link parsing unavailable, parsing in-thread: %s", e)
+        if parsed is None:
+            parsed = _parse_link_chunk(pending, default_name)
+        by_link = {}
+        for link, server in zip(pending, parsed):
+            if server is not None:
+                _LINK_CACHE.put((link, default_name), server)
+                by_link[link] = server
+        for i, (link, server) in enumerate(zip(raw_links, results)):
+            if server is None and link in by_link:
+                results[i] = copy.copy(by_link[link])
+        return results
+
+    @classmethod
+    def _parse_link(cls, raw_link, default_name):
         if raw_link.startswith(('vless://', 'vmess://', 'hysteria2://', 'hy2://')):
             from .link_parser import parse_link
             return parse_link(raw_link, default_name=default_name)
         data = decode_ss_link(raw_link)
         if not data:
             return None
+        from .link_parser import mux_fields_from_link
         host = data.get('server', '')
         is_priv = is_private_host(host)
         if is_priv:
@@ -94,139 +344,49 @@ class Server:
             plugin=data.get('plugin', ''),
             plugin_opts=data.get('plugin_opts', ''),
             is_private=is_priv,
+            **mux_fields_from_link(raw_link),
         )
 
     @classmethod
     def from_dict(cls, data):
-        """Build a Server from a stored dict (servers.json / subscription)."""
-        if not isinstance(data, dict):
-            data = {}
-        try:
-            port = int(data.get('port', 443))
-        except (TypeError, ValueError):
-            port = 443
-        try:
-            protocol = ProxyProtocol(data.get('protocol', 'shadowsocks'))
-        except ValueError:
-            protocol = ProxyProtocol.SHADOWSOCKS
-        try:
-            alter_id = int(data.get('alter_id', 0))
-        except (TypeError, ValueError):
-            alter_id = 0
-        try:
-            up_mbps = int(data.get('up_mbps', 0))
-        except (TypeError, ValueError):
-            up_mbps = 0
-        try:
-            down_mbps = int(data.get('down_mbps', 0))
-        except (TypeError, ValueError):
-            down_mbps = 0
-        expires_at_raw = data.get('expires_at')
-        expires_at = None
-        if expires_at_raw is not None:
-            try:
-                expires_at = int(expires_at_raw)
-            except (ValueError, TypeError):
-                expires_at = None
-        lock_export = bool(data.get('lock_export', False))
-        return cls(
-            key=data.get('key', ''),
-            name=data.get('name', 'Server'),
-            host=data.get('host', ''),
-            port=port,
-            method=data.get('method', 'aes-256-gcm'),
-            password=data.get('password', ''),
-            plugin=data.get('plugin', ''),
-            plugin_opts=data.get('plugin_opts', ''),
-            protocol=protocol,
-            uuid=data.get('uuid', ''),
-            security=data.get('security', 'none'),
-            transport=data.get('transport', 'tcp'),
-            flow=data.get('flow', ''),
-            encryption=data.get('encryption', 'none'),
-            server_name=data.get('server_name', ''),
-            fingerprint=data.get('fingerprint', 'chrome'),
-            public_key=data.get('public_key', ''),
-            short_id=data.get('short_id', ''),
-            alter_id=alter_id,
-            vmess_security=data.get('vmess_security', 'auto'),
-            path=data.get('path', ''),
-            host_header=data.get('host_header', ''),
-            is_private=data.get('is_private', False),
-            insecure=bool(data.get('insecure', False)),
-            obfs=data.get('obfs', ''),
-            obfs_password=data.get('obfs_password', ''),
-            ports=data.get('ports', ''),
-            up_mbps=up_mbps,
-            down_mbps=down_mbps,
-            lock_export=lock_export,
-            expires_at=expires_at,
-        )
+        """Build a Server from a stored dict (servers.json / subscription).
 
-    def to_dict(self):
-        """Serialize to storage format."""
-        d = {
-            "key": self.key,
-            "name": self.name,
-            "host": self.host,
-            "port": self.port,
-            "method": self.method,
-            "password": self.password,
-        }
-        if self.plugin:
-            d["plugin"] = self.plugin
-        if self.plugin_opts:
-            d["plugin_opts"] = self.plugin_opts
-        if self.protocol != ProxyProtocol.SHADOWSOCKS:
-            d["protocol"] = self.protocol.value
-        if self.uuid:
-            d["uuid"] = self.uuid
-        if self.security != "none":
-            d["security"] = self.security
-        if self.transport != "tcp":
-            d["transport"] = self.transport
-        if self.flow:
-            d["flow"] = self.flow
-        if self.encryption != "none":
-            d["encryption"] = self.encryption
-        if self.server_name:
-            d["server_name"] = self.server_name
-        if self.fingerprint and self.fingerprint != "chrome":
-            d["fingerprint"] = self.fingerprint
-        if self.public_key:
-            d["public_key"] = self.public_key
-        if self.short_id:
-            d["short_id"] = self.short_id
-        if self.alter_id:
-            d["alter_id"] = self.alter_id
-        if self.vmess_security and self.vmess_security != "auto":
-            d["vmess_security"] = self.vmess_security
-        if self.path:
-            d["path"] = self.path
-        if self.host_header:
-            d["host_header"] = self.host_header
-        if self.is_private:
-            d["is_private"] = True
-        if self.insecure:
-            d["insecure"] = True
-        if self.obfs:
-            d["obfs"] = self.obfs
-        if self.obfs_password:
-            d["obfs_password"] = self.obfs_password
-        if self.ports:
-            d["ports"] = self.ports
-        if self.up_mbps:
-            d["up_mbps"] = self.up_mbps
-        if self.down_mbps:
-            d["down_mbps"] = self.down_mbps
-        if self.lock_export:
-            d["lock_export"] = True
-        if self.expires_at is not None:
-            d["expires_at"] = self.expires_at
-        return d
+        Decoded by the table-driven codec (see _FIELD_CODECS); __init__ is not
+        called.
+        """
+        return _decode(cls, data)
+
+    @classmethod
+    def from_dicts(cls, dicts):
+        """from_dict over many stored dicts, as a list."""
+        decode = _decode
+        return [decode(cls, d) for d in dicts]
+
+    def _secret(self, name, reveal):
+        value = getattr(type(self), name).raw(self)
+        return value.reveal() if reveal and isinstance(value, Sealed) else value
+
+    def to_dict(self, reveal=True):
+        """Serialize to storage format.
+
+        With reveal=False, secrets that are still sealed stay Sealed handles
+        (for writing back to the vault without decrypting them).
+        """
+        return _encode(self, reveal)
+
+    @staticmethod
+    def to_dicts(servers, reveal=True):
+        """to_dict over many servers, as a list."""
+        encode = _encode
+        return [encode(s, reveal) for s in servers]
 
     @property
     def unique_key(self):
+        """Node identity (credentials @ address).
+
+        It embeds secrets, so it is built on each use rather than kept; match
+        and index servers by lookup_keys instead.
+        """
         if self.protocol == ProxyProtocol.SHADOWSOCKS:
             return f"{self.method}:{self.password}@{self.host}:{self.port}"
         if self.protocol == ProxyProtocol.VMESS:
@@ -235,6 +395,269 @@ class Server:
             return f"hysteria2:{self.password}@{self.host}:{self.port}"
         return f"vless:{self.uuid}@{self.host}:{self.port}"
 
+    @property
+    def lookup_keys(self):
+        """(link digest, node digest): lookup_key of key and unique_key.
+
+        Cached, and stored with the server, so matching a loaded server
+        against a refreshed link or an index query decrypts nothing.  Both
+        remember the vault key they were made with; digests of another key
+        are made again.
+        """
+        keys = self._current_lookup()
+        if keys is None:
+            keys = (lookup_key(self.key), lookup_key(self.unique_key))
+            self._lookup = (key_id(), keys)
+        return keys
+
+    @property
+    def has_lookup_keys(self) -> bool:
+        """True when lookup_keys are known without reading the secrets."""
+        return self._current_lookup() is not None
+
+    def _current_lookup(self):
+        """lookup_keys if cached or stored under the current vault key, else None."""
+        keys = self._lookup
+        if keys is None:
+            return None
+        kid = key_id()
+        if type(keys) is tuple:
+            return keys[1] if keys[0] == kid else None
+        stored_kid, _, rest = keys.partition(":")
+        if stored_kid != kid:
+            return None
+        key, _, unique = rest.partition(":")
+        keys = (key, unique)
+        self._lookup = (kid, keys)
+        return keys
+
     @property
     def display_protocol(self):
-        return self.protocol.value.upper()
\ No newline at end of file
+        return self.protocol.value.upper()
+
+
+_PROTOCOLS = {p.value: p for p in ProxyProtocol}
+
+
+# Decode coercers: (stored value, field default) -> slot value.
+def _coerce_int(value, default):
+    if type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _coerce_opt_int(value, default=None):
+    if value is None or type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _coerce_protocol(value, default=ProxyProtocol.SHADOWSOCKS):
+    if type(value) is ProxyProtocol:
+        return value
+    try:
+        return _PROTOCOLS.get(value, ProxyProtocol.SHADOWSOCKS)
+    except TypeError:
+        return ProxyProtocol.SHADOWSOCKS
+
+
+def _coerce_intern(value, default):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _coerce_intern_or(value, default):
+    value = value or default
+    return sys.intern(value) if type(value) is str else value
+
+
+def _coerce_str_or(value, default):
+    return value or default
+
+
+def _coerce_bool(value, default):
+    return bool(value)
+
+
+# Encode predicates: (slot value, field default) -> write the field?
+def _emit_truthy(value, default):
+    return value
+
+
+def _emit_changed(value, default):
+    return value != default
+
+
+def _emit_set(value, default):
+    return value and value != default
+
+
+def _emit_not_none(value, default):
+    return value is not None
+
+
+def _dump_flag(value):
+    return True
+
+
+def _dump_enum(value):
+    return value.value
+
+
+# Storage codec: (field, coerce, emit, dump) per stored field, in to_dict order.
+# Defaults are the dataclass field defaults.
+# coerce - from_dict turns the stored value into the slot value with
+#          coerce(value, default); None stores it as is.
+# emit   - to_dict writes the field when emit(value, default) is true; None
+#          always writes it.
+# dump   - to_dict writes dump(value) instead of the value; None writes it as is.
+# Secret fields reveal Sealed handles on encode unless reveal=False.  Stored
+# dicts (reveal=False) also carry the lookup keys, as "lookup": "kid:key:unique",
+# kid being the vault key id they were made with.
+_FIELD_CODECS = (
+    ("key", None, None, None),
+    ("name", None, None, None),
+    ("host", None, None, None),
+    ("port", _coerce_int, None, None),
+    ("method", _coerce_intern, None, None),
+    ("password", None, None, None),
+    ("plugin", _coerce_intern, _emit_truthy, None),
+    ("plugin_opts", None, _emit_truthy, None),
+    ("protocol", _coerce_protocol, _emit_changed, _dump_enum),
+    ("uuid", None, _emit_truthy, None),
+    ("security", _coerce_intern, _emit_changed, None),
+    ("transport", _coerce_intern, _emit_changed, None),
+    ("flow", _coerce_intern, _emit_truthy, None),
+    ("encryption", _coerce_intern, _emit_changed, None),
+    ("server_name", None, _emit_truthy, None),
+    ("fingerprint", _coerce_intern, _emit_set, None),
+    ("public_key", None, _emit_truthy, None),
+    ("short_id", None, _emit_truthy, None),
+    ("alter_id", _coerce_int, _emit_truthy, None),
+    ("vmess_security", _coerce_intern, _emit_set, None),
+    ("path", None, _emit_truthy, None),
+    ("host_header", None, _emit_truthy, None),
+    ("is_private", None, _emit_truthy, _dump_flag),
+    ("insecure", _coerce_bool, _emit_truthy, _dump_flag),
+    ("obfs", _coerce_intern, _emit_truthy, None),
+    ("obfs_password", None, _emit_truthy, None),
+    ("ports", None, _emit_truthy, None),
+    ("up_mbps", _coerce_int, _emit_truthy, None),
+    ("down_mbps", _coerce_int, _emit_truthy, None),
+    ("lock_export", _coerce_bool, _emit_truthy, _dump_flag),
+    ("expires_at", _coerce_opt_int, _emit_not_none, None),
+    ("mux", _coerce_intern_or, _emit_truthy, None),
+    ("mux_concurrency", _coerce_int, _emit_truthy, None),
+    ("mux_padding", _coerce_bool, _emit_truthy, _dump_flag),
+    ("mux_brutal", _coerce_bool, _emit_truthy, _dump_flag),
+    ("bw_network", _coerce_str_or, _emit_truthy, None),
+)
+
+
+def _lookup_to_store(server):
+    """The "kid:key:unique" lookup string to store with *server*, or None.
+
+    New lookup keys are only computed for plaintext secrets: for sealed
+    ones that would reveal them.
+    """
+    try:
+        keys = server._current_lookup()
+        if keys is None:
+            if any(type(get(server)) is Sealed for get in _SECRET_GETTERS):
+                return None
+            keys = server.lookup_keys
+        return f"{key_id()}:{keys[0]}:{keys[1]}"
+    except VaultError:
+        return None  # vault unusable; the save itself deals with that
+
+
+def _codec_tables(cls):
+    """Per-field rows of _FIELD_CODECS bound to the raw slots of *cls*.
+
+    Returns (decoders, encoders): (name, default, coerce, set slot) and
+    (name, default, emit, dump, get slot, is secret).  The raw slot accessors
+    skip the key/secret field descriptors, so decoding leaves the stored
+    lookup keys alone and sealed secrets are only revealed when to_dict is
+    asked to.
+    """
+    defaults = {f.name: f.default for f in fields(cls)}
+    decoders, encoders = [], []
+    for name, coerce, emit, dump in _FIELD_CODECS:
+        attr = cls.__dict__[name]
+        slot = attr.slot if isinstance(attr, _KeyField) else attr
+        default = defaults[name]
+        decoders.append((name, default, coerce, slot.__set__))
+        encoders.append((name, default, emit, dump, slot.__get__, name in SECRET_FIELDS))
+    return tuple(decoders), tuple(encoders)
+
+
+def _decode(cls, data):
+    """from_dict: a *cls* built from the stored dict *data*, bypassing __init__."""
+    if not isinstance(data, dict):
+        data = {}
+    get = data.get
+    new = object.__new__(cls)
+    for name, default, coerce, put in _DECODERS:
+        value = get(name, default)
+        put(new, value if coerce is None else coerce(value, default))
+    value = get("lookup")
+    new._lookup = value if type(value) is str and value else None
+    return new
+
+
+def _encode(server, reveal):
+    """to_dict: the stored dict of *server*."""
+    d = {}
+    for name, default, emit, dump, read, secret in _ENCODERS:
+        value = read(server)
+        if secret and reveal and type(value) is Sealed:
+            value = value.reveal()
+        if emit is None or emit(value, default):
+            d[name] = value if dump is None else dump(value)
+    if not reveal:
+        value = _lookup_to_store(server)
+        if value:
+            d["lookup"] = value
+    return d
+
+
+_SECRET_GETTERS = tuple(Server.__dict__[name].get for name in SECRET_FIELDS)
+_DECODERS, _ENCODERS = _codec_tables(Server)
+
+
+def parse_workers() -> int:
+    """Pool size Server.from_links uses by default; 1 (no pool) below MIN_PARSE_WORKERS CPUs."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # no sched_getaffinity on Windows and macOS
+        cpus = os.cpu_count() or 1
+    return min(cpus, MAX_PARSE_WORKERS) if cpus >= MIN_PARSE_WORKERS else 1
+
+
+def _parse_link_chunk(raw_links, default_name):
+    """Process-pool worker: parse *raw_links* without touching the link cache."""
+    return [Server._parse_link(link, default_name) for link in raw_links]
+
+
+def _pool_context():
+    # Workers must not be forked from the GUI process: a fork copies Qt's
+    # threads' state and can crash the parent later.  forkserver forks them
+    # from a clean helper process; spawn is the fallback (and all Windows has).
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _parse_links_in_pool(raw_links, default_name, workers):
+    """Parse *raw_links* on a process pool, a few chunks per worker, keeping order."""
+    size = -(-len(raw_links) // (workers * 4))
+    chunks = [raw_links[i:i + size] for i in range(0, len(raw_links), size)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        parsed = []
+        for chunk in pool.map(_parse_link_chunk, chunks, [default_name] * len(chunks)):
+            parsed.extend(chunk)
+    return parsed
@@ -17,7 +17,7 @@ from utils.distro_utils import get_ss_install_command
 from utils.platform_utils import is_windows
 from utils.server_manager import ServerManager
 from utils.engines.engine_manager import (
-    ensure_engine, EngineType, get_engine,
+    ensure_engine, EngineType, get_engine, resolve_engine_type,
 )
 
 PROVISIONING_MESSAGE = "Downloading proxy backend\u2026"
@@ -201,11 +201,7 @@ def provision_backend(engine_type=None) -> object | None:
     settings = mgr.settings
 
     if engine_type is None:
-        engine_type_str = settings.get("engine", "sslocal")
-        try:
-            engine_type = EngineType(engine_type_str)
-        except ValueError:
-            engine_type = EngineType.SSLOCAL
+        engine_type = resolve_engine_type(settings.get("engine", "sslocal"))
 
     engine = get_engine(engine_type)
     binary = engine.find_binary()
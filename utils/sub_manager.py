@@ -1,23 +1,72 @@
 import base64
 import binascii
+import codecs
+import copy
+import functools
 import ipaddress
+import itertools
 import json
 import logging
 import os
+import queue
 import re
-import tempfile
 import time
 import uuid
 import hashlib
+import http.client
+import ssl
+import threading
 import urllib.error
 import urllib.request
-from urllib.parse import quote, unquote, urlparse
+import zlib
+from urllib.parse import quote, unquote, urljoin, urlparse
 
+import socks
+
+from . import jsonio
+from .config_db import get_store
+from .persistence import atomic_write
 from .platform_utils import get_config_dir
+from .server_model import Server, is_private_host
 from . import twinsock
 
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+_DECOMPRESS_ERRORS = (zlib.error,) + ((brotli.error,) if brotli is not None else ())
+
 log = logging.getLogger(__name__)
 
+# Compressed bodies are inflated in chunks of this size, and a body that
+# inflates past the cap is rejected rather than held in memory.
+READ_CHUNK = 64 * 1024
+MAX_BODY_BYTES = 32 * 1024 * 1024
+# Links kept per subscription; aggregators beyond this are truncated.
+MAX_NODES = 100_000
+# The body format is picked from about this many leading bytes, looking for
+# links in the first few non-empty lines (panels may put a comment first).
+SNIFF_BYTES = 4 * 1024
+SNIFF_LINES = 5
+
+# Subscription fetch strategies (the ``sub_fetch_strategy`` setting).  Direct
+# and proxy double as the routes race mode remembers per panel host.
+FETCH_DIRECT = "direct"
+FETCH_PROXY = "proxy"
+FETCH_RACE = "race"
+FETCH_STRATEGY_LABELS = {
+    FETCH_DIRECT: "Direct",
+    FETCH_PROXY: "Through the tunnel",
+    FETCH_RACE: "Race direct and tunnel",
+}
+FETCH_TIMEOUT = 10
+
+SUPPORTED_LINK_PREFIXES = ('ss://', 'vless://', 'vmess://', 'hysteria2://', 'hy2://', 'tws3://', 'tws2://')
+
 
 # --- User-Agent presets ---
 
@@ -44,6 +93,20 @@ def _generate_hwid():
     return hashlib.md5(raw.encode()).hexdigest()[:16]
 
 
+def unique_subscription_name(name, taken) -> str:
+    """*name*, or "name (2)", "name (3)", ... when *taken* already has it.
+
+    Subscriptions are told apart by name (tabs, the server index, config.db
+    rows), and names default to the URL's host, which feeds may share.
+    """
+    candidate = name
+    n = 1
+    while candidate in taken:
+        n += 1
+        candidate = f"{name} ({n})"
+    return candidate
+
+
 def _subscriptions_path():
     return get_config_dir() / "subscriptions.json"
 
@@ -127,8 +190,34 @@ def _extract_description(headers, decoded_lines, announce, meta):
     return " ".join(preamble)
 
 
+def _sip008_link(host, port, method, password, plugin, plugin_opts, remarks):
+    """The SIP002 ss:// link for a SIP008 entry, used as the Server key."""
+    userinfo_b64 = base64.urlsafe_b64encode(
+        f"{method}:{password}".encode()
+    ).decode().rstrip('=')
+
+    link = f"ss://{userinfo_b64}@{host}:{port}"
+
+    # Add plugin if present
+    if plugin:
+        raw_plugin = plugin
+        if plugin_opts:
+            raw_plugin += ";" + plugin_opts
+        # Escape special chars, then percent-encode
+        escaped = raw_plugin.replace('\\', '\\\\').replace(';', '\\;').replace('=', '\\=')
+        link += "/?plugin=" + quote(escaped, safe='')
+
+    if remarks:
+        link += "#" + quote(remarks, safe='')
+    return link
+
+
 def _try_parse_sip008_json(content):
-    """Try to parse content as SIP008 JSON. Returns (ss_links, meta) or None."""
+    """Try to parse content as SIP008 JSON. Returns (servers, meta) or None.
+
+    Servers are built straight from the JSON fields; only their ``key``
+    link is generated, so nothing is decoded back from a link.
+    """
     try:
         data = json.loads(content)
     except (json.JSONDecodeError, ValueError):
@@ -137,45 +226,41 @@ def _try_parse_sip008_json(content):
     if not isinstance(data, dict) or data.get('version') != 1:
         return None
 
-    servers = data.get('servers', [])
-    if not isinstance(servers, list):
+    entries = data.get('servers', [])
+    if not isinstance(entries, list):
         return None
 
-    ss_links = []
-    for srv in servers:
+    servers = []
+    for srv in entries:
         if not isinstance(srv, dict):
             continue
-        host = srv.get('server', '')
-        port = srv.get('server_port', 443)
-        method = srv.get('method', '')
-        password = srv.get('password', '')
-        plugin = srv.get('plugin', '')
-        plugin_opts = srv.get('plugin_opts', '')
-        remarks = srv.get('remarks', '')
+        host = str(srv.get('server', '') or '')
+        method = str(srv.get('method', '') or '')
+        password = str(srv.get('password', '') or '')
+        plugin = str(srv.get('plugin', '') or '')
+        plugin_opts = str(srv.get('plugin_opts', '') or '')
+        remarks = str(srv.get('remarks', '') or '')
 
         if not host or not method:
             continue
+        try:
+            port = int(srv.get('server_port', 443))
+        except (TypeError, ValueError):
+            continue
+        if not 0 < port < 65536:
+            continue
 
-        # Build ss:// link in SIP002 format
-        userinfo_b64 = base64.urlsafe_b64encode(
-            f"{method}:{password}".encode()
-        ).decode().rstrip('=')
-
-        link = f"ss://{userinfo_b64}@{host}:{port}"
-
-        # Add plugin if present
-        if plugin:
-            raw_plugin = plugin
-            if plugin_opts:
-                raw_plugin += ";" + plugin_opts
-            # Escape special chars, then percent-encode
-            escaped = raw_plugin.replace('\\', '\\\\').replace(';', '\\;').replace('=', '\\=')
-            link += "/?plugin=" + quote(escaped, safe='')
-
-        if remarks:
-            link += "#" + quote(remarks, safe='')
-
-        ss_links.append(link)
+        servers.append(Server(
+            key=_sip008_link(host, port, method, password, plugin, plugin_opts, remarks),
+            name=remarks or "Server",
+            host=host,
+            port=port,
+            method=method,
+            password=password,
+            plugin=plugin,
+            plugin_opts=plugin_opts,
+            is_private=is_private_host(host),
+        ))
 
     meta = {}
     if 'bytes_used' in data or 'bytes_remaining' in data:
@@ -190,10 +275,523 @@ def _try_parse_sip008_json(content):
         except (ValueError, TypeError):
             meta['traffic'] = {'used': 0, 'total': 0, 'expire': 0}
 
-    return ss_links, meta
+    return servers, meta
+
+
+# Parsers for structured (JSON) subscription bodies, tried in order.  Each
+# takes the body text and returns (servers, meta) or None.
+STRUCTURED_PARSERS = (_try_parse_sip008_json,)
+
+
+def accept_encoding():
+    """Value for the Accept-Encoding header; brotli only when importable."""
+    return "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+
+def _decompressor(encoding):
+    """Return a callable(chunk) -> bytes for *encoding*, or None for identity."""
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("", "identity"):
+        return None
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+    if encoding == "deflate":
+        # "deflate" is meant to be zlib-wrapped, but some servers send raw
+        # deflate; pick based on the first chunk.
+        state = {}
+
+        def inflate(chunk):
+            if "obj" not in state:
+                try:
+                    obj = zlib.decompressobj(zlib.MAX_WBITS)
+                    out = obj.decompress(chunk)
+                except zlib.error:
+                    obj = zlib.decompressobj(-zlib.MAX_WBITS)
+                    out = obj.decompress(chunk)
+                state["obj"] = obj
+                return out
+            return state["obj"].decompress(chunk)
+        return inflate
+    if encoding == "br" and brotli is not None:
+        return brotli.Decompressor().process
+    raise ValueError(f"unsupported Content-Encoding: {encoding}")
+
+
+def _iter_body(response, max_bytes=MAX_BODY_BYTES):
+    """Yield the response body in chunks, inflating gzip/deflate/br on the way."""
+    decompress = _decompressor(response.headers.get('Content-Encoding', ''))
+    total = 0
+    while True:
+        chunk = response.read(READ_CHUNK)
+        if not chunk:
+            break
+        if decompress is not None:
+            try:
+                chunk = decompress(chunk)
+            except _DECOMPRESS_ERRORS as e:
+                raise ValueError(f"corrupt compressed body: {e}") from e
+        total += len(chunk)
+        if total > max_bytes:
+            raise ValueError("subscription body too large")
+        if chunk:
+            yield chunk
+
+
+_B64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=-_"
+_B64_DROP = bytes(c for c in range(256) if c not in _B64_ALPHABET)
+_B64_URLSAFE = bytes.maketrans(b"-_", b"+/")
+
+
+def _iter_b64decode(chunks):
+    """Decode base64 arriving in arbitrary chunks.
+
+    Like the whole-body decode it replaces: whitespace and other stray
+    bytes are ignored, the urlsafe alphabet is accepted and missing
+    padding is tolerated.
+    """
+    pending = b""
+    for chunk in chunks:
+        data = pending + chunk.translate(_B64_URLSAFE, _B64_DROP)
+        cut = len(data) - len(data) % 4
+        pending = data[cut:]
+        if cut:
+            yield base64.b64decode(data[:cut])
+    if len(pending) % 4 == 1:
+        pending = pending[:-1]  # a lone trailing character carries no byte
+    if pending:
+        yield base64.b64decode(pending + b"=" * (-len(pending) % 4))
+
+
+def _iter_lines(chunks):
+    """Split UTF-8 byte chunks into text lines without joining the whole body."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    tail = ""
+    for chunk in chunks:
+        parts = (tail + decoder.decode(chunk)).split("\n")
+        tail = parts.pop()
+        yield from parts
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _decodes_as_base64(head):
+    """True when *head* (the start of a body) is base64 of UTF-8 text."""
+    data = head.translate(None, b" \t\r\n")
+    if data.translate(None, _B64_ALPHABET):
+        return False  # bytes outside the alphabet: not base64 at all
+    data = data.rstrip(b"=").translate(_B64_URLSAFE)
+    data = data[:len(data) - len(data) % 4]
+    try:
+        # Not final: the head may end inside a multi-byte character.
+        codecs.getincrementaldecoder('utf-8')().decode(base64.b64decode(data))
+    except (binascii.Error, UnicodeDecodeError):
+        return False
+    return True
+
+
+def _body_kind(head, content_type):
+    """Classify a body from its first bytes: "json", "plain" or "base64".
+
+    A body counts as plain text when one of its first SNIFF_LINES non-empty
+    lines holds a link, or when its start does not decode as base64 text.
+    """
+    head = head.lstrip()
+    if 'application/json' in content_type or head.startswith(b'{'):
+        return "json"
+    lines = [line for line in head.split(b"\n") if line.strip()][:SNIFF_LINES]
+    if any(b"://" in line for line in lines) or not _decodes_as_base64(head):
+        return "plain"
+    return "base64"
+
+
+def _collect_links(lines, max_nodes, meta):
+    """Pick supported links out of *lines*, keeping the preamble for the description."""
+    links = []
+    preamble = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith(SUPPORTED_LINK_PREFIXES):
+            if len(links) >= max_nodes:
+                log.warning("Subscription has more than %d nodes; ignoring the rest", max_nodes)
+                meta['truncated'] = True
+                break
+            links.append(line)
+        elif not links and line and len(preamble) < 10 and not line.startswith("base64:"):
+            preamble.append(line)
+    return links, preamble
+
+
+def _request_variant(headers):
+    """Identify the request headers that shape the response body.
+
+    Providers serve different formats per User-Agent/HWID, so cached
+    validators only apply while those stay the same.
+    """
+    raw = f"{headers.get('User-Agent', '')}\n{headers.get('X-hwid', '')}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _http_cache(response, variant):
+    """Collect ETag/Last-Modified from *response* for the next conditional GET."""
+    cache = {}
+    etag = response.headers.get('ETag')
+    if etag:
+        cache['etag'] = etag
+    last_modified = response.headers.get('Last-Modified')
+    if last_modified:
+        cache['last_modified'] = last_modified
+    if cache:
+        cache['variant'] = variant
+    return cache
+
+
+class _PooledResponse:
+    """Response from KeepAlivePool; hands the connection back on exit."""
+
+    def __init__(self, pool, key, conn, response):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.headers = response.headers
+
+    def read(self, size=-1):
+        return self._response.read() if size is None or size < 0 else self._response.read(size)
+
+    def close(self):
+        self._pool._finish(self._key, self._conn, self._response)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class KeepAlivePool:
+    """Reuses one HTTP(S) connection per host across subscription fetches.
+
+    urllib opens a fresh connection (and TLS handshake) for every request;
+    a refresh round that fetches several subscriptions from the same panel
+    reuses the connection instead.  Responses mirror ``urlopen``: non-2xx
+    statuses raise ``urllib.error.HTTPError`` and redirects are followed.
+    """
+
+    MAX_REDIRECTS = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = {}  # (scheme, host, port) -> connection
+
+    def _connect(self, key, timeout):
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(
+                host, port, timeout=timeout, context=ssl.create_default_context())
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _request(self, key, path, headers, timeout, method="GET"):
+        with self._lock:
+            conn = self._idle.pop(key, None)
+        if conn is not None:
+            try:
+                conn.request(method, path, headers=headers)
+                return conn, conn.getresponse()
+            except (ConnectionResetError, BrokenPipeError, http.client.BadStatusLine):
+                # The server dropped the idle connection; retry on a new one.
+                conn.close()
+        conn = self._connect(key, timeout)
+        try:
+            conn.request(method, path, headers=headers)
+            return conn, conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+
+    def _finish(self, key, conn, response):
+        """Pool *conn* if its response was fully read and allows reuse."""
+        if response.isclosed() and not response.will_close:
+            with self._lock:
+                old = self._idle.pop(key, None)
+                self._idle[key] = conn
+            if old is not None:
+                old.close()
+        else:
+            conn.close()
+
+    def urlopen(self, url, headers, timeout=10, method="GET"):
+        for _ in range(self.MAX_REDIRECTS + 1):
+            parsed = urlparse(url)
+            scheme = parsed.scheme.lower()
+            if scheme not in ("http", "https") or not parsed.hostname:
+                raise urllib.error.URLError(f"unsupported URL: {url}")
+            key = (scheme, parsed.hostname, parsed.port)
+            path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+            conn, response = self._request(key, path, headers, timeout, method)
+            if 200 <= response.status < 300:
+                return _PooledResponse(self, key, conn, response)
+            location = response.getheader("Location")
+            response.read()
+            self._finish(key, conn, response)
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            raise urllib.error.HTTPError(url, response.status, response.reason,
+                                         response.headers, None)
+        raise urllib.error.URLError(f"too many redirects: {url}")
+
+    def close(self):
+        with self._lock:
+            conns = list(self._idle.values())
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+
+def _open(req, pool):
+    """Open *req* through *pool* when possible, else through urllib."""
+    scheme = urlparse(req.full_url).scheme.lower()
+    # urllib is what honours system/environment proxy settings.
+    if pool is None or urllib.request.getproxies().get(scheme):
+        return urllib.request.urlopen(req, timeout=FETCH_TIMEOUT)
+    return pool.urlopen(req.full_url, dict(req.header_items()), timeout=FETCH_TIMEOUT,
+                        method=req.get_method())
+
+
+def _socks_socket(port, host, timeout):
+    sock = socks.socksocket()
+    sock.set_proxy(socks.SOCKS5, "127.0.0.1", int(port), rdns=True)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(host)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+class _SocksHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, socks_port, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._socks_port = socks_port
+
+    def connect(self):
+        self.sock = _socks_socket(self._socks_port, (self.host, self.port), self.timeout)
+
+
+class _SocksHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, socks_port, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._socks_port = socks_port
+
+    def connect(self):
+        sock = _socks_socket(self._socks_port, (self.host, self.port), self.timeout)
+        self.sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+
+
+class _SocksHandler(urllib.request.HTTPHandler, urllib.request.HTTPSHandler):
+    """urllib handler that dials through the local SOCKS5 tunnel."""
+
+    def __init__(self, port):
+        urllib.request.HTTPHandler.__init__(self)
+        urllib.request.HTTPSHandler.__init__(self)
+        self._port = port
+
+    def http_open(self, req):
+        return self.do_open(functools.partial(_SocksHTTPConnection, socks_port=self._port), req)
 
+    def https_open(self, req):
+        return self.do_open(functools.partial(_SocksHTTPSConnection, socks_port=self._port), req)
 
-def parse_subscription(url, settings=None):
+
+def _open_proxied(req, port):
+    """Open *req* through the SOCKS5 tunnel on 127.0.0.1:*port*."""
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), _SocksHandler(port))
+    return opener.open(req, timeout=FETCH_TIMEOUT)
+
+
+def _open_route(route, req, pool, port):
+    return _open_proxied(req, port) if route == FETCH_PROXY else _open(req, pool)
+
+
+# Panel host -> route (FETCH_DIRECT / FETCH_PROXY) that won its last race.
+# parse_subscription seeds it from, and records it in, the subscription's
+# ``http_cache`` so the route survives restarts.
+_preferred_routes = {}
+_routes_lock = threading.Lock()
+
+
+def _seed_route(host, http_cache):
+    """Take the route stored in *http_cache* for *host* unless one is known already."""
+    route = (http_cache or {}).get('route')
+    if route in (FETCH_DIRECT, FETCH_PROXY):
+        with _routes_lock:
+            _preferred_routes.setdefault(host, route)
+
+
+def _with_route(cache, host):
+    """*cache* with the current preferred route for *host* recorded in it."""
+    with _routes_lock:
+        route = _preferred_routes.get(host)
+    if route:
+        cache['route'] = route
+    else:
+        cache.pop('route', None)
+    return cache
+
+
+def _request_copy(req):
+    """A copy of *req* that opening it cannot change under another thread."""
+    clone = copy.copy(req)
+    clone.headers = dict(req.headers)
+    clone.unredirected_hdrs = dict(req.unredirected_hdrs)
+    return clone
+
+
+def _answered(response, error):
+    """A response, or a 304 for a conditional request, settles a race."""
+    return response is not None or (
+        isinstance(error, urllib.error.HTTPError) and error.code == 304)
+
+
+def _race(req, pool, port):
+    """Open *req* directly and through the tunnel at once.
+
+    Returns (route, response) for the first answer; the slower response is
+    closed when it arrives.  Raises the last error when both routes fail.
+    Each attempt opens its own copy of *req*.
+    """
+    lock = threading.Lock()
+    state = {"winner": None, "pending": 2}
+    results = queue.Queue()
+
+    def attempt(route):
+        response = error = None
+        try:
+            response = _open_route(route, _request_copy(req), pool, port)
+        except Exception as e:
+            error = e
+        with lock:
+            state["pending"] -= 1
+            if _answered(response, error) and state["winner"] is None:
+                state["winner"] = route
+                results.put((route, response, error))
+                return
+            last = state["pending"] == 0 and state["winner"] is None
+        if response is not None:
+            response.close()
+        elif isinstance(error, urllib.error.HTTPError) and not last:
+            error.close()
+        if last:
+            results.put((route, None, error))
+
+    for route in (FETCH_DIRECT, FETCH_PROXY):
+        threading.Thread(target=attempt, args=(route,), daemon=True).start()
+    route, response, error = results.get()
+    if error is not None:
+        raise error
+    return route, response
+
+
+def _open_with_strategy(req, pool, settings):
+    """Open *req* the way the ``fetch_strategy`` setting asks.
+
+    Proxy and race modes need ``proxy_port`` (the running tunnel's local
+    SOCKS5 port) and fall back to a direct fetch without it.  Race mode
+    reuses the route that last won for the panel host, and races again
+    when that route fails.
+    """
+    strategy = settings.get("fetch_strategy") or FETCH_DIRECT
+    port = settings.get("proxy_port")
+    if strategy not in (FETCH_PROXY, FETCH_RACE) or not port:
+        return _open(req, pool)
+    if strategy == FETCH_PROXY:
+        return _open_proxied(req, port)
+
+    host = urlparse(req.full_url).hostname or ''
+    with _routes_lock:
+        route = _preferred_routes.get(host)
+    if route is not None:
+        try:
+            return _open_route(route, req, pool, port)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                raise
+            log.info("Subscription fetch via %s failed for %s; racing again", route, host)
+        except (urllib.error.URLError, OSError, http.client.HTTPException):
+            log.info("Subscription fetch via %s failed for %s; racing again", route, host)
+        with _routes_lock:
+            _preferred_routes.pop(host, None)
+    route, response = _race(req, pool, port)
+    with _routes_lock:
+        _preferred_routes[host] = route
+    log.info("Subscription host %s answered first via %s", host, route)
+    return response
+
+
+def _checked_url(url):
+    """Return urlparse(*url*), or None when it must not be fetched."""
+    parsed = urlparse(url)
+    if parsed.scheme.lower() not in ("https", "http"):
+        log.warning("Blocked subscription URL with scheme: %s", parsed.scheme)
+        return None
+    if parsed.scheme.lower() == "http":
+        log.warning("Subscription URL uses HTTP (not HTTPS): %s", url)
+    try:
+        ip = ipaddress.ip_address(parsed.hostname)
+        if ip.is_private or ip.is_loopback or ip.is_link_local:
+            log.warning("Blocked subscription URL pointing to private/local IP: %s", url)
+            return None
+    except (ValueError, AttributeError):
+        pass  # hostname is a domain name or None — OK
+    return parsed
+
+
+def _client_headers(settings):
+    """User-Agent and optional X-hwid headers identifying us to the panel."""
+    ua_key = settings.get("user_agent_key", "socksicle")
+    headers = {'User-Agent': USER_AGENT_PRESETS.get(ua_key, USER_AGENT_PRESETS["socksicle"])}
+    if settings.get("fake_hwid", False):
+        hwid_val = settings.get("hwid_value", "").strip()
+        if not hwid_val:
+            hwid_val = _generate_hwid()
+        headers['X-hwid'] = hwid_val
+    return headers
+
+
+def fetch_subscription_quota(url, settings=None, pool=None):
+    """Read a subscription's metadata headers without downloading its links.
+
+    Sends HEAD, and when the panel rejects it or leaves out
+    ``Subscription-Userinfo``, a GET for a single byte whose body is never
+    read.  Returns the ``_extract_metadata`` dict (with ``traffic`` when the
+    panel reports it), or {} on failure.  Takes the same settings and pool
+    as parse_subscription.
+    """
+    settings = settings or {}
+    if _checked_url(url) is None:
+        return {}
+    headers = _client_headers(settings)
+    meta = {}
+    for method, extra in (("HEAD", {}), ("GET", {'Range': 'bytes=0-0'})):
+        req = urllib.request.Request(url, headers=dict(headers, **extra), method=method)
+        try:
+            with _open_with_strategy(req, pool, settings) as response:
+                meta = _extract_metadata(response)
+        except urllib.error.HTTPError as e:
+            # 405/501 for HEAD, 416 for the range: try the next request kind.
+            log.debug("Quota %s for %s failed: HTTP %s", method, urlparse(url).hostname, e.code)
+            continue
+        except (urllib.error.URLError, OSError, TimeoutError, http.client.HTTPException) as e:
+            log.warning("Subscription quota fetch error for URL: %s — %s", url, e)
+            return {}
+        if 'traffic' in meta:
+            break
+    return meta
+
+
+def parse_subscription(url, settings=None, http_cache=None, pool=None):
     """Fetch and parse a shadowsocks subscription.
 
     Args:
@@ -202,95 +800,169 @@ def parse_subscription(url, settings=None):
             - user_agent_key: str key from USER_AGENT_PRESETS
             - fake_hwid: bool whether to send X-hwid header
             - hwid_value: str custom HWID value (if empty, auto-generate)
+            - max_body_bytes: int cap on the decoded body size
+            - max_nodes: int cap on the number of links returned
+            - fetch_strategy: FETCH_DIRECT, FETCH_PROXY or FETCH_RACE
+            - proxy_port: local SOCKS5 port of the running tunnel, if any
+        http_cache: Optional ``meta['http_cache']`` from an earlier fetch;
+            its ETag/Last-Modified are sent as a conditional GET, and its
+            ``route`` is the race winner remembered for the host.
+        pool: Optional KeepAlivePool shared by a batch of fetches.
 
-    Returns (ss_links, metadata_dict).
+    Returns (entries, metadata_dict).  Entries are link strings, or ready
+    Server objects for structured formats such as SIP008.  When the server
+    answers 304 Not Modified, entries is empty and metadata_dict has
+    ``not_modified: True``.  A fetch puts the response validators and the
+    preferred race route in ``metadata_dict['http_cache']``.
 
     Supports:
     - Base64-encoded link lists (standard)
     - SIP008 JSON format
     - Extended HTTP headers for metadata
+    - gzip/deflate (and brotli when installed) response compression
     """
     settings = settings or {}
-    parsed = urlparse(url)
-    if parsed.scheme.lower() not in ("https", "http"):
-        log.warning("Blocked subscription URL with scheme: %s", parsed.scheme)
+    max_bytes = settings.get("max_body_bytes") or MAX_BODY_BYTES
+    max_nodes = settings.get("max_nodes") or MAX_NODES
+    parsed = _checked_url(url)
+    if parsed is None:
         return [], {}
-    if parsed.scheme.lower() == "http":
-        log.warning("Subscription URL uses HTTP (not HTTPS): %s", url)
-    try:
-        ip = ipaddress.ip_address(parsed.hostname)
-        if ip.is_private or ip.is_loopback or ip.is_link_local:
-            log.warning("Blocked subscription URL pointing to private/local IP: %s", url)
-            return [], {}
-    except (ValueError, AttributeError):
-        pass  # hostname is a domain name or None — OK
     try:
-        # Build User-Agent
-        ua_key = settings.get("user_agent_key", "socksicle")
-        user_agent = USER_AGENT_PRESETS.get(ua_key, USER_AGENT_PRESETS["socksicle"])
-
-        # Build headers
-        headers = {'User-Agent': user_agent}
-
-        # HWID header
-        if settings.get("fake_hwid", False):
-            hwid_val = settings.get("hwid_value", "").strip()
-            if not hwid_val:
-                hwid_val = _generate_hwid()
-            headers['X-hwid'] = hwid_val
-
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req, timeout=10) as response:
-            raw_content = response.read().decode('utf-8').strip()
+        headers = _client_headers(settings)
+        variant = _request_variant(headers)
+        request_headers = dict(headers, **{'Accept-Encoding': accept_encoding()})
+        if http_cache and http_cache.get('variant') == variant:
+            if http_cache.get('etag'):
+                request_headers['If-None-Match'] = http_cache['etag']
+            if http_cache.get('last_modified'):
+                request_headers['If-Modified-Since'] = http_cache['last_modified']
+
+        host = parsed.hostname or ''
+        _seed_route(host, http_cache)
+        req = urllib.request.Request(url, headers=request_headers)
+        try:
+            response_cm = _open_with_strategy(req, pool, settings)
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                raise
+            log.info("Subscription not modified: %s", parsed.hostname)
+            meta = _extract_metadata(e)
+            meta['not_modified'] = True
+            cache = _with_route(dict(http_cache or {}), host)
+            if cache:
+                meta['http_cache'] = cache
+            return [], meta
+        with response_cm as response:
             content_type = response.headers.get('Content-Type', '')
 
             # Extract extended metadata from headers
             meta = _extract_metadata(response)
+            cache = _with_route(_http_cache(response, variant), host)
+            if cache:
+                meta['http_cache'] = cache
 
-            # Check for SIP008 JSON format
-            is_json = (
-                'application/json' in content_type
-                or (raw_content.startswith('{') and raw_content.endswith('}'))
-            )
-            if is_json:
-                result = _try_parse_sip008_json(raw_content)
-                if result is not None:
-                    ss_links, json_meta = result
-                    meta.update(json_meta)
-                    return ss_links, meta
-
-            # Standard base64 format (strip whitespace/newlines and handle urlsafe/unpadded base64)
-            try:
-                clean_b64 = re.sub(r'\s+', '', raw_content).replace('-', '+').replace('_', '/')
-                padded_b64 = clean_b64 + '=' * (-len(clean_b64) % 4)
-                decoded_content = base64.b64decode(padded_b64).decode('utf-8', errors='replace')
-            except Exception as e:
-                log.warning("Base64 decode failed, using raw content: %s", e)
-                decoded_content = raw_content
-
-            decoded_lines = decoded_content.splitlines()
-            if 'description' not in meta or not meta['description']:
-                meta['description'] = _extract_description(
-                    headers, decoded_lines, meta.get('announce', ''), meta)
+            # Peek at the start of the body to pick a decoder, then stream
+            # the rest through it.
+            chunks = _iter_body(response, max_bytes)
+            head = b""
+            for chunk in chunks:
+                head += chunk
+                if len(head.lstrip()) >= SNIFF_BYTES:
+                    break
+            kind = _body_kind(head, content_type)
+            body = itertools.chain((head,), chunks)
 
-            supported_prefixes = ('ss://', 'vless://', 'vmess://', 'hysteria2://', 'hy2://', 'tws3://', 'tws2://')
-            links = [
-                line.strip() for line in decoded_lines
-                if line.strip().startswith(supported_prefixes)
-            ]
+            if kind == "json":
+                # SIP008 is a single JSON document; it is bounded by max_bytes.
+                raw = b"".join(body)
+                text = raw.decode('utf-8').strip()
+                for parser in STRUCTURED_PARSERS:
+                    result = parser(text)
+                    if result is not None:
+                        servers, json_meta = result
+                        meta.update(json_meta)
+                        return servers[:max_nodes], meta
+                body = (raw,)
+            if kind != "plain":
+                body = _iter_b64decode(body)
 
+            links, preamble = _collect_links(_iter_lines(body), max_nodes, meta)
+            if 'description' not in meta or not meta['description']:
+                meta['description'] = _extract_description(
+                    headers, preamble, meta.get('announce', ''), meta)
             return links, meta
-    except (urllib.error.URLError, OSError, TimeoutError, json.JSONDecodeError, ValueError) as e:
+    except (urllib.error.URLError, OSError, TimeoutError, http.client.HTTPException,
+            json.JSONDecodeError, ValueError) as e:
         log.error("Subscription fetch/parse error for URL: %s — %s", url, e)
         return [], {}
 
 
-def _seal_subscription(sub):
+# Sealed server dicts from the last save, keyed by vault key id, record
+# format and a keyed digest of the plain dict (never the dict itself, which
+# holds the secrets): servers a refresh left alone are written without being
+# encrypted again.  In the tws4 record format the unit is the whole
+# subscription (URL plus server array).  Holds at most SEAL_CACHE_SIZE
+# entries and is dropped with the vault key.
+SEAL_CACHE_SIZE = 100_000
+_SEAL_CACHE_PURPOSE = "seal-cache"
+_seal_cache = {}
+
+
+def _forget_seal_cache():
+    global _seal_cache
+    _seal_cache = {}
+
+
+twinsock.on_key_change(_forget_seal_cache)
+
+
+def _cache_digest(value):
+    # Secrets still sealed since load are identified by their token.
+    def sealed_token(value):
+        if isinstance(value, twinsock.Sealed):
+            return value.ident
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+    return twinsock.lookup_digest(
+        _SEAL_CACHE_PURPOSE, json.dumps(value, sort_keys=True, default=sealed_token))
+
+
+def _cache_sealed(fresh, cache_key, sealed):
+    if len(fresh) < SEAL_CACHE_SIZE:
+        fresh[cache_key] = sealed
+
+
+def _seal_subscription(sub, key_id, fresh):
     d = dict(sub)
+    fmt = twinsock.record_format()
+    if fmt == twinsock.RECORD_FORMAT_RECORDS:
+        plain = [s.to_dict(reveal=False) if hasattr(s, "to_dict") else dict(s) for s in d.get("servers", [])]
+        url = d.pop("url", "")
+        cache_key = (key_id, fmt, _cache_digest([url, plain]))
+        sealed = _seal_cache.get(cache_key)
+        if sealed is None:
+            sealed = twinsock.seal_group(
+                "subscriptions", {"url": url, "servers": plain}, "servers",
+                twinsock.SECRET_FIELDS, ("url",))
+        _cache_sealed(fresh, cache_key, sealed)
+        d.update(sealed)
+        return d
     servers = []
+    missing = []  # (position, cache key, plain dict) not in _seal_cache
     for s in d.get("servers", []):
-        s_dict = s.to_dict() if hasattr(s, "to_dict") else dict(s)
-        servers.append(twinsock.seal_dict("subscriptions", s_dict, twinsock.SECRET_FIELDS))
+        s_dict = s.to_dict(reveal=False) if hasattr(s, "to_dict") else dict(s)
+        cache_key = (key_id, fmt, _cache_digest(s_dict))
+        sealed = _seal_cache.get(cache_key)
+        if sealed is None:
+            missing.append((len(servers), cache_key, s_dict))
+        else:
+            _cache_sealed(fresh, cache_key, sealed)
+        servers.append(sealed)
+    if missing:
+        sealed_dicts = twinsock.seal_dicts(
+            "subscriptions", [s_dict for _, _, s_dict in missing], twinsock.SECRET_FIELDS)
+        for (pos, cache_key, _), sealed in zip(missing, sealed_dicts):
+            _cache_sealed(fresh, cache_key, sealed)
+            servers[pos] = sealed
     d["servers"] = servers
     d["url"] = twinsock.encrypt_field("subscriptions", d.get("url", ""))
     return d
@@ -307,10 +979,22 @@ def _retire_foreign(path):
 
 
 def save_subscriptions(subs):
+    store = get_store()
+    if store is not None:
+        store.save_subscriptions(subs)
+        return
+    _save_subscriptions_json(subs)
+
+
+def _save_subscriptions_json(subs):
+    global _seal_cache
     path = _subscriptions_path()
     while True:
         try:
-            sealed = [_seal_subscription(sub) for sub in subs]
+            fresh = {}
+            key_id = twinsock.key_id()
+            sealed = [_seal_subscription(sub, key_id, fresh) for sub in subs]
+            _seal_cache = fresh
             break
         except twinsock.VaultError as e:
             if str(e) != "foreign":
@@ -319,30 +1003,36 @@ def save_subscriptions(subs):
             _retire_foreign(str(path))
             twinsock.drop_foreign()
             continue
-    with tempfile.NamedTemporaryFile(
-            mode='w', dir=str(path.parent), delete=False,
-            encoding="utf-8", suffix='.tmp') as f:
-        json.dump(sealed, f)
-        tmp_name = f.name
-    try:
-        os.replace(tmp_name, str(path))
-    except BaseException:
-        try:
-            os.remove(tmp_name)
-        except OSError:
-            pass
-        raise
-    twinsock.file_saved("subscriptions.json")
+    data = jsonio.dumps(sealed)
+    atomic_write(path, data)
+    twinsock.file_saved("subscriptions.json", data)
 
 
 def load_subscriptions():
+    store = get_store()
+    if store is None:
+        subs = load_subscriptions_json()
+    else:
+        try:
+            subs = store.load_subscriptions()
+        except twinsock.VaultError as e:
+            log.warning("vault: subscriptions unusable on this machine: %s", e)
+            return []
+    if twinsock.migration_occurred():
+        save_subscriptions(subs)
+    return subs
+
+
+def load_subscriptions_json():
+    """Read subscriptions.json whatever the storage backend (used to migrate)."""
     path = _subscriptions_path()
     if not path.exists():
         return []
-    twinsock.file_intact("subscriptions.json")
     try:
-        with open(path, 'r', encoding="utf-8", errors="replace") as f:
-            raw = json.load(f)
+        with open(path, 'rb') as f:
+            data = f.read()
+        twinsock.file_intact("subscriptions.json", data)
+        raw = jsonio.loads(data)
     except (json.JSONDecodeError, OSError, ValueError) as e:
         log.error("Failed to load subscriptions: %s", e)
         return []
@@ -353,21 +1043,16 @@ def load_subscriptions():
         if not isinstance(d, dict):
             continue
         try:
-            d = twinsock.unseal_dict("subscriptions", d, ("url",))
+            d = twinsock.unseal_group(
+                "subscriptions", d, "servers", twinsock.SECRET_FIELDS, ("url",), lazy=True)
         except twinsock.VaultError as e:
             log.warning("vault: subscriptions unusable on this machine: %s", e)
             return []
-        servers = []
-        for s in d.get("servers", []):
-            if isinstance(s, dict):
-                try:
-                    s = twinsock.unseal_dict("subscriptions", s, twinsock.SECRET_FIELDS)
-                except twinsock.VaultError as e:
-                    log.warning("vault: subscriptions unusable on this machine: %s", e)
-                    return []
-            servers.append(s)
-        d["servers"] = servers
+        d.setdefault("url", "")
+        name = str(d.get("name") or "Subscription")
+        d["name"] = unique_subscription_name(name, {sub["name"] for sub in subs})
+        if d["name"] != name:
+            log.warning("Subscription name %r is used twice; loading the second as %r",
+                        name, d["name"])
         subs.append(d)
-    if twinsock.migration_occurred():
-        save_subscriptions(subs)
     return subs
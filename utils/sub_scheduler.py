@@ -0,0 +1,108 @@
+"""Subscription refresh scheduling: a due-time priority queue with backoff.
+
+Each subscription with a ``profile_update_interval`` is due at
+``last_updated + interval``.  A failed refresh is retried after an
+exponential backoff instead of on the next timer tick, and a success
+resets it; subscriptions without an interval are never retried.
+SubscriptionManager pops everything due on each tick and refreshes it as
+one round.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+BASE_BACKOFF_S = 5 * 60
+MAX_BACKOFF_S = 6 * 3600
+
+# Refresh rounds: worker threads, and the spread of their start times so a
+# round does not hit every panel in the same instant.
+MAX_CONCURRENT_REFRESHES = 4
+START_JITTER_S = 2.0
+
+
+def backoff_delay(failures: int) -> float:
+    """Seconds to wait after the *failures*-th consecutive failure."""
+    if failures <= 0:
+        return 0.0
+    return min(MAX_BACKOFF_S, BASE_BACKOFF_S * 2 ** (failures - 1))
+
+
+class RefreshQueue:
+    """Min-heap of (due time, subscription name) with per-name failure counts.
+
+    Rescheduling a name pushes a new heap entry and leaves the old one in
+    place; stale entries are skipped when popped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []          # (due, seq, name)
+        self._due = {}           # name -> due of its live heap entry
+        self._failures = {}      # name -> consecutive failures
+        self._in_flight = set()
+        self._seq = itertools.count()
+
+    def _push(self, name, due):
+        self._due[name] = due
+        heapq.heappush(self._heap, (due, next(self._seq), name))
+
+    def sync(self, subs):
+        """Track the subscriptions in *subs*, dropping ones that are gone."""
+        with self._lock:
+            names = set()
+            for sub in subs:
+                name = sub['name']
+                names.add(name)
+                if name in self._due or name in self._in_flight:
+                    continue
+                interval_hours = sub.get('profile_update_interval', 0) or 0
+                if interval_hours > 0:
+                    self._push(name, sub.get('last_updated', 0) + interval_hours * 3600)
+            for name in list(self._due):
+                if name not in names:
+                    del self._due[name]
+                    self._failures.pop(name, None)
+
+    def pop_due(self, now=None) -> list:
+        """Names due at *now*, earliest first; they stay in flight until recorded."""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, _, name = heapq.heappop(self._heap)
+                if self._due.get(name) != when:
+                    continue
+                del self._due[name]
+                self._in_flight.add(name)
+                due.append(name)
+        return due
+
+    def record(self, name, ok, interval_hours=0, now=None):
+        """Schedule *name*'s next refresh after an attempt."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._in_flight.discard(name)
+            if ok:
+                self._failures.pop(name, None)
+                if interval_hours and interval_hours > 0:
+                    self._push(name, now + interval_hours * 3600)
+                else:
+                    self._due.pop(name, None)
+            else:
+                failures = self._failures.get(name, 0) + 1
+                self._failures[name] = failures
+                # Without an interval the subscription is refreshed by hand
+                # only, so there is nothing to retry in the background.
+                if interval_hours and interval_hours > 0:
+                    self._push(name, now + backoff_delay(failures))
+                else:
+                    self._due.pop(name, None)
+
+    def failures(self, name) -> int:
+        with self._lock:
+            return self._failures.get(name, 0)
+
+    def next_due(self, name):
+        with self._lock:
+            return self._due.get(name)
@@ -1,32 +1,159 @@
 """Subscription state: load/save, add/update/delete, traffic summary, auto-update."""
+import logging
+import random
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
+from urllib.parse import urlparse
 
 from PySide6.QtCore import QObject, Signal, QTimer
 
-from .server_model import Server
-from .sub_manager import load_subscriptions, parse_subscription, save_subscriptions
+from .persistence import get_persistence
+from .server_index import get_server_index
+from .server_model import Server, lookup_key
+from .sub_manager import (FETCH_DIRECT, KeepAlivePool, fetch_subscription_quota,
+                          load_subscriptions, parse_subscription, save_subscriptions,
+                          unique_subscription_name)
+from .sub_scheduler import MAX_CONCURRENT_REFRESHES, START_JITTER_S, RefreshQueue
+
+log = logging.getLogger(__name__)
 
 # How often the auto-update timer checks subscriptions for pending refreshes.
 AUTO_UPDATE_INTERVAL_MS = 5 * 60 * 1000
+# Quota refreshes only read the Subscription-Userinfo headers, so traffic and
+# expiry can be kept current far more often than the node lists.
+QUOTA_REFRESH_INTERVAL_MS = 15 * 60 * 1000
+
+
+# Subscription fields a refresh may change; a refresh that leaves these and
+# the server list alone is not written back to disk.
+_REFRESHED_FIELDS = ('traffic', 'profile_title', 'support_url', 'profile_web_page_url',
+                     'announce', 'description', 'profile_update_interval', 'http_cache')
+
+
+@dataclass
+class SubscriptionDiff:
+    """What a refresh changed compared to the stored servers."""
+    added: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    changed: list = field(default_factory=list)   # same node, new link
+    unchanged: int = 0
+    reordered: bool = False
+    rekeyed: int = 0   # stored servers whose lookup keys had to be computed
+
+    @property
+    def empty(self):
+        return not (self.added or self.removed or self.changed or self.reordered)
+
+
+def _dedup_key(server):
+    return server.key.strip() if server.key else server.unique_key
+
+
+def _stored_key(server):
+    key, unique = server.lookup_keys
+    return key or unique
+
+
+def diff_servers(old_servers, links, lock_export=False, expires_at=None):
+    """Build the refreshed server list for *links*, reusing *old_servers*.
+
+    *links* holds link strings and/or ready Server objects (structured
+    subscription formats), matched by their key.
+
+    A link identical to a stored server's key reuses that Server object
+    as-is, so it is not re-parsed and keeps any per-node state.  A new link
+    for a known node (same unique_key) is parsed and counted as changed,
+    carrying over measured Hysteria 2 bandwidth.  Stored servers are matched
+    by their lookup keys, so only new links are read in plaintext and sealed
+    secrets stay sealed.  Returns (servers, diff).
+    """
+    diff = SubscriptionDiff()
+    by_key = {}
+    by_unique = {}
+    for s in old_servers:
+        if not s.has_lookup_keys:
+            diff.rekeyed += 1
+        by_key.setdefault(_stored_key(s), s)
+        by_unique.setdefault(s.lookup_keys[1], []).append(s)
+
+    entries = []
+    for e in links:
+        link, parsed = (e.key.strip(), e) if isinstance(e, Server) else (e.strip(), None)
+        entries.append((link, parsed, by_key.get(lookup_key(link)) if link and by_key else None))
+    # Exact matches are claimed up front so a changed link for the same
+    # node cannot take a server whose own link is still listed.
+    kept = {id(old) for _, _, old in entries if old is not None}
+    # Everything else is parsed up front in one batch (in parallel when large).
+    to_parse = [link for link, parsed, old in entries if parsed is None and old is None]
+    parsed_links = dict(zip(to_parse, Server.from_links(to_parse)))
+
+    servers = []
+    seen_keys = set()
+    for link, parsed, s in entries:
+        if s is not None:
+            if link not in seen_keys:
+                seen_keys.add(link)
+                servers.append(s)
+                diff.unchanged += 1
+            continue
+        s = parsed or parsed_links.get(link)
+        if not s:
+            continue
+        if lock_export:
+            s.lock_export = True
+        if expires_at is not None:
+            s.expires_at = expires_at
+        dedup_key = _dedup_key(s)
+        if dedup_key in seen_keys:
+            continue
+        seen_keys.add(dedup_key)
+        prev = None
+        if by_unique:
+            prev = next((o for o in by_unique.get(s.lookup_keys[1], ()) if id(o) not in kept), None)
+        if prev is not None:
+            kept.add(id(prev))
+            # Measured Hysteria 2 bandwidth survives a refresh of the same node.
+            if prev.bw_network:
+                s.up_mbps, s.down_mbps = prev.up_mbps, prev.down_mbps
+                s.bw_network = prev.bw_network
+            diff.changed.append(s)
+        else:
+            diff.added.append(s)
+        servers.append(s)
+
+    diff.removed = [s for s in old_servers if id(s) not in kept]
+    if not (diff.added or diff.removed or diff.changed):
+        diff.reordered = any(a is not b for a, b in zip(servers, old_servers))
+    return servers, diff
 
 
 class SubscriptionManager(QObject):
     updated = Signal(bool, int)  # success, new node count
+    serversChanged = Signal(str)  # subscription name whose server list changed
+    quotaChanged = Signal(str)  # subscription name whose traffic/expiry changed
 
     def __init__(self, settings=None):
         super().__init__()
         self._lock = threading.Lock()
         self._settings = settings or {}
+        self._proxy_port = None
         self.subscriptions = load_subscriptions()
+        index = get_server_index()
         for sub in self.subscriptions:
-            sub['servers'] = [Server.from_dict(s) for s in sub.get('servers', [])]
+            sub['servers'] = Server.from_dicts(sub.get('servers', []))
+            index.set_owner(sub['name'], sub['servers'])
+        self._queue = RefreshQueue()
 
         # Auto-update timer
         self._auto_timer = QTimer(self)
         self._auto_timer.timeout.connect(self._check_auto_update)
         self._auto_timer.start(AUTO_UPDATE_INTERVAL_MS)
+        self._quota_timer = QTimer(self)
+        self._quota_timer.timeout.connect(self.refresh_quotas)
+        self._quota_timer.start(QUOTA_REFRESH_INTERVAL_MS)
 
     def _get_sub_settings(self):
         """Extract subscription-related settings for parse_subscription."""
@@ -34,13 +161,17 @@ class SubscriptionManager(QObject):
             "user_agent_key": self._settings.get("user_agent_key", "socksicle"),
             "fake_hwid": self._settings.get("fake_hwid", False),
             "hwid_value": self._settings.get("hwid_value", ""),
+            "max_body_bytes": int(self._settings.get("sub_max_body_mb", 0)) * 1024 * 1024,
+            "max_nodes": int(self._settings.get("sub_max_nodes", 0)),
+            "fetch_strategy": self._settings.get("sub_fetch_strategy", FETCH_DIRECT),
+            "proxy_port": self._proxy_port,
         }
 
     def _serialize_unlocked(self):
         return [
             {
                 **sub,
-                "servers": [s.to_dict() for s in sub.get("servers", [])],
+                "servers": Server.to_dicts(sub.get("servers", []), reveal=False),
             }
             for sub in self.subscriptions
         ]
@@ -49,6 +180,16 @@ class SubscriptionManager(QObject):
         with self._lock:
             return self._serialize_unlocked()
 
+    def save(self):
+        """Schedule a background write of the current subscription state.
+
+        Call it after releasing ``_lock``: the write takes the lock to snapshot.
+        """
+        get_persistence().mark_dirty("subscriptions.json", self._write)
+
+    def _write(self):
+        save_subscriptions(self._serialized())
+
     def get(self, name):
         with self._lock:
             return next((s for s in self.subscriptions if s['name'] == name), None)
@@ -58,24 +199,17 @@ class SubscriptionManager(QObject):
         return list(sub['servers']) if sub else []
 
     def add(self, name, url, lock_export: bool = False, expires_at: int | None = None):
-        """Fetch and store a new subscription. Returns True on success."""
+        """Fetch and store a new subscription.
+
+        Returns the name it was stored under (*name*, numbered when another
+        subscription has it), or None when the fetch found no servers.
+        """
         links, meta = parse_subscription(url, self._get_sub_settings())
         if not links:
-            return False
-        servers = []
-        seen_keys = set()
-        for link in links:
-            s = Server.from_link(link)
-            if s:
-                if lock_export:
-                    s.lock_export = True
-                if expires_at is not None:
-                    s.expires_at = expires_at
-                dedup_key = s.key.strip() if s.key else s.unique_key
-                if dedup_key not in seen_keys:
-                    servers.append(s)
-                    seen_keys.add(dedup_key)
+            return None
+        servers, _ = diff_servers([], links, lock_export=lock_export, expires_at=expires_at)
         with self._lock:
+            name = unique_subscription_name(name, {s['name'] for s in self.subscriptions})
             sub_dict = {
                 "name": name,
                 "url": url,
@@ -89,68 +223,202 @@ class SubscriptionManager(QObject):
                 "profile_update_interval": meta.get('profile_update_interval', 0),
                 "last_updated": time.time(),
             }
+            if meta.get('http_cache'):
+                sub_dict["http_cache"] = meta['http_cache']
             if lock_export:
                 sub_dict["lock_export"] = True
             if expires_at is not None:
                 sub_dict["expires_at"] = expires_at
             self.subscriptions.append(sub_dict)
-            save_subscriptions(self._serialize_unlocked())
-        return True
+            get_server_index().set_owner(name, servers)
+        self.save()
+        return name
+
+    def add_imported(self, subs):
+        """Store imported subscription dicts whose URL is not there yet.
+
+        Names are numbered when taken.  Returns how many were added.
+        """
+        added = 0
+        with self._lock:
+            urls = {s['url'] for s in self.subscriptions}
+            names = {s['name'] for s in self.subscriptions}
+            for sub in subs:
+                if sub['url'] in urls:
+                    continue
+                sub['name'] = unique_subscription_name(sub.get('name') or "Subscription", names)
+                self.subscriptions.append(sub)
+                get_server_index().set_owner(sub['name'], sub['servers'])
+                urls.add(sub['url'])
+                names.add(sub['name'])
+                added += 1
+        if added:
+            self.save()
+        return added
 
     def update(self, sub):
         """Refresh a subscription off the GUI thread; emits `updated` when done."""
         threading.Thread(target=self._update_worker, args=(sub,), daemon=True).start()
 
+    def _refresh(self, sub, pool=None):
+        """Fetch *sub* and diff it against the current servers without touching shared state.
+
+        Returns (meta, servers, diff); servers is None when the fetch failed
+        or the subscription was not modified.
+        """
+        links, meta = parse_subscription(sub['url'], self._get_sub_settings(),
+                                         http_cache=sub.get('http_cache'), pool=pool)
+        if meta.get('not_modified') or not links:
+            return meta, None, SubscriptionDiff()
+        servers, diff = diff_servers(sub.get('servers', []), links,
+                                     lock_export=bool(sub.get('lock_export', False)),
+                                     expires_at=sub.get('expires_at'))
+        return meta, servers, diff
+
+    def _commit_unlocked(self, sub, meta, servers, diff):
+        """Apply a _refresh result to *sub*. Returns True when it needs saving."""
+        sub['last_updated'] = time.time()
+        if meta.get('not_modified'):
+            # Nothing changed upstream: keep the servers, and only save when
+            # the quota headers or the preferred fetch route did move.
+            changed = False
+            traffic = meta.get('traffic')
+            if traffic and traffic != sub.get('traffic'):
+                sub['traffic'] = traffic
+                changed = True
+            cache = meta.get('http_cache')
+            if cache and cache != sub.get('http_cache'):
+                sub['http_cache'] = cache
+                changed = True
+            return changed
+        if servers is None:
+            return False
+        before = {key: sub.get(key) for key in _REFRESHED_FIELDS}
+        if not diff.empty:
+            sub['servers'] = servers
+            get_server_index().set_owner(sub['name'], servers)
+
+        # Update metadata
+        if meta.get('traffic'):
+            sub['traffic'] = meta['traffic']
+        for key in ('profile_title', 'support_url', 'profile_web_page_url',
+                     'announce', 'description', 'profile_update_interval'):
+            if key in meta:
+                sub[key] = meta[key]
+        if meta.get('http_cache'):
+            sub['http_cache'] = meta['http_cache']
+        else:
+            sub.pop('http_cache', None)
+        # Lookup keys computed for servers stored without them are saved too.
+        return (not diff.empty or bool(diff.rekeyed)
+                or any(sub.get(key) != value for key, value in before.items()))
+
     def _update_worker(self, sub, emit_signal=True):
         """Refresh a subscription; emits `updated` only when emit_signal is True."""
-        links, meta = parse_subscription(sub['url'], self._get_sub_settings())
-        if not links:
-            if emit_signal:
-                self.updated.emit(False, 0)
-            return
-
-        old_keys = {s.key.strip() if s.key else s.unique_key for s in sub.get('servers', [])}
-        new_servers = []
-        seen_keys = set()
-        new_count = 0
-
-        sub_lock_export = bool(sub.get('lock_export', False))
-        sub_expires_at = sub.get('expires_at')
-
-        for link in links:
-            s = Server.from_link(link)
-            if s:
-                if sub_lock_export:
-                    s.lock_export = True
-                if sub_expires_at is not None:
-                    s.expires_at = sub_expires_at
-                dedup_key = s.key.strip() if s.key else s.unique_key
-                if dedup_key not in seen_keys:
-                    new_servers.append(s)
-                    seen_keys.add(dedup_key)
-                    if dedup_key not in old_keys:
-                        new_count += 1
-
+        meta, servers, diff = self._refresh(sub)
+        ok = bool(meta.get('not_modified')) or servers is not None
         with self._lock:
-            sub['servers'] = new_servers
-
-            # Update metadata
-            if meta.get('traffic'):
-                sub['traffic'] = meta['traffic']
-            for key in ('profile_title', 'support_url', 'profile_web_page_url',
-                         'announce', 'description', 'profile_update_interval'):
-                if key in meta:
-                    sub[key] = meta[key]
-            sub['last_updated'] = time.time()
-
-            save_subscriptions(self._serialize_unlocked())
+            changed = self._commit_unlocked(sub, meta, servers, diff)
+        if changed:
+            self.save()
+        self._queue.record(sub['name'], ok, sub.get('profile_update_interval', 0))
+        if servers is not None and not diff.empty:
+            self.serversChanged.emit(sub['name'])
         if emit_signal:
-            self.updated.emit(True, new_count)
+            self.updated.emit(ok, len(diff.added))
+
+    def _refresh_host(self, subs, pool):
+        """Refresh subscriptions sharing a host one after another on one connection."""
+        time.sleep(random.uniform(0, START_JITTER_S))
+        results = []
+        for sub in subs:
+            try:
+                results.append((sub, *self._refresh(sub, pool)))
+            except Exception as e:
+                log.error("Subscription refresh failed for %s: %s", sub.get('name'), e)
+                results.append((sub, {}, None, SubscriptionDiff()))
+        return results
+
+    def _refresh_round(self, subs):
+        """Refresh *subs* with bounded concurrency and commit them in one save."""
+        by_host = {}
+        for sub in subs:
+            by_host.setdefault(urlparse(sub['url']).hostname or '', []).append(sub)
+        results = []
+        pool = KeepAlivePool()
+        try:
+            workers = min(MAX_CONCURRENT_REFRESHES, len(by_host)) or 1
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self._refresh_host, group, pool)
+                           for group in by_host.values()]
+                for future in futures:
+                    results.extend(future.result())
+        finally:
+            pool.close()
+
+        changed = False
+        with self._lock:
+            for sub, meta, servers, diff in results:
+                # Deleted while the round was running.
+                if not any(s is sub for s in self.subscriptions):
+                    continue
+                changed |= self._commit_unlocked(sub, meta, servers, diff)
+        if changed:
+            self.save()
+        for sub, meta, servers, diff in results:
+            ok = bool(meta.get('not_modified')) or servers is not None
+            self._queue.record(sub['name'], ok, sub.get('profile_update_interval', 0))
+            if servers is not None and not diff.empty:
+                self.serversChanged.emit(sub['name'])
+
+    def _fetch_quota(self, sub, pool):
+        try:
+            return sub, fetch_subscription_quota(sub['url'], self._get_sub_settings(), pool)
+        except Exception as e:
+            log.error("Quota refresh failed for %s: %s", sub.get('name'), e)
+            return sub, {}
+
+    def _quota_round(self, subs):
+        """Read the quota headers of *subs* and store traffic that changed."""
+        pool = KeepAlivePool()
+        try:
+            workers = min(MAX_CONCURRENT_REFRESHES, len(subs)) or 1
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda sub: self._fetch_quota(sub, pool), subs))
+        finally:
+            pool.close()
+
+        changed = []
+        with self._lock:
+            for sub, meta in results:
+                traffic = meta.get('traffic')
+                if not traffic or traffic == sub.get('traffic'):
+                    continue
+                if not any(s is sub for s in self.subscriptions):
+                    continue
+                sub['traffic'] = traffic
+                changed.append(sub['name'])
+        if changed:
+            self.save()
+        for name in changed:
+            self.quotaChanged.emit(name)
+
+    def refresh_quotas(self):
+        """Refresh traffic/expiry of subscriptions that report it, without fetching links."""
+        with self._lock:
+            subs = [s for s in self.subscriptions if s.get('traffic')]
+        if subs:
+            threading.Thread(target=self._quota_round, args=(subs,), daemon=True).start()
+
+    def _start_round(self, subs):
+        if subs:
+            threading.Thread(target=self._refresh_round, args=(subs,), daemon=True).start()
 
     def delete(self, name):
         with self._lock:
             self.subscriptions = [s for s in self.subscriptions if s['name'] != name]
-            save_subscriptions(self._serialize_unlocked())
+            get_server_index().remove_owner(name)
+        self.save()
 
     def traffic_info(self, name):
         """Return (used_gb, total_gb, percent, expire_str) or None when absent."""
@@ -188,38 +456,32 @@ class SubscriptionManager(QObject):
         """Replace the settings dict used for subscription parsing."""
         self._settings = settings
 
+    def set_proxy_port(self, port):
+        """Local SOCKS5 port of the running tunnel (None when disconnected).
+
+        Used by the proxy and race fetch strategies.
+        """
+        self._proxy_port = int(port) if port else None
+
     def set_auto_update(self, enabled, interval_ms=AUTO_UPDATE_INTERVAL_MS):
-        """Enable/disable the periodic auto-update timer."""
+        """Enable/disable the periodic auto-update and quota refresh timers."""
         if enabled:
             self._auto_timer.start(interval_ms)
+            self._quota_timer.start(QUOTA_REFRESH_INTERVAL_MS)
         else:
             self._auto_timer.stop()
+            self._quota_timer.stop()
 
     def _check_auto_update(self):
-        """Periodically check if any subscription needs updating."""
-        now = time.time()
-        due = []
+        """Periodically refresh subscriptions that are due (or due a retry)."""
         with self._lock:
-            for sub in self.subscriptions:
-                interval_hours = sub.get('profile_update_interval', 0)
-                if interval_hours <= 0:
-                    continue
-                last = sub.get('last_updated', 0)
-                elapsed_hours = (now - last) / 3600
-                if elapsed_hours >= interval_hours:
-                    due.append(sub)
-        for sub in due:
-            threading.Thread(
-                target=self._update_worker, args=(sub,), daemon=True,
-                kwargs={"emit_signal": False}
-            ).start()
+            subs = list(self.subscriptions)
+        self._queue.sync(subs)
+        due = set(self._queue.pop_due())
+        self._start_round([sub for sub in subs if sub['name'] in due])
 
     def update_all(self):
         """Update all subscriptions (for app startup)."""
         with self._lock:
             subs = list(self.subscriptions)
-        for sub in subs:
-            threading.Thread(
-                target=self._update_worker, args=(sub,), daemon=True,
-                kwargs={"emit_signal": False}
-            ).start()
+        self._start_round(subs)
@@ -27,15 +27,31 @@ Threat model (honest):
 - Chain hashes in drawer.json allow noticing file tampering after writing
   (only a log warning, decryption is not blocked).
 - Share links: pure tws3:// (and legacy tws2://) share encryption/decryption
-  without machine binding.
+  without machine binding, optionally compressed, and split into sequenced
+  parts when too long for one QR code.
 
 Token format:
 - v3: tws3.<base64url-nopad(0x03 | nonce(12B) | ciphertext+tag(16B))>
 - v2: tws2.<base64url-nopad(0x02 | nonce(16B) | tag(32B) | ciphertext)> (decrypt-only)
+- v4 record: tws4.<base64url-nopad(0x04 | nonce(12B) | ciphertext+tag(16B))>, where
+  the plaintext is the compact JSON of all secret fields of one server (stored
+  under "sealed") or of a subscription's URL plus its whole server array. The
+  associated data binds the purpose, the record kind and the array length.
+  Written only when the "tws4" record format is selected; both formats are
+  always readable and a load in the other format marks the file for rewrite.
+- compressed share: tws3://<base64url-nopad(0x05 | codec(1B) | nonce(12B) |
+  ciphertext+tag(16B))>, where the plaintext is deflated (codec 1) or
+  zstd-compressed (codec 2) and the first two bytes are the associated data.
+- share part: tws3://<base64url-nopad(0x06 | share id(4B) | index(2B) |
+  count(2B) | slice)>. The slices of all parts of one share id, in index
+  order, are the raw bytes of the whole share token.
 """
 import base64
 import binascii
+import contextlib
+import copy
 import hashlib
+import hmac
 import json
 import logging
 import os
@@ -47,6 +63,8 @@ import tempfile
 import threading
 import time
 import uuid
+import zlib
+from collections import OrderedDict
 from pathlib import Path
 
 from cryptography.exceptions import InvalidTag
@@ -57,6 +75,11 @@ from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from . import twinsock_legacy_v2
 from .platform_utils import get_config_dir
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 log = logging.getLogger(__name__)
 
 # Versioning & Deprecation policy
@@ -68,14 +91,30 @@ TOKEN_PREFIX_CURRENT = "tws3."
 TOKEN_PREFIX_LEGACY = "tws2."
 TOKEN_PREFIXES = (TOKEN_PREFIX_CURRENT, TOKEN_PREFIX_LEGACY)
 
+RECORD_VERSION = 0x04
+RECORD_PREFIX = "tws4."
+RECORD_KEY = "sealed"
+RECORD_FORMAT_FIELDS = "tws3"   # one tws3 token per secret field
+RECORD_FORMAT_RECORDS = "tws4"  # one tws4 blob per server / subscription
+RECORD_FORMATS = (RECORD_FORMAT_FIELDS, RECORD_FORMAT_RECORDS)
+
 SHARE_SCHEME_CURRENT = "tws3://"
 SHARE_SCHEME_LEGACY = "tws2://"
 SHARE_SCHEMES = (SHARE_SCHEME_CURRENT, SHARE_SCHEME_LEGACY)
+SHARE_VERSION_COMPRESSED = 0x05
+SHARE_VERSION_PART = 0x06
+SHARE_CODECS = {"zlib": 0x01, "zstd": 0x02}
+# Decompressed share payloads larger than this are rejected.
+SHARE_MAX_PLAIN = 16 * 1024 * 1024
+# Longest token split_share() emits: a QR code of this many bytes stays
+# scannable from a screen (a version 40-M code holds at most 2331).
+SHARE_PART_CHARS = 1000
+_SHARE_PART_HEADER = struct.Struct(">B4sHH")  # version, share id, index, count
 
 SCHEMA = "socksicle-drawer"
 DRAWER_VERSION = 3
 DRAWER_FILE = "drawer.json"
-CHAIN_FILES = ("servers.json", "subscriptions.json")
+CHAIN_FILES = ("servers.json", "subscriptions.json", "config.db")
 SECRET_FIELDS = ("key", "password", "uuid", "public_key", "obfs_password")
 OBFUSCATION_MARKER = "__obfuscated__"
 _EAR_FIELDS = SECRET_FIELDS + ("url",)
@@ -98,6 +137,31 @@ _REPAIRED = False
 _FOREIGN = False
 _MIGRATED = False
 _MIGRATION_LOGGED = False
+# AES-GCM ciphers for field purposes, derived once per unlocked primary key.
+# AESGCM objects are stateless between calls, so they are shared by threads
+# encrypting outside _lock.
+_CIPHERS: dict[str, AESGCM] = {}
+# HMAC keys for lookup_digest, per purpose, derived like _CIPHERS.
+_LOOKUP_KEYS: dict[str, bytes] = {}
+# key_id() of the unlocked key, "" until asked for.
+_KEY_ID = ""
+_RECORD_FORMAT = RECORD_FORMAT_FIELDS
+# Plaintext of recently revealed Sealed handles, keyed by token (a v3 token
+# maps to its string, a v4 record to its field dict).  Bounded so resident
+# plaintext follows the servers actually in use, not the list sizes.
+REVEAL_CACHE_SIZE = 256
+_REVEALED: OrderedDict = OrderedDict()
+_revealed_lock = threading.Lock()
+# Called with no arguments when the vault key is dropped or replaced, so
+# caches of values sealed or digested under the old key can let go of them.
+# They run under _lock and must not call back into the vault.
+_KEY_CHANGE_HOOKS: list = []
+# Last drawer.json read or written, with the (mtime_ns, size) it had then,
+# so chain updates do not re-read the drawer.
+_DRAWER_CACHE: tuple[tuple[int, int], dict] | None = None
+# Nesting depth of chain_batch() and the digests it is holding back.
+_CHAIN_BATCH = 0
+_CHAIN_PENDING: dict[str, str] = {}
 
 
 class VaultError(Exception):
@@ -249,17 +313,61 @@ def _peek_version(token: str) -> int:
         return 0
 
 
-def tokenize(k: bytes, plain: str, nonce: bytes | None = None) -> str:
-    """Encrypt plaintext using AES-256-GCM (NIST SP 800-38D, 12B nonce + 16B tag)."""
+def _seal_token(aesgcm: AESGCM, plain: str, nonce: bytes | None = None) -> str:
     if not plain:
         return ""
     nonce = nonce or secrets.token_bytes(12)
-    pt = plain.encode("utf-8")
-    aesgcm = AESGCM(k)
-    ct_with_tag = aesgcm.encrypt(nonce, pt, None)
+    ct_with_tag = aesgcm.encrypt(nonce, plain.encode("utf-8"), None)
     return TOKEN_PREFIX_CURRENT + _b64url(bytes([TOKEN_VERSION_CURRENT]) + nonce + ct_with_tag)
 
 
+def _open_v3(aesgcm: AESGCM, raw: bytes) -> str:
+    """Decrypt a decoded v3 token (version byte included)."""
+    if len(raw) < 1 + 12 + 16:  # 1 byte ver + 12 byte nonce + 16 byte tag
+        raise VaultError("integrity")
+    try:
+        return aesgcm.decrypt(raw[1:13], raw[13:], None).decode("utf-8")
+    except (InvalidTag, UnicodeDecodeError, ValueError):
+        raise VaultError("integrity")
+
+
+def _record_aad(purpose: str, kind: str, count: int | None = None) -> bytes:
+    aad = f"socksicle::tws::v4|{purpose}|{kind}"
+    if count is not None:
+        aad += f"|{count}"
+    return aad.encode("utf-8")
+
+
+def _seal_record(aesgcm: AESGCM, payload, aad: bytes) -> str:
+    nonce = secrets.token_bytes(12)
+    plain = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return RECORD_PREFIX + _b64url(bytes([RECORD_VERSION]) + nonce + aesgcm.encrypt(nonce, plain, aad))
+
+
+def _open_record(aesgcm: AESGCM, token, aad: bytes):
+    if not isinstance(token, str) or not token.startswith(RECORD_PREFIX):
+        raise VaultError("integrity")
+    try:
+        raw = _b64url_decode(token[len(RECORD_PREFIX):])
+    except (binascii.Error, ValueError):
+        raise VaultError("integrity")
+    if len(raw) < 1 + 12 + 16:
+        raise VaultError("integrity")
+    if raw[0] != RECORD_VERSION:
+        raise VaultError(f"unsupported_version:{raw[0]}")
+    try:
+        return json.loads(aesgcm.decrypt(raw[1:13], raw[13:], aad).decode("utf-8"))
+    except (InvalidTag, UnicodeDecodeError, ValueError):
+        raise VaultError("integrity")
+
+
+def tokenize(k: bytes, plain: str, nonce: bytes | None = None) -> str:
+    """Encrypt plaintext using AES-256-GCM (NIST SP 800-38D, 12B nonce + 16B tag)."""
+    if not plain:
+        return ""
+    return _seal_token(AESGCM(k), plain, nonce)
+
+
 def detokenize(k: bytes, token: str) -> str:
     """Decrypt token, dispatching by version byte (v3 AES-GCM or v2 legacy stream)."""
     if not token:
@@ -275,15 +383,7 @@ def detokenize(k: bytes, token: str) -> str:
         raise VaultError("integrity")
     ver = raw[0]
     if ver == TOKEN_VERSION_CURRENT:
-        if len(raw) < 1 + 12 + 16:  # 1 byte ver + 12 byte nonce + 16 byte tag
-            raise VaultError("integrity")
-        nonce = raw[1:13]
-        ct_with_tag = raw[13:]
-        try:
-            pt = AESGCM(k).decrypt(nonce, ct_with_tag, None)
-            return pt.decode("utf-8")
-        except (InvalidTag, UnicodeDecodeError, ValueError):
-            raise VaultError("integrity")
+        return _open_v3(AESGCM(k), raw)
     elif ver == TOKEN_VERSION_MIN_SUPPORTED:
         return twinsock_legacy_v2.detokenize_v2(k, token, exc_class=VaultError)
     else:
@@ -293,19 +393,74 @@ def detokenize(k: bytes, token: str) -> str:
 DEFAULT_SHARE_KEY = "abcdfg"
 
 
-def _encrypt_share_bytes(k: bytes, plain: str) -> str:
+def _share_codec(compress: str) -> int:
+    codec = SHARE_CODECS.get(compress)
+    if codec is None:
+        raise ValueError(f"unknown share compression: {compress}")
+    if codec == SHARE_CODECS["zstd"] and zstandard is None:
+        raise ValueError("zstd share compression needs the zstandard package")
+    return codec
+
+
+def _compress_share(codec: int, data: bytes) -> bytes:
+    if codec == SHARE_CODECS["zstd"]:
+        return zstandard.ZstdCompressor(level=19).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _decompress_share(codec: int, data: bytes) -> bytes:
+    """Inflate a compressed share payload, refusing more than SHARE_MAX_PLAIN bytes."""
+    if codec == SHARE_CODECS["zlib"]:
+        d = zlib.decompressobj()
+        try:
+            out = d.decompress(data, SHARE_MAX_PLAIN + 1)
+        except zlib.error:
+            raise VaultError("TwinSock share payload is corrupt")
+        if len(out) > SHARE_MAX_PLAIN or d.unconsumed_tail:
+            raise VaultError("TwinSock share payload is too large")
+        return out
+    if codec == SHARE_CODECS["zstd"]:
+        if zstandard is None:
+            raise VaultError("TwinSock share needs zstd support (install the zstandard package)")
+        chunks = []
+        total = 0
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+                while True:
+                    chunk = reader.read(65536)
+                    if not chunk:
+                        break
+                    total += len(chunk)
+                    if total > SHARE_MAX_PLAIN:
+                        raise VaultError("TwinSock share payload is too large")
+                    chunks.append(chunk)
+        except zstandard.ZstdError:
+            raise VaultError("TwinSock share payload is corrupt")
+        return b"".join(chunks)
+    raise VaultError(f"unsupported TwinSock share compression: {codec}")
+
+
+def _encrypt_share_bytes(k: bytes, plain: str, compress: str | None = None) -> str:
     nonce = secrets.token_bytes(12)
     pt = plain.encode("utf-8")
     aesgcm = AESGCM(k)
+    if compress:
+        header = bytes([SHARE_VERSION_COMPRESSED, _share_codec(compress)])
+        ct_with_tag = aesgcm.encrypt(nonce, _compress_share(header[1], pt), header)
+        return SHARE_SCHEME_CURRENT + _b64url(header + nonce + ct_with_tag)
     ct_with_tag = aesgcm.encrypt(nonce, pt, None)
     return SHARE_SCHEME_CURRENT + _b64url(bytes([TOKEN_VERSION_CURRENT]) + nonce + ct_with_tag)
 
 
-def encrypt_share(key: str = "", plaintext: str | list = "", lock_export: bool = False, expires_at: int | None = None) -> str:
+def encrypt_share(key: str = "", plaintext: str | list = "", lock_export: bool = False,
+                  expires_at: int | None = None, compress: str | None = None) -> str:
     """Encrypt a share link or list of links into a clean tws3://<base64url> token.
 
     Supports bundling multiple servers, permissions (lock_export), and expiration timestamp (expires_at).
     If key is empty or not specified, uses DEFAULT_SHARE_KEY.
+    With compress="zlib" (or "zstd", when zstandard is installed) the payload is
+    compressed before encryption; such tokens need a Socksicle that knows the
+    compressed share version.
     """
     if not plaintext:
         return ""
@@ -329,7 +484,119 @@ def encrypt_share(key: str = "", plaintext: str | list = "", lock_export: bool =
     else:
         pt = str(plaintext)
 
-    return _encrypt_share_bytes(_share_derived_key(key), pt)
+    return _encrypt_share_bytes(_share_derived_key(key), pt, compress)
+
+
+def split_share(token: str, max_chars: int = SHARE_PART_CHARS) -> list[str]:
+    """Split a tws3:// share token into sequenced part tokens of at most *max_chars*.
+
+    A token that already fits comes back as the only item.
+    """
+    if len(token) <= max_chars:
+        return [token]
+    if not token.startswith(SHARE_SCHEME_CURRENT):
+        raise ValueError("only tws3:// share tokens can be split")
+    raw = _b64url_decode(token[len(SHARE_SCHEME_CURRENT):])
+    size = (max_chars - len(SHARE_SCHEME_CURRENT)) * 3 // 4 - _SHARE_PART_HEADER.size
+    if size <= 0:
+        raise ValueError(f"max_chars too small for a share part: {max_chars}")
+    count = -(-len(raw) // size)
+    if count > 0xFFFF:
+        raise ValueError("share too large to split")
+    share_id = secrets.token_bytes(4)
+    return [
+        SHARE_SCHEME_CURRENT + _b64url(
+            _SHARE_PART_HEADER.pack(SHARE_VERSION_PART, share_id, index, count)
+            + raw[index * size:(index + 1) * size])
+        for index in range(count)
+    ]
+
+
+def encrypt_share_parts(key: str = "", plaintext: str | list = "", lock_export: bool = False,
+                        expires_at: int | None = None, compress: str | None = "zlib",
+                        max_chars: int = SHARE_PART_CHARS) -> list[str]:
+    """encrypt_share, compressed by default and split with split_share."""
+    token = encrypt_share(key, plaintext, lock_export, expires_at, compress)
+    return split_share(token, max_chars) if token else []
+
+
+def _share_part_header(token: str):
+    """(share id, index, count, slice) of a share part token, or None for other tokens."""
+    t = token.strip()
+    if t.startswith(SHARE_SCHEME_CURRENT):
+        t = t[len(SHARE_SCHEME_CURRENT):]
+    try:
+        raw = _b64url_decode(t)
+    except (binascii.Error, ValueError):
+        return None
+    if len(raw) <= _SHARE_PART_HEADER.size or raw[0] != SHARE_VERSION_PART:
+        return None
+    _, share_id, index, count = _SHARE_PART_HEADER.unpack_from(raw)
+    return share_id, index, count, raw[_SHARE_PART_HEADER.size:]
+
+
+def is_share_part(token: str) -> bool:
+    """True for one part of a split share (see split_share)."""
+    return bool(token) and _share_part_header(token) is not None
+
+
+class ShareAssembler:
+    """Reassembles a split share from its parts, fed one at a time in any order.
+
+    Feed each scanned or pasted part to feed(); once complete is True,
+    token() returns the whole share token for decrypt_share_payload.
+    """
+
+    def __init__(self):
+        self.share_id = None
+        self.total = 0
+        self._slices = {}
+
+    @property
+    def received(self) -> int:
+        return len(self._slices)
+
+    @property
+    def complete(self) -> bool:
+        return self.total > 0 and len(self._slices) == self.total
+
+    def missing(self) -> list[int]:
+        """Indices (0-based) of the parts not fed yet."""
+        return [i for i in range(self.total) if i not in self._slices]
+
+    def feed(self, token: str) -> bool:
+        """Add one part; returns complete. Duplicates are ignored."""
+        parsed = _share_part_header(token)
+        if parsed is None:
+            raise VaultError("not a TwinSock share part")
+        share_id, index, count, data = parsed
+        if count == 0 or index >= count:
+            raise VaultError("malformed TwinSock share part")
+        if self.share_id is None:
+            self.share_id, self.total = share_id, count
+        elif share_id != self.share_id or count != self.total:
+            raise VaultError("TwinSock share part belongs to another share")
+        self._slices.setdefault(index, data)
+        return self.complete
+
+    def token(self) -> str:
+        if not self.complete:
+            raise VaultError(f"incomplete TwinSock share: {self.received} of {self.total} parts")
+        return SHARE_SCHEME_CURRENT + _b64url(b"".join(self._slices[i] for i in range(self.total)))
+
+
+def join_share(text: str) -> str:
+    """Return *text* with the whitespace-separated parts of a split share joined.
+
+    Text without share parts is returned unchanged.
+    """
+    pieces = text.split()
+    if not any(is_share_part(p) for p in pieces):
+        return text
+    assembler = ShareAssembler()
+    for piece in pieces:
+        assembler.feed(piece)
+    return assembler.token()
 
 
 def _extract_share_payload_bytes(token: str) -> tuple[int, bytes, bytes, bytes] | None:
@@ -356,6 +623,10 @@ def _extract_share_payload_bytes(token: str) -> tuple[int, bytes, bytes, bytes]
         if len(raw) < 1 + 12 + 16:
             return None
         return ver, raw, raw[1:13], raw[13:]
+    elif ver == SHARE_VERSION_COMPRESSED:
+        if len(raw) < 2 + 12 + 16:
+            return None
+        return ver, raw, raw[2:14], raw[14:]
     elif ver == TOKEN_VERSION_MIN_SUPPORTED:
         return ver, raw, b"", b""
     return None
@@ -365,11 +636,13 @@ def decrypt_share_payload(key: str, token: str) -> tuple[str | list, dict]:
     """Decrypt a tws3:// or tws2:// share token back to (target_link_or_list, metadata_dict).
 
     Supports single links, multi-server arrays, clean format ('tws3://<b64url>'),
-    legacy ('tws3://tws3.<b64url>'), and bare tokens.
+    legacy ('tws3://tws3.<b64url>'), bare tokens, compressed shares, and all
+    parts of a split share separated by whitespace.
     """
     if not token:
         return token, {"lock_export": False, "expires_at": None}
 
+    token = join_share(token)
     parsed = _extract_share_payload_bytes(token)
     if parsed is None:
         # Non-tws link or invalid encoding
@@ -387,16 +660,24 @@ def decrypt_share_payload(key: str, token: str) -> tuple[str | list, dict]:
     last_error = None
     decrypted_text = None
 
-    if ver == TOKEN_VERSION_CURRENT:
+    if ver in (TOKEN_VERSION_CURRENT, SHARE_VERSION_COMPRESSED):
+        compressed = ver == SHARE_VERSION_COMPRESSED
+        aad = raw[:2] if compressed else None
         for candidate_key in keys_to_try:
             k = _share_derived_key(candidate_key)
             try:
-                pt = AESGCM(k).decrypt(nonce, ct_with_tag, None)
+                pt = AESGCM(k).decrypt(nonce, ct_with_tag, aad)
+            except (InvalidTag, ValueError) as e:
+                last_error = e
+                continue
+            if compressed:
+                pt = _decompress_share(raw[1], pt)
+            try:
                 decrypted_text = pt.decode("utf-8")
-                break
-            except (InvalidTag, UnicodeDecodeError, ValueError) as e:
+            except UnicodeDecodeError as e:
                 last_error = e
                 continue
+            break
     elif ver == TOKEN_VERSION_MIN_SUPPORTED:
         for candidate_key in keys_to_try:
             try:
@@ -450,14 +731,27 @@ def _drawer_path() -> Path:
     return get_config_dir() / DRAWER_FILE
 
 
+def _drawer_stamp(p: Path) -> tuple[int, int] | None:
+    try:
+        st = p.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
 def _read_drawer() -> dict | None:
+    global _DRAWER_CACHE
     p = _drawer_path()
-    if not p.exists():
+    stamp = _drawer_stamp(p)
+    if stamp is None:
         return None
+    if _DRAWER_CACHE is not None and _DRAWER_CACHE[0] == stamp:
+        return copy.deepcopy(_DRAWER_CACHE[1])
     try:
         with open(p, "r", encoding="utf-8") as f:
             data = json.load(f)
         if isinstance(data, dict):
+            _DRAWER_CACHE = (stamp, copy.deepcopy(data))
             return data
     except (json.JSONDecodeError, OSError, ValueError):
         pass
@@ -465,9 +759,11 @@ def _read_drawer() -> dict | None:
 
 
 def _write_drawer(drawer: dict):
+    global _DRAWER_CACHE
     p = _drawer_path()
     p.parent.mkdir(parents=True, exist_ok=True)
     tmp_name = None
+    _DRAWER_CACHE = None
     try:
         with tempfile.NamedTemporaryFile(
                 "w", dir=str(p.parent), delete=False,
@@ -482,6 +778,9 @@ def _write_drawer(drawer: dict):
             except OSError:
                 pass
         raise
+    stamp = _drawer_stamp(p)
+    if stamp is not None:
+        _DRAWER_CACHE = (stamp, copy.deepcopy(drawer))
 
 
 def ensure_drawer():
@@ -563,6 +862,9 @@ def _unlock_locked() -> bool:
             km_v3_a = _tier_key("a", fa)
             _D = D
             _K_PRIMARY = _primary_key(km_v3_a, D)
+            _CIPHERS.clear()
+            _LOOKUP_KEYS.clear()
+            _key_changed()
             _TIER = "B" if tier == "b" else "A"
             _REPAIRED = (tier == "b")
             _FOREIGN = False
@@ -612,6 +914,9 @@ def drop_foreign():
         _D = None
         _K_PRIMARY = None
         _K_PRIMARY_V2 = None
+        _CIPHERS.clear()
+        _LOOKUP_KEYS.clear()
+        _key_changed()
         _TIER = ""
         _REPAIRED = False
 
@@ -640,81 +945,465 @@ def vault_status() -> dict:
                 "reason": "foreign" if _FOREIGN else "locked"}
 
 
-def encrypt_field(purpose: str, plaintext: str) -> str:
+def set_record_format(fmt: str | None):
+    """Select how seal_dicts/seal_group store secrets from now on ("tws3" or "tws4")."""
+    global _RECORD_FORMAT
+    with _lock:
+        _RECORD_FORMAT = fmt if fmt in RECORD_FORMATS else RECORD_FORMAT_FIELDS
+
+
+def record_format() -> str:
+    return _RECORD_FORMAT
+
+
+def _note_format(fmt: str):
+    """A value was read in *fmt*; schedule a rewrite if another format is selected."""
+    if fmt != _RECORD_FORMAT:
+        with _lock:
+            _mark_migrated()
+
+
+def key_id() -> str:
+    """Short non-secret id of the unlocked vault key; changes with the vault."""
+    global _KEY_ID
+    kid = _KEY_ID
+    if kid:
+        return kid
     with _lock:
         _unlock_locked()
-        return tokenize(_field_key(purpose), plaintext)
+        _KEY_ID = hashlib.sha256(b"socksicle::tws::key-id" + _K_PRIMARY).hexdigest()[:16]
+        return _KEY_ID
 
 
-def decrypt_field(purpose: str, token: str) -> str:
+def _field_cipher(purpose: str) -> AESGCM:
+    """Cached AES-GCM cipher for *purpose*; unlocks the vault on first use."""
     with _lock:
+        _unlock_locked()
+        cipher = _CIPHERS.get(purpose)
+        if cipher is None:
+            cipher = _CIPHERS[purpose] = AESGCM(_field_key(purpose))
+        return cipher
+
+
+def lookup_digest(purpose: str, value: str) -> str:
+    """Keyed HMAC-SHA256 of *value*: equal values match, the value is not revealed."""
+    with _lock:
+        _unlock_locked()
+        key = _LOOKUP_KEYS.get(purpose)
+        if key is None:
+            key = _LOOKUP_KEYS[purpose] = _field_key("lookup::" + purpose)
+    return hmac.new(key, value.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+class _FieldCrypto:
+    """Encrypts/decrypts fields of one purpose with a cipher fetched on first need.
+
+    v3 work runs outside _lock; legacy tokens and plain values take the
+    locked path, which also records migrations.
+    """
+
+    def __init__(self, purpose: str):
+        self.purpose = purpose
+        self._cipher = None
+
+    def cipher(self) -> AESGCM:
+        if self._cipher is None:
+            self._cipher = _field_cipher(self.purpose)
+        return self._cipher
+
+    def encrypt(self, plaintext: str) -> str:
+        return _seal_token(self.cipher(), plaintext)
+
+    def decrypt(self, token: str) -> str:
         if not token:
             return ""
-        if any(token.startswith(p) for p in TOKEN_PREFIXES):
-            _unlock_locked()
-            ver = _peek_version(token)
-            if ver == TOKEN_VERSION_CURRENT:
-                return detokenize(_field_key(purpose), token)
-            elif ver == TOKEN_VERSION_MIN_SUPPORTED:
-                _mark_migrated()
-                global _K_PRIMARY_V2
-                if _K_PRIMARY_V2 is None and _D is not None:
-                    fa_legacy, _ = twinsock_legacy_v2.fingerprint_v2()
-                    km_leg = twinsock_legacy_v2.tier_key_v2("a", fa_legacy)
-                    _K_PRIMARY_V2 = twinsock_legacy_v2.primary_key_v2(km_leg, _D)
-                k_legacy = twinsock_legacy_v2.field_key_v2(_K_PRIMARY_V2, purpose)
-                return twinsock_legacy_v2.detokenize_v2(k_legacy, token, exc_class=VaultError)
-            else:
-                raise VaultError(f"unsupported_version:{ver}")
-        if token.startswith(OBFUSCATION_MARKER):
+        if token.startswith(TOKEN_PREFIX_CURRENT):
+            try:
+                raw = _b64url_decode(token[len(TOKEN_PREFIX_CURRENT):])
+            except (binascii.Error, ValueError):
+                raise VaultError("integrity")
+            if raw and raw[0] == TOKEN_VERSION_CURRENT:
+                return _open_v3(self.cipher(), raw)
+        with _lock:
+            return _decrypt_field_locked(self.purpose, token)
+
+
+def encrypt_field(purpose: str, plaintext: str) -> str:
+    return _FieldCrypto(purpose).encrypt(plaintext)
+
+
+def decrypt_field(purpose: str, token: str) -> str:
+    return _FieldCrypto(purpose).decrypt(token)
+
+
+def _decrypt_field_locked(purpose: str, token: str) -> str:
+    if not token:
+        return ""
+    if any(token.startswith(p) for p in TOKEN_PREFIXES):
+        _unlock_locked()
+        ver = _peek_version(token)
+        if ver == TOKEN_VERSION_CURRENT:
+            return detokenize(_field_key(purpose), token)
+        elif ver == TOKEN_VERSION_MIN_SUPPORTED:
             _mark_migrated()
-            return _legacy_deobfuscate(token)
-        if token.startswith("__"):
-            return token
+            global _K_PRIMARY_V2
+            if _K_PRIMARY_V2 is None and _D is not None:
+                fa_legacy, _ = twinsock_legacy_v2.fingerprint_v2()
+                km_leg = twinsock_legacy_v2.tier_key_v2("a", fa_legacy)
+                _K_PRIMARY_V2 = twinsock_legacy_v2.primary_key_v2(km_leg, _D)
+            k_legacy = twinsock_legacy_v2.field_key_v2(_K_PRIMARY_V2, purpose)
+            return twinsock_legacy_v2.detokenize_v2(k_legacy, token, exc_class=VaultError)
+        else:
+            raise VaultError(f"unsupported_version:{ver}")
+    if token.startswith(OBFUSCATION_MARKER):
         _mark_migrated()
+        return _legacy_deobfuscate(token)
+    if token.startswith("__"):
         return token
+    _mark_migrated()
+    return token
 
 
-def seal_dict(purpose: str, d: dict, fields: tuple | list) -> dict:
-    out = dict(d)
+class Sealed:
+    """Opaque handle to a secret field that is still encrypted at rest.
+
+    Produced by unseal_dicts(..., lazy=True).  reveal() decrypts on demand
+    through a small LRU of recent plaintexts; seal_dicts writes an untouched
+    handle back as its original token without decrypting it.
+    """
+
+    __slots__ = ("purpose", "token", "field", "key_id", "item", "aad")
+
+    def __init__(self, purpose: str, token: str, field: str | None = None, key_id: str = "",
+                 item: int | None = None, aad: bytes | None = None):
+        self.purpose = purpose
+        self.token = token
+        self.field = field  # None for a tws3 token, the field name inside a tws4 record
+        self.key_id = key_id
+        self.item = item  # index into the items of a tws4 group record, else None
+        self.aad = aad  # AAD of a group record
+
+    def reveal(self) -> str:
+        return _reveal(self)
+
+    @property
+    def ident(self):
+        """What tells this sealed value apart from others (handles of one record share a token)."""
+        if self.field is None:
+            return self.token
+        return [self.token, self.field, self.item]
+
+    def __repr__(self):
+        return f"<Sealed {self.purpose}{'/' + self.field if self.field else ''}>"
+
+
+def on_key_change(callback):
+    """Call *callback* whenever the vault key is dropped or replaced."""
+    _KEY_CHANGE_HOOKS.append(callback)
+
+
+def _key_changed():
+    """The vault key was dropped or replaced: forget what depends on it (under _lock)."""
+    global _KEY_ID
+    _KEY_ID = ""
+    with _revealed_lock:
+        _REVEALED.clear()
+    for callback in _KEY_CHANGE_HOOKS:
+        callback()
+
+
+def _reveal(handle: Sealed) -> str:
+    with _revealed_lock:
+        value = _REVEALED.get(handle.token)
+        if value is not None:
+            _REVEALED.move_to_end(handle.token)
+    if value is None:
+        crypto = _FieldCrypto(handle.purpose)
+        try:
+            if handle.field is None:
+                value = crypto.decrypt(handle.token)
+            else:
+                value = _open_record(crypto.cipher(), handle.token,
+                                     handle.aad or _record_aad(handle.purpose, "server"))
+                if not isinstance(value, dict):
+                    value = {}
+        except VaultError as e:
+            log.warning("vault: sealed %s value: %s (using empty)", handle.purpose, e)
+            return ""
+        with _revealed_lock:
+            _REVEALED[handle.token] = value
+            while len(_REVEALED) > REVEAL_CACHE_SIZE:
+                _REVEALED.popitem(last=False)
+    if handle.field is None:
+        return value
+    if handle.item is not None:
+        items = value.get("items")
+        value = items[handle.item] if isinstance(items, list) and handle.item < len(items) else {}
+        if not isinstance(value, dict):
+            return ""
+    field_value = value.get(handle.field)
+    return field_value if isinstance(field_value, str) else ""
+
+
+def reveal(value) -> str:
+    """Plaintext of a field value from unseal_dicts, sealed handle or not."""
+    return value.reveal() if isinstance(value, Sealed) else value
+
+
+def _split_secrets(d: dict, fields) -> dict:
+    """Pop the non-empty *fields* out of *d* and return them as plaintext."""
+    hidden = {}
     for field in fields:
-        if out.get(field):
-            out[field] = encrypt_field(purpose, str(out[field]))
+        value = d.get(field)
+        value = str(reveal(value)) if value else ""
+        if value:
+            hidden[field] = value
+            del d[field]
+        elif field in d:
+            d[field] = ""
+    return hidden
+
+
+def seal_dicts(purpose: str, dicts, fields: tuple | list) -> list[dict]:
+    """Encrypt *fields* of every dict in *dicts*; returns new dicts in order.
+
+    The purpose cipher is looked up once and the encryption itself runs
+    outside the vault lock.  In the "tws4" record format each dict's
+    secrets are sealed together under RECORD_KEY.
+    """
+    crypto = _FieldCrypto(purpose)
+    records = _RECORD_FORMAT == RECORD_FORMAT_RECORDS
+    aad = _record_aad(purpose, "server")
+    kid = None
+    out = []
+    for d in dicts:
+        d = dict(d)
+        if records:
+            d.pop(RECORD_KEY, None)
+            hidden = _split_secrets(d, fields)
+            if hidden:
+                d[RECORD_KEY] = _seal_record(crypto.cipher(), hidden, aad)
+            out.append(d)
+            continue
+        for field in fields:
+            value = d.get(field)
+            if not value:
+                continue
+            if isinstance(value, Sealed):
+                if kid is None:
+                    kid = key_id()
+                if value.field is None and value.purpose == purpose and value.key_id == kid:
+                    d[field] = value.token  # still sealed as loaded
+                    continue
+                value = value.reveal()
+                if not value:
+                    d[field] = ""
+                    continue
+            d[field] = crypto.encrypt(str(value))
+        out.append(d)
     return out
 
 
-def unseal_dict(purpose: str, d: dict, fields: tuple | list) -> dict:
-    out = dict(d)
+def _unseal_fields(crypto: "_FieldCrypto", d: dict, fields, kid: str | None = None) -> bool:
+    """Decrypt per-field tokens of *d* in place; True if any value was present.
+
+    With *kid* (the vault key id), current-version tokens become Sealed
+    handles instead of being decrypted.
+    """
+    seen = False
     for field in fields:
-        value = out.get(field)
+        value = d.get(field)
         if isinstance(value, str) and value:
+            seen = True
+            if kid is not None and value.startswith(TOKEN_PREFIX_CURRENT) \
+                    and _peek_version(value) == TOKEN_VERSION_CURRENT:
+                d[field] = Sealed(crypto.purpose, value, None, kid)
+                continue
             try:
-                out[field] = decrypt_field(purpose, value)
+                d[field] = crypto.decrypt(value)
             except VaultError as e:
                 if str(e) == "foreign":
                     raise
                 log.warning("vault: field %s: %s (set to empty)", field, e)
-                out[field] = ""
+                d[field] = ""
+    return seen
+
+
+def unseal_dicts(purpose: str, dicts, fields: tuple | list, lazy: bool = False) -> list[dict]:
+    """Decrypt *fields* of every dict in *dicts*; returns new dicts in order.
+
+    Reads tws3 field tokens and tws4 records alike.  A field or record that
+    fails to decrypt is left empty; a foreign vault raises.  With *lazy*,
+    tws3 tokens and tws4 records are returned as Sealed handles and only
+    legacy or plain values are processed now.
+    """
+    crypto = _FieldCrypto(purpose)
+    aad = _record_aad(purpose, "server")
+    kid = key_id() if lazy else None
+    out = []
+    formats = set()
+    for d in dicts:
+        d = dict(d)
+        if _unseal_fields(crypto, d, fields, kid):
+            formats.add(RECORD_FORMAT_FIELDS)
+        token = d.pop(RECORD_KEY, None)
+        if token and lazy:
+            formats.add(RECORD_FORMAT_RECORDS)
+            d.update({f: Sealed(purpose, token, f, kid) for f in fields})
+        elif token:
+            formats.add(RECORD_FORMAT_RECORDS)
+            try:
+                hidden = _open_record(crypto.cipher(), token, aad)
+            except VaultError as e:
+                if str(e) == "foreign":
+                    raise
+                log.warning("vault: sealed record: %s (secrets set to empty)", e)
+                hidden = {}
+            if isinstance(hidden, dict):
+                d.update({f: hidden[f] for f in fields if isinstance(hidden.get(f), str)})
+        out.append(d)
+    for fmt in formats:
+        _note_format(fmt)
     return out
 
 
-def file_saved(name: str):
+def seal_group(purpose: str, owner: dict, items_key: str,
+               fields: tuple | list, owner_fields: tuple | list = ()) -> dict:
+    """Seal *owner* and the dicts in owner[items_key] as one unit.
+
+    In the "tws4" record format the *owner_fields* of *owner* and the
+    *fields* of every item go into a single record under RECORD_KEY, bound
+    to the number of items.  Otherwise each value becomes its own tws3 token.
+    """
+    owner = dict(owner)
+    items = [dict(i) for i in owner.get(items_key, [])]
+    if _RECORD_FORMAT != RECORD_FORMAT_RECORDS:
+        owner.update(seal_dicts(purpose, (owner,), owner_fields)[0])
+        owner[items_key] = seal_dicts(purpose, items, fields)
+        return owner
+    owner.pop(RECORD_KEY, None)
+    payload = {"owner": _split_secrets(owner, owner_fields),
+               "items": [_split_secrets(i, fields) for i in items]}
+    aad = _record_aad(purpose, items_key, len(items))
+    owner[items_key] = items
+    owner[RECORD_KEY] = _seal_record(_field_cipher(purpose), payload, aad)
+    return owner
+
+
+def unseal_group(purpose: str, owner: dict, items_key: str,
+                 fields: tuple | list, owner_fields: tuple | list = (),
+                 lazy: bool = False) -> dict:
+    """Reverse of seal_group; also accepts owners stored in tws3 form.
+
+    With *lazy*, item secrets stay sealed: tws3 tokens as with unseal_dicts,
+    a group record as Sealed handles to the item inside it.  The record is
+    still opened once here for the owner fields, but the item secrets are
+    not kept; revealing one opens the record again through the reveal cache.
+    """
+    owner = dict(owner)
+    items = [i for i in owner.get(items_key, []) if isinstance(i, dict)]
+    token = owner.pop(RECORD_KEY, None)
+    if not token:
+        owner.update(unseal_dicts(purpose, (owner,), owner_fields)[0])
+        owner[items_key] = unseal_dicts(purpose, items, fields, lazy=lazy)
+        return owner
+    _note_format(RECORD_FORMAT_RECORDS)
+    aad = _record_aad(purpose, items_key, len(items))
+    try:
+        payload = _open_record(_field_cipher(purpose), token, aad)
+    except VaultError as e:
+        if str(e) == "foreign":
+            raise
+        log.warning("vault: sealed %s record: %s (secrets set to empty)", items_key, e)
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+    hidden = payload.get("owner")
+    if isinstance(hidden, dict):
+        owner.update({f: hidden[f] for f in owner_fields if isinstance(hidden.get(f), str)})
+    hidden_items = payload.get("items")
+    if not isinstance(hidden_items, list) or len(hidden_items) != len(items):
+        hidden_items = [{}] * len(items)
+    kid = key_id() if lazy else None
+    out = []
+    for pos, (item, hidden) in enumerate(zip(items, hidden_items)):
+        item = dict(item)
+        if isinstance(hidden, dict):
+            present = [f for f in fields if isinstance(hidden.get(f), str)]
+            if lazy:
+                item.update({f: Sealed(purpose, token, f, kid, pos, aad) for f in present})
+            else:
+                item.update({f: hidden[f] for f in present})
+        out.append(item)
+    owner[items_key] = out
+    return owner
+
+
+def seal_dict(purpose: str, d: dict, fields: tuple | list) -> dict:
+    return seal_dicts(purpose, (d,), fields)[0]
+
+
+def unseal_dict(purpose: str, d: dict, fields: tuple | list) -> dict:
+    return unseal_dicts(purpose, (d,), fields)[0]
+
+
+def _flush_chain_locked(digests: dict[str, str]):
+    draw = _read_drawer()
+    if draw is None:
+        return
+    chain = draw.setdefault("chain", {})
+    if all(chain.get(name) == digest for name, digest in digests.items()):
+        return
+    chain.update(digests)
+    _write_drawer(draw)
+
+
+@contextlib.contextmanager
+def chain_batch():
+    """Hold back drawer chain updates from file_saved until the block ends.
+
+    Saving several chained files inside one batch rewrites drawer.json once.
+    """
+    global _CHAIN_BATCH
+    with _lock:
+        _CHAIN_BATCH += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _CHAIN_BATCH -= 1
+            if _CHAIN_BATCH == 0 and _CHAIN_PENDING:
+                pending = dict(_CHAIN_PENDING)
+                _CHAIN_PENDING.clear()
+                _flush_chain_locked(pending)
+
+
+def file_saved(name: str, data: bytes | None = None):
+    """Record the digest of chained file *name* after it was written.
+
+    Pass the bytes just written as *data* to avoid reading the file back.
+    """
     with _lock:
         if name not in CHAIN_FILES:
             return
-        try:
-            digest = _sha256((get_config_dir() / name).read_bytes()).hex()
-        except OSError:
-            log.warning("vault: cannot hash %s", name)
-            return
-        draw = _read_drawer()
-        if draw is None:
+        if data is None:
+            try:
+                data = (get_config_dir() / name).read_bytes()
+            except OSError:
+                log.warning("vault: cannot hash %s", name)
+                return
+        digest = _sha256(data).hex()
+        if _CHAIN_BATCH:
+            _CHAIN_PENDING[name] = digest
             return
-        draw.setdefault("chain", {})[name] = digest
-        _write_drawer(draw)
+        _flush_chain_locked({name: digest})
+
 
+def file_intact(name: str, data: bytes | None = None) -> bool:
+    """Check chained file *name* against its recorded digest.
 
-def file_intact(name: str) -> bool:
+    Pass the bytes already read as *data* to avoid reading the file twice.
+    """
     with _lock:
         if name not in CHAIN_FILES:
             return True
@@ -724,11 +1413,13 @@ def file_intact(name: str) -> bool:
         want = draw.get("chain", {}).get(name)
         if want is None:
             return True
-        try:
-            have = _sha256((get_config_dir() / name).read_bytes()).hex()
-        except OSError:
-            log.warning("vault: %s missing but chain expects it", name)
-            return False
+        if data is None:
+            try:
+                data = (get_config_dir() / name).read_bytes()
+            except OSError:
+                log.warning("vault: %s missing but chain expects it", name)
+                return False
+        have = _sha256(data).hex()
         if have != want:
             log.warning("vault: %s was modified outside Socksicle (chain mismatch)", name)
             return False
@@ -745,72 +1436,140 @@ def _import_clean(raw: dict) -> dict:
     return out
 
 
-def export_payload(manual_servers, subscriptions):
-    def is_locked(item):
-        if hasattr(item, "lock_export"):
-            return bool(item.lock_export)
-        if isinstance(item, dict):
-            return bool(item.get("lock_export", False))
-        return False
+EXPORT_SCHEMA = "socksicle-export"
+EXPORT_NOTE = ("Secret fields (passwords, links) in this file are stored in plain text — "
+               "do not share or store it unnecessarily.")
+
+
+def _export_locked(item) -> bool:
+    if hasattr(item, "lock_export"):
+        return bool(item.lock_export)
+    if isinstance(item, dict):
+        return bool(item.get("lock_export", False))
+    return False
+
 
+def iter_export(manual_servers, subscriptions):
+    """Yield an export one record at a time, skipping lock_export items.
+
+    Records are ("manual", server_dict), ("subscription", sub_dict without
+    its servers) and ("subscription_server", server_dict); the servers of a
+    subscription follow it.
+    """
     def server_dict(s):
         return s.to_dict() if hasattr(s, "to_dict") else dict(s)
 
-    exported_manuals = [
-        server_dict(s) for s in manual_servers
-        if not is_locked(s)
-    ]
-    exported_subs = []
+    for s in manual_servers:
+        if not _export_locked(s):
+            yield "manual", server_dict(s)
     for sub in subscriptions:
-        if is_locked(sub):
+        if _export_locked(sub):
             continue
-        sub_dict = dict(sub)
-        sub_servers = [
-            server_dict(s) for s in sub_dict.get("servers", [])
-            if not is_locked(s)
-        ]
-        exported_subs.append({**sub_dict, "servers": sub_servers})
+        yield "subscription", {k: v for k, v in sub.items() if k != "servers"}
+        for s in sub.get("servers", []):
+            if not _export_locked(s):
+                yield "subscription_server", server_dict(s)
+
+
+def count_export(manual_servers, subscriptions) -> int:
+    """Number of servers iter_export yields."""
+    total = sum(not _export_locked(s) for s in manual_servers)
+    for sub in subscriptions:
+        if not _export_locked(sub):
+            total += sum(not _export_locked(s) for s in sub.get("servers", []))
+    return total
 
+
+def export_payload(manual_servers, subscriptions):
+    exported_manuals = []
+    exported_subs = []
+    for kind, d in iter_export(manual_servers, subscriptions):
+        if kind == "manual":
+            exported_manuals.append(d)
+        elif kind == "subscription":
+            exported_subs.append({**d, "servers": []})
+        else:
+            exported_subs[-1]["servers"].append(d)
     return {
-        "schema": "socksicle-export",
-        "note": "Secret fields (passwords, links) in this file are stored in plain text — "
-                "do not share or store it unnecessarily.",
+        "schema": EXPORT_SCHEMA,
+        "note": EXPORT_NOTE,
         "manual_servers": exported_manuals,
         "subscriptions": exported_subs,
     }
 
 
-def import_payload(data):
+def _import_server(raw):
     from .server_model import Server
+    if not isinstance(raw, dict):
+        return None
+    try:
+        return Server.from_dict(_import_clean(raw)) or None
+    except (TypeError, ValueError):
+        return None
+
+
+def import_records(records):
+    """Turn export records (see iter_export) into imported items, one at a time.
+
+    Yields ("manual", Server) and ("subscription", sub_dict) with the
+    subscription's "servers" as Servers, once all of them have been read.
+    """
+    sub = None
+    for kind, raw in records:
+        if kind == "subscription_server":
+            if sub is not None:
+                srv = _import_server(raw)
+                if srv:
+                    sub["servers"].append(srv)
+            continue
+        if sub is not None:
+            yield "subscription", sub
+            sub = None
+        if kind == "manual":
+            srv = _import_server(raw)
+            if srv:
+                yield "manual", srv
+        elif kind == "subscription" and isinstance(raw, dict):
+            sub = _import_clean(raw)
+            sub["servers"] = []
+    if sub is not None:
+        yield "subscription", sub
+
+
+def payload_records(data, consume: bool = False):
+    """Export records of a whole export document (see export_payload).
+
+    With consume=True the document's lists are emptied as they are read, so
+    each stored dict can be freed once its server has been imported.
+    """
+    def items(value):
+        if not isinstance(value, list):
+            return
+        if not consume:
+            yield from value
+            return
+        value.reverse()
+        while value:
+            yield value.pop()
+
+    for raw in items(data.get("manual_servers")):
+        yield "manual", raw
+    for raw in items(data.get("subscriptions")):
+        if not isinstance(raw, dict):
+            continue
+        servers = raw.pop("servers", None) if consume else raw.get("servers")
+        yield "subscription", {k: v for k, v in raw.items() if k != "servers"}
+        yield from (("subscription_server", s) for s in items(servers))
+
+
+def import_payload(data):
     data = dict(data or {})
     if "schema" not in data:
         log.warning("import: legacy export format (no schema), treating as transport form")
     manuals = []
-    for raw in data.get("manual_servers", []):
-        if not isinstance(raw, dict):
-            continue
-        try:
-            srv = Server.from_dict(_import_clean(raw))
-        except (TypeError, ValueError):
-            continue
-        if srv:
-            manuals.append(srv)
     subs = []
-    for raw in data.get("subscriptions", []):
-        if not isinstance(raw, dict):
-            continue
-        raw = _import_clean(raw)
-        servers = []
-        for s in raw.get("servers", []):
-            if isinstance(s, dict):
-                try:
-                    srv = Server.from_dict(_import_clean(s))
-                except (TypeError, ValueError):
-                    continue
-                if srv:
-                    servers.append(srv)
-        raw["servers"] = servers
-        subs.append(raw)
+    for kind, item in import_records(payload_records(data)):
+        (manuals if kind == "manual" else subs).append(item)
     return manuals, subs
 
 
@@ -842,11 +1601,18 @@ def _legacy_deobfuscate(token, key=None):
 
 
 def _reset():
-    global _D, _K_PRIMARY, _K_PRIMARY_V2, _TIER, _REPAIRED, _FOREIGN, _MIGRATED, _MIGRATION_LOGGED
+    global _DRAWER_CACHE, _CHAIN_BATCH, _RECORD_FORMAT, _D, _K_PRIMARY, _K_PRIMARY_V2, _TIER, _REPAIRED, _FOREIGN, _MIGRATED, _MIGRATION_LOGGED
     with _lock:
         _D = None
         _K_PRIMARY = None
         _K_PRIMARY_V2 = None
+        _CIPHERS.clear()
+        _LOOKUP_KEYS.clear()
+        _key_changed()
+        _RECORD_FORMAT = RECORD_FORMAT_FIELDS
+        _DRAWER_CACHE = None
+        _CHAIN_BATCH = 0
+        _CHAIN_PENDING.clear()
         _TIER = ""
         _REPAIRED = False
         _FOREIGN = False
@@ -0,0 +1,93 @@
+"""Benchmark for the TwinSock record formats on subscriptions.json.
+
+Builds one synthetic subscription per size (servers parsed from
+``parse_bench.make_links``) and, for the ``tws3`` (one token per secret
+field) and ``tws4`` (one sealed record per subscription) formats, reports:
+
+- ``file_kb``: size of the written subscriptions.json;
+- ``save_s``: save_subscriptions with a cold seal cache;
+- ``load_s``: load_subscriptions of that file.
+
+The vault and files live in a throwaway config directory, so the real
+Socksicle configuration is never touched.  Run with::
+
+    python -m utils.vault_bench [--sizes 1000,10000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from . import sub_manager, twinsock
+from .parse_bench import make_links
+from .server_model import Server
+
+DEFAULT_SIZES = (1_000, 10_000)
+_CONFIG_ENV = ("APPDATA", "XDG_CONFIG_HOME")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(sizes=DEFAULT_SIZES):
+    """Return one result dict per size and record format."""
+    saved_env = {k: os.environ.get(k) for k in _CONFIG_ENV}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for k in _CONFIG_ENV:
+            os.environ[k] = tmp
+        twinsock._reset()
+        try:
+            for size in sizes:
+                servers = [s.to_dict() for s in Server.from_links(make_links(size), workers=1)]
+                subs = [{"name": "Bench", "url": "https://example.com/sub?token=bench",
+                         "servers": servers}]
+                path = sub_manager._subscriptions_path()
+                for fmt in twinsock.RECORD_FORMATS:
+                    twinsock.set_record_format(fmt)
+                    sub_manager._seal_cache = {}
+                    save = _timed(lambda: sub_manager.save_subscriptions(subs))
+                    load = _timed(sub_manager.load_subscriptions)
+                    results.append({"servers": size, "format": fmt,
+                                    "file_kb": round(path.stat().st_size / 1024, 1),
+                                    "save_s": round(save, 3), "load_s": round(load, 3)})
+        finally:
+            twinsock._reset()
+            sub_manager._seal_cache = {}
+            for k, v in saved_env.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark TwinSock tws3 vs tws4 storage.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated server counts")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+    try:
+        sizes = [int(v) for v in args.sizes.split(",") if v.strip()]
+    except ValueError as e:
+        parser.error(f"bad size: {e}")
+    results = run(sizes)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    headers = ("servers", "format", "file_kb", "save_s", "load_s")
+    rows = [headers] + [tuple(r[h] for h in headers) for r in results]
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(headers))]
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)).rstrip())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())